@@ -0,0 +1,120 @@
+"""
+Admission control for the chat endpoints.
+
+A burst of /chat traffic would otherwise start one agent run (LLM calls,
+aiosqlite work) per request with no upper bound. Three guards sit in front of
+the agent tree:
+
+  * `ConcurrencyLimiter`: at most `max_in_flight` agent runs per worker; up to
+    `max_queue` more wait (FIFO) for a slot for at most `queue_timeout`
+    seconds, anything beyond that is rejected immediately (503).
+  * `RateLimiter`: fixed-window request counts per client, kept in the
+    SharedState backend so the limit holds across worker processes (429).
+  * `until_deadline`: iterates an agent run until the request's deadline and
+    then cancels the pending step, which cancels the LLM call or tool in
+    progress and closes the whole agent chain.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; `status_code` and `retry_after` (seconds) go into the HTTP response."""
+
+    def __init__(self, status_code: int, reason: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.message = message
+        self.retry_after = retry_after
+
+    def headers(self):
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))} if self.retry_after is not None else {}
+
+
+class ConcurrencyLimiter:
+    """Bounded number of concurrent runs with a bounded FIFO wait queue (max_in_flight <= 0: unlimited)."""
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None):
+        """
+        Holds one run slot for the duration of the block. Waits at most
+        min(queue_timeout, timeout) seconds; raises AdmissionRejected (503) when
+        the queue is full or the wait times out.
+        """
+        if self._semaphore is not None:
+            if self._semaphore.locked() or self.waiting:
+                if self.waiting >= self.max_queue:
+                    raise AdmissionRejected(503, "queue_full", "The assistant is busy right now. Please try again in a moment.", retry_after=1)
+                wait = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+                self.waiting += 1
+                try:
+                    async with asyncio.timeout(max(wait, 0)):
+                        await self._semaphore.acquire()
+                except TimeoutError:
+                    raise AdmissionRejected(503, "queue_timeout", "The assistant is busy right now. Please try again in a moment.", retry_after=1) from None
+                finally:
+                    self.waiting -= 1
+            else:
+                await self._semaphore.acquire()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    def stats(self):
+        return {"max_in_flight": self.max_in_flight, "max_queue": self.max_queue, "in_flight": self.in_flight, "waiting": self.waiting}
+
+
+class RateLimiter:
+    """At most `limit` requests per client per `window_seconds` (limit <= 0: unlimited)."""
+
+    def __init__(self, shared_state, limit: int, window_seconds: float):
+        self.shared_state = shared_state
+        self.limit = limit
+        self.window_seconds = window_seconds
+
+    async def check(self, client_key: str) -> None:
+        """Counts one request for `client_key`; raises AdmissionRejected (429) once the window's budget is spent."""
+        if self.limit <= 0:
+            return
+        now = time.time()
+        window = int(now // self.window_seconds)
+        count = await self.shared_state.incr(f"ratelimit:{client_key}:{window}", 1, ttl=self.window_seconds)
+        if count > self.limit:
+            raise AdmissionRejected(
+                429, "rate_limited", "Too many messages. Please slow down and try again shortly.",
+                retry_after=(window + 1) * self.window_seconds - now,
+            )
+
+
+async def until_deadline(events: AsyncIterator, deadline: float) -> AsyncIterator:
+    """
+    Yields from `events` until the event loop time reaches `deadline`, then raises
+    TimeoutError. Only the wait for the next item is timed, so the cancellation
+    lands inside `events` (the agent run) and never in the caller's own awaits.
+    """
+    try:
+        while True:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    event = await events.__anext__()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        await events.aclose()
@@ -0,0 +1,79 @@
+"""
+Coalesces concurrent single-key lookups into one batched query.
+
+When the LLM emits several tool calls in one step, the ADK runs them
+concurrently; each `check_order_status` call would otherwise take its own
+pooled connection and run its own query. `BatchLoader.load(key)` queues the
+key instead and returns a future: every key queued during the same event-loop
+turn (all the tool calls the ADK just started, or the IDs of one
+`check_order_statuses` call) is answered by a single `load_many(keys)` call,
+i.e. one `WHERE ... IN (...)` round trip.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    `load_many(keys)` returns key -> value for the keys it found; `load(key)`
+    returns that value, or None for a key `load_many` did not return. An
+    exception from `load_many` is raised by every `load` of its batch.
+    """
+
+    def __init__(self, load_many: Callable[[List[K]], Awaitable[Dict[K, V]]], max_batch_size: int = 500):
+        self._load_many = load_many
+        self.max_batch_size = max_batch_size
+        self._queued: Dict[K, asyncio.Future] = {}
+        self._dispatch_scheduled = False
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.keys = 0
+
+    async def load(self, key: K) -> Optional[V]:
+        future = self._queued.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._queued[key] = loop.create_future()
+            if not self._dispatch_scheduled:
+                # Runs after the tasks that are already ready, so their keys join this batch
+                self._dispatch_scheduled = True
+                loop.call_soon(self._dispatch)
+        # Shielded: a caller cancelled at its deadline must not fail the batch for the others
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        queued, self._queued = self._queued, {}
+        self._dispatch_scheduled = False
+        keys = list(queued)
+        for start in range(0, len(keys), self.max_batch_size):
+            batch = {key: queued[key] for key in keys[start:start + self.max_batch_size]}
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: Dict[K, asyncio.Future]) -> None:
+        self.batches += 1
+        self.keys += len(batch)
+        try:
+            found = await self._load_many(list(batch))
+        except BaseException as e:
+            for future in batch.values():
+                if future.done():
+                    continue
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                    future.exception()  # Mark as retrieved; callers still waiting get it themselves
+                else:
+                    future.cancel()
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(key))
+
+    def stats(self) -> Dict[str, float]:
+        return {"batches": self.batches, "keys": self.keys, "keys_per_batch": self.keys / self.batches if self.batches else 0.0}
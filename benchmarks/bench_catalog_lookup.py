@@ -0,0 +1,84 @@
+"""
+Microbenchmark: product-by-id lookup via ProductCatalog's hash index vs. the
+original `next(p for p in product_catalog if p.get("id") == ...)` list scan.
+
+Simulates resolving the line items of a 50-line order against synthetic catalogs.
+
+Run from the repository root:
+    python benchmarks/bench_catalog_lookup.py
+    python benchmarks/bench_catalog_lookup.py --sizes 1000 100000 --lines 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from catalog import ProductCatalog  # noqa: E402
+
+
+def make_products(size):
+    categories = ["Clothing", "Electronics", "Home & Kitchen", "Books", "Sports", "Health"]
+    return [
+        {
+            "id": f"p-{i:07d}",
+            "name": f"Synthetic Product {i}",
+            "price": round(1 + (i % 500) * 0.37, 2),
+            "description": f"Synthetic product number {i} for benchmarking.",
+            "category": categories[i % len(categories)],
+        }
+        for i in range(size)
+    ]
+
+
+def run(sizes, lines, repeat):
+    results = []
+    rng = random.Random(42)
+    for size in sizes:
+        products = make_products(size)
+        catalog = ProductCatalog(products)
+        order_ids = [f"p-{rng.randrange(size):07d}" for _ in range(lines)]
+
+        def list_scan():
+            for product_id in order_ids:
+                next((p for p in products if p.get("id") == product_id), None)
+
+        def index_lookup():
+            for product_id in order_ids:
+                catalog.get(product_id)
+
+        # Keep the slow path to a bounded number of runs on large catalogs
+        scan_runs = max(1, min(100, 200_000 // size))
+        scan = min(timeit.repeat(list_scan, number=scan_runs, repeat=repeat)) / scan_runs
+        index = min(timeit.repeat(index_lookup, number=1000, repeat=repeat)) / 1000
+        results.append({
+            "catalog_size": size,
+            "order_lines": lines,
+            "list_scan_us": round(scan * 1e6, 2),
+            "index_lookup_us": round(index * 1e6, 2),
+            "speedup": round(scan / index, 1) if index else None,
+        })
+        print(f"{size:>9} products | list scan {scan * 1e6:>12.1f} us/order | "
+              f"index {index * 1e6:>8.2f} us/order | x{scan / index:,.0f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[102, 1_000, 10_000, 100_000])
+    parser.add_argument("--lines", type=int, default=50, help="line items per simulated order")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.lines, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
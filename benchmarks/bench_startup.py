@@ -0,0 +1,170 @@
+"""
+Cold-start benchmark: how long a fresh worker process takes to import main and
+to become ready, per AGENT_WARMUP mode.
+
+  * import: `python -X importtime -c "import main"` in a fresh interpreter;
+    reports the total and the packages with the most import time (self time
+    summed per top-level package), so a heavy import creeping back into the
+    module-level imports shows up by name.
+  * startup: starts `uvicorn main:app` against empty temporary databases and
+    polls GET /ready, recording when the first HTTP response arrives (the
+    worker is serving) and when /ready turns 200 (it can run agent turns).
+
+Results use the shared format, so two runs can be diffed with compare.py.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --modes startup background --json startup.json
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from results import summarize, write_results  # noqa: E402
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _env(**overrides):
+    env = dict(os.environ)
+    env.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")  # no network fetch of the model cost map
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.update(overrides)
+    return env
+
+
+def import_profile():
+    """(seconds to import main, {top-level package: summed self seconds}) from one fresh interpreter."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    total = None
+    per_package = defaultdict(float)
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = int(match[1]), int(match[2]), match[3], match[4]
+        per_package[module.split(".")[0]] += self_us / 1e6
+        if module == "main" and len(indent) == 1:
+            total = cumulative_us / 1e6
+    return total, per_package
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get_ready(url):
+    """HTTP status of GET /ready, or None while nothing is listening yet."""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None
+
+
+def time_to_ready(mode, timeout):
+    """(seconds until the first HTTP response, seconds until /ready is 200) for one uvicorn start."""
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        env = _env(
+            AGENT_WARMUP=mode,
+            SQLITE_DATABASE_PATH=os.path.join(workdir, "ecommerce.db"),
+            SESSION_DATABASE_PATH=os.path.join(workdir, "sessions.db"),
+            SHARED_STATE_PATH=os.path.join(workdir, "shared_state.db"),
+            CATALOG_FILE=os.path.join(workdir, "products.cat"),
+            CATALOG_WATCH_INTERVAL_SECONDS="0",
+        )
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        serving = ready = None
+        try:
+            url = f"http://127.0.0.1:{port}/ready"
+            while ready is None and time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {server.returncode} (AGENT_WARMUP={mode})")
+                status = _get_ready(url)
+                now = time.perf_counter() - started
+                if status is not None and serving is None:
+                    serving = now
+                if status == 200:
+                    ready = now
+                else:
+                    time.sleep(0.02)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    if ready is None:
+        raise RuntimeError(f"/ready did not return 200 within {timeout}s (AGENT_WARMUP={mode})")
+    return serving, ready
+
+
+def run(args):
+    results = []
+
+    import_seconds = []
+    package_seconds = defaultdict(list)
+    for _ in range(args.runs):
+        total, per_package = import_profile()
+        import_seconds.append(total)
+        for package, seconds in per_package.items():
+            package_seconds[package].append(seconds)
+    row = {"group": "import", "name": "main", **summarize(import_seconds, sum(import_seconds))}
+    row["top_packages"] = {
+        package: round(statistics.median(seconds) * 1000, 1)
+        for package, seconds in sorted(package_seconds.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+    }
+    results.append(row)
+
+    for mode in args.modes:
+        serving, ready = zip(*(time_to_ready(mode, args.timeout) for _ in range(args.runs)))
+        results.append({"group": "serving", "name": mode, **summarize(serving, sum(serving))})
+        results.append({"group": "ready", "name": mode, **summarize(ready, sum(ready))})
+    return results
+
+
+def print_results(results):
+    for row in results:
+        print(f"  {row['group']:<8} {row['name']:<11} p50 {row['p50_ms'] / 1000:7.3f} s | max {row['max_ms'] / 1000:7.3f} s | runs {row['calls']}")
+        for package, ms in row.get("top_packages", {}).items():
+            print(f"      {package:<24} {ms:9.1f} ms")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per measurement")
+    parser.add_argument("--modes", nargs="+", default=["startup", "background", "lazy"], help="AGENT_WARMUP modes to start")
+    parser.add_argument("--top", type=int, default=8, help="packages listed in the import profile")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for /ready")
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+    if args.json:
+        write_results(args.json, "startup", {k: v for k, v in vars(args).items() if k != "json"}, results)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,161 @@
+"""
+Latency / throughput benchmark for the agent tools against synthetic data.
+
+For every catalog size x order-table size it builds a synthetic catalog and a
+migrated SQLite database (see synthetic.py), then calls search_products
+(keywords, a category sorted by price, the category list), check_order_status
+(one order, five in parallel and five through check_order_statuses),
+list_all_orders (first page and a deep keyset page), get_sales_summary,
+place_order and remove_order directly, `--calls` times each from
+`--concurrency` concurrent workers. Products come from the store selected with
+CATALOG_STORE (sqlite by default, like the server). The tool result cache is
+disabled unless `--cache` is given, so the numbers reflect the tools themselves.
+
+Run from the repository root:
+    python benchmarks/bench_tools.py
+    python benchmarks/bench_tools.py --products 1000 1000000 --orders 10000 10000000 --json tools.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)  # main mounts templates/static relative to the working directory
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("ORDER_ARCHIVE_AFTER_DAYS", "0")  # synthetic orders are all older than the archival cutoff
+
+import main  # noqa: E402
+from catalog import ProductCatalog, parse_products  # noqa: E402
+from db_pool import SQLitePool  # noqa: E402
+from results import summarize, write_results  # noqa: E402
+from synthetic import build_orders_db, make_products  # noqa: E402
+
+
+def tool_workloads(products, orders_count, rng):
+    """tool name -> zero-argument coroutine factory producing one representative call."""
+    words = [w for p in products[:2000] for w in p["name"].split()]
+    categories = sorted({p["category"] for p in products})
+    order_ids = [f"BENCH-{i:08d}" for i in range(orders_count)]
+    removable = rng.sample(order_ids, min(len(order_ids), 10_000))
+    deep_cursor = main._encode_order_cursor("2024-07-01T00:00:00", "BENCH-00000000")
+
+    def search():
+        query = " ".join(rng.sample(words, 2))
+        if rng.random() < 0.3:
+            return main.search_products(query, category=rng.choice(categories))
+        return main.search_products(query)
+
+    def place():
+        items = [{"product_id": rng.choice(products)["id"], "quantity": rng.randint(1, 3)} for _ in range(rng.randint(1, 4))]
+        return main.place_order(items)
+
+    return {
+        "search_products": search,
+        "search_products_by_price": lambda: main.search_products(
+            "", category=rng.choice(categories), max_price=rng.choice((25, 50, 100, 500)), sort_by="price_asc",
+        ),
+        "search_categories": lambda: main.search_products("what categories do you have"),
+        "check_order_status": lambda: main.check_order_status(rng.choice(order_ids)),
+        # Five orders in one turn: parallel tool calls (as the ADK runs them) and the batched tool
+        "check_order_status_x5_parallel": lambda: _first_error(*(main.check_order_status(i) for i in rng.sample(order_ids, 5))),
+        "check_order_statuses_x5": lambda: main.check_order_statuses(rng.sample(order_ids, 5)),
+        "list_all_orders": lambda: main.list_all_orders(),
+        "list_all_orders_deep_page": lambda: main.list_all_orders(cursor=deep_cursor),
+        "get_sales_summary": lambda: main.get_sales_summary(days=30, top_products=10),
+        "place_order": place,
+        "remove_order": lambda: main.remove_order(removable.pop() if removable else "missing"),
+    }
+
+
+async def _first_error(*calls):
+    """Awaits the calls concurrently; the first error result, or the last result."""
+    results = await asyncio.gather(*calls)
+    return next((r for r in results if r.get("status") == "error"), results[-1])
+
+
+async def measure(make_call, calls: int, concurrency: int):
+    latencies, errors = [], 0
+    remaining = iter(range(calls))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            result = await make_call()
+            latencies.append(time.perf_counter() - started)
+            if result.get("status") == "error":
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_case(products_count, orders_count, args, workdir):
+    rng = random.Random(1234)
+    products = make_products(products_count)
+    db_path = os.path.join(workdir, f"orders_{products_count}_{orders_count}.db")
+    build = await build_orders_db(db_path, orders_count, [p["id"] for p in products], products=products)
+    print(f"\n{products_count:,} products / {orders_count:,} orders (built in {build['build_seconds']}s)")
+
+    main.catalog = ProductCatalog(products)
+    main.tool_cache.clear()
+    main.tool_cache.max_entries = main.TOOL_CACHE_MAX_ENTRIES if args.cache else 0
+    main.db_pool = SQLitePool(db_path, readers=args.readers)
+    await main.db_pool.open()
+    if main._sql_catalog():
+        await main._import_sql_catalog(parse_products(products))
+    await main.refresh_catalog_columns()
+    main.request_is_admin.set(True)  # get_sales_summary answers admin requests only
+
+    rows = []
+    try:
+        for tool, make_call in tool_workloads(products, orders_count, rng).items():
+            if args.tools and tool not in args.tools:
+                continue
+            latencies, errors, wall = await measure(make_call, args.calls, args.concurrency)
+            row = {"products": products_count, "orders": orders_count, "tool": tool, "errors": errors, **summarize(latencies, wall)}
+            rows.append(row)
+            print(f"  {tool:<30} p50 {row['p50_ms']:>9.3f} ms | p95 {row['p95_ms']:>9.3f} ms | "
+                  f"{row['throughput_per_s']:>9,.1f}/s | errors {errors}")
+    finally:
+        await main.db_pool.close()
+    return rows
+
+
+async def run(args):
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for products_count in args.products:
+            for orders_count in args.orders:
+                results.extend(await run_case(products_count, orders_count, args, workdir))
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, nargs="+", default=[1_000, 100_000], help="catalog sizes")
+    parser.add_argument("--orders", type=int, nargs="+", default=[10_000, 100_000], help="order table sizes")
+    parser.add_argument("--calls", type=int, default=500, help="calls per tool")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=main.SQLITE_POOL_READERS, help="SQLite reader connections")
+    parser.add_argument("--tools", nargs="+", help="only benchmark these tools")
+    parser.add_argument("--cache", action="store_true", help="keep the tool result cache enabled")
+    parser.add_argument("--workdir", help="directory for the temporary databases (default: system temp)")
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        params = {k: v for k, v in vars(args).items() if k not in ("json", "workdir")}
+        write_results(args.json, "tools", params, results)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,69 @@
+"""
+Compares two benchmark result files (from bench_tools.py or load_chat.py --json).
+
+Rows are matched on their identifying fields (tool / group / name and data
+sizes) and the p50 / p95 / throughput changes are printed. Exits with status
+1 when any p95 regressed by more than --threshold percent, so it can gate CI.
+
+    python benchmarks/compare.py before.json after.json --threshold 15
+"""
+import argparse
+import json
+import sys
+
+KEY_FIELDS = ("group", "name", "tool", "products", "orders")
+METRICS = ("p50_ms", "p95_ms", "throughput_per_s")
+
+
+def _key(row):
+    return tuple((field, row[field]) for field in KEY_FIELDS if field in row)
+
+
+def _change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(before_doc, after_doc, threshold):
+    before_rows = {_key(row): row for row in before_doc["results"] if "p95_ms" in row}
+    regressions = []
+    print(f"{before_doc.get('benchmark')}: {before_doc.get('commit')} -> {after_doc.get('commit')}")
+    for row in after_doc["results"]:
+        if "p95_ms" not in row:
+            continue
+        key = _key(row)
+        old = before_rows.get(key)
+        label = " ".join(f"{v}" for _, v in key)
+        if old is None:
+            print(f"  {label:<45} (new)")
+            continue
+        changes = {metric: _change(old.get(metric), row.get(metric)) for metric in METRICS}
+        print(f"  {label:<45} " + " | ".join(
+            f"{metric} {old.get(metric)} -> {row.get(metric)}"
+            + (f" ({changes[metric]:+.1f}%)" if changes[metric] is not None else "")
+            for metric in METRICS
+        ))
+        if changes["p95_ms"] is not None and changes["p95_ms"] > threshold:
+            regressions.append((label, changes["p95_ms"]))
+    for label, change in regressions:
+        print(f"REGRESSION: {label} p95 {change:+.1f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 increase in percent")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    sys.exit(1 if compare(before, after, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+main.app with every agent's model replaced by FakeLiteLlm, for load-testing a
+real multi-worker server without LLM calls (each worker process imports this
+module, so each installs its own fake model):
+
+    WEB_CONCURRENCY=4 FAKE_LLM_LATENCY_MS=300 uvicorn --app-dir benchmarks fake_app:app --port 8000
+    python benchmarks/load_chat.py --url http://127.0.0.1:8000 --clients 64 --requests 4000
+"""
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # main mounts templates/static relative to the working directory
+
+import main  # noqa: E402
+from fake_llm import install_fake_llm  # noqa: E402
+
+install_fake_llm(main.get_root_agent(), latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")))
+app = main.app
@@ -0,0 +1,133 @@
+"""
+Deterministic stand-in for the LiteLlm model, for load tests without network calls.
+
+Each agent behaves like a well-behaved model would: the orchestrator transfers
+to the sub-agent matching the message's keywords, sub-agents call their tool
+with arguments taken from the message, and every agent answers with a short
+text built from the tool result. An optional fixed latency per call
+approximates a remote model. fake_llm_server.py plays the same agents behind
+an OpenAI-compatible HTTP endpoint, to exercise the real LiteLLM/HTTP path.
+
+    from fake_llm import install_fake_llm
+    install_fake_llm(main.get_root_agent(), latency_ms=300)
+"""
+import asyncio
+import re
+from typing import Any, AsyncGenerator, Optional, Tuple
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+_AGENT_NAME_RE = re.compile(r'Your internal name is "([^"]+)"')
+_ORDER_ID_RE = re.compile(r"\b(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[A-Z]{2,6}-?\d{3,})\b", re.IGNORECASE)
+_PRODUCT_ID_RE = re.compile(r"\bp-\d+\b", re.IGNORECASE)
+
+# (keywords, sub-agent) checked in order by the orchestrator
+TRANSFER_RULES = [
+    (("revenue", "sales", "best sell", "top products"), "sales_analytics_agent"),
+    (("cancel", "remove"), "order_cancellation_agent"),
+    (("buy", "purchase", "order p-"), "ordering_agent"),
+    (("status", "track", "where is"), "order_status_agent"),
+    (("my orders", "order history", "list orders"), "list_orders_agent"),
+    (("bye", "goodbye", "thanks"), "farewell_agent"),
+    (("hi", "hello", "hey"), "greeting_agent"),
+]
+
+
+def _next_call(agent: str, message: str, tools) -> Optional[Tuple[str, dict]]:
+    lowered = message.lower()
+    if agent == "product_search_agent" and "search_products" in tools:
+        return "search_products", {"query": message}
+    if agent == "order_status_agent" and "check_order_status" in tools:
+        order_ids = _ORDER_ID_RE.findall(message)
+        if len(order_ids) > 1 and "check_order_statuses" in tools:
+            return "check_order_statuses", {"order_ids": order_ids}
+        match = _ORDER_ID_RE.search(message)
+        return "check_order_status", {"order_id": match.group(0) if match else "unknown"}
+    if agent == "order_cancellation_agent" and "remove_order" in tools:
+        match = _ORDER_ID_RE.search(message)
+        return "remove_order", {"order_id": match.group(0) if match else "unknown"}
+    if agent == "list_orders_agent" and "list_all_orders" in tools:
+        return "list_all_orders", {}
+    if agent == "sales_analytics_agent" and "get_sales_summary" in tools:
+        return "get_sales_summary", {}
+    if agent == "ordering_agent" and "place_order" in tools:
+        items = [{"product_id": pid, "quantity": 1} for pid in _PRODUCT_ID_RE.findall(message)]
+        return "place_order", {"items": items}
+    if "transfer_to_agent" in tools and agent == "shopping_orchestrator_agent":
+        padded = f" {lowered} "
+        target = next(
+            (target for keywords, target in TRANSFER_RULES if any(f" {k}" in padded for k in keywords)),
+            "product_search_agent",
+        )
+        return "transfer_to_agent", {"agent_name": target}
+    return None
+
+
+def next_step(agent: str, message: str, tools, tool_result: Optional[dict] = None) -> Tuple[str, Any, Any]:
+    """
+    The fake model's next move for `agent`: ("call", tool name, args) or ("text", reply, None).
+    `tool_result` is the response of the tool it called last (None on a fresh user turn).
+    Shared with fake_llm_server.py, which plays the same agents over the OpenAI HTTP API.
+    """
+    if tool_result is None:
+        call = _next_call(agent, message, tools)
+        if call is not None:
+            return ("call", *call)
+        return "text", f"Hello from {agent or 'the assistant'}! How can I help you shop today?", None
+    body = tool_result.get("report") or tool_result.get("message") or tool_result.get("status") or "Done."
+    return "text", f"[{agent}] {str(body)[:500]}", None
+
+
+class FakeLiteLlm(BaseLlm):
+    model: str = "fake/deterministic"
+    latency_ms: float = 0.0
+
+    @staticmethod
+    def _agent_name(llm_request) -> str:
+        instruction = getattr(llm_request.config, "system_instruction", None) or ""
+        match = _AGENT_NAME_RE.search(instruction if isinstance(instruction, str) else str(instruction))
+        return match.group(1) if match else ""
+
+    @staticmethod
+    def _user_text(llm_request) -> str:
+        # Skips the "For context: [agent] said ..." messages the ADK relays between agents
+        for content in reversed(llm_request.contents or []):
+            texts = [part.text for part in content.parts or () if part.text]
+            if content.role == "user" and texts and not texts[0].startswith("For context:"):
+                return texts[0]
+        return ""
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+        agent = self._agent_name(llm_request)
+        last = (llm_request.contents or [None])[-1]
+        responses = [p.function_response for p in (last.parts or ()) if p.function_response] if last else []
+        kind, value, args = next_step(
+            agent, self._user_text(llm_request), llm_request.tools_dict or {},
+            (responses[-1].response or {}) if responses else None,
+        )
+        if kind == "call":
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name=value, args=args))]))
+            return
+
+        if stream:
+            for start in range(0, len(value), 40):
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=value[start:start + 40])]), partial=True)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=value)]))
+
+
+def install_fake_llm(root_agent, latency_ms: float = 0.0) -> FakeLiteLlm:
+    """Replaces the model of `root_agent` and all of its sub-agents with one FakeLiteLlm."""
+    fake = FakeLiteLlm(latency_ms=latency_ms)
+
+    def walk(agent):
+        agent.model = fake
+        for sub_agent in agent.sub_agents:
+            walk(sub_agent)
+
+    walk(root_agent)
+    return fake
@@ -0,0 +1,147 @@
+"""
+OpenAI-compatible fake LLM server, for testing the real LiteLLM / HTTP path
+(main's shared LLM connection pool included) without network access.
+
+POST /v1/chat/completions answers like fake_llm.FakeLiteLlm: the agent is
+recognised from its system prompt ('Your internal name is "..."'), tool calls
+and replies come from fake_llm.next_step, with an optional fixed latency per
+call. Both plain and streamed (SSE) completions are supported.
+
+GET /stats reports what the server saw: requests, the number of distinct
+client connections (TCP source ports) they arrived on, and the peak number of
+concurrent requests, which shows whether the client reuses connections and
+how many calls it keeps in flight.
+
+Run from the repository root:
+    python benchmarks/fake_llm_server.py --port 8100 --latency-ms 200
+    LLM_API_BASE=http://127.0.0.1:8100/v1 LLM_API_KEY=fake uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse, StreamingResponse  # noqa: E402
+
+from fake_llm import _AGENT_NAME_RE, next_step  # noqa: E402
+
+LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+
+app = FastAPI()
+stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+connections = set()
+
+
+@app.middleware("http")
+async def count_connections(request: Request, call_next):
+    # Each TCP connection has its own client port; HTTP/1.1 keep-alive reuses it for later requests
+    if request.client is not None:
+        connections.add((request.client.host, request.client.port))
+    return await call_next(request)
+
+
+def _text(content) -> str:
+    """Message content as text: a string, or a list of {"type": "text", "text": ...} parts."""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content or () if isinstance(part, dict))
+
+
+def _decide(body):
+    messages = body.get("messages") or []
+    system = " ".join(_text(m.get("content")) for m in messages if m.get("role") in ("system", "developer"))
+    match = _AGENT_NAME_RE.search(system)
+    tools = {tool["function"]["name"] for tool in body.get("tools") or () if tool.get("type") == "function"}
+
+    tool_result = None
+    if messages and messages[-1].get("role") == "tool":
+        try:
+            tool_result = json.loads(_text(messages[-1].get("content")) or "{}")
+        except ValueError:
+            tool_result = {"message": _text(messages[-1].get("content"))}
+        if not isinstance(tool_result, dict):
+            tool_result = {"message": str(tool_result)}
+    # Skips the "For context: [agent] said ..." messages the ADK relays between agents
+    message = next(
+        (text for text in (_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user")
+         if text and not text.startswith("For context:")),
+        "",
+    )
+    return next_step(match.group(1) if match else "", message, tools, tool_result)
+
+
+def _completion(body, delta: bool, kind, value, args):
+    if kind == "call":
+        call = {"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function", "function": {"name": value, "arguments": json.dumps(args)}}
+        message = {"role": "assistant", "content": None, "tool_calls": [{"index": 0, **call} if delta else call]}
+        finish_reason = "tool_calls"
+    else:
+        message = {"role": "assistant", "content": value}
+        finish_reason = "stop"
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion.chunk" if delta else "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "delta" if delta else "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        if LATENCY_MS:
+            await asyncio.sleep(LATENCY_MS / 1000)
+        step = _decide(body)
+    finally:
+        stats["in_flight"] -= 1
+
+    if not body.get("stream"):
+        return JSONResponse(_completion(body, False, *step))
+
+    async def events():
+        yield f"data: {json.dumps(_completion(body, True, *step))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "connections": len(connections)}
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    stats.update(requests=0, max_in_flight=0)
+    connections.clear()
+    return {"status": "success"}
+
+
+def main_cli():
+    global LATENCY_MS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS, help="fixed latency per completion")
+    args = parser.parse_args()
+    LATENCY_MS = args.latency_ms
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,216 @@
+"""
+Concurrent load test for POST /chat with the LLM replaced by FakeLiteLlm.
+
+Starts the app in-process (startup/shutdown events included) against a
+synthetic catalog and order database, then `--clients` simulated users each
+send messages from a fixed mix (product searches, greetings, order status for
+one or several orders, order history, product counts, purchases) in their own
+session until `--requests` requests have been made. Latency is reported
+overall, per message kind and per path taken (fast_path / response_cache /
+agent).
+
+With `--llm-server` the agents talk to a local OpenAI-compatible fake
+(fake_llm_server.py, started on a free port) through LiteLLM and main's shared
+LLM HTTP pool instead; the server's request, connection and concurrency
+counts are reported too. Add `--no-llm-pool` for LiteLLM's own clients.
+
+With `--url` the same mix is sent to an already running server instead (the
+real model is used there, so expect very different numbers). All simulated
+users share one address, so start that server with CHAT_RATE_LIMIT=0.
+
+Run from the repository root:
+    python benchmarks/load_chat.py
+    python benchmarks/load_chat.py --clients 50 --requests 2000 --llm-latency-ms 300 --json chat.json
+    python benchmarks/load_chat.py --no-fast-path --llm-server --llm-latency-ms 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+from results import summarize, write_results  # noqa: E402
+from synthetic import build_orders_db, make_products, write_products_json  # noqa: E402
+
+# (kind, weight, message template); {word}, {order_id} and {product_id} are filled in per request
+MESSAGE_MIX = [
+    ("search", 40, "show me {word} {word}"),
+    ("greeting", 10, "hi there"),
+    ("order_status", 12, "what is the status of order {order_id}"),
+    ("order_status_multi", 3, "what is the status of orders {order_id}, {order_id} and {order_id}"),
+    ("order_history", 10, "show me my orders"),
+    ("product_count", 10, "how many products do you have"),
+    ("purchase", 10, "I want to buy {product_id}"),
+    ("categories", 5, "what categories do you have"),
+]
+
+
+def make_message(rng, words, order_ids, product_ids):
+    kind, _, template = rng.choices(MESSAGE_MIX, weights=[w for _, w, _ in MESSAGE_MIX])[0]
+    message = template.replace("{product_id}", rng.choice(product_ids))
+    for placeholder, values in (("{order_id}", order_ids), ("{word}", words)):
+        while placeholder in message:
+            message = message.replace(placeholder, rng.choice(values), 1)
+    return kind, message
+
+
+def chat_path(body) -> str:
+    event_types = {event.get("type") for event in body.get("events", [])} if isinstance(body, dict) else set()
+    if "fast_path" in event_types:
+        return "fast_path"
+    if "response_cache" in event_types:
+        return "response_cache"
+    return "agent"
+
+
+async def run_load(client, args, words, order_ids, product_ids):
+    rng = random.Random(99)
+    counter = iter(range(args.requests))
+    by_kind, by_path, all_latencies = defaultdict(list), defaultdict(list), []
+    status_codes = defaultdict(int)
+
+    async def simulated_user(user_index: int):
+        headers = {"X-Session-ID": f"bench-session-{user_index}", "X-User-ID": f"bench-user-{user_index}"}
+        for _ in counter:
+            kind, message = make_message(rng, words, order_ids, product_ids)
+            started = time.perf_counter()
+            response = await client.post("/chat", json={"message": message}, headers=headers)
+            latency = time.perf_counter() - started
+            status_codes[response.status_code] += 1
+            all_latencies.append(latency)
+            by_kind[kind].append(latency)
+            by_path[chat_path(response.json()) if response.status_code == 200 else "error"].append(latency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulated_user(i) for i in range(args.clients)))
+    wall = time.perf_counter() - started
+
+    results = [{"group": "all", "name": "all", **summarize(all_latencies, wall)}]
+    results += [{"group": "kind", "name": kind, **summarize(lat, wall)} for kind, lat in sorted(by_kind.items())]
+    results += [{"group": "path", "name": path, **summarize(lat, wall)} for path, lat in sorted(by_path.items())]
+    results.append({"group": "status_codes", "name": "all", **{str(code): n for code, n in sorted(status_codes.items())}})
+    return results
+
+
+@contextmanager
+def fake_llm_server(latency_ms):
+    """Runs fake_llm_server.py on a free port; yields its base URL."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_llm_server.py"),
+         "--port", str(port), "--latency-ms", str(latency_ms)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                httpx.get(f"{url}/stats", timeout=1)
+                break
+            except httpx.TransportError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("fake_llm_server.py did not start")
+                time.sleep(0.1)
+        yield url
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def run(args):
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as workdir:
+        products = make_products(args.products)
+        product_ids = [p["id"] for p in products]
+        words = sorted({w for p in products[:2000] for w in p["name"].lower().split()})
+        order_ids = [f"BENCH-{i:08d}" for i in rng.sample(range(args.orders), min(args.orders, 5000))]
+
+        if args.url:
+            async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+                return await run_load(client, args, words, order_ids, product_ids)
+
+        # Configure the app before importing it (settings are read at import time)
+        db_path = os.path.join(workdir, "orders.db")
+        await build_orders_db(db_path, args.orders, product_ids, products=products)
+        os.environ["SQLITE_DATABASE_PATH"] = db_path
+        os.environ["SESSION_DATABASE_PATH"] = os.path.join(workdir, "sessions.db")
+        os.environ["CATALOG_FILE"] = os.path.join(workdir, "products.cat")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.environ.setdefault("CHAT_RATE_LIMIT", "0")  # simulated users send far faster than real ones
+        os.environ.setdefault("ORDER_ARCHIVE_AFTER_DAYS", "0")  # synthetic orders are all older than the archival cutoff
+        if args.no_fast_path:
+            os.environ["FAST_PATH_ENABLED"] = "false"
+        if args.no_llm_pool:
+            os.environ["LLM_HTTP_POOL"] = "false"
+        os.chdir(ROOT)  # main mounts templates/static relative to the working directory
+        if not args.llm_server:
+            return await run_in_process(args, workdir, products, words, order_ids, product_ids)
+
+        with fake_llm_server(args.llm_latency_ms) as llm_url:
+            os.environ["LLM_API_BASE"] = f"{llm_url}/v1"
+            os.environ["LLM_API_KEY"] = "fake"
+            results = await run_in_process(args, workdir, products, words, order_ids, product_ids)
+            server_stats = httpx.get(f"{llm_url}/stats").json()
+        results.append({"group": "llm_server", "name": "pool" if not args.no_llm_pool else "litellm",
+                        **{k: server_stats[k] for k in ("requests", "connections", "max_in_flight")}})
+        return results
+
+
+async def run_in_process(args, workdir, products, words, order_ids, product_ids):
+    import main
+
+    if not args.llm_server:
+        from fake_llm import install_fake_llm
+        install_fake_llm(main.get_root_agent(), latency_ms=args.llm_latency_ms)
+    main.PRODUCTS_FILE = write_products_json(products, os.path.join(workdir, "products.json"))
+    await main.startup_event()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            return await run_load(client, args, words, order_ids, product_ids)
+    finally:
+        await main.shutdown_event()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=500, help="total /chat requests")
+    parser.add_argument("--products", type=int, default=10_000, help="synthetic catalog size")
+    parser.add_argument("--orders", type=int, default=10_000, help="synthetic order table size")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated latency per fake LLM call")
+    parser.add_argument("--no-fast-path", action="store_true", help="send every message through the agent tree")
+    parser.add_argument("--llm-server", action="store_true", help="call a local fake OpenAI-compatible server over HTTP")
+    parser.add_argument("--no-llm-pool", action="store_true", help="LLM_HTTP_POOL=false (LiteLLM's own HTTP clients)")
+    parser.add_argument("--url", help="load-test a running server instead (real LLM)")
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for row in results:
+        if "p50_ms" in row:
+            print(f"{row['group']:>6} {row['name']:<15} {row['calls']:>6} calls | p50 {row['p50_ms']:>9.2f} ms | "
+                  f"p95 {row['p95_ms']:>9.2f} ms | p99 {row['p99_ms']:>9.2f} ms | {row['throughput_per_s']:>8,.1f}/s")
+        else:
+            print(f"{row['group']:>6} {row}")
+    if args.json:
+        write_results(args.json, "chat", {k: v for k, v in vars(args).items() if k != "json"}, results)
+
+
+if __name__ == "__main__":
+    main_cli()
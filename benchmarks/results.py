@@ -0,0 +1,56 @@
+"""
+Latency summaries and the JSON result format shared by the benchmarks.
+
+Every run is written as {"benchmark", "commit", "timestamp", "python", "params", "results"}
+so runs from different commits can be diffed with compare.py.
+"""
+import datetime
+import json
+import os
+import platform
+import subprocess
+from typing import Any, Dict, List, Sequence
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def summarize(latencies: Sequence[float], wall_seconds: float) -> Dict[str, Any]:
+    """p50/p95/p99/mean/max in milliseconds plus throughput for a list of per-call latencies (seconds)."""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"calls": 0}
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+    return {
+        "calls": len(ordered),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "throughput_per_s": round(len(ordered) / wall_seconds, 1) if wall_seconds else None,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(path: str, benchmark: str, params: Dict[str, Any], results: List[Dict[str, Any]]) -> None:
+    document = {
+        "benchmark": benchmark,
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
@@ -0,0 +1,213 @@
+"""
+Concurrency stress test for idempotent ordering and stock reservation.
+
+Every order targets a few hot SKUs with limited stock. All orders are
+submitted at once from `--workers` processes (each with its own event loop and
+connection pool on the same database file), and:
+
+  * `--retry-rate` of them are submitted twice with the same idempotency key,
+    the two copies going to different worker processes;
+  * `--cancel-rate` of the orders that get placed are then cancelled twice
+    concurrently (only one cancellation may take effect and restock).
+
+Afterwards the database is checked: no key produced more than one order, every
+copy of a key got the same order ID, stock never went negative, the stock left
+equals the initial stock minus the units of the orders not cancelled, and the
+reservation table agrees with those orders' items. Exits with status 1 on any
+violation.
+
+Run from the repository root:
+    python benchmarks/stress_orders.py
+    python benchmarks/stress_orders.py --orders 2000 --workers 4 --skus 2 --stock 300
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aiosqlite  # noqa: E402
+
+import order_store  # noqa: E402
+from catalog import parse_products  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+from product_store import import_products  # noqa: E402
+from synthetic import make_products, write_products_json  # noqa: E402
+
+
+def make_submissions(args, hot_skus, rng):
+    """One list of submissions per worker process; retried orders are sent from two workers."""
+    per_worker = [[] for _ in range(args.workers)]
+    for i in range(args.orders):
+        skus = rng.sample(hot_skus, rng.randint(1, min(2, len(hot_skus))))
+        submission = {
+            "key": f"stress-{i}",
+            "items": [{"product_id": sku, "quantity": rng.randint(1, 3)} for sku in skus],
+            "cancel": rng.random() < args.cancel_rate,
+        }
+        per_worker[i % args.workers].append(submission)
+        if rng.random() < args.retry_rate:
+            per_worker[(i + 1) % args.workers].append(submission)
+    for submissions in per_worker:
+        rng.shuffle(submissions)
+    return per_worker
+
+
+async def _submit(main, submission):
+    result = await main._place_order(submission["items"], idempotency_key=submission["key"])
+    outcome = {
+        "key": submission["key"],
+        "status": result["status"],
+        "error_code": result.get("error_code"),
+        "order_id": result.get("order_id"),
+        "replay": result.get("idempotent_replay", False),
+        "removals": [],
+    }
+    if submission["cancel"] and result["status"] == "success" and not outcome["replay"]:
+        removals = await asyncio.gather(main.remove_order(result["order_id"]), main.remove_order(result["order_id"]))
+        outcome["removals"] = ["already_cancelled" if r.get("already_cancelled") else r["status"] for r in removals]
+    return outcome
+
+
+async def _run_worker(main, submissions, start_barrier):
+    await main.startup_event()
+    try:
+        # Start submitting only once every worker is up, so the processes really race
+        await asyncio.to_thread(start_barrier.wait)
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(_submit(main, s) for s in submissions))
+        return outcomes, time.perf_counter() - started
+    finally:
+        await main.shutdown_event()
+
+
+def run_worker(workdir, products_path, submissions, start_barrier):
+    """Entry point of one worker process: starts the app against the shared database and submits its orders."""
+    os.environ.update({
+        "SQLITE_DATABASE_PATH": os.path.join(workdir, "orders.db"),
+        "SESSION_DATABASE_PATH": os.path.join(workdir, "sessions.db"),
+        "SHARED_STATE_PATH": os.path.join(workdir, "shared_state.db"),
+        "CATALOG_FILE": os.path.join(workdir, "products.cat"),
+    })
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.chdir(ROOT)  # main mounts templates/static relative to the working directory
+    import main
+    main.PRODUCTS_FILE = products_path
+    return asyncio.run(_run_worker(main, submissions, start_barrier))
+
+
+async def prepare_db(path, products, hot_skus, stock):
+    async with aiosqlite.connect(path) as db:
+        await run_migrations(db)
+        await import_products(db, parse_products(products))
+        await order_store.set_stock(db, {sku: stock for sku in hot_skus})
+
+
+def verify(db_path, outcomes, hot_skus, stock):
+    """Returns a list of invariant violations (empty when everything holds)."""
+    problems = []
+    by_key = defaultdict(list)
+    for outcome in outcomes:
+        by_key[outcome["key"]].append(outcome)
+
+    created = set()
+    for key, copies in by_key.items():
+        order_ids = {c["order_id"] for c in copies if c["status"] == "success"}
+        if len(order_ids) > 1:
+            problems.append(f"{key}: copies got different orders {sorted(order_ids)}")
+        creators = [c for c in copies if c["status"] == "success" and not c["replay"]]
+        if len(creators) > 1:
+            problems.append(f"{key}: {len(creators)} copies created an order")
+        created.update(c["order_id"] for c in creators)
+        for c in copies:
+            if c["removals"] and sorted(c["removals"]) != ["already_cancelled", "success"]:
+                problems.append(f"{key}: concurrent removals returned {c['removals']}")
+    removed = {c["order_id"] for c in outcomes if "success" in c["removals"]}
+
+    with sqlite3.connect(db_path) as db:
+        active = {row[0] for row in db.execute("SELECT order_id FROM orders WHERE status != 'Cancelled'")}
+        if active != created - removed:
+            problems.append(f"orders table has {len(active)} active orders, expected {len(created - removed)}")
+        cancelled = {row[0] for row in db.execute("SELECT order_id FROM orders WHERE status = 'Cancelled'")}
+        if cancelled != removed:
+            problems.append(f"orders table has {len(cancelled)} cancelled orders, expected {len(removed)}")
+        keys = db.execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()[0]
+        if keys != len(created):
+            problems.append(f"{keys} idempotency keys recorded for {len(created)} created orders")
+
+        left = dict(db.execute("SELECT product_id, quantity FROM inventory"))
+        sold = dict(db.execute("""
+            SELECT oi.product_id, SUM(oi.quantity) FROM order_items oi JOIN orders o ON o.order_id = oi.order_id
+            WHERE o.status != 'Cancelled' GROUP BY oi.product_id
+        """))
+        reserved = dict(db.execute("SELECT product_id, SUM(quantity) FROM inventory_reservations GROUP BY product_id"))
+        for sku in hot_skus:
+            if left.get(sku, -1) < 0:
+                problems.append(f"{sku}: stock is {left.get(sku)}")
+            if left.get(sku, 0) + sold.get(sku, 0) != stock:
+                problems.append(f"{sku}: {left.get(sku)} left + {sold.get(sku, 0)} in orders != {stock} initial")
+            if reserved.get(sku, 0) != sold.get(sku, 0):
+                problems.append(f"{sku}: {reserved.get(sku, 0)} reserved != {sold.get(sku, 0)} in orders")
+    return problems, left, sold
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=600, help="distinct orders (idempotency keys)")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes sharing the database")
+    parser.add_argument("--skus", type=int, default=3, help="hot SKUs every order draws from")
+    parser.add_argument("--stock", type=int, default=150, help="initial units per hot SKU")
+    parser.add_argument("--retry-rate", type=float, default=0.3, help="share of orders submitted twice")
+    parser.add_argument("--cancel-rate", type=float, default=0.1, help="share of placed orders removed (twice, concurrently)")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    products = make_products(max(50, args.skus))
+    hot_skus = [p["id"] for p in products[:args.skus]]
+    submissions = make_submissions(args, hot_skus, rng)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "orders.db")
+        products_path = write_products_json(products, os.path.join(workdir, "products.json"))
+        asyncio.run(prepare_db(db_path, products, hot_skus, args.stock))
+        if args.workers > 1:
+            os.environ["SHARED_STATE_BACKEND"] = "sqlite"
+
+        started = time.perf_counter()
+        with Manager() as manager, ProcessPoolExecutor(max_workers=args.workers) as pool:
+            start_barrier = manager.Barrier(args.workers)
+            futures = [pool.submit(run_worker, workdir, products_path, s, start_barrier) for s in submissions]
+            results = [future.result() for future in futures]
+        wall = time.perf_counter() - started
+
+        outcomes = [outcome for worker_outcomes, _ in results for outcome in worker_outcomes]
+        problems, left, sold = verify(db_path, outcomes, hot_skus, args.stock)
+
+    statuses = Counter(o["error_code"] or ("replay" if o["replay"] else o["status"]) for o in outcomes)
+    busiest = max(elapsed for _, elapsed in results)
+    print(f"{len(outcomes)} submissions ({args.orders} keys) from {args.workers} workers in {busiest:.2f}s "
+          f"({len(outcomes) / busiest:.0f}/s; {wall:.2f}s including startup)")
+    print("results: " + ", ".join(f"{name}={count}" for name, count in sorted(statuses.items())))
+    print("cancelled: " + str(sum(1 for o in outcomes if "success" in o["removals"])))
+    for sku in hot_skus:
+        print(f"{sku}: {args.stock} initial, {sold.get(sku, 0)} in orders, {left.get(sku)} left")
+    if problems:
+        print(f"FAILED: {len(problems)} invariant violation(s)")
+        for problem in problems[:20]:
+            print("  " + problem)
+        sys.exit(1)
+    print("OK: no duplicate orders, no oversold stock, stock and reservations consistent")
+
+
+if __name__ == "__main__":
+    main_cli()
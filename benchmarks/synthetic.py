@@ -0,0 +1,165 @@
+"""
+Synthetic data for the benchmarks, shaped like products.json and orders.json.
+
+Product names and descriptions are recombined from the words of the real
+catalog (so search terms have a realistic spread), and orders reference the
+synthetic product IDs. Products and orders are written straight into a
+migrated SQLite database in large batches, so 10M-row tables can be built in
+a few minutes.
+
+Used by bench_tools.py and load_chat.py; it can also build a database on its own:
+    python benchmarks/synthetic.py --products 100000 --orders 1000000 --db /tmp/bench.db
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import aiosqlite  # noqa: E402
+
+from catalog import parse_products  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+from sales_rollups import rebuild as rebuild_sales_rollups  # noqa: E402
+from product_store import UPSERT_SQL, product_row  # noqa: E402
+
+ORDER_STATUSES = ["Processing", "Shipped", "Delivered", "Cancelled"]
+
+
+def _load_json(name: str, default):
+    try:
+        with open(os.path.join(ROOT, name)) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+
+def make_products(size: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """`size` products in the products.json shape (IDs p-0000000, p-0000001, ...)."""
+    rng = random.Random(seed)
+    source = _load_json("products.json", [])
+    name_words = sorted({w for p in source for w in p.get("name", "").split() if w.isalpha()}) or ["Synthetic", "Product"]
+    desc_words = sorted({w for p in source for w in p.get("description", "").split() if w.isalpha()}) or ["synthetic"]
+    categories = sorted({p["category"] for p in source if p.get("category")}) or ["Electronics", "Clothing"]
+    return [
+        {
+            "id": f"p-{i:07d}",
+            "name": " ".join(rng.sample(name_words, min(3, len(name_words)))),
+            "price": round(rng.uniform(2, 500), 2),
+            "description": " ".join(rng.choices(desc_words, k=12)),
+            "category": rng.choice(categories),
+        }
+        for i in range(size)
+    ]
+
+
+def write_products_json(products: List[Dict[str, Any]], path: str) -> str:
+    with open(path, "w") as f:
+        json.dump(products, f)
+    return path
+
+
+def iter_orders(count: int, product_ids: List[str], users: int = 1000, seed: int = 7) -> Iterator[Dict[str, Any]]:
+    """`count` orders in the orders.json shape (plus user_id / created_at / prices as stored in SQLite)."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1)
+    span_seconds = 2 * 365 * 24 * 3600
+    for i in range(count):
+        items = [
+            {"product_id": rng.choice(product_ids), "quantity": rng.randint(1, 3), "price": round(rng.uniform(2, 500), 2)}
+            for _ in range(rng.randint(1, 4))
+        ]
+        yield {
+            "order_id": f"BENCH-{i:08d}",
+            "user_id": f"user-{rng.randrange(users):05d}",
+            "status": rng.choice(ORDER_STATUSES),
+            "created_at": (start + datetime.timedelta(seconds=rng.randrange(span_seconds))).isoformat(),
+            "details": "Synthetic benchmark order.",
+            "total_price": round(sum(item["quantity"] * item["price"] for item in items), 2),
+            "items": items,
+        }
+
+
+async def build_orders_db(path: str, orders: int, product_ids: List[str], users: int = 1000, batch_size: int = 20_000,
+                          products: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Creates (or replaces) a migrated SQLite database at `path` holding `orders` synthetic orders
+    and, when given, the `products` catalog (products table + FTS index).
+    Rows are bulk-loaded with the blocking sqlite3 module (it is a setup step, not a measured one).
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    async with aiosqlite.connect(path) as db:
+        await run_migrations(db)
+
+    started = time.perf_counter()
+    items_written = 0
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    try:
+        if products:
+            # Before ANALYZE, so the statistics describe the loaded catalog
+            conn.executemany(UPSERT_SQL, [product_row(p) for p in parse_products(products)])
+            conn.commit()
+
+        order_rows, item_rows = [], []
+
+        def flush():
+            conn.executemany(
+                "INSERT INTO orders (order_id, user_id, status, created_at, details, total_price) VALUES (?, ?, ?, ?, ?, ?)",
+                order_rows,
+            )
+            conn.executemany("INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)", item_rows)
+            conn.commit()
+            order_rows.clear()
+            item_rows.clear()
+
+        for order in iter_orders(orders, product_ids, users=users):
+            order_rows.append((order["order_id"], order["user_id"], order["status"], order["created_at"],
+                               order["details"], order["total_price"]))
+            item_rows.extend((order["order_id"], i["product_id"], i["quantity"], i["price"]) for i in order["items"])
+            items_written += len(order["items"])
+            if len(order_rows) >= batch_size:
+                flush()
+        flush()
+    finally:
+        conn.close()
+
+    # The bulk load bypasses the order write path, so the sales rollups are backfilled in one pass
+    async with aiosqlite.connect(path) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        await rebuild_sales_rollups(db)
+        await db.commit()
+        await db.execute("ANALYZE")
+        await db.commit()
+    return {"orders": orders, "order_items": items_written, "build_seconds": round(time.perf_counter() - started, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--db", default="bench_orders.db", help="SQLite database to (re)create")
+    parser.add_argument("--products-json", help="optional path to also write the synthetic catalog as JSON")
+    args = parser.parse_args()
+
+    products = make_products(args.products)
+    if args.products_json:
+        write_products_json(products, args.products_json)
+    stats = asyncio.run(build_orders_db(args.db, args.orders, [p["id"] for p in products], users=args.users, products=products))
+    print(json.dumps({"db": args.db, "products": args.products, **stats}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import hashlib
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from observability import get_logger
+from search_index import ProductSearchIndex
+
+logger = get_logger("catalog")
+
+
+class Product:
+    """Compact, read-only product record (no per-instance __dict__)."""
+
+    __slots__ = ("id", "name", "price", "description", "category")
+
+    def __init__(self, id: str, name: str, price: Optional[float], description: str, category: str):
+        self.id = id
+        self.name = name
+        self.price = price  # None when the source data has a missing/non-numeric price
+        self.description = description
+        self.category = category
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Product":
+        price = data.get("price")
+        if isinstance(price, bool) or not isinstance(price, (int, float)):
+            logger.warning(f"Non-numeric price for {data.get('id')}: {price}")
+            price = None
+        return cls(
+            id=str(data.get("id", "")),
+            name=data.get("name") or "Unknown Product",
+            price=float(price) if price is not None else None,
+            description=data.get("description") or "",
+            category=data.get("category") or "",
+        )
+
+    def checksum(self) -> int:
+        """64-bit content hash of the record, used to detect changed products on reload."""
+        payload = "\x1f".join((self.id, self.name, repr(self.price), self.description, self.category))
+        return struct.unpack("<Q", hashlib.blake2b(payload.encode("utf-8"), digest_size=8).digest())[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "price": self.price,
+            "description": self.description,
+            "category": self.category,
+        }
+
+    def __repr__(self) -> str:
+        return f"Product(id={self.id!r}, name={self.name!r}, price={self.price!r})"
+
+
+def parse_products(products: Iterable[Dict[str, Any]]) -> List[Product]:
+    """Validated Product records from products.json entries (invalid and duplicate IDs are skipped)."""
+    records: List[Product] = []
+    seen = set()
+    for data in products:
+        if not isinstance(data, dict) or not data.get("id"):
+            logger.warning(f"Skipping invalid product: {data}")
+            continue
+        product = Product.from_dict(data)
+        if product.id in seen:
+            logger.warning(f"Duplicate product ID '{product.id}', keeping the first entry.")
+            continue
+        records.append(product)
+        seen.add(product.id)
+    return records
+
+
+class ProductCatalog:
+    """
+    Product catalog loaded from products.json (or a compiled catalog file, see catalog_store.py).
+    Holds the product records, an id -> position hash index for O(1) lookups,
+    and the search index used by search_products.
+
+    A catalog is immutable; a reload builds a new one (passing the old one as
+    `previous` so the search index is only updated for the changed products)
+    and the caller swaps the reference.
+    """
+
+    def __init__(self, products: Iterable[Dict[str, Any]] = (), generation: int = 0,
+                 previous: Optional["ProductCatalog"] = None):
+        records = parse_products(products)
+        self._build(records, [p.id for p in records], [p.checksum() for p in records], generation, previous)
+
+    @classmethod
+    def from_sequence(cls, products: Sequence[Product], ids: Sequence[str], checksums: Sequence[int],
+                      generation: int = 0, previous: Optional["ProductCatalog"] = None) -> "ProductCatalog":
+        """
+        Catalog over already validated records, e.g. the lazily decoded products of a
+        memory-mapped catalog file. `ids` and `checksums` are per position.
+        """
+        catalog = cls.__new__(cls)
+        catalog._build(products, ids, checksums, generation, previous)
+        return catalog
+
+    def _build(self, products: Sequence[Product], ids: Sequence[str], checksums: Sequence[int],
+               generation: int, previous: Optional["ProductCatalog"]) -> None:
+        self.products = products
+        self.ids = ids
+        self.positions: Dict[str, int] = {product_id: i for i, product_id in enumerate(ids)}
+        self.checksums = checksums
+        self.generation = generation
+        # IDs whose record changed since `previous`; None when unknown (first load or IDs added/removed/reordered)
+        self.changed_ids: Optional[List[str]] = None
+
+        if previous is not None and len(previous.ids) == len(ids) and list(previous.ids) == list(ids):
+            changed = [i for i in range(len(ids)) if previous.checksums[i] != checksums[i]]
+            self.changed_ids = [ids[i] for i in changed]
+            self.search_index = previous.search_index.updated(products, changed)
+        else:
+            self.search_index = ProductSearchIndex(products)
+
+    def get(self, product_id: str) -> Optional[Product]:
+        """Returns the product with the given ID, or None."""
+        position = self.positions.get(product_id)
+        return self.products[position] if position is not None else None
+
+    def name_for(self, product_id: str) -> str:
+        product = self.get(product_id)
+        return product.name if product else f"Unknown Product ({product_id})"
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def __iter__(self) -> Iterator[Product]:
+        return iter(self.products)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self.positions
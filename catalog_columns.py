@@ -0,0 +1,142 @@
+"""
+Columnar (NumPy) view of the product catalog for category / price queries.
+
+The search index and the products table answer keyword queries well, but
+"what categories do you have" and "electronics under $50, cheapest first" are
+questions about whole columns. `ColumnarCatalog` keeps, per product in
+catalog order:
+
+    keys            int64   where to fetch the product: its position in an
+                            in-memory catalog, or its rowid in the products table
+    prices          float64 NaN for a missing price
+    category_codes  int32   index into `categories` (first-seen order)
+
+and precomputes per-category facets (product count, min / max price) when it
+is built. Filters are vectorized boolean masks; price-sorted top-k selection
+partitions the matches (O(n)) and only sorts the k it returns. Like the search
+filters, a missing price counts as 0.0 for min_price / max_price; for sorting
+it is placed after every priced product.
+
+A view is immutable and tagged with the catalog generation it was built
+from; the server rebuilds it whenever the catalog is reloaded.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from catalog import Product
+
+
+class ColumnarCatalog:
+    def __init__(self, keys: np.ndarray, prices: np.ndarray, categories: Iterable[str], generation: int):
+        self.generation = generation
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+
+        codes: Dict[str, int] = {}
+        self.category_codes = np.fromiter(
+            (codes.setdefault(category, len(codes)) for category in categories), dtype=np.int32, count=len(self.keys),
+        )
+        self.categories: List[str] = list(codes)
+        self._codes_by_name = {name.lower(): code for code, name in enumerate(self.categories)}
+
+        has_price = ~np.isnan(self.prices)
+        self._filter_prices = np.where(has_price, self.prices, 0.0)
+        self._ascending = np.where(has_price, self.prices, np.inf)
+        self._descending = np.where(has_price, -self.prices, np.inf)
+
+        # Facets: products per category and the price range of the priced ones (NaN when none has a price)
+        self.counts = np.bincount(self.category_codes, minlength=len(self.categories))
+        self.min_prices = np.full(len(self.categories), np.nan)
+        self.max_prices = np.full(len(self.categories), np.nan)
+        np.fmin.at(self.min_prices, self.category_codes, self.prices)
+        np.fmax.at(self.max_prices, self.category_codes, self.prices)
+
+    @classmethod
+    def from_products(cls, products: Sequence[Product], generation: int) -> "ColumnarCatalog":
+        """View over an in-memory or memory-mapped catalog; keys are product positions."""
+        from catalog_store import MappedProducts
+
+        if isinstance(products, MappedProducts):
+            # Read the columns straight from the mapping instead of decoding every product
+            catalog_file = products.file
+            prices = np.frombuffer(catalog_file.prices, dtype=np.float64)
+            categories = (catalog_file.string("category", i) for i in range(len(catalog_file)))
+        else:
+            prices = np.fromiter((np.nan if p.price is None else p.price for p in products), dtype=np.float64, count=len(products))
+            categories = (p.category for p in products)
+        return cls(np.arange(len(products), dtype=np.int64), prices, categories, generation)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple[int, Optional[float], str]], generation: int) -> "ColumnarCatalog":
+        """View over (rowid, price, category) rows of the products table; keys are rowids."""
+        keys = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        prices = np.fromiter((np.nan if row[1] is None else row[1] for row in rows), dtype=np.float64, count=len(rows))
+        return cls(keys, prices, (row[2] or "" for row in rows), generation)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def category_names(self) -> List[str]:
+        """Distinct non-empty category names, in first-seen catalog order."""
+        return [name for name in self.categories if name]
+
+    def facets(self) -> List[Dict[str, Any]]:
+        """Per category: product count and the min / max price (None when no product has a price)."""
+        return [
+            {
+                "category": name,
+                "products": int(self.counts[code]),
+                "min_price": None if np.isnan(self.min_prices[code]) else float(self.min_prices[code]),
+                "max_price": None if np.isnan(self.max_prices[code]) else float(self.max_prices[code]),
+            }
+            for code, name in enumerate(self.categories) if name
+        ]
+
+    def category_code(self, name: str) -> Optional[int]:
+        """Code of the category called `name` (case-insensitive), or None."""
+        return self._codes_by_name.get(name.strip().lower())
+
+    def select(
+        self,
+        categories: Optional[Iterable[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> np.ndarray:
+        """Row numbers (ascending) of the products matching every given filter."""
+        mask = None
+        if categories is not None:
+            codes = [code for code in (self.category_code(name) for name in categories) if code is not None]
+            mask = np.isin(self.category_codes, codes)
+        if min_price is not None:
+            above = self._filter_prices >= float(min_price)
+            mask = above if mask is None else mask & above
+        if max_price is not None:
+            below = self._filter_prices <= float(max_price)
+            mask = below if mask is None else mask & below
+        return np.arange(len(self.keys)) if mask is None else np.flatnonzero(mask)
+
+    def top_k_by_price(
+        self,
+        k: int,
+        descending: bool = False,
+        categories: Optional[Iterable[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> Tuple[np.ndarray, int]:
+        """
+        (keys of the k cheapest, or most expensive, matching products in order; total matches).
+        Equal prices keep catalog order.
+        """
+        rows = self.select(categories, min_price, max_price)
+        total = len(rows)
+        if k <= 0 or not total:
+            return self.keys[:0], total
+        sort_prices = (self._descending if descending else self._ascending)[rows]
+        if k < total:
+            # Keep every product tied with the k-th price, so the earliest ones in catalog order win the cut
+            kth_price = np.partition(sort_prices, k - 1)[k - 1]
+            candidates = np.flatnonzero(sort_prices <= kth_price)
+            rows, sort_prices = rows[candidates], sort_prices[candidates]
+        order = np.lexsort((rows, sort_prices))[:k]
+        return self.keys[rows[order]], total
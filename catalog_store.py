@@ -0,0 +1,207 @@
+"""
+Compiled, memory-mapped product catalog ("products.cat").
+
+products.json is compiled once into a compact columnar binary file that the
+server maps read-only instead of parsing and holding as Python objects:
+
+    header     magic "ECAT", format version, generation, product count
+    directory  for id / name / description / category: (offsets, blob) positions;
+               then the price and checksum column positions
+    columns    per string column: count+1 u64 offsets into a UTF-8 blob;
+               price: f64 per product (NaN = missing); checksum: u64 per product
+
+All integers and floats are little-endian and every section starts on an
+8-byte boundary, so columns are read with zero-copy memoryview casts and
+products are decoded on demand. Pages are shared through the OS page cache by
+every worker process mapping the same file.
+
+The file is written to a temporary name and renamed into place, so readers
+never see a partial file; a process holding the old mapping keeps a valid view
+of the old inode until it drops it. Each compile bumps the generation, which
+is how the server's file watcher and reload endpoint detect a new catalog.
+
+    python catalog_store.py [products.json] [products.cat]
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import List, Optional, Sequence
+
+from catalog import Product, ProductCatalog, parse_products
+from observability import configure_logging, get_logger
+
+logger = get_logger("catalog_store")
+
+MAGIC = b"ECAT"
+FORMAT_VERSION = 1
+STRING_COLUMNS = ("id", "name", "description", "category")
+
+_HEADER = struct.Struct("<4sIQQ")  # magic, version, generation, count
+_DIRECTORY = struct.Struct("<" + "QQ" * len(STRING_COLUMNS) + "QQ")
+
+
+class CatalogFileError(Exception):
+    """The catalog file is missing, truncated or not in a supported format."""
+
+
+def _align(f) -> int:
+    position = f.tell()
+    if position % 8:
+        f.write(b"\0" * (8 - position % 8))
+    return f.tell()
+
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def read_generation(path: str) -> int:
+    """Generation stored in the header of `path`, or 0 if there is no readable catalog file."""
+    try:
+        with open(path, "rb") as f:
+            magic, version, generation, _ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return 0
+    return generation if magic == MAGIC and version == FORMAT_VERSION else 0
+
+
+def write_catalog_file(products: Sequence[Product], path: str, generation: int) -> None:
+    """Atomically (re)writes `path` with the given products."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    positions: List[int] = []
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, generation, len(products)))
+            f.write(b"\0" * _DIRECTORY.size)
+
+            for column in STRING_COLUMNS:
+                offsets, blob = array("Q", [0]), bytearray()
+                for product in products:
+                    blob += getattr(product, column).encode("utf-8")
+                    offsets.append(len(blob))
+                positions.append(_align(f))
+                f.write(_little_endian(offsets).tobytes())
+                positions.append(_align(f))
+                f.write(blob)
+
+            prices = array("d", (p.price if p.price is not None else math.nan for p in products))
+            positions.append(_align(f))
+            f.write(_little_endian(prices).tobytes())
+            checksums = array("Q", (p.checksum() for p in products))
+            positions.append(_align(f))
+            f.write(_little_endian(checksums).tobytes())
+
+            f.seek(_HEADER.size)
+            f.write(_DIRECTORY.pack(*positions))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def compile_catalog(json_path: str, out_path: str) -> int:
+    """
+    Compiles products.json into a catalog file (validated and deduplicated the same
+    way as ProductCatalog). Returns the new generation.
+    """
+    with open(json_path, "r") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise CatalogFileError(f"{json_path} must contain a JSON list of products.")
+    products = parse_products(data)
+    generation = read_generation(out_path) + 1
+    write_catalog_file(products, out_path, generation)
+    logger.info(f"Compiled {len(products)} products from {json_path} into {out_path} (generation {generation}).")
+    return generation
+
+
+class CatalogFile:
+    """Read-only memory mapping of a compiled catalog file."""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise CatalogFileError("Memory-mapped catalogs require a little-endian host; use CATALOG_STORE=json.")
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise CatalogFileError(f"Cannot map catalog file {path}: {e}") from e
+
+        try:
+            magic, version, self.generation, self.count = _HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise CatalogFileError(f"{path} is not a version {FORMAT_VERSION} catalog file.")
+            positions = _DIRECTORY.unpack_from(self._mmap, _HEADER.size)
+            view = memoryview(self._mmap)
+            self._strings = {}
+            for i, column in enumerate(STRING_COLUMNS):
+                offsets_at, blob_at = positions[2 * i], positions[2 * i + 1]
+                offsets = view[offsets_at:offsets_at + 8 * (self.count + 1)].cast("Q")
+                self._strings[column] = (offsets, blob_at)
+            price_at, checksum_at = positions[-2], positions[-1]
+            self.prices = view[price_at:price_at + 8 * self.count].cast("d")
+            self.checksums = view[checksum_at:checksum_at + 8 * self.count].cast("Q")
+            if len(self.prices) != self.count or len(self.checksums) != self.count:
+                raise CatalogFileError(f"{path} is truncated.")
+        except (struct.error, TypeError, ValueError) as e:
+            raise CatalogFileError(f"{path} is corrupt: {e}") from e
+
+    def string(self, column: str, index: int) -> str:
+        offsets, blob_at = self._strings[column]
+        return str(self._mmap[blob_at + offsets[index]:blob_at + offsets[index + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class MappedProducts(Sequence):
+    """Sequence view over a CatalogFile; Product records are decoded on access."""
+
+    def __init__(self, catalog_file: CatalogFile):
+        self.file = catalog_file
+
+    def __len__(self) -> int:
+        return self.file.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        price = self.file.prices[index]
+        return Product(
+            id=self.file.string("id", index),
+            name=self.file.string("name", index),
+            price=None if math.isnan(price) else price,
+            description=self.file.string("description", index),
+            category=self.file.string("category", index),
+        )
+
+
+def load_catalog_file(path: str, previous: Optional[ProductCatalog] = None) -> ProductCatalog:
+    """ProductCatalog backed by the memory-mapped catalog file at `path`."""
+    catalog_file = CatalogFile(path)
+    ids = [catalog_file.string("id", i) for i in range(len(catalog_file))]
+    return ProductCatalog.from_sequence(
+        MappedProducts(catalog_file), ids, catalog_file.checksums, catalog_file.generation, previous,
+    )
+
+
+if __name__ == "__main__":
+    configure_logging()
+    source = sys.argv[1] if len(sys.argv) > 1 else "products.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else "products.cat"
+    print(f"{target}: generation {compile_catalog(source, target)}")
@@ -0,0 +1,155 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+import aiosqlite
+
+from observability import get_logger
+
+logger = get_logger("db_pool")
+
+
+class SQLitePool:
+    """
+    Long-lived aiosqlite connections shared by all tool calls.
+
+    SQLite allows a single writer at a time, so the pool keeps exactly one writer
+    connection (serialized with a lock) plus `readers` read connections handed out
+    from a queue. With WAL journaling, readers never block the writer or each other,
+    so concurrent chats can overlap their reads. Every connection is opened once
+    (one aiosqlite worker thread each) and tuned with the pragmas below.
+    `attachments` (schema name -> file) are ATTACHed to every connection.
+
+    `close()` closes the idle readers at once and waits up to `close_timeout`
+    seconds for the checked-out ones; a reader still in use after that is closed
+    when its borrower returns it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        readers: int = 4,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size_kib: int = 64 * 1024,
+        busy_timeout_ms: int = 5000,
+        attachments: Optional[Dict[str, str]] = None,
+        close_timeout: float = 10.0,
+    ):
+        self.path = path
+        self.reader_count = max(1, readers)
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout_ms = busy_timeout_ms
+        self.attachments = dict(attachments or {})
+        self.close_timeout = close_timeout
+
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_lock = asyncio.Lock()
+        self._readers: List[aiosqlite.Connection] = []
+        # None in the queue tells waiting borrowers that the pool was closed
+        self._idle_readers: "asyncio.Queue[Optional[aiosqlite.Connection]]" = asyncio.Queue()
+        self._checked_out: Set[aiosqlite.Connection] = set()
+        self._all_returned = asyncio.Event()
+        self._closed = True
+
+    async def _connect(self) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.path)
+        db.row_factory = aiosqlite.Row
+        # Row-returning pragmas are fetched to completion: an unfinished statement keeps a read
+        # transaction open, which blocks the journal mode switch and ATTACH on other connections
+        pragmas = [
+            f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)};",
+            "PRAGMA journal_mode = WAL;",
+            "PRAGMA synchronous = NORMAL;",
+            "PRAGMA foreign_keys = ON;",
+            f"PRAGMA mmap_size = {int(self.mmap_size)};",
+            # Negative cache_size is in KiB rather than pages
+            f"PRAGMA cache_size = -{int(self.cache_size_kib)};",
+            "PRAGMA temp_store = MEMORY;",
+        ]
+        for pragma in pragmas:
+            await db.execute_fetchall(pragma)
+        for name, path in self.attachments.items():
+            await db.execute(f"ATTACH DATABASE ? AS {name}", (path,))
+            await db.execute_fetchall(f"PRAGMA {name}.journal_mode = WAL;")
+        return db
+
+    async def open(self) -> None:
+        if not self._closed:
+            return
+        # Open the writer first so WAL mode is set before readers attach
+        self._writer = await self._connect()
+        self._idle_readers = asyncio.Queue()
+        for _ in range(self.reader_count):
+            db = await self._connect()
+            self._readers.append(db)
+            self._idle_readers.put_nowait(db)
+        self._closed = False
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        idle_readers, self._readers = self._idle_readers, []
+        while not idle_readers.empty():
+            db = idle_readers.get_nowait()
+            if db is not None:
+                await db.close()
+        idle_readers.put_nowait(None)
+        if self._checked_out:
+            # Borrowers close their reader when they return it
+            self._all_returned.clear()
+            try:
+                await asyncio.wait_for(self._all_returned.wait(), self.close_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Closing the database pool with {len(self._checked_out)} reader(s) still in use; "
+                               f"they are closed when returned.")
+        # Wait for the in-flight write (if any) to finish before closing
+        async with self._writer_lock:
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+
+    @property
+    def is_open(self) -> bool:
+        return not self._closed
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrows a read connection; waits if all readers are busy."""
+        if self._closed:
+            raise RuntimeError("Database pool is not open.")
+        idle_readers = self._idle_readers
+        db = await idle_readers.get()
+        if db is None:
+            # Closed while waiting: pass the signal on to the next waiter
+            idle_readers.put_nowait(None)
+            raise RuntimeError("Database pool is not open.")
+        self._checked_out.add(db)
+        try:
+            yield db
+        finally:
+            self._checked_out.discard(db)
+            if db in self._readers:
+                idle_readers.put_nowait(db)
+            else:
+                # The pool was closed (and maybe reopened) while this reader was out
+                await db.close()
+                if not self._checked_out:
+                    self._all_returned.set()
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Borrows the single write connection. Any transaction left open when the
+        block exits with an error is rolled back so the next writer starts clean.
+        """
+        if self._closed:
+            raise RuntimeError("Database pool is not open.")
+        async with self._writer_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                if self._writer.in_transaction:
+                    await self._writer.rollback()
+                raise
@@ -0,0 +1,199 @@
+"""
+Bounded conversation-history compaction for LLM requests.
+
+Installed as a `before_model_callback` on every agent, it rewrites the
+request's contents right before each model call:
+
+1. The last `keep_turns` user turns are kept verbatim.
+2. In older turns, tool outputs (HTML order tables, product lists, ...) are
+   replaced by a short plain-text digest and long texts are clipped.
+3. If the history is still over `token_budget`, whole old turns are dropped
+   (oldest first), then tool outputs inside the kept turns are clipped,
+   leaving the most recent one intact.
+
+Turns are dropped whole so function calls always stay paired with their
+responses. Prompt sizes before and after compaction are recorded in
+`PromptSizeMetrics` for every call.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from collections import defaultdict, deque
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+# ADK re-injects other agents' replies as user messages starting with this prefix
+_CONTEXT_PREFIX = "For context:"
+
+
+def estimate_tokens(contents: List[types.Content]) -> int:
+    """Cheap token estimate (~4 characters per token) over text, tool calls and tool outputs."""
+    chars = 0
+    for content in contents:
+        for part in content.parts or ():
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call:
+                chars += len(part.function_call.name or "") + len(str(part.function_call.args or ""))
+            elif part.function_response:
+                chars += len(part.function_response.name or "") + len(str(part.function_response.response or ""))
+    return chars // 4 + 1
+
+
+def _clip(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit].rstrip()} ... [truncated, {len(text)} chars originally]"
+
+
+def _digest(value: Any, limit: int) -> str:
+    """Plain-text digest of a tool output: HTML stripped, whitespace collapsed, clipped."""
+    text = value if isinstance(value, str) else str(value)
+    if "<tr>" in text:
+        rows = max(text.count("<tr>") - 1, 0)  # minus the header row
+        text = f"[table with {rows} row(s)] " + _TAG_RE.sub(" ", text)
+    text = _SPACE_RE.sub(" ", _TAG_RE.sub(" ", text)).strip()
+    return _clip(text, limit)
+
+
+def _is_turn_start(content: types.Content) -> bool:
+    if content.role != "user" or not content.parts:
+        return False
+    if any(part.function_response for part in content.parts):
+        return False
+    texts = [part.text for part in content.parts if part.text]
+    return bool(texts) and not texts[0].startswith(_CONTEXT_PREFIX)
+
+
+def _split_turns(contents: List[types.Content]) -> List[List[types.Content]]:
+    turns: List[List[types.Content]] = []
+    for content in contents:
+        if not turns or _is_turn_start(content):
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+def _compact_part(part: types.Part, limit: int) -> types.Part:
+    # Imported here so that importing this module does not load google.genai (see main's agent warm-up)
+    from google.genai import types
+
+    if part.function_response:
+        response = part.function_response.response or {}
+        if len(str(response)) <= limit:
+            return part
+        summary: Dict[str, Any] = {}
+        if isinstance(response, dict):
+            if "status" in response:
+                summary["status"] = response["status"]
+            body = {k: v for k, v in response.items() if k != "status"}
+            summary["summary"] = _digest(body.get("report") or body.get("message") or body, limit)
+        else:
+            summary["summary"] = _digest(response, limit)
+        return types.Part(function_response=types.FunctionResponse(
+            id=part.function_response.id, name=part.function_response.name, response=summary,
+        ))
+    if part.text and len(part.text) > limit * 2:
+        return types.Part(text=_clip(part.text, limit * 2))
+    return part
+
+
+def _compact_content(content: types.Content, limit: int) -> types.Content:
+    from google.genai import types
+
+    return types.Content(role=content.role, parts=[_compact_part(part, limit) for part in content.parts or ()])
+
+
+class PromptSizeMetrics:
+    """Thread-safe rolling record of prompt sizes (estimated tokens) per LLM call."""
+
+    def __init__(self, max_samples: int = 1000):
+        self._samples: deque = deque(maxlen=max_samples)
+        self._per_agent: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+        self._lock = threading.Lock()
+
+    def record(self, agent_name: str, tokens_before: int, tokens_after: int, contents_before: int, contents_after: int) -> None:
+        with self._lock:
+            self._samples.append({
+                "agent": agent_name,
+                "tokens_before": tokens_before,
+                "tokens_after": tokens_after,
+                "contents_before": contents_before,
+                "contents_after": contents_after,
+            })
+            stats = self._per_agent[agent_name]
+            stats["calls"] += 1
+            stats["tokens_before"] += tokens_before
+            stats["tokens_after"] += tokens_after
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._samples)
+            per_agent = {name: dict(stats) for name, stats in self._per_agent.items()}
+        after = sorted(s["tokens_after"] for s in samples)
+
+        def percentile(p: float) -> int:
+            return after[min(len(after) - 1, int(p * len(after)))] if after else 0
+
+        return {
+            "calls": len(samples),
+            "prompt_tokens_p50": percentile(0.5),
+            "prompt_tokens_p95": percentile(0.95),
+            "prompt_tokens_max": after[-1] if after else 0,
+            "tokens_saved": sum(s["tokens_before"] - s["tokens_after"] for s in samples),
+            "last": samples[-1] if samples else None,
+            "per_agent": per_agent,
+        }
+
+
+class HistoryCompactor:
+    """Callable `before_model_callback` that keeps each LLM request within a history token budget."""
+
+    def __init__(self, keep_turns: int = 3, token_budget: int = 4000, tool_summary_chars: int = 300,
+                 metrics: Optional[PromptSizeMetrics] = None):
+        self.keep_turns = max(1, keep_turns)
+        self.token_budget = token_budget
+        self.tool_summary_chars = tool_summary_chars
+        self.metrics = metrics or PromptSizeMetrics()
+
+    def compact(self, contents: List[types.Content]) -> List[types.Content]:
+        turns = _split_turns(contents)
+        recent = turns[-self.keep_turns:]
+        older = [[_compact_content(c, self.tool_summary_chars) for c in turn] for turn in turns[:-self.keep_turns]]
+
+        def flatten(turn_list):
+            return [content for turn in turn_list for content in turn]
+
+        # Drop whole old turns, oldest first, until the history fits the budget
+        while older and estimate_tokens(flatten(older + recent)) > self.token_budget:
+            older.pop(0)
+
+        compacted = flatten(older + recent)
+        if estimate_tokens(compacted) > self.token_budget:
+            # Still too large: digest tool outputs in the kept turns too, except the latest one
+            latest_response = max(
+                (i for i, c in enumerate(compacted) if any(p.function_response for p in c.parts or ())),
+                default=None,
+            )
+            compacted = [
+                c if i == latest_response or not any(p.function_response for p in c.parts or ())
+                else _compact_content(c, self.tool_summary_chars)
+                for i, c in enumerate(compacted)
+            ]
+        return compacted
+
+    def __call__(self, callback_context, llm_request) -> None:
+        contents = llm_request.contents or []
+        tokens_before = estimate_tokens(contents)
+        compacted = self.compact(contents) if contents else contents
+        llm_request.contents = compacted
+        tokens_after = estimate_tokens(compacted)
+        agent_name = getattr(callback_context, "agent_name", None) or "unknown"
+        self.metrics.record(agent_name, tokens_before, tokens_after, len(contents), len(compacted))
+        return None  # Continue with the (compacted) request
@@ -0,0 +1,126 @@
+"""
+Deterministic intent router for /chat.
+
+Recognizes unambiguous requests ("status of order <id>", "list my orders",
+"cancel order <id>", "how many products", "what categories") so read-only ones
+can be answered by calling the tool directly, without the orchestrator +
+sub-agent LLM round trips (main.FAST_PATH_TOOLS; cancellations still go
+through the agent, which asks for confirmation). High-precision regex rules are tried first; a small keyword
+classifier handles rephrasings of read-only requests. Intents that change an
+order (ORDER_CHANGING_INTENTS) are only ever taken from a whole-message rule,
+and never from a question or a conditional ("should I cancel ...", "cancel
+... if ..."). Anything uncertain returns None and goes through the agent tree
+as before.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Order IDs: UUIDs from place_order, or legacy IDs like ORD1001 / ABC-678
+_UUID = r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+_ORDER_ID = rf"(?:{_UUID}|[A-Za-z]{{0,5}}-?\d{{3,}}[A-Za-z0-9-]*)"
+_ORDER_REF = rf"(?:order|purchase)\s*(?:id|number|no\.?|#)?\s*[:#]?\s*(?P<order_id>{_ORDER_ID})"
+
+_UUID_RE = re.compile(_UUID)
+_ORDER_REF_RE = re.compile(_ORDER_REF, re.IGNORECASE)
+_PRODUCT_ID_RE = re.compile(r"\bp-\d+\b", re.IGNORECASE)
+
+# Words that mean the user wants something the fast path must never guess at
+_BLOCKERS = re.compile(r"\b(buy|purchase|add|reorder|change|update|modify|instead|but|not|don'?t)\b", re.IGNORECASE)
+# Questions and conditions: fine for looking something up, never for changing an order
+_ORDER_CHANGE_BLOCKERS = re.compile(r"\?|\b(should|what|how|if|unless|when|whether|can i|could i)\b", re.IGNORECASE)
+
+_POLITE = r"(?:please\s+|can you\s+|could you\s+|i want to\s+|i'd like to\s+|i need to\s+)*"
+
+# (intent, compiled rule). Each rule must match the whole (normalized) message.
+RULES: List[Tuple[str, "re.Pattern[str]"]] = [
+    ("order_status", re.compile(
+        rf"^{_POLITE}(?:what(?:'s| is)\s+(?:the\s+)?status\s+of|check(?:\s+the)?\s+status\s+of|status\s+(?:of|for)|track|where\s+is)"
+        rf"\s+(?:my\s+)?{_ORDER_REF}$", re.IGNORECASE)),
+    ("cancel_order", re.compile(
+        rf"^{_POLITE}(?:cancel|remove|delete)\s+(?:my\s+)?{_ORDER_REF}$", re.IGNORECASE)),
+    ("list_orders", re.compile(
+        rf"^{_POLITE}(?:list|show(?:\s+me)?|see|view)\s+(?:all\s+)?(?:of\s+)?my\s+(?:past\s+|previous\s+)?(?:orders|order\s+history|purchases)$"
+        r"|^(?:my\s+orders|order\s+history|my\s+order\s+history)$", re.IGNORECASE)),
+    ("product_count", re.compile(
+        r"^(?:how\s+many\s+products(?:\s+do\s+you\s+have|\s+are\s+there)?(?:\s+in\s+(?:the|your)\s+catalog)?"
+        r"|(?:what\s+is\s+the\s+)?total\s+(?:number\s+of\s+products|product\s+count))$", re.IGNORECASE)),
+    ("list_categories", re.compile(
+        r"^(?:what\s+(?:product\s+)?categories\s+(?:do\s+you\s+have|are\s+there|are\s+available)"
+        r"|(?:list|show(?:\s+me)?)\s+(?:all\s+)?(?:the\s+)?(?:product\s+)?categories)$", re.IGNORECASE)),
+]
+
+# Keyword weights for the fallback classifier
+INTENT_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "order_status": {"status": 3, "track": 3, "tracking": 3, "where": 1, "shipped": 2, "delivered": 2, "arrive": 2, "arriving": 2},
+    "cancel_order": {"cancel": 4, "cancellation": 4, "remove": 2, "delete": 2},
+    "list_orders": {"list": 2, "history": 3, "orders": 2, "past": 1, "previous": 1, "all": 1},
+    "product_count": {"how": 1, "many": 2, "products": 1, "total": 1, "count": 2, "number": 1},
+    "list_categories": {"categories": 4, "category": 2},
+}
+
+# Intents that need an order ID extracted from the message
+REQUIRES_ORDER_ID = {"order_status", "cancel_order"}
+# Intents whose tool changes an order: whole-message rules only, the classifier merely scores them
+ORDER_CHANGING_INTENTS = {"cancel_order"}
+
+MIN_CONFIDENCE = 0.8
+MAX_WORDS = 16
+
+
+def _normalize(message: str) -> str:
+    message = message.strip().rstrip("?!. ")
+    return re.sub(r"\s+", " ", message)
+
+
+def extract_order_id(message: str) -> Optional[str]:
+    """Returns the single order ID referenced in the message, or None if there are zero or several."""
+    ids = {m.group(0).lower() for m in _UUID_RE.finditer(message)}
+    if not ids:
+        ids = {m.group("order_id") for m in _ORDER_REF_RE.finditer(message)}
+    return next(iter(ids)) if len(ids) == 1 else None
+
+
+def classify(message: str) -> Tuple[Optional[str], float]:
+    """Keyword classifier: returns (best intent, confidence in [0, 1])."""
+    words = re.findall(r"[a-z']+", message.lower())
+    scores = {intent: sum(weights.get(w, 0) for w in words) for intent, weights in INTENT_KEYWORDS.items()}
+    total = sum(scores.values())
+    if not total:
+        return None, 0.0
+    best = max(scores, key=scores.get)
+    return best, scores[best] / total
+
+
+def route(message: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns {"intent", "args", "confidence", "matched_by"} when the message is an
+    unambiguous request the fast path can answer, else None (use the agent tree).
+    """
+    text = _normalize(message)
+    if not text or len(text.split()) > MAX_WORDS:
+        return None
+    if _BLOCKERS.search(text) or _PRODUCT_ID_RE.search(text):
+        return None
+    # Checked on the raw message: _normalize drops the trailing "?"
+    changes_blocked = _ORDER_CHANGE_BLOCKERS.search(message) is not None
+
+    for intent, rule in RULES:
+        if intent in ORDER_CHANGING_INTENTS and changes_blocked:
+            continue
+        match = rule.match(text)
+        if match:
+            args = {}
+            if intent in REQUIRES_ORDER_ID:
+                args["order_id"] = match.group("order_id")
+            return {"intent": intent, "args": args, "confidence": 1.0, "matched_by": "rule"}
+
+    intent, confidence = classify(text)
+    if intent is None or confidence < MIN_CONFIDENCE or intent in ORDER_CHANGING_INTENTS:
+        return None
+    args = {}
+    if intent in REQUIRES_ORDER_ID:
+        order_id = extract_order_id(text)
+        if not order_id:
+            return None
+        args["order_id"] = order_id
+    return {"intent": intent, "args": args, "confidence": round(confidence, 2), "matched_by": "classifier"}
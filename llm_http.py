@@ -0,0 +1,246 @@
+"""
+One pooled HTTP client for every LLM provider call.
+
+Without it LiteLLM builds its own httpx client per provider client, with the
+library's default limits: connection reuse, concurrency and timeouts toward
+the LLM endpoint are not under our control and not visible in /metrics.
+`LLMHttpPool` owns a single `httpx.AsyncClient` and `install()` hands it to
+LiteLLM (`litellm.aclient_session`), which then sends every OpenAI-compatible
+request of every agent through it:
+
+  * keep-alive pool: `max_connections` in total, of which up to
+    `max_keepalive` stay open (idle) for `keepalive_expiry` seconds, so
+    consecutive agent steps reuse warm TCP/TLS connections;
+  * HTTP/2 when the `h2` package is installed (negotiated over TLS via ALPN;
+    plain http:// endpoints stay on HTTP/1.1), multiplexing concurrent calls
+    over few connections;
+  * `HostLimitedTransport`: at most `max_per_host` requests in flight per
+    host, the rest wait (FIFO) for a slot instead of opening more
+    connections or overrunning the provider's own limits;
+  * `warm_up()`: opens connections to the LLM endpoint at startup, so the
+    first chat turns do not pay for DNS, TCP and TLS setup.
+
+Utilization (connections by state, requests in flight and waiting per host,
+slot wait, time to response headers) is exported through the shared metrics
+registry; `update_metrics()` refreshes the point-in-time gauges.
+"""
+import asyncio
+import importlib.util
+import time
+from typing import Any, Callable, Dict
+
+import httpx
+
+from observability import get_logger, metrics
+
+logger = get_logger("llm_http")
+
+LLM_HTTP_CONNECTIONS = metrics.gauge(
+    "ecommerce_llm_http_connections", "Pooled connections to LLM providers by state (active, idle).", ["state"]
+)
+LLM_HTTP_POOL_UTILIZATION = metrics.gauge(
+    "ecommerce_llm_http_pool_utilization", "Active LLM provider connections as a fraction of LLM_HTTP_MAX_CONNECTIONS."
+)
+LLM_HTTP_IN_FLIGHT = metrics.gauge("ecommerce_llm_http_in_flight", "LLM provider requests in flight per host.", ["host"])
+LLM_HTTP_WAITING = metrics.gauge("ecommerce_llm_http_waiting", "LLM provider requests waiting for a per-host slot.", ["host"])
+LLM_HTTP_REQUESTS = metrics.counter(
+    "ecommerce_llm_http_requests_total", "LLM provider HTTP requests by host and status (2xx, 4xx, 5xx, error).", ["host", "status"]
+)
+LLM_HTTP_SLOT_WAIT = metrics.histogram(
+    "ecommerce_llm_http_slot_wait_seconds", "Time LLM provider requests waited for a per-host slot.", ["host"]
+)
+LLM_HTTP_RESPONSE_SECONDS = metrics.histogram(
+    "ecommerce_llm_http_response_seconds", "Time from sending an LLM provider request to its response headers.", ["host"]
+)
+
+
+def h2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class _SlotReleasingStream(httpx.AsyncByteStream):
+    """Response body that gives the per-host slot back once it has been read or closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class HostLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps an httpx transport with a per-host concurrency cap (max_per_host <= 0:
+    unlimited) and records the per-host request metrics. A slot is held until
+    the response body is closed, which for streamed completions is the end of
+    the stream, not the arrival of the headers.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_per_host: int):
+        self._transport = transport
+        self.max_per_host = max_per_host
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.waiting: Dict[str, int] = {}
+
+    async def _acquire(self, host: str) -> None:
+        if self.max_per_host <= 0:
+            return
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        if not semaphore.locked():
+            await semaphore.acquire()
+            return
+        started = time.perf_counter()
+        self.waiting[host] = self.waiting.get(host, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting[host] -= 1
+            LLM_HTTP_SLOT_WAIT.observe(time.perf_counter() - started, host)
+
+    def _releaser(self, host: str) -> Callable[[], None]:
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            self.in_flight[host] -= 1
+            if self.max_per_host > 0:
+                self._semaphores[host].release()
+
+        return release
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.netloc.decode("ascii")
+        await self._acquire(host)
+        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        release = self._releaser(host)
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            LLM_HTTP_REQUESTS.inc(host, "error")
+            raise
+        LLM_HTTP_RESPONSE_SECONDS.observe(time.perf_counter() - started, host)
+        LLM_HTTP_REQUESTS.inc(host, f"{response.status_code // 100}xx")
+        if response.is_closed:
+            # The transport already read the body (an in-memory response): httpx never closes it again
+            release()
+        else:
+            response.stream = _SlotReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class LLMHttpPool:
+    """The shared LLM provider client: keep-alive pool, optional HTTP/2 and per-host caps (see module docstring)."""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 60.0,
+        max_per_host: int = 32,
+        http2: bool = True,
+        connect_timeout: float = 5.0,
+        timeout: float = 120.0,
+        verify: bool = True,
+    ):
+        if http2 and not h2_available():
+            logger.warning("LLM_HTTP2 is on but the h2 package is not installed; LLM calls use HTTP/1.1 (pip install h2).")
+            http2 = False
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._pool_transport = httpx.AsyncHTTPTransport(http2=http2, limits=self.limits, verify=verify)
+        self.transport = HostLimitedTransport(self._pool_transport, max_per_host)
+        self.client = httpx.AsyncClient(
+            transport=self.transport,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            follow_redirects=True,
+        )
+        self._installed = False
+
+    def install(self) -> None:
+        """Makes LiteLLM send OpenAI-compatible calls through this pool."""
+        import litellm
+        litellm.aclient_session = self.client
+        self._installed = True
+
+    async def warm_up(self, url: str, connections: int, timeout: float = 5.0) -> int:
+        """
+        Opens up to `connections` concurrent connections to `url` (HEAD requests; any
+        HTTP status counts) and leaves them idle in the pool. Returns how many
+        succeeded; failures are logged, never raised.
+        """
+        if connections <= 0 or not url.strip().lower().startswith(("http://", "https://")):
+            return 0
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.client.head(url.strip(), timeout=timeout) for _ in range(connections)), return_exceptions=True
+        )
+        failures = [r for r in results if isinstance(r, BaseException)]
+        if failures:
+            logger.warning(f"LLM connection warm-up to {url.strip()}: {len(failures)} of {connections} failed ({failures[0]!r})")
+        opened = connections - len(failures)
+        logger.info(f"LLM connection warm-up: {opened} connection(s) to {url.strip()} in {time.perf_counter() - started:.2f}s "
+                    f"({'HTTP/2' if self.http2 else 'HTTP/1.1'}).")
+        return opened
+
+    def _pool_connections(self):
+        # httpx keeps the httpcore pool private; its connection list is the only view of pool occupancy
+        pool = getattr(self._pool_transport, "_pool", None)
+        return list(getattr(pool, "connections", ()))
+
+    def stats(self) -> Dict[str, Any]:
+        connections = [c for c in self._pool_connections() if not c.is_closed()]
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "max_per_host": self.transport.max_per_host,
+            "connections": {"active": len(connections) - idle, "idle": idle},
+            "in_flight": {host: n for host, n in self.transport.in_flight.items() if n},
+            "waiting": {host: n for host, n in self.transport.waiting.items() if n},
+        }
+
+    def update_metrics(self) -> Dict[str, Any]:
+        stats = self.stats()
+        LLM_HTTP_CONNECTIONS.set("active", value=stats["connections"]["active"])
+        LLM_HTTP_CONNECTIONS.set("idle", value=stats["connections"]["idle"])
+        if self.limits.max_connections:
+            LLM_HTTP_POOL_UTILIZATION.set(value=stats["connections"]["active"] / self.limits.max_connections)
+        for host, n in self.transport.in_flight.items():
+            LLM_HTTP_IN_FLIGHT.set(host, value=n)
+        for host, n in self.transport.waiting.items():
+            LLM_HTTP_WAITING.set(host, value=n)
+        return stats
+
+    async def aclose(self) -> None:
+        if self._installed:
+            import litellm
+            if litellm.aclient_session is self.client:
+                litellm.aclient_session = None
+            self._installed = False
+        await self.client.aclose()
+
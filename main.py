@@ -1,905 +1,2707 @@
-import json
-import os
-import uuid
-import datetime
-# from zoneinfo import ZoneInfo # Not needed for current tool logic
-from typing import Any, Dict, List
-
-import httpx
-from fastapi import WebSocket, WebSocketDisconnect
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
-from google.adk.models.lite_llm import LiteLlm
-from google.adk.agents import Agent
-# Remove LiteLlm import and config
-# from google.adk.models.lite_llm import LiteLlm
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types # Keep this for ADK types
-
-# Import Google Generative AI SDK (will pick up GOOGLE_API_KEY from environment)
-import google.genai as genai # <--- Import the SDK
-
-from dotenv import load_dotenv
-import traceback
-
-# Add aiosqlite import (keeping SQLite as per your last working DB code)
-import aiosqlite
-
-# --- Load environment variables early ---
-load_dotenv() # <--- Load variables from .env
-
-# --- API Configuration (for Google Generative AI) ---
-# Get Google API Key from environment variables
-
-API_KEY = " "
-API_URL = " "
-
-
-# Note: We are NOT calling genai.configure(api_key=...) here.
-# The SDK should pick up the GOOGLE_API_KEY environment variable automatically.
-
-
-# --- Data Storage (Global variables) ---
-product_catalog: List[Dict[str, Any]] = []
-
-# Define the paths to your static data files
-PRODUCTS_FILE = "products.json"
-
-
-# --- Database Configuration (For SQLite) ---
-# Use the environment variable for the SQLite database file path
-SQLITE_DATABASE_PATH = os.getenv("SQLITE_DATABASE_PATH", "./ecommerce.db") # Default to ./ecommerce.db
-
-# Global variable to hold the database path
-db_file_path = SQLITE_DATABASE_PATH
-
-
-# Define a Default User ID (Still needed for the orders table)
-DEFAULT_USER_ID = "Aryan Sharma"
-
-
-# Initialize an async HTTP client (kept)
-# Set verify=True in production for SSL cert verification
-async_client = httpx.AsyncClient(verify=False)
-
-
-# --- Simulated Tool Definitions (Using aiosqlite) ---
-
-# search_products remains the same (uses product_catalog from JSON)
-async def search_products(query: str) -> Dict[str, Any]:
-    """
-    Simulates searching a product catalog loaded from JSON.
-    Returns a list of products or a not found message.
-    """
-    print(f"[Tool Call] search_products called for query: '{query}'")
-    print(f"DEBUG: search_products received query: '{query}'")
-
-    query_lower = query.lower()
-    found_products = []
-    keywords = query_lower.split()
-
-    if not keywords:
-        return {"status": "not_found", "message": "Please provide keywords."}
-
-    global product_catalog
-    if not product_catalog:
-        return {"status": "error", "message": "Product catalog is empty."}
-
-    print(f"DEBUG: Keywords to search for: {keywords}")
-
-    if "what" in query_lower and "categories" in query_lower:
-        categories = set()
-        print("DEBUG: Inside the 'what categories' block")
-        for product in product_catalog:
-            print(f"DEBUG: Checking product: {product}")
-            if isinstance(product, dict) and "category" in product:
-                categories.add(product["category"])
-                print(f"DEBUG: Added category: {product['category']}")
-        if categories:
-            category_list = list(categories)
-            report_message = f"Available product categories are: {', '.join(category_list)}."
-            result = {"status": "report", "report": report_message}
-            print(f"DEBUG: search_products returning: {result}")
-            return result
-        else:
-            result = {"status": "not_found", "message": "No product categories found."}
-            print(f"DEBUG: search_products returning: {result}")
-            return result
-    elif "total" in query_lower and "product" in query_lower and "count" in query_lower:
-        total_count = len(product_catalog)
-        report_message = f"There are currently {total_count} products in our catalog."
-        result = {"status": "report", "report": report_message}
-        print(f"DEBUG: search_products returning: {result}")
-        return result
-
-    # *Moved the total product count check to be *before* the keyword search*
-
-    for product in product_catalog:
-        if not isinstance(product, dict):
-            print(f"WARNING: Skipping invalid product: {product}")
-            continue
-
-        name = product.get('name', '').lower()
-        description = product.get('description', '').lower()
-        category = product.get('category', '').lower()
-        product_text = f"{name} {description} {category}"
-
-        if "computer" in query_lower and "accessories" in query_lower:
-            if "electronics" in category or "home & office" in category:
-                if "mouse" in name.lower() or "keyboard" in name.lower() or "speaker" in name.lower() or "headphone" in name.lower():
-                  found_products.append(product)
-                  print(f"DEBUG: Found a match: {product.get('name')}")
-        elif any(keyword in product_text for keyword in keywords):
-            found_products.append(product)
-            print(f"DEBUG: Found a match: {product.get('name')}")
-
-    if found_products:
-        results_list = []
-        for product in found_products:
-            price = product.get('price', 0.0)
-            if not isinstance(price, (int, float)):
-                print(f"WARNING: Non-numeric price for {product.get('id')}: {price}")
-                price = 0.0
-            results_list.append(
-                f"{product.get('name', 'Unknown Product')} (ID: {product.get('id', 'N/A')}, Price: ${price:.2f})"
-            )
-        report_message = f"I found {len(found_products)} product(s) matching '{query}': " + "; ".join(results_list) + "."
-        result = {"status": "report", "report": report_message}
-        print(f"DEBUG: search_products returning: {result}")
-        return result
-    else:
-        result = {"status": "not_found", "message": f"Sorry, no products found matching '{query}'."}
-        print(f"DEBUG: search_products returning: {result}")
-        return result
-
-
-
-
-# check_order_status - UPDATED to retrieve stored total_price
-async def check_order_status(order_id: str) -> Dict[str, Any]: # Changed return type hint to Any as it can return error/not_found too
-    """
-    Checks the status of an order in the SQLite database, including item prices and the stored total.
-    """
-    print(f"[Tool Call] check_order_status called for order_id: '{order_id}'")
-
-    if not db_file_path:
-         print("   Database file path is not set.")
-         return {
-             "status": "error",
-             "message": "Database is not configured. Cannot check order status.",
-         }
-
-    try:
-        async with aiosqlite.connect(db_file_path) as db:
-            await db.execute("PRAGMA foreign_keys = ON;")
-            db.row_factory = aiosqlite.Row
-            cursor = await db.cursor()
-
-            # SQL query to fetch order and its items, including price from order_items
-            # Select total_price from orders table
-            sql = """
-            SELECT
-                o.order_id, o.status, o.created_at, o.details, o.total_price,
-                oi.product_id, oi.quantity, oi.price
-            FROM orders o
-            LEFT JOIN order_items oi ON o.order_id = oi.order_id
-            WHERE o.order_id = ?
-            """
-            await cursor.execute(sql, (order_id,))
-            results = await cursor.fetchall()
-
-            if not results:
-                print(f"   Order ID '{order_id}' not found in database.")
-                return {
-                    "status": "not_found",
-                    "message": f"Order with ID {order_id} not found.",
-                }
-
-            # Process results
-            order_data = results[0]
-            status = order_data.get('status', 'Unknown')
-            created_at = order_data.get('created_at', 'N/A')
-            details = order_data.get('details', 'No additional details available.')
-            stored_total_price = order_data.get('total_price', 0.0) # Retrieve stored total
-
-
-            item_details_list = []
-            # We can still calculate the total here for verification if needed, but will use the stored value
-            # calculated_total = 0.0
-
-
-            # Check if the order had items (at least one row with a product_id that is not NULL)
-            # The LEFT JOIN will return one row with NULLs for oi columns if order exists but has no items
-            if order_data and order_data['product_id'] is not None: # Ensure product_id is not None from LEFT JOIN
-                 for row in results:
-                      item_product_id = row.get('product_id')
-                      item_quantity = row.get('quantity', 0) # Default quantity to 0 for calculation safety
-                      item_price = row.get('price', 0.0)    # Default price to 0.0 for calculation safety
-
-                      # Look up product name from loaded JSON catalog (optional, price is from DB)
-                      product = next((p for p in product_catalog if p.get("id") == item_product_id), None)
-                      product_name = product.get("name", f"Unknown Product ({item_product_id})") if product else f"Unknown Product ({item_product_id})"
-
-                      item_cost = item_quantity * item_price
-                      # calculated_total += item_cost
-
-                      # Include item-level price and calculated cost
-                      item_details_list.append(f"- {item_quantity} x {product_name} @ ${item_price:.2f} each (${item_cost:.2f})")
-
-            items_summary = "\n".join(item_details_list) if item_details_list else "No items listed."
-
-
-            report_message = (
-                f"Details for order {order_id} (Placed On: {created_at}):\n"
-                f"Status: {status}\n"
-                f"Items:\n{items_summary}\n"
-                f"Total Amount: ${stored_total_price:.2f}\n" # Use the stored total
-                f"More Info: {details}"
-            )
-
-            return {
-                "status": "report",
-                "report": report_message,
-            }
-
-    except Exception as e:
-        print(f"Error checking order status for '{order_id}': {e}")
-        traceback.print_exc()
-        return {
-            "status": "error",
-            "message": f"An error occurred while checking status for order '{order_id}': {e}",
-        }
-
-async def place_order(items: List[Dict[str, int]]) -> Dict[str, Any]:
-    """
-    Places an order for one or more products by adding them to the SQLite database.
-    Expects a list of dictionaries, where each dictionary contains 'product_id' and 'quantity'.
-    """
-    print(f"[Tool Call] place_order called with items: {items}")
-    if not db_file_path:
-        print("    Database file path is not set.")
-        return {
-            "status": "error",
-            "message": "Database is not configured. Cannot place order.",
-        }
-
-    order_items_details = []
-    order_total_cost = 0.0
-    all_products_found = True
-    failed_product_ids = []
-
-    # 1. Validate product existence and quantities for all items
-    for item in items:
-        product_id = item.get("product_id")
-        quantity = item.get("quantity", 1)
-
-        if not product_id:
-            print("    Error: product_id is missing in an item.")
-            return {"status": "error", "message": "Invalid order item: product ID is missing."}
-
-        product = next((p for p in product_catalog if p.get("id") == product_id), None)
-        if not product:
-            print(f"    Product ID '{product_id}' not found in catalog.")
-            all_products_found = False
-            failed_product_ids.append(product_id)
-            continue  # Process other items to report all missing products
-
-        product_price = product.get("price", 0.0)
-        if not isinstance(product_price, (int, float)) or product_price < 0:
-            print(f"    Product '{product_id}' has invalid or missing price: {product_price}")
-            return {"status": "error", "message": f"Product '{product_id}' has an invalid price. Cannot place order."}
-
-        if not isinstance(quantity, int) or quantity <= 0:
-            print(f"    Invalid quantity: {quantity} for product '{product_id}'. Must be a positive integer.")
-            return {"status": "error", "message": f"Invalid quantity for product '{product_id}'. Please specify a valid positive number."}
-
-        item_cost = quantity * product_price
-        order_total_cost += item_cost
-        order_items_details.append({"product_id": product_id, "quantity": quantity, "price": product_price, "name": product.get("name", "Unknown")})
-
-    if not all_products_found:
-        return {
-            "status": "error",
-            "message": f"The following product IDs were not found in the catalog: {', '.join(failed_product_ids)}.",
-        }
-
-    try:
-        async with aiosqlite.connect(db_file_path) as db:
-            await db.execute("PRAGMA foreign_keys = ON;")
-            cursor = await db.cursor()
-
-            # 2. Generate unique order ID
-            new_order_id = str(uuid.uuid4())
-
-            # 3. Insert the new order into the 'orders' table
-            order_details_str = ", ".join([f"{item['quantity']} x {item['name']} @ ${item['price']:.2f}" for item in order_items_details])
-            order_sql = """
-                INSERT INTO orders (order_id, user_id, status, created_at, details, total_price)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """
-            order_values = (
-                new_order_id,
-                DEFAULT_USER_ID,
-                "Processing",
-                datetime.datetime.now().isoformat(),
-                f"Order placed via AI assistant for: {order_details_str}",
-                order_total_cost,
-            )
-            await cursor.execute(order_sql, order_values)
-
-            # 4. Insert items into the 'order_items' table
-            item_sql = """
-                INSERT INTO order_items (order_id, product_id, quantity, price)
-                VALUES (?, ?, ?, ?)
-                """
-            for item in order_items_details:
-                item_values = (new_order_id, item["product_id"], item["quantity"], item["price"])
-                await cursor.execute(item_sql, item_values)
-
-            # 5. Commit the transaction
-            await db.commit()
-
-            print(f"    Order {new_order_id} committed to database with total cost ${order_total_cost:.2f}.")
-
-            # 6. Return success response
-            ordered_items_summary = ", ".join([f"{item['quantity']} x {item['name']}" for item in order_items_details])
-            return {
-                "status": "success",
-                "order_id": new_order_id,
-                "message": f"Your order for {ordered_items_summary} has been placed successfully! Total cost: ${order_total_cost:.2f}. Your order ID is {new_order_id}.",
-            }
-
-    except Exception as e:
-        print(f"Error placing order for items {items}: {e}")
-        traceback.print_exc()
-        return {
-            "status": "error",
-            "message": f"An error occurred while placing your order: {e}",
-        }
-
-# remove_order tool implementation (called by order_cancellation_agent) - Remains the same
-async def remove_order(order_id: str) -> Dict[str, str]:
-    """
-    Removes or cancels an order and its items from the SQLite database by order ID.
-    """
-    print(f"[Tool Call] remove_order called for order_id: '{order_id}'")
-
-    if not db_file_path:
-         print("   Database file path is not set.")
-         return {
-             "status": "error",
-             "message": "Database is not configured. Cannot remove order.",
-         }
-
-    try:
-        async with aiosqlite.connect(db_file_path) as db:
-            await db.execute("PRAGMA foreign_keys = ON;")
-
-            # Check if the order exists first
-            check_sql = "SELECT COUNT(*) FROM orders WHERE order_id = ?"
-            cursor = await db.cursor()
-            await cursor.execute(check_sql, (order_id,))
-            exists = (await cursor.fetchone())[0] > 0
-
-            if not exists:
-                 print(f"   Order ID '{order_id}' not found in database.")
-                 return {
-                     "status": "not_found",
-                     "message": f"Order with ID {order_id} not found. Cannot remove.",
-                 }
-
-            # Delete order items first (due to foreign key constraint)
-            delete_items_sql = "DELETE FROM order_items WHERE order_id = ?"
-            await cursor.execute(delete_items_sql, (order_id,))
-            items_deleted = cursor.rowcount
-
-            # Delete the order itself
-            delete_order_sql = "DELETE FROM orders WHERE order_id = ?"
-            await cursor.execute(delete_order_sql, (order_id,))
-            order_deleted = cursor.rowcount
-
-            await db.commit()
-
-            print(f"   Order {order_id} and {items_deleted} items removed from database.")
-
-            return {
-                "status": "success",
-                "order_id": order_id,
-                "message": f"Order {order_id} has been successfully removed.",
-            }
-
-    except Exception as e:
-        print(f"Error removing order '{order_id}': {e}")
-        traceback.print_exc()
-        return {
-            "status": "error",
-            "message": f"An error occurred while removing order '{order_id}': {e}",
-        }
-
-# --- NEW Tool: List All Orders - UPDATED to format as HTML table ---
-async def list_all_orders() -> Dict[str, Any]:
-    """
-    Fetches and lists all orders from the SQLite database and formats as an HTML table string.
-    """
-    print("[Tool Call] list_all_orders called")
-
-    if not db_file_path:
-         print("   Database file path is not set.")
-         return {
-             "status": "error",
-             "message": "Database is not configured. Cannot list orders.",
-         }
-
-    try:
-        async with aiosqlite.connect(db_file_path) as db:
-            await db.execute("PRAGMA foreign_keys = ON;")
-            db.row_factory = aiosqlite.Row # Rows behave like dictionaries
-            cursor = await db.cursor()
-
-            # Select relevant columns from the orders table
-            sql = """
-            SELECT order_id, status, created_at, total_price
-            FROM orders
-            ORDER BY created_at DESC; -- Order by most recent first
-            """
-            await cursor.execute(sql)
-            results = await cursor.fetchall()
-
-            if not results:
-                print("   No orders found in database.")
-                return {
-                    "status": "not_found",
-                    "message": "You have not placed any orders yet.",
-                }
-
-            # *** Format results as an HTML table string ***
-            table_rows = []
-            # Add table header
-            table_rows.append("<tr><th>Order ID</th><th>Status</th><th>Total</th><th>Placed On</th></tr>")
-
-            for row in results:
-                # *** Corrected: Access columns using square brackets [] ***
-                order_id = row['order_id']
-                status = row['status']
-                created_at = row['created_at']
-                total_price = row['total_price']
-                # Add a row for each order
-                table_rows.append(
-                    f"<tr>"
-                    f"<td>{order_id}</td>"
-                    f"<td>{status}</td>"
-                    f"<td>${total_price:.2f}</td>"
-                    f"<td>{created_at}</td>" # Display the datetime string directly
-                    f"</tr>"
-                )
-
-            # Combine all rows into a full HTML table
-            # Added a class "orders-table" for specific styling if needed
-            html_table = "<table class='orders-table'>" + "".join(table_rows) + "</table>"
-
-            # The tool should return a dictionary. The agent will use the 'report' field.
-            return {
-                "status": "report",
-                "report": html_table, # Put the HTML string here
-                # Optionally, add a plain text intro message for the agent to use
-                "intro_message": "Here is your order history:",
-            }
-
-
-    except Exception as e:
-        print(f"Error listing all orders: {e}")
-        traceback.print_exc()
-        # Return an error status if something goes wrong
-        return {
-            "status": "error",
-            "message": f"An error occurred while listing orders: {e}",
-        }
-
-
-# --- Configure Agents (Using LiteLlm) ---
-# Re-using the LiteLlm config provided for all agents
-llm_config = LiteLlm(
-    model="gpt-4o-mini",
-    api_key=API_KEY,
-    api_base=API_URL,
-    # Add any other LiteLlm specific configs here if needed
-)
-# Use the defined llm_config for all agents
-
-greeting_agent = Agent(
-    model=llm_config,
-    name="greeting_agent",
-    instruction="You are the Greeting Agent. Your ONLY task is to provide a friendly and concise greeting.",
-    description="Handles simple greetings and hellos",
-)
-
-farewell_agent = Agent(
-    model=llm_config,
-    name="farewell_agent",
-    instruction="You are the Farewell Agent. Your ONLY task is to provide a polite and concise goodbye message.",
-    description="Handles simple farewells and goodbyes",
-)
-
-product_search_agent = Agent(
-    model=llm_config,
-    name="product_search_agent",
-    instruction="""You are the Product Search Agent. Your primary goal is to understand user queries related to finding products. Your responses should be in plain text, avoiding any special formatting.
-
-Here's how to handle user queries:
-
-**1. Direct Product Search:**
-
-* If the user provides specific keywords or product names (e.g., 'smartphone', 'running shoes', 'wireless keyboard'), immediately use the `search_products` tool with those keywords.
-
-**2. Broad Category Handling:**
-
-* If the user mentions a broad category (e.g., 'electronics', 'clothing', 'computer accessories'):
-    * First, identify the mentioned category.
-    * Then, check if the `search_products` tool, when used with this broad category, returns any results.
-        * If results are found, present them to the user, addressing them by name if known (e.g., "Here are some products I found in the [category] category, [User Name]: ...").
-        * If no results are found, ask the user to specify a sub-category or a specific product within that category to narrow down the search (e.g., "I found some products in the [category] category, but to help me find exactly what you're looking for, could you please specify a sub-category or a specific product?").
-
-**3. Category Listing Request:**
-
-* If the user asks for a list of categories (e.g., "What product categories do you have?", "List all categories"):
-    * Use the `search_products` tool with a query like "what categories".  The `search_products` tool is now designed to handle this and return a list of categories.
-    * Present the categories to the user, addressing them by name if known (e.g., "Here are the product categories I can search, [User Name]: [category list]").
-
-**4. No Products Found:**
-
-* After using the `search_products` tool, if no results are found:
-    * Inform the user politely, addressing them by name if known (e.g., "I'm sorry, [User Name], I couldn't find any products matching your query.").
-    * If the query was for a specific item, suggest searching within a broader category (e.g., "I couldn't find a 'mechanical keyboard', but I can search for 'keyboards' in general.").
-    * If the query was for a broad category and no sub-categories were found, inform the user.
-
-**5. Total Product Count Request:**
-
-    * If the user asks for the total number of products (e.g., "How many products do you have?", "What is the total number of products?"):
-    * Use the `search_products` tool with the query "total product count". The `search_products` tool is now designed to handle this and return the total count.
-    * Present the count to the user, addressing them by name if known (e.g., "There are currently [total count] products in our catalog, [User Name].").
-**6. Presenting Results:**
-
-* When presenting results from the `search_products` tool (when the tool returns 'status' is 'report'):
-    * Present the information from the 'report' field to the user in a clear and concise manner, addressing them by name if known (e.g., "Here's what I found for you, [User Name]: ...").
-
-**Example Interaction:**
-
-User: "Show me computer accessories"
-Agent: *(Internally calls search_products with "computer accessories")* "Here are some products I found in the computer accessories category, [User Name]: ..."
-
-User: "I want a mechanical keyboard"
-Agent: *(Internally calls search_products with "mechanical keyboard")* "I'm sorry, [User Name], I couldn't find any products matching 'mechanical keyboard'.  I can search for 'keyboards' in general, would you like me to do that?"
-
-User: "show me electronics"
-Agent: *(Internally calls search_products with "electronics")* "Here are some products I found in the electronics category, [User Name]: ..."
-
-User: "laptops"
-Agent: *(Internally calls search_products with "laptops")* "Here's what I found for you, [User Name]: ..."
-
-User: "What product categories do you have?"
-Agent: *(Internally calls search_products with "what categories do you have?")* "Here are the product categories I can search, [User Name]: Clothing, Footwear, Accessories, Electronics, Fitness, Home & Kitchen, Books, Home & Office, Smart Home, Garden & Outdoor, Tools, Home Decor, Kitchen Appliances, Dinnerware, Cookware, Cutlery, Kitchen Utensils, Home & Storage, Bathroom, Bedding, Lighting, Rugs, Window Treatments, Cleaning Supplies, Bathroom Accessories, Personal Care, Fitness Supplements, Sports, Health."
-
-**Example Interaction:**
-
-User: "How many products do you have?"
-Agent: *(Internally calls search_products with "total product count")* "There are currently 102 products in our catalog, Aryan."
-
-""",
-    description="Searches for products in the catalog based on user queries, with category refinement.",
-    tools=[search_products],
-)
-
-
-
-
-# order_status_agent - Instruction UPDATED slightly
-order_status_agent = Agent(
-    model=llm_config,
-    name="order_status_agent",
-    instruction="""You are the Order Status Agent. Your task is to help users check the status of their orders. Identify the order ID from the user's message, however it is phrased. Use the `check_order_status` tool with the extracted order ID.
-
-Examples of user queries:
-- 'What is the status of my order #12345?' -> Order ID: 12345
-- 'Can you tell me where my order with ID ABC-678 is?' -> Order ID: ABC-678
-- 'Track order number 9876.' -> Order ID: 9876
-- 'Check the status of order XYZ123.' -> Order ID: XYZ123
-- 'I want to know about my recent purchase, the ID is 54321.' -> Order ID: 54321
-
-Based on the tool's response, if the 'status' is 'report', provide the detailed order information, including item prices and the total amount, to the user clearly. If the 'status' is 'not_found', inform the user that the order ID was not found. Respond in plain text, avoiding any special formatting.""",
-    description="Checks the status of a user's order based on the provided order ID, including item prices and total amount.",
-    tools=[check_order_status],
-)
-
-ordering_agent = Agent(
-    model=llm_config,
-    name="ordering_agent",
-    instruction="""You are the Ordering Agent. Your role is to process user requests to place orders for one or more products. Understand the user's intent to buy products and extract a list of product IDs and their desired quantities.
-
-Examples of user queries:
-- 'I want to order product ID: XYZ-123 and two of ABC-456.' -> items: [{'product_id': 'XYZ-123', 'quantity': 1}, {'product_id': 'ABC-456', 'quantity': 2}]
-- 'Can you buy me one of LMN-789 and three of PQR-001?' -> items: [{'product_id': 'LMN-789', 'quantity': 1}, {'product_id': 'PQR-001', 'quantity': 3}]
-- 'Order item 111 and two of item 222.' -> items: [{'product_id': '111', 'quantity': 1}, {'product_id': '222', 'quantity': 2}]
-
-Call the `place_order` tool with the extracted list of items. Based on the tool's response ('success' or 'error'), inform the user if the order was placed successfully, providing the order ID and the total cost (which the tool will now need to calculate for multiple items) from the 'message' if successful, or the 'message' if there was an error. If you cannot extract a clear list of product IDs and quantities, ask the user for clarification. Respond concisely and in plain text, avoiding Markdown or special formatting.
-    """,
-    description="Places new orders for one or more products based on user requests, tracking the price at the time of order.",
-    tools=[place_order],
-)
-
-order_cancellation_agent = Agent(
-    model=llm_config,
-    name="order_cancellation_agent",
-    instruction="""You are the Order Cancellation Agent. Your task is to process user requests to cancel or remove orders. Identify the order ID that the user wants to cancel, regardless of how they phrase their request. Use the `remove_order` tool with the extracted order ID.
-
-Examples of user queries:
-- 'Cancel order #56789.' -> Order ID: 56789
-- 'I want to remove my order with ID LMN-321.' -> Order ID: LMN-321
-- 'Can you delete order number 11223?' -> Order ID: 11223
-- 'I need to cancel a recent purchase, the ID is PQR-777.' -> Order ID: PQR-777
-- 'Get rid of order number 44556.' -> Order ID: 44556
-
-Based on the tool's response, if the 'status' is 'success', confirm to the user that the order has been successfully removed. If the 'status' is 'not_found', inform the user that the order ID was not found. If the 'status' is 'error', relay the error message from the tool. If you cannot clearly identify the order ID, ask the user for the specific ID they wish to cancel. Respond in plain text, avoiding any special formatting.""",
-    description="Cancels or removes existing orders based on the provided order ID.",
-    tools=[remove_order],
-)
-
-
-# --- NEW Agent: List Orders ---
-list_orders_agent = Agent(
-    model=llm_config,
-    name="list_orders_agent",
-    instruction="""You are the List Orders Agent. Your purpose is to show the user their order history. When the user asks to see their orders or order history, simply call the `list_all_orders` tool.
-
-Examples of user queries:
-- 'Show me my orders.'
-- 'What have I ordered before?'
-- 'Can I see my order history?'
-- 'List all my past purchases.'
-- 'What are my previous orders?'
-
-Based on the tool's response, if the 'status' is 'report', present the information from the 'report' field (which will be an HTML table) to the user. If the 'status' is 'not_found', inform the user using the message from the 'message' field (e.g., "You have not placed any orders yet."). Respond in plain text, avoiding any special formatting of the HTML content.""",
-    description="Lists all orders placed by the user.",
-    tools=[list_all_orders],
-)
-
-
-# Root Orchestrator Agent - Instruction UPDATED and sub_agents UPDATED
-root_agent = Agent(
-    model=llm_config,
-    name="shopping_orchestrator_agent",
-    instruction=f"""You are the main Shopping Assistant. Your primary role is to greet the user, introduce yourself and your capabilities, ask for their name, and then route their subsequent requests to the most appropriate specialist agent. Be concise in your routing decisions.
-
-**Initial Interaction:**
-
-1. Introduce yourself as the Shopping Assistant.
-2. Briefly list your capabilities: product search, checking order status, placing orders, listing all orders, and cancelling orders.
-3. Ask the user for their name (e.g., 'What is your name?').
-4. Once you receive the user's name, remember it for future interactions.
-5. Always use the first name of the user.(e.g., if user says "My name is Aryan Sharma", remember "Aryan" for future interactions).
-
-**Subsequent Interactions:**
-
-- **Greeting:** If the user's message is a clear greeting (e.g., "Hi", "Hello", "Good morning"), delegate to `greeting_agent`, passing the user's name if known.
-- **Farewell:** If the user's message is a clear farewell (e.g., "Bye", "Goodbye", "See you"), delegate to `farewell_agent`, passing the user's name if known.
-- **Capabilities Inquiry:** If the user asks about your capabilities again (e.g., "What can you do?"), respond directly with the list of capabilities, addressing them by name if known (e.g., '[User Name], as I mentioned, I can help with product search, checking order status, placing orders, listing all orders, and cancelling orders.').
-- **Product Search:** If the user expresses a desire to find products, including category listing and total product count, delegate to `product_search_agent`, passing the user's name if known. Examples: "search for [product]", "find me [item]", "show me [category]", "what product categories do you have?", "how many products do you have?".
-- **Order Status:** If the user asks about the status of a specific order (usually including an order ID or phrases like "where is my order"), delegate to `order_status_agent`, passing the user's name if known.
-- **Ordering:** If the user wants to buy or order a product (usually including a product ID or keywords like "buy", "order", "purchase"), delegate to `ordering_agent`, passing the user's name if known.
-- **Order Cancellation:** If the user wants to cancel or remove an order (usually including an order ID or keywords like "cancel", "remove", "delete order"), delegate to `order_cancellation_agent`, passing the user's name if known.
-- **List Orders:** If the user wants to see their order history (e.g., "list my orders", "show me my order history", "what have I ordered"), delegate to `list_orders_agent`, passing the user's name if known.
-
-**Direct Responses (after initial interaction):**
-
-- For queries that do not clearly fall into one of the delegation categories, politely state, addressing them by name if known (e.g., '[User Name], I can only help with product search, checking order status, placing orders, listing all orders, and cancelling orders. Please let me know how I can assist you with these tasks.').
-""",
-    description="Greets the user, introduces capabilities, asks for name, and then routes user queries to specialized agents.",
-    tools=[],
-    sub_agents=[
-        greeting_agent,
-        farewell_agent,
-        product_search_agent,
-        order_status_agent,
-        ordering_agent,
-        order_cancellation_agent,
-        list_orders_agent,
-    ],
-)
-
-
-
-# --- FastAPI App Setup ---
-app = FastAPI()
-
-# Ensure only one mount for static files
-app.mount("/static", StaticFiles(directory="templates/static"), name="static")
-
-session_service = InMemorySessionService()
-runner: Runner = None
-user_name_cache: Dict[str, str] = {} # Simple in-memory cache for user names
-
-# Using DEFAULT_USER_ID defined at the top for session management
-APP_NAME = "my_adk_fastapi_app"
-USER_ID_FOR_SESSIONS = DEFAULT_USER_ID # Consistent user ID for sessions
-SESSION_ID = "fastapi_session_abc" # Keep a fixed session ID for simplicity
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Initializes ADK components, HTTP client, loads static data, and sets DB file path."""
-    global runner, product_catalog, db_file_path
-    print("Initializing ADK Session and Runner...")
-
-    # --- Load Static Data (products still from JSON) ---
-    print(f"Loading product data from {PRODUCTS_FILE}...")
-    try:
-        with open(PRODUCTS_FILE, "r") as f:
-            product_catalog = json.load(f)
-        print(f"Loaded {len(product_catalog)} products from {PRODUCTS_FILE}")
-    except FileNotFoundError:
-        print(f"Error: {PRODUCTS_FILE} not found. Product search and ordering will not work correctly.")
-        product_catalog = []
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode {PRODUCTS_FILE}. Check file format.")
-        product_catalog = []
-
-    # --- Database Setup (SQLite) ---
-    db_file_path = SQLITE_DATABASE_PATH
-    print(f"Using SQLite database file: {db_file_path}")
-
-    # Optional: Create tables on startup if they don't exist
-    try:
-        async with aiosqlite.connect(db_file_path) as db:
-            await db.execute("PRAGMA foreign_keys = ON;")
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS orders (
-                    order_id VARCHAR(255) PRIMARY KEY,
-                    user_id VARCHAR(255),
-                    status VARCHAR(50),
-                    created_at DATETIME,
-                    details TEXT,
-                    total_price REAL DEFAULT 0.0 -- Added column to store total price of the order
-                )
-            """)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS order_items (
-                    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_id VARCHAR(255),
-                    product_id VARCHAR(255),
-                    quantity INTEGER,
-                    price REAL, -- Stores unit price at time of order
-                    FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE
-                )
-            """)
-            await db.commit()
-            print("SQLite database tables checked/created.")
-    except Exception as e:
-        print(f"Error checking/creating SQLite tables: {e}")
-        traceback.print_exc()
-
-    # --- ADK Session and Runner Setup ---
-    try:
-        # Use the consistent user ID for sessions
-        session = session_service.get_session(app_name=APP_NAME, user_id=USER_ID_FOR_SESSIONS, session_id=SESSION_ID)
-        if session is None:
-             session_service.create_session(app_name=APP_NAME, user_id=USER_ID_FOR_SESSIONS, session_id=SESSION_ID)
-             print(f"Created session: {SESSION_ID}")
-        else:
-             print(f"Using existing session: {SESSION_ID}")
-    except Exception as e:
-        print(f"Error managing session {SESSION_ID}: {e}")
-
-    # --- Initialize the Runner ---
-    runner = Runner(
-        agent=root_agent,
-        app_name=APP_NAME,
-        # No need to pass API key here, SDK should pick it up from env
-        session_service=session_service
-    )
-    print("ADK Runner initialized with Root Agent.")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Shuts down the HTTP client."""
-    print("Shutting down HTTP client...")
-    await async_client.close()
-    print("HTTP client shut down.")
-
-
-# --- FastAPI Endpoints ---
-@app.get("/", response_class=HTMLResponse)
-async def read_root():
-    """Serves the index.html file."""
-    try:
-        return FileResponse("templates/index.html")
-    except FileNotFoundError:
-        return HTMLResponse("<html><body><h1>Error: index.html not found in the 'templates' directory.</h1></body></html>", status_code=404)
-
-
-@app.post("/chat")
-async def chat_endpoint(message: Dict[str, str]):
-    """
-    Receives user message, runs through ADK agent (delegation),
-    and returns the final text response.
-    """
-    if runner is None:
-        print("Error: Runner is not initialized during chat request.")
-        events = [{"type": "error", "message": "Agent system is not fully initialized.", "status_code": 500}]
-        return JSONResponse(content={"response": "Agent system is not fully initialized.", "events": events}, status_code=500)
-
-    user_message = message.get("message", "").strip()
-    if not user_message:
-        events = [{"type": "error", "message": "Please provide a message.", "status_code": 400}]
-        return JSONResponse(content={"response": "Please provide a message.", "events": events}, status_code=400)
-
-    print(f"\n--- Received message: {user_message} ---")
-
-    try:
-        user_content = types.Content(role='user', parts=[types.Part(text=user_message)])
-        print(f"Created input content: {user_content}")
-    except Exception as e:
-        print(f"Error creating types.Content object: {e}")
-        events = [{"type": "error", "message": f"Error processing message input: {e}", "status_code": 500}]
-        return JSONResponse(content={"response": f"Error processing message input: {e}", "events": events}, status_code=500)
-
-    final_response = None
-    agent_name = "Shopping Assistant"
-    events = []
-    last_distinct_agent = None
-
-    try:
-        async for event in runner.run_async(user_id=USER_ID_FOR_SESSIONS, session_id=SESSION_ID, new_message=user_content):
-            current_agent = getattr(event, 'author', None)
-            print(f"Runner yielded event type: {getattr(event, 'type', 'N/A')}, Author: {current_agent}")
-
-            if current_agent and last_distinct_agent and current_agent != last_distinct_agent:
-                events.append({"type": "agent_transfer", "from": last_distinct_agent, "to": current_agent})
-
-            if current_agent:
-                last_distinct_agent = current_agent
-
-            if (hasattr(event, 'is_final_response') and event.is_final_response() and
-                hasattr(event, 'content') and event.content and
-                hasattr(event.content, 'parts') and event.content.parts
-               ):
-                if hasattr(event.content.parts[0], 'text') and event.content.parts[0].text:
-                    final_response = event.content.parts[0].text
-                    agent_name = current_agent or "Shopping Assistant"
-                    events.append({"type": "final_response", "text": final_response, "agent_name": agent_name})
-            elif hasattr(event, 'content') and event.content and hasattr(event.content, 'parts') and event.content.parts and hasattr(event.content.parts[0], 'text'):
-                # Capture intermediate messages as well, with the author
-                message_text = event.content.parts[0].text
-                message_author = current_agent or "System" # Default to System if no author
-                events.append({"type": "intermediate_message", "author": message_author, "text": message_text})
-
-    except Exception as e:
-        print(f"--- An error occurred during runner execution: {e} ---")
-        traceback.print_exc()
-        error_message = f"An internal server error occurred: {e}. Check server logs for details."
-        if "Missing key inputs argument" in str(e) or "api_key" in str(e).lower():
-            error_message = "Error: The AI model could not be accessed. Please ensure your Google API key is correctly set in the environment variable GOOGLE_API_KEY."
-        events.append({"type": "error", "message": error_message, "status_code": 500, "agent_name": agent_name})
-
-    # Construct and return the JSONResponse *after* the try-except block
-    if final_response:
-        try:
-            parsed_json = json.loads(final_response)
-            return JSONResponse(content={"response": parsed_json, "agent_name": agent_name, "events": events})
-        except (json.JSONDecodeError, TypeError):
-            return JSONResponse(content={"response": final_response, "agent_name": agent_name, "events": events})
-    else:
-        return JSONResponse(content={"response": "No final response received.", "agent_name": agent_name, "events": events}, status_code=500)
-# --- How to run ---
-# 1. Save the code as main.py
-# 2. Create the 'templates' folder with index.html, style.css, script.js
-# 3. Create products.json in the same directory as main.py
-# 4. Create/Update a .env file with your Google API key and SQLite database path:
-#    GOOGLE_API_KEY=YOUR_ACTUAL_GOOGLE_API_KEY
-#    SQLITE_DATABASE_PATH=./ecommerce.db
-# 5. Install necessary libraries: pip install fastapi uvicorn google-adk google-generativeai python-dotenv httpx aiosqlite
-# 6. Make sure your GOOGLE_API_KEY environment variable is correctly set via the .env file.
-#    When you run uvicorn, check the terminal output for the "DEBUG: GOOGLE_API_KEY loaded from environment:" line
-#    to confirm your key is being loaded.
-# 7. Run: uvicorn main:app --reload
\ No newline at end of file
+import asyncio
+import base64
+import contextvars
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+import datetime
+# from zoneinfo import ZoneInfo # Not needed for current tool logic
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+# google.adk, google.genai and LiteLLM take most of the import time of this module, so they are
+# imported where the agent tree is built (see "Agent tree and warm-up") instead of here
+if TYPE_CHECKING:
+    from google.adk.runners import Runner
+    from google.adk.tools.tool_context import ToolContext
+
+    from catalog_columns import ColumnarCatalog
+
+from dotenv import load_dotenv
+
+from catalog import Product, ProductCatalog, parse_products
+from catalog_store import compile_catalog, load_catalog_file
+import order_archive
+import order_store
+import product_store
+import sales_rollups
+from db_pool import SQLitePool
+from migrations import check_query_plans, get_schema_version, run_migrations
+from intent_router import route as route_intent
+from history_compaction import HistoryCompactor, PromptSizeMetrics
+from observability import (
+    AgentCallTracer,
+    configure_logging,
+    fields,
+    get_logger,
+    metrics,
+    observe_span,
+    record_agent_transfer,
+    span,
+    traced_tool,
+)
+from tool_cache import ToolResultCache
+from batch_loader import BatchLoader
+from shared_state import create_shared_state
+from admission import AdmissionRejected, ConcurrencyLimiter, RateLimiter, until_deadline
+from response_cache import SemanticResponseCache, is_cacheable_message
+
+# --- Load environment variables early ---
+load_dotenv() # <--- Load variables from .env
+
+# --- Logging (LOG_LEVEL=DEBUG for per-call tool/SQL/LLM spans, LOG_FORMAT=json for structured output) ---
+configure_logging()
+logger = get_logger("app")
+
+# --- API Configuration (for Google Generative AI) ---
+# Get Google API Key from environment variables
+
+API_KEY = os.getenv("LLM_API_KEY", " ")
+API_URL = os.getenv("LLM_API_BASE", " ")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+
+# Note: We are NOT calling genai.configure(api_key=...) here.
+# The SDK should pick up the GOOGLE_API_KEY environment variable automatically.
+
+
+# --- Data Storage (Global variables) ---
+# Product catalog loaded at startup (id index + search index); every tool reads from it.
+# Reloads build a new catalog and swap this reference, so in-flight calls keep a consistent view.
+catalog: ProductCatalog = ProductCatalog()
+
+# Maximum number of products returned by a single search
+SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", "20"))
+SEARCH_SORTS = ("relevance", "price_asc", "price_desc")
+# Keyword searches sorted by price order this many of the most relevant matches
+PRICE_SORT_CANDIDATES = int(os.getenv("PRICE_SORT_CANDIDATES", "500"))
+
+# Define the paths to your static data files
+PRODUCTS_FILE = "products.json"
+
+# Catalog store: "sqlite" (products.json imported into the products table + FTS5 index, see product_store.py),
+# "mmap" (compiled into CATALOG_FILE and memory-mapped, see catalog_store.py) or "json" (parsed into memory)
+CATALOG_STORE = os.getenv("CATALOG_STORE", "sqlite").lower()
+CATALOG_FILE = os.getenv("CATALOG_FILE", "products.cat")
+# How often products.json / CATALOG_FILE are checked for changes (0 disables the watcher)
+CATALOG_WATCH_INTERVAL_SECONDS = float(os.getenv("CATALOG_WATCH_INTERVAL_SECONDS", "5"))
+# Shared secret for the /admin endpoints, /orders/import and /analytics/sales (X-Admin-Token header); unset disables
+# them (403) and leaves the sales analytics agent out of the agent tree
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Result cache for the read-only tools (search_products, check_order_status)
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "2048"))
+TOOL_CACHE_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", "600"))
+ORDER_STATUS_CACHE_TTL_SECONDS = float(os.getenv("ORDER_STATUS_CACHE_TTL_SECONDS", "30"))
+tool_cache = ToolResultCache(max_entries=TOOL_CACHE_MAX_ENTRIES, ttl_seconds=TOOL_CACHE_TTL_SECONDS)
+
+# --- Multi-worker mode: state shared between uvicorn worker processes (see shared_state.py) ---
+# uvicorn takes its default worker count from WEB_CONCURRENCY; more than one worker needs the sqlite backend
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "sqlite" if WEB_CONCURRENCY > 1 else "memory").lower()
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "./shared_state.db")
+# How quickly invalidations published by other workers reach this worker's caches
+SHARED_STATE_POLL_INTERVAL_SECONDS = float(os.getenv("SHARED_STATE_POLL_INTERVAL_SECONDS", "0.25"))
+shared_state = create_shared_state(SHARED_STATE_BACKEND, SHARED_STATE_PATH)
+shared_state_task: Optional[asyncio.Task] = None
+
+
+async def invalidate_everywhere(*tags: str) -> None:
+    """Drops cached tool results for `tags` in this worker and, via shared_state, in every other worker."""
+    tool_cache.invalidate(*tags)
+    try:
+        await shared_state.publish(tags)
+    except Exception:
+        logger.exception("Error publishing cache invalidation", extra=fields(tags=list(tags)))
+
+
+async def _apply_shared_invalidations_periodically():
+    while True:
+        await asyncio.sleep(SHARED_STATE_POLL_INTERVAL_SECONDS)
+        try:
+            tags = await shared_state.poll()
+        except Exception:
+            logger.exception("Error polling shared cache invalidations")
+            continue
+        if tags:
+            tool_cache.invalidate(*set(tags))
+
+
+# Cache counters are copied into these gauges when /metrics is scraped
+CACHE_LOOKUPS = metrics.gauge("ecommerce_cache_lookups", "Cache lookups by cache and result.", ["cache", "result"])
+CACHE_ENTRIES = metrics.gauge("ecommerce_cache_entries", "Entries currently cached.", ["cache"])
+CATALOG_GENERATION = metrics.gauge("ecommerce_catalog_generation", "Generation of the loaded product catalog.")
+CATALOG_PRODUCTS = metrics.gauge("ecommerce_catalog_products", "Products in the loaded catalog.")
+CATALOG_RELOADS = metrics.counter("ecommerce_catalog_reloads_total", "Catalog reloads by outcome.", ["result"])
+
+
+def _order_cache_tag(order_id: str) -> str:
+    return f"order:{order_id}"
+
+
+def publish_catalog(new_catalog: ProductCatalog, source: str) -> ProductCatalog:
+    """Makes `new_catalog` the live catalog and drops the cached results it may have made stale."""
+    global catalog
+    catalog = new_catalog
+    # changed_ids is None when the whole catalog is new; an empty list means nothing changed
+    if new_catalog.changed_ids != []:
+        tool_cache.invalidate("catalog")
+        if response_cache is not None:
+            response_cache.clear()
+    CATALOG_GENERATION.set(value=new_catalog.generation)
+    CATALOG_PRODUCTS.set(value=len(new_catalog))
+    changed = "all" if new_catalog.changed_ids is None else len(new_catalog.changed_ids)
+    logger.info(f"Loaded {len(new_catalog)} products from {source} (generation {new_catalog.generation}, "
+                f"changed: {changed}, search index: {len(new_catalog.search_index.postings)} terms)")
+    return new_catalog
+
+
+def load_catalog(path: str = PRODUCTS_FILE) -> ProductCatalog:
+    """(Re)loads the product catalog straight from JSON (CATALOG_STORE=json, benchmarks)."""
+    product_data = []
+    try:
+        with open(path, "r") as f:
+            product_data = json.load(f)
+    except FileNotFoundError:
+        logger.error(f"{path} not found. Product search and ordering will not work correctly.")
+    except json.JSONDecodeError:
+        logger.error(f"Could not decode {path}. Check file format.")
+
+    return publish_catalog(ProductCatalog(product_data, generation=catalog.generation + 1, previous=catalog), path)
+
+
+# --- Catalog hot reload ---
+catalog_reload_lock = asyncio.Lock()
+catalog_watch_task: Optional[asyncio.Task] = None
+# (mtime_ns, size, inode) of each catalog source file as of the last reload
+_catalog_source_states: Dict[str, Optional[tuple]] = {}
+
+
+def _file_state(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _catalog_sources() -> List[str]:
+    return [PRODUCTS_FILE] if CATALOG_STORE in ("json", "sqlite") else [PRODUCTS_FILE, CATALOG_FILE]
+
+
+def _sql_catalog() -> bool:
+    """True when the tools read products from the SQLite products table."""
+    return CATALOG_STORE == "sqlite"
+
+
+# Generation / size of the products table as last seen by this worker (CATALOG_STORE=sqlite)
+sql_catalog_state: Dict[str, Any] = {"generation": None, "products": 0, "changed_products": None}
+
+
+def _sync_sql_catalog_state(state: Dict[str, Any]) -> None:
+    """
+    Records the products table's generation and size. When the generation moved (imported
+    by this or another worker, or offline) this worker's cached results are dropped.
+    """
+    if state["generation"] != sql_catalog_state["generation"]:
+        tool_cache.invalidate("catalog")
+        if response_cache is not None:
+            response_cache.clear()
+    sql_catalog_state.update(generation=state["generation"], products=state["products"])
+    CATALOG_GENERATION.set(value=state["generation"])
+    CATALOG_PRODUCTS.set(value=state["products"])
+
+
+def _read_products_file() -> List[Product]:
+    with open(PRODUCTS_FILE, "r") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{PRODUCTS_FILE} must contain a JSON list of products.")
+    return parse_products(data)
+
+
+async def _import_sql_catalog(products: Optional[List[Product]] = None) -> Dict[str, Any]:
+    """Imports products.json (or `products`) into the products table; only changed rows are written."""
+    if products is None:
+        products = await asyncio.to_thread(_read_products_file)
+    async with db_pool.writer() as db:
+        with span("sql", "products.import", rows=len(products)):
+            stats = await product_store.import_products(db, products)
+    changed = stats.pop("changed_ids")
+    _sync_sql_catalog_state(stats)
+    sql_catalog_state["changed_products"] = len(changed)
+    logger.info(f"Imported {PRODUCTS_FILE} into SQLite (generation {stats['generation']}, {stats['products']} products: "
+                f"{stats['inserted']} inserted, {stats['updated']} updated, {stats['deleted']} deleted)")
+    return {**stats, "changed_products": len(changed)}
+
+
+def _catalog_file_is_stale() -> bool:
+    source, compiled = _file_state(PRODUCTS_FILE), _file_state(CATALOG_FILE)
+    return source is not None and (compiled is None or source[0] > compiled[0])
+
+
+def _build_catalog(previous: ProductCatalog, compile_source: bool) -> ProductCatalog:
+    """Builds (without publishing) the catalog from the configured store; runs in a worker thread."""
+    if CATALOG_STORE == "json":
+        with open(PRODUCTS_FILE, "r") as f:
+            return ProductCatalog(json.load(f), generation=previous.generation + 1, previous=previous)
+    if compile_source or _catalog_file_is_stale():
+        compile_catalog(PRODUCTS_FILE, CATALOG_FILE)
+    return load_catalog_file(CATALOG_FILE, previous=previous)
+
+
+async def reload_catalog(compile_source: bool = False) -> Dict[str, Any]:
+    """
+    Rebuilds the catalog off the event loop and swaps it in. products.json is
+    (re)compiled into CATALOG_FILE first when it is newer or `compile_source` is set;
+    with CATALOG_STORE=sqlite it is re-imported into the products table instead.
+    On failure the current catalog stays live.
+    """
+    async with catalog_reload_lock:
+        states = {path: _file_state(path) for path in _catalog_sources()}
+        previous = catalog
+        started = time.perf_counter()
+        # Recorded up front so a broken file is retried only once it changes again
+        _catalog_source_states.update(states)
+        try:
+            if _sql_catalog():
+                stats = await _import_sql_catalog()
+                await refresh_catalog_columns()
+                CATALOG_RELOADS.inc("ok")
+                return {"status": "success", **stats, "seconds": round(time.perf_counter() - started, 3)}
+            new_catalog = await asyncio.to_thread(_build_catalog, previous, compile_source)
+        except Exception as e:
+            CATALOG_RELOADS.inc("error")
+            logger.exception("Error reloading the product catalog; keeping the current one")
+            generation = sql_catalog_state["generation"] if _sql_catalog() else previous.generation
+            return {"status": "error", "message": f"Catalog reload failed: {e}", "generation": generation}
+        publish_catalog(new_catalog, PRODUCTS_FILE if CATALOG_STORE == "json" else CATALOG_FILE)
+        await refresh_catalog_columns()
+        CATALOG_RELOADS.inc("ok")
+        return {
+            "status": "success",
+            "generation": new_catalog.generation,
+            "products": len(new_catalog),
+            "changed_products": None if new_catalog.changed_ids is None else len(new_catalog.changed_ids),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+
+async def _watch_catalog_files():
+    """
+    Reloads the catalog when products.json or the compiled catalog file changes on disk.
+    With CATALOG_STORE=sqlite it also notices imports done by other workers (generation change).
+    """
+    while True:
+        await asyncio.sleep(CATALOG_WATCH_INTERVAL_SECONDS)
+        if any(_file_state(path) != _catalog_source_states.get(path) for path in _catalog_sources()):
+            await reload_catalog()
+        elif _sql_catalog():
+            try:
+                async with db_pool.reader() as db:
+                    generation_moved = await product_store.catalog_generation(db) != sql_catalog_state["generation"]
+                    if generation_moved:
+                        _sync_sql_catalog_state(await product_store.catalog_state(db))
+                if generation_moved:
+                    # Imported by another worker (or offline): this worker's columnar view is stale
+                    await refresh_catalog_columns()
+            except Exception:
+                logger.exception("Error checking the catalog generation")
+
+
+# --- Columnar catalog view: category facets and price-sorted top-k (see catalog_columns.py) ---
+# Rebuilt after every catalog reload; NumPy is imported on the first build, not with this module
+catalog_columns: Optional["ColumnarCatalog"] = None
+CATALOG_COLUMNS_BUILD_SECONDS = metrics.gauge("ecommerce_catalog_columns_build_seconds", "Time spent building the columnar catalog view.")
+
+
+def current_catalog_columns() -> Optional["ColumnarCatalog"]:
+    """The columnar view if it was built from the live catalog generation, else None (callers use the catalog store)."""
+    columns = catalog_columns
+    generation = sql_catalog_state["generation"] if _sql_catalog() else catalog.generation
+    return columns if columns is not None and columns.generation == generation else None
+
+
+async def refresh_catalog_columns() -> None:
+    """Rebuilds the columnar view unless it already matches the live catalog; failures keep the old one."""
+    global catalog_columns
+    if current_catalog_columns() is not None:
+        return
+    started = time.perf_counter()
+    try:
+        from catalog_columns import ColumnarCatalog
+
+        if _sql_catalog():
+            generation = sql_catalog_state["generation"]
+            async with db_pool.reader() as db:
+                with span("sql", "products.columns"):
+                    rows = await product_store.price_category_rows(db)
+            columns = await asyncio.to_thread(ColumnarCatalog.from_rows, rows, generation)
+        else:
+            live = catalog
+            columns = await asyncio.to_thread(ColumnarCatalog.from_products, live.products, live.generation)
+    except Exception:
+        logger.exception("Error building the columnar catalog view")
+        return
+    catalog_columns = columns
+    CATALOG_COLUMNS_BUILD_SECONDS.set(value=time.perf_counter() - started)
+    logger.info(f"Columnar catalog view built: {len(columns)} products, {len(columns.category_names())} categories "
+                f"(generation {columns.generation}, {time.perf_counter() - started:.3f}s).")
+
+
+# --- Database Configuration (For SQLite) ---
+# Use the environment variable for the SQLite database file path
+SQLITE_DATABASE_PATH = os.getenv("SQLITE_DATABASE_PATH", "./ecommerce.db") # Default to ./ecommerce.db
+
+# Global variable to hold the database path
+db_file_path = SQLITE_DATABASE_PATH
+
+# Connection pool settings: one writer plus N readers, opened once at startup
+SQLITE_POOL_READERS = int(os.getenv("SQLITE_POOL_READERS", "4"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", str(64 * 1024)))
+# EXPLAIN checks of the recorded query plans at startup: "on_migrate" (only when this start applied migrations), "always" or "never"
+SQLITE_CHECK_QUERY_PLANS = os.getenv("SQLITE_CHECK_QUERY_PLANS", "on_migrate").lower()
+
+# --- Order archival: orders older than ORDER_ARCHIVE_AFTER_DAYS move to archive tables (see order_archive.py) ---
+ORDER_ARCHIVE_AFTER_DAYS = float(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "90"))  # 0 = never archive
+ORDER_ARCHIVE_PATH = os.getenv("ORDER_ARCHIVE_PATH", "")  # separate archive database; empty = archive tables in SQLITE_DATABASE_PATH
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", "1000"))
+ORDER_ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ORDER_ARCHIVE_INTERVAL_SECONDS", "3600"))
+ORDER_ARCHIVE_SCHEMA = order_archive.archive_schema(ORDER_ARCHIVE_PATH)
+order_archive_task: Optional[asyncio.Task] = None
+ORDERS_ARCHIVED = metrics.counter("ecommerce_orders_archived_total", "Orders moved from the hot tables to the archive tier.")
+
+
+async def archive_old_orders() -> int:
+    """Moves every order older than ORDER_ARCHIVE_AFTER_DAYS to the archive, one batch per writer lock."""
+    cutoff = order_archive.cutoff_for(ORDER_ARCHIVE_AFTER_DAYS)
+    moved = 0
+    while True:
+        async with db_pool.writer() as db:
+            with span("sql", "order_archive.batch"):
+                batch = await order_archive.archive_batch(db, ORDER_ARCHIVE_SCHEMA, cutoff, ORDER_ARCHIVE_BATCH_SIZE)
+        moved += batch
+        ORDERS_ARCHIVED.inc(amount=batch)
+        if batch < ORDER_ARCHIVE_BATCH_SIZE:
+            return moved
+        # Releasing the writer between batches lets live orders and cancellations in
+        await asyncio.sleep(0)
+
+
+async def _archive_old_orders_periodically():
+    while True:
+        try:
+            # With several workers, only the first to claim this interval runs the job
+            window = int(time.time() // ORDER_ARCHIVE_INTERVAL_SECONDS)
+            if await shared_state.incr(f"order_archive:{window}", 1, ttl=ORDER_ARCHIVE_INTERVAL_SECONDS * 2) == 1:
+                moved = await archive_old_orders()
+                if moved:
+                    logger.info("Archived old orders", extra=fields(orders=moved, older_than_days=ORDER_ARCHIVE_AFTER_DAYS))
+        except Exception:
+            logger.exception("Error archiving old orders")
+        await asyncio.sleep(ORDER_ARCHIVE_INTERVAL_SECONDS)
+
+# Global connection pool (created in startup_event, closed in shutdown_event)
+db_pool: SQLitePool = None
+
+
+# Define a Default User ID (Still needed for the orders table)
+DEFAULT_USER_ID = "Aryan Sharma"
+
+
+# --- LLM provider connection pool: every LiteLLM call to API_URL goes through one tuned client (see llm_http.py) ---
+LLM_HTTP_POOL_ENABLED = os.getenv("LLM_HTTP_POOL", "true").lower() in ("1", "true", "yes")
+LLM_HTTP_SETTINGS = {
+    "max_connections": int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+    "max_keepalive": int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+    "keepalive_expiry": float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", "60")),
+    "max_per_host": int(os.getenv("LLM_HTTP_MAX_PER_HOST", "32")),
+    "http2": os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes"),
+    "connect_timeout": float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT_SECONDS", "5")),
+    "timeout": float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "120")),
+    "verify": os.getenv("LLM_HTTP_VERIFY", "true").lower() in ("1", "true", "yes"),
+}
+LLM_HTTP_WARMUP_CONNECTIONS = int(os.getenv("LLM_HTTP_WARMUP_CONNECTIONS", "2"))
+# Created with the agent stack (importing httpx/LiteLLM is part of the deferred cold start)
+llm_http_pool = None
+
+
+# --- Simulated Tool Definitions (Using aiosqlite) ---
+
+# search_products - FTS5 query over the products table, or the in-memory inverted index (CATALOG_STORE=mmap|json)
+@traced_tool
+async def search_products(
+    query: str,
+    limit: int = SEARCH_RESULT_LIMIT,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort_by: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Searches the product catalog, ranking matches by relevance.
+    Optionally restricts results to a category and/or a price range, and sorts them
+    by price with sort_by="price_asc" (cheapest first) or "price_desc".
+    Returns a list of products or a not found message.
+    """
+    logger.debug("search_products called", extra=fields(query=query, limit=limit, category=category, min_price=min_price, max_price=max_price, sort_by=sort_by))
+    sort_by = (sort_by or "relevance").strip().lower()
+    if sort_by not in SEARCH_SORTS:
+        return {"status": "error", "message": f"Unknown sort_by '{sort_by}'; use one of: {', '.join(SEARCH_SORTS)}."}
+
+    # Results only change when the catalog is reloaded (which clears the cache)
+    cache_key = (
+        "search_products",
+        " ".join(query.lower().split()),
+        limit,
+        (category or "").strip().lower() or None,
+        None if min_price is None else float(min_price),
+        None if max_price is None else float(max_price),
+        sort_by,
+    )
+    return await tool_cache.get_or_compute(
+        cache_key,
+        lambda: _search_products(query, limit, category, min_price, max_price, sort_by),
+        tags=("catalog",),
+    )
+
+
+async def _search_products(
+    query: str,
+    limit: int,
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    sort_by: str = "relevance",
+) -> Dict[str, Any]:
+    query_lower = query.lower()
+    keywords = query_lower.split()
+    by_price = sort_by in ("price_asc", "price_desc")
+
+    if not keywords and not category and not by_price:
+        return {"status": "not_found", "message": "Please provide keywords."}
+
+    catalog_size = sql_catalog_state["products"] if _sql_catalog() else len(catalog.search_index)
+    if not catalog_size:
+        return {"status": "error", "message": "Product catalog is empty."}
+
+    if "what" in query_lower and "categories" in query_lower:
+        category_list = await _catalog_categories()
+        if category_list:
+            report_message = f"Available product categories are: {', '.join(category_list)}."
+            result = {"status": "report", "report": report_message}
+            columns = current_catalog_columns()
+            if columns is not None:
+                # Precomputed per-category product counts and price ranges
+                result["categories"] = columns.facets()
+        else:
+            result = {"status": "not_found", "message": "No product categories found."}
+        logger.debug("search_products result", extra=fields(status=result["status"]))
+        return result
+    elif "total" in query_lower and "product" in query_lower and "count" in query_lower:
+        total_count = catalog_size
+        report_message = f"There are currently {total_count} products in our catalog."
+        result = {"status": "report", "report": report_message}
+        logger.debug("search_products result", extra=fields(status=result["status"]))
+        return result
+
+    search_query = query
+    categories = [category] if category else None
+    if "computer" in query_lower and "accessories" in query_lower:
+        # Computer accessories are peripherals from the electronics / office categories
+        search_query = "mouse keyboard speaker headphone"
+        categories = categories or ["Electronics", "Home & Office"]
+
+    if by_price:
+        found_products, total_matches = await _catalog_search_by_price(
+            search_query,
+            limit=limit,
+            categories=categories,
+            min_price=min_price,
+            max_price=max_price,
+            descending=sort_by == "price_desc",
+        )
+    else:
+        found_products, total_matches = await _catalog_search(
+            search_query,
+            limit=limit,
+            categories=categories,
+            min_price=min_price,
+            max_price=max_price,
+        )
+
+    if found_products:
+        results_list = []
+        for product in found_products:
+            price = product.price if product.price is not None else 0.0
+            results_list.append(f"{product.name} (ID: {product.id}, Price: ${price:.2f})")
+        report_message = f"I found {total_matches} product(s) matching '{query or category or 'your filters'}'"
+        if total_matches > len(found_products):
+            report_message += f" (showing the top {len(found_products)})"
+        if by_price:
+            report_message += ", cheapest first" if sort_by == "price_asc" else ", most expensive first"
+        report_message += ": " + "; ".join(results_list) + "."
+        result = {"status": "report", "report": report_message}
+        logger.debug("search_products result", extra=fields(status=result["status"]))
+        return result
+    else:
+        result = {"status": "not_found", "message": f"Sorry, no products found matching '{query}'."}
+        logger.debug("search_products result", extra=fields(status=result["status"]))
+        return result
+
+
+
+
+async def _catalog_categories() -> List[str]:
+    columns = current_catalog_columns()
+    if columns is not None:
+        return columns.category_names()
+    if not _sql_catalog():
+        return catalog.search_index.categories()
+    async with db_pool.reader() as db:
+        with span("sql", "products.categories"):
+            return await product_store.categories(db)
+
+
+async def _catalog_search(query: str, **filters):
+    if not _sql_catalog():
+        return catalog.search_index.search(query, **filters)
+    async with db_pool.reader() as db:
+        with span("sql", "products.search"):
+            return await product_store.search(db, query, **filters)
+
+
+async def _catalog_search_by_price(query: str, limit: int, descending: bool = False, **filters):
+    """
+    (matches ordered by price, total matches). A query that is empty or just names a
+    category browses that category with the columnar view's top-k selection; other
+    keyword queries order their PRICE_SORT_CANDIDATES most relevant matches by price.
+    """
+    columns = current_catalog_columns()
+    terms = " ".join(query.split())
+    if columns is not None and (not terms or columns.category_code(terms) is not None):
+        categories = filters.pop("categories", None) or ([terms] if terms else None)
+        keys, total = columns.top_k_by_price(limit, descending, categories, **filters)
+        return await _products_at(keys.tolist()), total
+
+    found, total = await _catalog_search(query, limit=max(limit, PRICE_SORT_CANDIDATES), **filters)
+    # Products without a price go last either way
+    priced = sorted(found, key=lambda p: (p.price is None, -(p.price or 0.0) if descending else (p.price or 0.0)))
+    return priced[:limit], total
+
+
+async def _products_at(keys: List[int]) -> List[Product]:
+    """Products for columnar view keys, in order: rowids with CATALOG_STORE=sqlite, catalog positions otherwise."""
+    if not _sql_catalog():
+        return [catalog.products[key] for key in keys]
+    async with db_pool.reader() as db:
+        with span("sql", "products.by_rowid", rows=len(keys)):
+            return await product_store.get_products_by_rowid(db, keys)
+
+
+async def _lookup_products(product_ids: List[str]) -> Dict[str, Product]:
+    """product ID -> Product for the IDs in the catalog (one indexed query with CATALOG_STORE=sqlite)."""
+    if not _sql_catalog():
+        return {pid: product for pid in product_ids if (product := catalog.get(pid)) is not None}
+    async with db_pool.reader() as db:
+        with span("sql", "products.lookup", rows=len(product_ids)):
+            return await product_store.get_products(db, product_ids)
+
+
+# check_order_status - UPDATED to retrieve stored total_price
+@traced_tool
+async def check_order_status(order_id: str) -> Dict[str, Any]: # Changed return type hint to Any as it can return error/not_found too
+    """
+    Checks the status of an order in the SQLite database, including item prices and the stored total.
+    """
+    logger.debug("check_order_status called", extra=fields(order_id=order_id))
+    return await _cached_order_status(order_id.strip())
+
+
+MAX_ORDER_STATUS_BATCH = int(os.getenv("MAX_ORDER_STATUS_BATCH", "20"))  # order IDs per check_order_statuses call
+
+
+@traced_tool
+async def check_order_statuses(order_ids: List[str]) -> Dict[str, Any]:
+    """
+    Checks the status of several orders at once (one database query for all of them),
+    including item prices and the stored totals.
+    """
+    logger.debug("check_order_statuses called", extra=fields(order_ids=order_ids))
+    order_ids = list(dict.fromkeys(order_id.strip() for order_id in order_ids if order_id and order_id.strip()))
+    if not order_ids:
+        return {"status": "error", "message": "No order IDs were given."}
+    if len(order_ids) > MAX_ORDER_STATUS_BATCH:
+        return {"status": "error", "message": f"Please ask about at most {MAX_ORDER_STATUS_BATCH} orders at a time."}
+
+    # Every lookup starts in this event-loop turn, so the cache misses share one query (see order_status_loader)
+    results = await asyncio.gather(*(_cached_order_status(order_id) for order_id in order_ids))
+    orders = [{"order_id": order_id, **result} for order_id, result in zip(order_ids, results)]
+    if all(result["status"] == "error" for result in results):
+        return {"status": "error", "message": results[0]["message"], "orders": orders}
+    return {
+        "status": "report",
+        "report": "\n\n".join(result.get("report") or result.get("message", "") for result in results),
+        "orders": orders,
+        "not_found": [order["order_id"] for order in orders if order["status"] == "not_found"],
+    }
+
+
+async def _cached_order_status(order_id: str) -> Dict[str, Any]:
+    # Entries are dropped by place_order / import_orders / remove_order for the same ID;
+    # the shorter TTL bounds staleness for status changes made outside this app
+    return await tool_cache.get_or_compute(
+        ("check_order_status", order_id),
+        lambda: _check_order_status(order_id),
+        tags=(_order_cache_tag(order_id), "catalog"),
+        ttl=ORDER_STATUS_CACHE_TTL_SECONDS,
+    )
+
+
+# Orders and their items, including prices from order_items and the stored total_price; product
+# names come from the products table. Formatted with the hot or the archive table names.
+ORDER_STATUS_SQL = """
+    SELECT
+        o.order_id, o.status, o.created_at, o.details, o.total_price,
+        oi.product_id, oi.quantity, oi.price, p.name AS product_name
+    FROM {orders} o
+    LEFT JOIN {order_items} oi ON o.order_id = oi.order_id
+    LEFT JOIN products p ON p.product_id = oi.product_id
+    WHERE o.order_id IN ({placeholders})
+    """
+
+
+async def _select_order_rows(order_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """order ID -> its order/item rows, for the IDs that exist (recent orders first, then the archive tier)."""
+    found: Dict[str, List[Dict[str, Any]]] = {}
+    tables = [("orders", "order_items", "check_order_status.select_orders")]
+    if ORDER_ARCHIVE_AFTER_DAYS > 0:
+        # Older orders have been moved to the archive tier (see order_archive.py)
+        tables.append((f"{ORDER_ARCHIVE_SCHEMA}.orders_archive", f"{ORDER_ARCHIVE_SCHEMA}.order_items_archive",
+                       "check_order_status.select_archived_orders"))
+    async with db_pool.reader() as db:
+        for orders, order_items, span_name in tables:
+            missing = [order_id for order_id in order_ids if order_id not in found]
+            if not missing:
+                break
+            placeholders = ", ".join("?" for _ in missing)
+            with span("sql", span_name, rows=len(missing)):
+                cursor = await db.execute(
+                    ORDER_STATUS_SQL.format(orders=orders, order_items=order_items, placeholders=placeholders), missing
+                )
+                for row in await cursor.fetchall():
+                    found.setdefault(row["order_id"], []).append(dict(row))
+                await cursor.close()
+    return found
+
+
+# Concurrent check_order_status lookups (parallel tool calls, check_order_statuses) are answered by one query
+order_status_loader = BatchLoader(_select_order_rows, max_batch_size=order_store.LOOKUP_BATCH_SIZE)
+
+
+def _order_status_report(order_id: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Process results
+    order_data = results[0]
+    status = order_data.get('status', 'Unknown')
+    created_at = order_data.get('created_at', 'N/A')
+    details = order_data.get('details', 'No additional details available.')
+    stored_total_price = order_data.get('total_price', 0.0) # Retrieve stored total
+
+    item_details_list = []
+    # Check if the order had items (at least one row with a product_id that is not NULL)
+    # The LEFT JOIN will return one row with NULLs for oi columns if order exists but has no items
+    if order_data and order_data['product_id'] is not None: # Ensure product_id is not None from LEFT JOIN
+         for row in results:
+              item_product_id = row.get('product_id')
+              item_quantity = row.get('quantity', 0) # Default quantity to 0 for calculation safety
+              item_price = row.get('price', 0.0)    # Default price to 0.0 for calculation safety
+
+              # Product name from the JOIN; the in-memory catalog covers CATALOG_STORE=mmap|json
+              product_name = row.get('product_name') or catalog.name_for(item_product_id)
+
+              item_cost = item_quantity * item_price
+
+              # Include item-level price and calculated cost
+              item_details_list.append(f"- {item_quantity} x {product_name} @ ${item_price:.2f} each (${item_cost:.2f})")
+
+    items_summary = "\n".join(item_details_list) if item_details_list else "No items listed."
+
+    report_message = (
+        f"Details for order {order_id} (Placed On: {created_at}):\n"
+        f"Status: {status}\n"
+        f"Items:\n{items_summary}\n"
+        f"Total Amount: ${stored_total_price:.2f}\n" # Use the stored total
+        f"More Info: {details}"
+    )
+
+    return {
+        "status": "report",
+        "report": report_message,
+    }
+
+
+async def _check_order_status(order_id: str) -> Dict[str, Any]:
+    if db_pool is None or not db_pool.is_open:
+         logger.error("Database pool is not initialized.")
+         return {
+             "status": "error",
+             "message": "Database is not configured. Cannot check order status.",
+         }
+
+    try:
+        results = await order_status_loader.load(order_id)
+        if not results:
+            logger.info("Order not found", extra=fields(order_id=order_id))
+            return {
+                "status": "not_found",
+                "message": f"Order with ID {order_id} not found.",
+            }
+        return _order_status_report(order_id, results)
+
+    except Exception as e:
+        logger.exception("Error checking order status", extra=fields(order_id=order_id))
+        return {
+            "status": "error",
+            "message": f"An error occurred while checking status for order '{order_id}': {e}",
+        }
+
+# SQL shared by place_order and the bulk order import
+ORDER_INSERT_SQL = """
+    INSERT INTO orders (order_id, user_id, status, created_at, details, total_price)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """
+ORDER_ITEM_INSERT_SQL = """
+    INSERT INTO order_items (order_id, product_id, quantity, price)
+    VALUES (?, ?, ?, ?)
+    """
+
+# Orders written per transaction by import_orders (keeps the writer lock short for live orders)
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "500"))
+# Statuses an imported order may carry (place_order always starts at "Processing")
+ORDER_STATUSES = ("Processing", "Shipped", "Delivered", "Cancelled")
+
+
+def _price_order_items(items: List[Dict[str, int]], products: Dict[str, Product]):
+    """
+    Validates order line items against the catalog products in `products` (see _lookup_products)
+    and prices them. Returns (priced items, total cost, None) or (None, None, error response).
+    """
+    order_items_details = []
+    order_total_cost = 0.0
+    failed_product_ids = []
+
+    if not items:
+        return None, None, {"status": "error", "message": "An order must contain at least one item."}
+
+    for item in items:
+        product_id = item.get("product_id")
+        quantity = item.get("quantity", 1)
+
+        if not product_id:
+            logger.info("Order item rejected: product_id is missing")
+            return None, None, {"status": "error", "message": "Invalid order item: product ID is missing."}
+
+        product = products.get(product_id)
+        if not product:
+            logger.info("Order item rejected: product not in catalog", extra=fields(product_id=product_id))
+            failed_product_ids.append(product_id)
+            continue  # Process other items to report all missing products
+
+        product_price = product.price
+        if product_price is None or product_price < 0:
+            logger.warning("Order item rejected: invalid or missing price", extra=fields(product_id=product_id, price=product_price))
+            return None, None, {"status": "error", "message": f"Product '{product_id}' has an invalid price. Cannot place order."}
+
+        if not isinstance(quantity, int) or quantity <= 0:
+            logger.info("Order item rejected: invalid quantity", extra=fields(product_id=product_id, quantity=quantity))
+            return None, None, {"status": "error", "message": f"Invalid quantity for product '{product_id}'. Please specify a valid positive number."}
+
+        item_cost = quantity * product_price
+        order_total_cost += item_cost
+        order_items_details.append({"product_id": product_id, "quantity": quantity, "price": product_price, "name": product.name})
+
+    if failed_product_ids:
+        return None, None, {
+            "status": "error",
+            "message": f"The following product IDs were not found in the catalog: {', '.join(failed_product_ids)}.",
+        }
+
+    return order_items_details, order_total_cost, None
+
+
+async def _insert_orders(db, orders: List[Dict[str, Any]]) -> None:
+    """
+    Inserts orders and all of their line items inside the caller's transaction,
+    using one executemany per table instead of one round trip per row, and adds
+    them to the sales rollups (see sales_rollups.py) in the same transaction.
+    Each order dict holds the `orders` columns plus an 'items' list of priced items.
+    """
+    order_rows = [
+        (o["order_id"], o["user_id"], o["status"], o["created_at"], o["details"], o["total_price"])
+        for o in orders
+    ]
+    item_rows = [
+        (o["order_id"], item["product_id"], item["quantity"], item["price"])
+        for o in orders
+        for item in o["items"]
+    ]
+    with span("sql", "orders.insert", rows=len(order_rows)):
+        await db.executemany(ORDER_INSERT_SQL, order_rows)
+    with span("sql", "order_items.insert", rows=len(item_rows)):
+        await db.executemany(ORDER_ITEM_INSERT_SQL, item_rows)
+    with span("sql", "sales_rollups.record_orders", rows=len(order_rows)):
+        await sales_rollups.record_orders(db, orders)
+
+
+async def _write_orders(db, orders: List[Dict[str, Any]]) -> None:
+    """Writes orders and their line items (see _insert_orders) in a single BEGIN IMMEDIATE transaction."""
+    # Take the write lock up front so the transaction cannot fail half-way with SQLITE_BUSY
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        await _insert_orders(db, orders)
+        with span("sql", "commit"):
+            await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+
+# --- Idempotent ordering and stock reservation (see order_store.py) ---
+IDEMPOTENCY_HEADER_NAME = "Idempotency-Key"
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+# Idempotency-Key of the chat request being served (scoped to the user), read by the place_order tool
+request_idempotency_key: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_idempotency_key", default=None)
+_idempotency_keys_pruned_at = 0.0
+
+
+def _scoped_idempotency_key(user_id: str, key: Optional[str]) -> Optional[str]:
+    key = (key or "").strip()
+    return f"{user_id}:{key[:255]}" if key else None
+
+
+def _out_of_stock_message(shortages: List[Dict[str, Any]], products: Dict[str, Product]) -> str:
+    parts = []
+    for shortage in shortages:
+        product = products.get(shortage["product_id"])
+        name = product.name if product else shortage["product_id"]
+        if shortage["available"]:
+            parts.append(f"only {shortage['available']} x {name} left (you asked for {shortage['requested']})")
+        else:
+            parts.append(f"{name} is out of stock")
+    return "Sorry, we cannot place this order: " + "; ".join(parts) + "."
+
+
+async def _place_order(items: List[Dict[str, int]], idempotency_key: Optional[str] = None, key_per_items: bool = False) -> Dict[str, Any]:
+    """
+    Validates, prices and writes one order. The idempotency key check, the stock
+    reservation and the order insert share one BEGIN IMMEDIATE transaction, so
+    concurrent orders (in any worker) can neither oversell nor create duplicates.
+    A repeated key returns the first response with "idempotent_replay": True; a key
+    reused for different items is rejected with error_code "idempotency_key_reused",
+    unless key_per_items is set (then each distinct set of items gets its own order).
+    """
+    global _idempotency_keys_pruned_at
+    if db_pool is None or not db_pool.is_open:
+        logger.error("Database pool is not initialized.")
+        return {
+            "status": "error",
+            "message": "Database is not configured. Cannot place order.",
+        }
+
+    # 1. Validate product existence and quantities for all items
+    products = await _lookup_products([item.get("product_id") for item in items or () if item.get("product_id")])
+    order_items_details, order_total_cost, error = _price_order_items(items, products)
+    if error:
+        return error
+    request_hash = order_store.request_fingerprint(order_items_details)
+    if idempotency_key and key_per_items:
+        idempotency_key = f"{idempotency_key}:{request_hash}"
+
+    try:
+        # 2. Generate unique order ID
+        new_order_id = str(uuid.uuid4())
+        order_details_str = ", ".join([f"{item['quantity']} x {item['name']} @ ${item['price']:.2f}" for item in order_items_details])
+        order = {
+            "order_id": new_order_id,
+            "user_id": DEFAULT_USER_ID,
+            "status": "Processing",
+            "created_at": datetime.datetime.now().isoformat(),
+            "details": f"Order placed via AI assistant for: {order_details_str}",
+            "total_price": order_total_cost,
+            "items": order_items_details,
+        }
+        ordered_items_summary = ", ".join([f"{item['quantity']} x {item['name']}" for item in order_items_details])
+        response = {
+            "status": "success",
+            "order_id": new_order_id,
+            "message": f"Your order for {ordered_items_summary} has been placed successfully! Total cost: ${order_total_cost:.2f}. Your order ID is {new_order_id}.",
+        }
+
+        # 3. Check the idempotency key, reserve stock and insert the order and its items in one transaction
+        async with db_pool.writer() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                if idempotency_key:
+                    with span("sql", "place_order.idempotency_key"):
+                        previous = await order_store.find_idempotent_response(db, idempotency_key, IDEMPOTENCY_KEY_TTL_SECONDS)
+                    if previous is not None:
+                        await db.rollback()
+                        if previous["request_hash"] != request_hash:
+                            logger.info("Idempotency key reused for a different order", extra=fields(order_id=previous["order_id"]))
+                            return {
+                                "status": "error",
+                                "error_code": "idempotency_key_reused",
+                                "message": "This request ID was already used for a different order. Please start a new request.",
+                            }
+                        logger.info("Idempotent order replay", extra=fields(order_id=previous["order_id"]))
+                        return {**previous["response"], "idempotent_replay": True}
+                with span("sql", "place_order.reserve_stock", items=len(order_items_details)):
+                    await order_store.reserve_stock(db, new_order_id, order_items_details)
+                await _insert_orders(db, [order])
+                if idempotency_key:
+                    await order_store.record_idempotent_response(db, idempotency_key, request_hash, new_order_id, response)
+                    if time.monotonic() - _idempotency_keys_pruned_at > 3600:
+                        _idempotency_keys_pruned_at = time.monotonic()
+                        with span("sql", "place_order.prune_idempotency_keys"):
+                            await order_store.prune_idempotency_keys(db, IDEMPOTENCY_KEY_TTL_SECONDS)
+                with span("sql", "commit"):
+                    await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+        await invalidate_everywhere(_order_cache_tag(new_order_id))
+
+        logger.info("Order placed", extra=fields(order_id=new_order_id, total_price=round(order_total_cost, 2)))
+
+        # 4. Return success response
+        return response
+
+    except order_store.InsufficientStock as e:
+        logger.info("Order rejected: insufficient stock", extra=fields(shortages=e.shortages))
+        return {
+            "status": "error",
+            "error_code": "insufficient_stock",
+            "message": _out_of_stock_message(e.shortages, products),
+            "shortages": e.shortages,
+        }
+    except Exception as e:
+        logger.exception("Error placing order", extra=fields(items=items))
+        return {
+            "status": "error",
+            "error_code": "internal_error",
+            "message": f"An error occurred while placing your order: {e}",
+        }
+
+
+@traced_tool
+async def place_order(items: List[Dict[str, int]], tool_context: Optional["ToolContext"] = None) -> Dict[str, Any]:
+    """
+    Places an order for one or more products by adding them to the SQLite database.
+    Expects a list of dictionaries, where each dictionary contains 'product_id' and 'quantity'.
+    """
+    logger.debug("place_order called", extra=fields(items=items))
+    # Same items under the same key -> same order: the chat request's Idempotency-Key covers client
+    # retries, and without one the ADK invocation ID covers the model calling the tool again in one turn
+    key = request_idempotency_key.get()
+    if key is None and tool_context is not None:
+        key = f"invocation:{tool_context.invocation_id}"
+    return await _place_order(items, idempotency_key=key, key_per_items=True)
+
+
+@traced_tool
+async def import_orders(orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Bulk-imports orders (e.g. large B2B carts or replays from another system).
+    Each order needs an 'items' list like place_order; 'order_id', 'user_id', 'status'
+    (one of ORDER_STATUSES), 'created_at' and 'details' are optional. Orders are written in batches of
+    BULK_IMPORT_BATCH_SIZE per transaction; order IDs that already exist are skipped.
+    """
+    logger.info("import_orders called", extra=fields(orders=len(orders)))
+    if db_pool is None or not db_pool.is_open:
+        logger.error("Database pool is not initialized.")
+        return {
+            "status": "error",
+            "message": "Database is not configured. Cannot import orders.",
+        }
+
+    # One batched lookup for every product referenced by the import
+    products = await _lookup_products([
+        item.get("product_id")
+        for raw_order in orders if isinstance(raw_order, dict)
+        for item in raw_order.get("items") or () if isinstance(item, dict) and item.get("product_id")
+    ])
+
+    prepared = []
+    rejected = []
+    seen_ids = set()
+    for index, raw_order in enumerate(orders):
+        if not isinstance(raw_order, dict):
+            rejected.append({"index": index, "message": "Order must be an object."})
+            continue
+        status = raw_order.get("status") or "Processing"
+        if status not in ORDER_STATUSES:
+            rejected.append({"index": index, "message": f"Unknown status '{status}'; use one of: {', '.join(ORDER_STATUSES)}."})
+            continue
+        order_items_details, order_total_cost, error = _price_order_items(raw_order.get("items") or [], products)
+        if error:
+            rejected.append({"index": index, "message": error["message"]})
+            continue
+        order_id = str(raw_order.get("order_id") or uuid.uuid4())
+        if order_id in seen_ids:
+            rejected.append({"index": index, "message": f"Duplicate order ID '{order_id}' in request."})
+            continue
+        seen_ids.add(order_id)
+        order_details_str = ", ".join([f"{item['quantity']} x {item['name']} @ ${item['price']:.2f}" for item in order_items_details])
+        prepared.append({
+            "order_id": order_id,
+            "user_id": raw_order.get("user_id") or DEFAULT_USER_ID,
+            "status": status,
+            "created_at": raw_order.get("created_at") or datetime.datetime.now().isoformat(),
+            "details": raw_order.get("details") or f"Order imported for: {order_details_str}",
+            "total_price": order_total_cost,
+            "items": order_items_details,
+        })
+
+    imported = 0
+    skipped_existing = []
+    try:
+        for start in range(0, len(prepared), BULK_IMPORT_BATCH_SIZE):
+            batch = prepared[start:start + BULK_IMPORT_BATCH_SIZE]
+            async with db_pool.writer() as db:
+                # Skip orders that were already imported (makes replays safe)
+                placeholders = ", ".join("?" for _ in batch)
+                with span("sql", "import_orders.select_existing", rows=len(batch)):
+                    cursor = await db.execute(
+                        f"SELECT order_id FROM orders WHERE order_id IN ({placeholders})",
+                        [o["order_id"] for o in batch],
+                    )
+                    existing = {row[0] for row in await cursor.fetchall()}
+                    await cursor.close()
+                new_orders = [o for o in batch if o["order_id"] not in existing]
+                skipped_existing.extend(o["order_id"] for o in batch if o["order_id"] in existing)
+                if new_orders:
+                    await _write_orders(db, new_orders)
+                    await invalidate_everywhere(*(_order_cache_tag(o["order_id"]) for o in new_orders))
+                imported += len(new_orders)
+    except Exception as e:
+        logger.exception("Error importing orders", extra=fields(imported=imported))
+        return {
+            "status": "error",
+            "message": f"An error occurred while importing orders after {imported} were written: {e}",
+            "imported": imported,
+            "rejected": rejected,
+        }
+
+    logger.info("Orders imported", extra=fields(imported=imported, skipped_existing=len(skipped_existing), rejected=len(rejected)))
+    return {
+        "status": "success",
+        "imported": imported,
+        "skipped_existing": skipped_existing,
+        "rejected": rejected,
+    }
+
+CANCEL_ORDER_SQL = "UPDATE orders SET status = 'Cancelled', cancelled_at = ? WHERE order_id = ? AND status != 'Cancelled'"
+ORDER_PREVIOUS_STATUS_SQL = "SELECT status, created_at, total_price FROM orders WHERE order_id = ?"
+
+
+# remove_order tool implementation (called by order_cancellation_agent)
+@traced_tool
+async def remove_order(order_id: str) -> Dict[str, Any]:
+    """
+    Cancels an order by order ID: its status becomes 'Cancelled' and any reserved stock is
+    returned to inventory. The order stays in the order history.
+    """
+    logger.debug("remove_order called", extra=fields(order_id=order_id))
+
+    if db_pool is None or not db_pool.is_open:
+         logger.error("Database pool is not initialized.")
+         return {
+             "status": "error",
+             "message": "Database is not configured. Cannot remove order.",
+         }
+
+    try:
+        async with db_pool.writer() as db:
+            # The write lock is taken before the status is read, so a concurrent cancellation of the
+            # same order (e.g. in another worker) can neither release its stock nor count it twice
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                # The previous status and the order's day / total are what the sales rollups move
+                with span("sql", "remove_order.status"):
+                    cursor = await db.execute(ORDER_PREVIOUS_STATUS_SQL, (order_id,))
+                    order = await cursor.fetchone()
+                    await cursor.close()
+
+                if order is None or order[0] == sales_rollups.CANCELLED:
+                    archived = False
+                    if order is None and ORDER_ARCHIVE_AFTER_DAYS > 0:
+                        # Rare path: tell an archived order apart from an unknown one
+                        with span("sql", "remove_order.archived"):
+                            cursor = await db.execute(f"SELECT 1 FROM {ORDER_ARCHIVE_SCHEMA}.orders_archive WHERE order_id = ?", (order_id,))
+                            archived = await cursor.fetchone() is not None
+                            await cursor.close()
+                    await db.rollback()
+                    if archived:
+                        logger.info("Order is archived, not cancelling", extra=fields(order_id=order_id))
+                        return {
+                            "status": "error",
+                            "error_code": "order_archived",
+                            "message": f"Order {order_id} is more than {ORDER_ARCHIVE_AFTER_DAYS:g} days old and can no longer be cancelled.",
+                        }
+                    if order is None:
+                        logger.info("Order not found", extra=fields(order_id=order_id))
+                        return {
+                            "status": "not_found",
+                            "message": f"Order with ID {order_id} not found. Cannot remove.",
+                        }
+                    return {
+                        "status": "success",
+                        "order_id": order_id,
+                        "already_cancelled": True,
+                        "message": f"Order {order_id} was already cancelled.",
+                    }
+
+                # Cancelled in place (the order and its items are kept; order_archive moves them out later)
+                with span("sql", "remove_order.cancel"):
+                    await db.execute(CANCEL_ORDER_SQL, (datetime.datetime.now().isoformat(), order_id))
+                with span("sql", "remove_order.sales_rollups"):
+                    await sales_rollups.record_cancellation(db, order_id, order[0], order[1], order[2])
+
+                # Give the units this order reserved back to inventory
+                with span("sql", "remove_order.release_stock"):
+                    released = await order_store.release_stock(db, order_id)
+
+                with span("sql", "commit"):
+                    await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+            await invalidate_everywhere(_order_cache_tag(order_id))
+
+            logger.info("Order cancelled", extra=fields(order_id=order_id, units_restocked=sum(released.values())))
+
+            return {
+                "status": "success",
+                "order_id": order_id,
+                "message": f"Order {order_id} has been cancelled.",
+            }
+
+    except Exception as e:
+        logger.exception("Error removing order", extra=fields(order_id=order_id))
+        return {
+            "status": "error",
+            "message": f"An error occurred while removing order '{order_id}': {e}",
+        }
+
+# --- Order history: keyset pagination on (created_at, order_id) ---
+# Default / maximum number of orders returned per page of order history
+ORDER_PAGE_SIZE = int(os.getenv("ORDER_PAGE_SIZE", "20"))
+MAX_ORDER_PAGE_SIZE = int(os.getenv("MAX_ORDER_PAGE_SIZE", "500"))
+
+
+def _encode_order_cursor(created_at: str, order_id: str) -> str:
+    """Opaque page cursor pointing just after the given (created_at, order_id) row."""
+    raw = json.dumps([created_at, order_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_order_cursor(cursor: str):
+    created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return created_at, order_id
+
+
+async def fetch_orders_page(page_size: int, after=None, user_id: Optional[str] = None, table: str = "orders") -> List[Dict[str, Any]]:
+    """
+    Fetches up to `page_size` orders, most recent first, strictly after the
+    (created_at, order_id) keyset position `after`. Uses the covering
+    created_at / user_id indexes, so each page costs O(page_size) however deep it is.
+    `table` is "orders" (recent orders) or the archive tier's orders table.
+    """
+    conditions = []
+    params: List[Any] = []
+    if user_id is not None:
+        conditions.append("user_id = ?")
+        params.append(user_id)
+    if after is not None:
+        conditions.append("(created_at, order_id) < (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT order_id, status, created_at, total_price
+        FROM {table}
+        {where}
+        ORDER BY created_at DESC, order_id DESC
+        LIMIT ?
+        """
+    params.append(page_size)
+    async with db_pool.reader() as db:
+        with span("sql", ("orders.page_by_user" if user_id else "orders.page") + ("" if table == "orders" else ".archive")):
+            cursor = await db.execute(sql, params)
+            rows = await cursor.fetchall()
+            await cursor.close()
+    return [dict(row) for row in rows]
+
+
+def _order_history_tables(include_archive: bool) -> List[str]:
+    """
+    The order tables, recent first. Archiving moves the oldest orders out, so the archive
+    tier continues the (created_at, order_id) keyset order where `orders` ends.
+    """
+    tables = ["orders"]
+    if include_archive and ORDER_ARCHIVE_AFTER_DAYS > 0:
+        tables.append(f"{ORDER_ARCHIVE_SCHEMA}.orders_archive")
+    return tables
+
+
+async def iter_orders(user_id: Optional[str] = None, page_size: int = MAX_ORDER_PAGE_SIZE, after=None, include_archive: bool = False):
+    """
+    Async generator over the order history (most recent first), one page at a time.
+    The reader connection is released between pages, so streaming the whole history
+    uses constant memory and does not hold a connection for the duration.
+    With include_archive, the archived (older) orders follow the recent ones.
+    """
+    for table in _order_history_tables(include_archive):
+        position = after
+        while True:
+            rows = await fetch_orders_page(page_size, after=position, user_id=user_id, table=table)
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                break
+            position = (rows[-1]["created_at"], rows[-1]["order_id"])
+
+
+# --- NEW Tool: List All Orders - UPDATED to format as HTML table, one page at a time ---
+@traced_tool
+async def list_all_orders(
+    page_size: int = ORDER_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Lists orders from the SQLite database, most recent first, formatted as an HTML table string.
+    Returns at most `page_size` orders; pass the returned 'next_cursor' back as `cursor`
+    to get the next page. `user_id` optionally restricts the history to one user.
+    Archived orders follow the recent ones, as in iter_orders(include_archive=True).
+    """
+    logger.debug("list_all_orders called", extra=fields(page_size=page_size, cursor=cursor, user_id=user_id))
+
+    if db_pool is None or not db_pool.is_open:
+         logger.error("Database pool is not initialized.")
+         return {
+             "status": "error",
+             "message": "Database is not configured. Cannot list orders.",
+         }
+
+    page_size = max(1, min(int(page_size or ORDER_PAGE_SIZE), MAX_ORDER_PAGE_SIZE))
+    after = None
+    if cursor:
+        try:
+            after = _decode_order_cursor(cursor)
+        except (ValueError, TypeError):
+            return {"status": "error", "message": "Invalid page cursor. Start again without a cursor."}
+
+    try:
+        # Fetch one extra row to know whether another page exists; when the recent orders run out,
+        # the page continues into the archive from the same keyset position
+        results = []
+        for table in _order_history_tables(include_archive=True):
+            position = (results[-1]["created_at"], results[-1]["order_id"]) if results else after
+            results.extend(await fetch_orders_page(page_size + 1 - len(results), after=position, user_id=user_id, table=table))
+            if len(results) > page_size:
+                break
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if not results:
+            logger.debug("No orders found")
+            return {
+                "status": "not_found",
+                "message": "You have not placed any orders yet." if not cursor else "There are no more orders.",
+            }
+
+        # *** Format results as an HTML table string ***
+        table_rows = []
+        # Add table header
+        table_rows.append("<tr><th>Order ID</th><th>Status</th><th>Total</th><th>Placed On</th></tr>")
+
+        for row in results:
+            total_price = row['total_price'] or 0.0
+            # Add a row for each order
+            table_rows.append(
+                f"<tr>"
+                f"<td>{row['order_id']}</td>"
+                f"<td>{row['status']}</td>"
+                f"<td>${total_price:.2f}</td>"
+                f"<td>{row['created_at']}</td>" # Display the datetime string directly
+                f"</tr>"
+            )
+
+        # Combine all rows into a full HTML table
+        # Added a class "orders-table" for specific styling if needed
+        html_table = "<table class='orders-table'>" + "".join(table_rows) + "</table>"
+
+        # The tool should return a dictionary. The agent will use the 'report' field.
+        result = {
+            "status": "report",
+            "report": html_table, # Put the HTML string here
+            # Optionally, add a plain text intro message for the agent to use
+            "intro_message": "Here is your order history:",
+        }
+        if has_more:
+            last = results[-1]
+            result["next_cursor"] = _encode_order_cursor(last["created_at"], last["order_id"])
+            result["more_message"] = f"Showing the {len(results)} most recent orders. More orders are available."
+        return result
+
+    except Exception as e:
+        logger.exception("Error listing orders")
+        # Return an error status if something goes wrong
+        return {
+            "status": "error",
+            "message": f"An error occurred while listing orders: {e}",
+        }
+
+
+# --- Sales analytics: read from the rollup tables, never from orders / order_items (see sales_rollups.py) ---
+SALES_SUMMARY_DAYS = int(os.getenv("SALES_SUMMARY_DAYS", "7"))
+MAX_SALES_SUMMARY_DAYS = int(os.getenv("MAX_SALES_SUMMARY_DAYS", "366"))
+MAX_TOP_PRODUCTS = 50
+# Whether the chat request being served carried the admin token (see _is_admin); store-wide figures need it
+request_is_admin: contextvars.ContextVar[bool] = contextvars.ContextVar("request_is_admin", default=False)
+
+
+async def sales_summary(days: int = SALES_SUMMARY_DAYS, top: int = 5) -> Dict[str, Any]:
+    """
+    Revenue, orders and units per day for the last `days` days (today included, days
+    without orders as zeros), the `top` best-selling products and order counts by status.
+    """
+    days = max(1, min(int(days), MAX_SALES_SUMMARY_DAYS))
+    top = max(1, min(int(top), MAX_TOP_PRODUCTS))
+    today = datetime.date.today()
+    since = (today - datetime.timedelta(days=days - 1)).isoformat()
+    async with db_pool.reader() as db:
+        with span("sql", "sales_rollups.daily"):
+            rows = {row["day"]: row for row in await sales_rollups.daily_sales(db, since)}
+        with span("sql", "sales_rollups.top_products"):
+            best_sellers = await sales_rollups.top_products(db, top)
+        with span("sql", "sales_rollups.status_counts"):
+            statuses = await sales_rollups.status_counts(db)
+
+    daily = []
+    for offset in range(days):
+        day = (today - datetime.timedelta(days=offset)).isoformat()
+        daily.append(rows.get(day) or {"day": day, "orders": 0, "units": 0, "revenue": 0.0, "cancelled_orders": 0})
+    names = await _lookup_products([p["product_id"] for p in best_sellers])
+    for product in best_sellers:
+        found = names.get(product["product_id"])
+        product["name"] = found.name if found else product["product_id"]
+    return {
+        "days": days,
+        "since": since,
+        "totals": {
+            "orders": sum(d["orders"] for d in daily),
+            "units": sum(d["units"] for d in daily),
+            "revenue": round(sum(d["revenue"] for d in daily), 2),
+            "cancelled_orders": sum(d["cancelled_orders"] for d in daily),
+        },
+        "daily": daily,
+        "top_products": best_sellers,
+        "order_status_counts": statuses,
+    }
+
+
+@traced_tool
+async def get_sales_summary(days: int = SALES_SUMMARY_DAYS, top_products: int = 5) -> Dict[str, Any]:
+    """
+    Sales analytics: revenue, orders and units sold per day over the last `days` days,
+    the `top_products` best-selling products (by units) and the number of orders per status.
+    Cancelled orders are excluded from revenue, units and best sellers.
+    """
+    logger.debug("get_sales_summary called", extra=fields(days=days, top_products=top_products))
+    # Same gate as GET /analytics/sales: customers chatting with the shop never see store-wide sales
+    if not request_is_admin.get():
+        logger.info("Sales summary refused: not an admin request")
+        return {
+            "status": "error",
+            "error_code": "forbidden",
+            "message": "Sales figures are only available to store operators.",
+        }
+    if db_pool is None or not db_pool.is_open:
+        logger.error("Database pool is not initialized.")
+        return {
+            "status": "error",
+            "message": "Database is not configured. Cannot report sales.",
+        }
+    try:
+        summary = await sales_summary(days, top_products)
+    except Exception as e:
+        logger.exception("Error reading sales rollups")
+        return {
+            "status": "error",
+            "message": f"An error occurred while reading sales figures: {e}",
+        }
+
+    totals = summary["totals"]
+    lines = [
+        f"Last {summary['days']} day(s) since {summary['since']}: {totals['orders']} orders, "
+        f"{totals['units']} units, ${totals['revenue']:.2f} revenue, {totals['cancelled_orders']} cancelled.",
+        "Revenue per day: " + ", ".join(f"{d['day']} ${d['revenue']:.2f} ({d['orders']} orders)" for d in summary["daily"]) + ".",
+    ]
+    if summary["top_products"]:
+        lines.append("Best sellers: " + ", ".join(
+            f"{p['name']} (ID: {p['product_id']}, {p['units']} units, ${p['revenue']:.2f})" for p in summary["top_products"]
+        ) + ".")
+    if summary["order_status_counts"]:
+        lines.append("Orders by status (all time): " + ", ".join(
+            f"{status}: {count}" for status, count in summary["order_status_counts"].items()
+        ) + ".")
+    return {"status": "report", "report": "\n".join(lines), **summary}
+
+
+# --- Conversation-history compaction (runs before every LLM call of every agent) ---
+# The last HISTORY_KEEP_TURNS user turns are sent verbatim; older tool outputs are digested
+# and the history is trimmed to HISTORY_TOKEN_BUDGET (estimated) tokens per request.
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "3"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+HISTORY_TOOL_SUMMARY_CHARS = int(os.getenv("HISTORY_TOOL_SUMMARY_CHARS", "300"))
+
+prompt_size_metrics = PromptSizeMetrics()
+history_compactor = HistoryCompactor(
+    keep_turns=HISTORY_KEEP_TURNS,
+    token_budget=HISTORY_TOKEN_BUDGET,
+    tool_summary_chars=HISTORY_TOOL_SUMMARY_CHARS,
+    metrics=prompt_size_metrics,
+)
+# Timing spans for every agent run and LLM call (latency histograms on /metrics)
+agent_call_tracer = AgentCallTracer()
+
+
+# --- Agent tree (built on first use: importing google.adk and LiteLLM dominates cold start) ---
+root_agent = None  # Set by get_root_agent
+_agent_tree_lock = threading.Lock()
+
+
+def _build_agent_tree():
+    """Imports google.adk / LiteLLM and builds the orchestrator with its eight sub-agents."""
+    from google.adk.agents import Agent
+    from google.adk.models.lite_llm import LiteLlm
+
+    # --- Configure Agents (Using LiteLlm) ---
+    # Re-using the LiteLlm config provided for all agents
+    llm_config = LiteLlm(
+        model=LLM_MODEL,
+        api_key=API_KEY,
+        api_base=API_URL,
+        # Add any other LiteLlm specific configs here if needed
+    )
+    # Use the defined llm_config for all agents
+    greeting_agent = Agent(
+        model=llm_config,
+        name="greeting_agent",
+        instruction="You are the Greeting Agent. Your ONLY task is to provide a friendly and concise greeting.",
+        description="Handles simple greetings and hellos",
+    )
+
+    farewell_agent = Agent(
+        model=llm_config,
+        name="farewell_agent",
+        instruction="You are the Farewell Agent. Your ONLY task is to provide a polite and concise goodbye message.",
+        description="Handles simple farewells and goodbyes",
+    )
+
+    product_search_agent = Agent(
+        model=llm_config,
+        name="product_search_agent",
+        instruction="""You are the Product Search Agent. Your primary goal is to understand user queries related to finding products. Your responses should be in plain text, avoiding any special formatting.
+
+Here's how to handle user queries:
+
+**1. Direct Product Search:**
+
+* If the user provides specific keywords or product names (e.g., 'smartphone', 'running shoes', 'wireless keyboard'), immediately use the `search_products` tool with those keywords.
+
+**2. Broad Category Handling:**
+
+* If the user mentions a broad category (e.g., 'electronics', 'clothing', 'computer accessories'):
+    * First, identify the mentioned category.
+    * Then, check if the `search_products` tool, when used with this broad category, returns any results.
+        * If results are found, present them to the user, addressing them by name if known (e.g., "Here are some products I found in the [category] category, [User Name]: ...").
+        * If no results are found, ask the user to specify a sub-category or a specific product within that category to narrow down the search (e.g., "I found some products in the [category] category, but to help me find exactly what you're looking for, could you please specify a sub-category or a specific product?").
+
+**3. Category Listing Request:**
+
+* If the user asks for a list of categories (e.g., "What product categories do you have?", "List all categories"):
+    * Use the `search_products` tool with a query like "what categories".  The `search_products` tool is now designed to handle this and return a list of categories.
+    * Present the categories to the user, addressing them by name if known (e.g., "Here are the product categories I can search, [User Name]: [category list]").
+
+**4. No Products Found:**
+
+* After using the `search_products` tool, if no results are found:
+    * Inform the user politely, addressing them by name if known (e.g., "I'm sorry, [User Name], I couldn't find any products matching your query.").
+    * If the query was for a specific item, suggest searching within a broader category (e.g., "I couldn't find a 'mechanical keyboard', but I can search for 'keyboards' in general.").
+    * If the query was for a broad category and no sub-categories were found, inform the user.
+
+**5. Total Product Count Request:**
+
+    * If the user asks for the total number of products (e.g., "How many products do you have?", "What is the total number of products?"):
+    * Use the `search_products` tool with the query "total product count". The `search_products` tool is now designed to handle this and return the total count.
+    * Present the count to the user, addressing them by name if known (e.g., "There are currently [total count] products in our catalog, [User Name].").
+**6. Presenting Results:**
+
+* When presenting results from the `search_products` tool (when the tool returns 'status' is 'report'):
+    * Present the information from the 'report' field to the user in a clear and concise manner, addressing them by name if known (e.g., "Here's what I found for you, [User Name]: ...").
+
+**7. Filters:**
+
+* If the user restricts the search to a category or a price range (e.g., "headphones under $100", "clothing between $20 and $50"), pass the `category`, `min_price` and/or `max_price` arguments to `search_products` instead of putting them in the query text.
+* Results are ranked by relevance and capped by `limit`; only raise `limit` if the user explicitly asks to see more results.
+* If the user wants results ordered by price (e.g., "electronics under $50, cheapest first", "the most expensive watches"), pass `sort_by="price_asc"` or `sort_by="price_desc"`. To browse a whole category by price, pass the category name as both the query and `category`.
+
+**Example Interaction:**
+
+User: "Show me computer accessories"
+Agent: *(Internally calls search_products with "computer accessories")* "Here are some products I found in the computer accessories category, [User Name]: ..."
+
+User: "I want a mechanical keyboard"
+Agent: *(Internally calls search_products with "mechanical keyboard")* "I'm sorry, [User Name], I couldn't find any products matching 'mechanical keyboard'.  I can search for 'keyboards' in general, would you like me to do that?"
+
+User: "show me electronics"
+Agent: *(Internally calls search_products with "electronics")* "Here are some products I found in the electronics category, [User Name]: ..."
+
+User: "laptops"
+Agent: *(Internally calls search_products with "laptops")* "Here's what I found for you, [User Name]: ..."
+
+User: "What product categories do you have?"
+Agent: *(Internally calls search_products with "what categories do you have?")* "Here are the product categories I can search, [User Name]: Clothing, Footwear, Accessories, Electronics, Fitness, Home & Kitchen, Books, Home & Office, Smart Home, Garden & Outdoor, Tools, Home Decor, Kitchen Appliances, Dinnerware, Cookware, Cutlery, Kitchen Utensils, Home & Storage, Bathroom, Bedding, Lighting, Rugs, Window Treatments, Cleaning Supplies, Bathroom Accessories, Personal Care, Fitness Supplements, Sports, Health."
+
+**Example Interaction:**
+
+User: "How many products do you have?"
+Agent: *(Internally calls search_products with "total product count")* "There are currently 102 products in our catalog, Aryan."
+
+""",
+        description="Searches for products in the catalog based on user queries, with category refinement.",
+        tools=[search_products],
+    )
+
+
+
+
+    # order_status_agent - Instruction UPDATED slightly
+    order_status_agent = Agent(
+        model=llm_config,
+        name="order_status_agent",
+        instruction="""You are the Order Status Agent. Your task is to help users check the status of their orders. Identify the order ID from the user's message, however it is phrased. Use the `check_order_status` tool with the extracted order ID. If the user asks about several orders at once, call the `check_order_statuses` tool once with the list of all the order IDs instead of calling `check_order_status` for each of them.
+
+Examples of user queries:
+- 'What is the status of my order #12345?' -> Order ID: 12345
+- 'Can you tell me where my order with ID ABC-678 is?' -> Order ID: ABC-678
+- 'Track order number 9876.' -> Order ID: 9876
+- 'Check the status of order XYZ123.' -> Order ID: XYZ123
+- 'I want to know about my recent purchase, the ID is 54321.' -> Order ID: 54321
+- 'Where are my orders ABC-678 and XYZ123?' -> Order IDs: ['ABC-678', 'XYZ123'] (use `check_order_statuses`)
+
+Based on the tool's response, if the 'status' is 'report', provide the detailed order information, including item prices and the total amount, to the user clearly. If the 'status' is 'not_found', inform the user that the order ID was not found. For `check_order_statuses`, report every order in 'orders' and mention the IDs listed in 'not_found'. Respond in plain text, avoiding any special formatting.""",
+        description="Checks the status of one or more of a user's orders based on the provided order IDs, including item prices and total amount.",
+        tools=[check_order_status, check_order_statuses],
+    )
+
+    ordering_agent = Agent(
+        model=llm_config,
+        name="ordering_agent",
+        instruction="""You are the Ordering Agent. Your role is to process user requests to place orders for one or more products. Understand the user's intent to buy products and extract a list of product IDs and their desired quantities.
+
+Examples of user queries:
+- 'I want to order product ID: XYZ-123 and two of ABC-456.' -> items: [{'product_id': 'XYZ-123', 'quantity': 1}, {'product_id': 'ABC-456', 'quantity': 2}]
+- 'Can you buy me one of LMN-789 and three of PQR-001?' -> items: [{'product_id': 'LMN-789', 'quantity': 1}, {'product_id': 'PQR-001', 'quantity': 3}]
+- 'Order item 111 and two of item 222.' -> items: [{'product_id': '111', 'quantity': 1}, {'product_id': '222', 'quantity': 2}]
+
+Call the `place_order` tool with the extracted list of items. Based on the tool's response ('success' or 'error'), inform the user if the order was placed successfully, providing the order ID and the total cost (which the tool will now need to calculate for multiple items) from the 'message' if successful, or the 'message' if there was an error. If you cannot extract a clear list of product IDs and quantities, ask the user for clarification. Respond concisely and in plain text, avoiding Markdown or special formatting.
+    """,
+        description="Places new orders for one or more products based on user requests, tracking the price at the time of order.",
+        tools=[place_order],
+    )
+
+    order_cancellation_agent = Agent(
+        model=llm_config,
+        name="order_cancellation_agent",
+        instruction="""You are the Order Cancellation Agent. Your task is to process user requests to cancel or remove orders. Identify the order ID that the user wants to cancel, regardless of how they phrase their request. Use the `remove_order` tool with the extracted order ID.
+
+Examples of user queries:
+- 'Cancel order #56789.' -> Order ID: 56789
+- 'I want to remove my order with ID LMN-321.' -> Order ID: LMN-321
+- 'Can you delete order number 11223?' -> Order ID: 11223
+- 'I need to cancel a recent purchase, the ID is PQR-777.' -> Order ID: PQR-777
+- 'Get rid of order number 44556.' -> Order ID: 44556
+
+A cancellation cannot be undone: before calling `remove_order`, repeat the order ID and ask the user to confirm (e.g., 'Do you want me to cancel order 56789? This cannot be undone.'). Only call the tool once the user has confirmed that order ID in a later message.
+
+Based on the tool's response, if the 'status' is 'success', confirm to the user that the order has been cancelled, using the 'message' from the tool. If the 'status' is 'not_found', inform the user that the order ID was not found. If the 'status' is 'error', relay the error message from the tool. If you cannot clearly identify the order ID, ask the user for the specific ID they wish to cancel. Respond in plain text, avoiding any special formatting.""",
+        description="Cancels or removes existing orders based on the provided order ID.",
+        tools=[remove_order],
+    )
+
+
+    # --- NEW Agent: List Orders ---
+    list_orders_agent = Agent(
+        model=llm_config,
+        name="list_orders_agent",
+        instruction="""You are the List Orders Agent. Your purpose is to show the user their order history. When the user asks to see their orders or order history, simply call the `list_all_orders` tool.
+
+Examples of user queries:
+- 'Show me my orders.'
+- 'What have I ordered before?'
+- 'Can I see my order history?'
+- 'List all my past purchases.'
+- 'What are my previous orders?'
+
+Based on the tool's response, if the 'status' is 'report', present the information from the 'report' field (which will be an HTML table) to the user. If the 'status' is 'not_found', inform the user using the message from the 'message' field (e.g., "You have not placed any orders yet."). Respond in plain text, avoiding any special formatting of the HTML content.
+
+The tool returns one page of the most recent orders. If the response contains a 'next_cursor', tell the user that more orders are available. When the user asks to see more (e.g., 'show more', 'next page', 'older orders'), call `list_all_orders` again with `cursor` set to the 'next_cursor' value from the previous response.""",
+        description="Lists all orders placed by the user.",
+        tools=[list_all_orders],
+    )
+
+
+    sales_analytics_agent = Agent(
+        model=llm_config,
+        name="sales_analytics_agent",
+        instruction="""You are the Sales Analytics Agent. You answer questions from store operators about sales: revenue per day, best-selling products and how many orders are in each status. Call the `get_sales_summary` tool.
+
+Examples of user queries:
+- 'What was our revenue this week?' -> days: 7
+- 'Show me sales for the last 30 days.' -> days: 30
+- 'What are our top 10 products?' -> top_products: 10
+- 'How many orders are cancelled?' -> use 'order_status_counts'
+
+Based on the tool's response, if the 'status' is 'report', answer from the 'report' field (the detailed numbers are in 'totals', 'daily', 'top_products' and 'order_status_counts'). Revenue and best sellers exclude cancelled orders. If the 'status' is 'error', relay the message; never estimate or make up sales figures. Respond in plain text, avoiding any special formatting.""",
+        description="Reports sales analytics: revenue per day, best-selling products and order counts by status.",
+        tools=[get_sales_summary],
+    )
+
+
+    # Store-wide sales are for operators only: without ADMIN_TOKEN nobody is one, so the agent is left out entirely
+    sub_agents = [
+        greeting_agent,
+        farewell_agent,
+        product_search_agent,
+        order_status_agent,
+        ordering_agent,
+        order_cancellation_agent,
+        list_orders_agent,
+    ]
+    sales_analytics_routing = ""
+    if ADMIN_TOKEN:
+        sub_agents.append(sales_analytics_agent)
+        sales_analytics_routing = """
+- **Sales Analytics:** If the user asks about store-wide sales figures (e.g., "revenue this week", "top selling products", "how many orders are cancelled"), delegate to `sales_analytics_agent` (it only answers store operators)."""
+
+    # Root Orchestrator Agent - Instruction UPDATED and sub_agents UPDATED
+    root_agent = Agent(
+        model=llm_config,
+        name="shopping_orchestrator_agent",
+        instruction=f"""You are the main Shopping Assistant. Your primary role is to greet the user, introduce yourself and your capabilities, ask for their name, and then route their subsequent requests to the most appropriate specialist agent. Be concise in your routing decisions.
+
+**Initial Interaction:**
+
+1. Introduce yourself as the Shopping Assistant.
+2. Briefly list your capabilities: product search, checking order status, placing orders, listing all orders, and cancelling orders.
+3. Ask the user for their name (e.g., 'What is your name?').
+4. Once you receive the user's name, remember it for future interactions.
+5. Always use the first name of the user.(e.g., if user says "My name is Aryan Sharma", remember "Aryan" for future interactions).
+
+**Subsequent Interactions:**
+
+- **Greeting:** If the user's message is a clear greeting (e.g., "Hi", "Hello", "Good morning"), delegate to `greeting_agent`, passing the user's name if known.
+- **Farewell:** If the user's message is a clear farewell (e.g., "Bye", "Goodbye", "See you"), delegate to `farewell_agent`, passing the user's name if known.
+- **Capabilities Inquiry:** If the user asks about your capabilities again (e.g., "What can you do?"), respond directly with the list of capabilities, addressing them by name if known (e.g., '[User Name], as I mentioned, I can help with product search, checking order status, placing orders, listing all orders, and cancelling orders.').
+- **Product Search:** If the user expresses a desire to find products, including category listing and total product count, delegate to `product_search_agent`, passing the user's name if known. Examples: "search for [product]", "find me [item]", "show me [category]", "what product categories do you have?", "how many products do you have?".
+- **Order Status:** If the user asks about the status of a specific order (usually including an order ID or phrases like "where is my order"), delegate to `order_status_agent`, passing the user's name if known.
+- **Ordering:** If the user wants to buy or order a product (usually including a product ID or keywords like "buy", "order", "purchase"), delegate to `ordering_agent`, passing the user's name if known.
+- **Order Cancellation:** If the user wants to cancel or remove an order (usually including an order ID or keywords like "cancel", "remove", "delete order"), delegate to `order_cancellation_agent`, passing the user's name if known.
+- **List Orders:** If the user wants to see their order history (e.g., "list my orders", "show me my order history", "what have I ordered"), delegate to `list_orders_agent`, passing the user's name if known.{sales_analytics_routing}
+
+**Direct Responses (after initial interaction):**
+
+- For queries that do not clearly fall into one of the delegation categories, politely state, addressing them by name if known (e.g., '[User Name], I can only help with product search, checking order status, placing orders, listing all orders, and cancelling orders. Please let me know how I can assist you with these tasks.').
+""",
+        description="Greets the user, introduces capabilities, asks for name, and then routes user queries to specialized agents.",
+        tools=[],
+        sub_agents=sub_agents,
+    )
+
+    # Timing spans and history compaction on every agent's LLM calls
+    for agent in [root_agent, *root_agent.sub_agents]:
+        agent.before_model_callback = [history_compactor, agent_call_tracer.before_model]
+        agent.after_model_callback = agent_call_tracer.after_model
+        agent.before_agent_callback = agent_call_tracer.before_agent
+        agent.after_agent_callback = agent_call_tracer.after_agent
+    return root_agent
+
+
+def get_root_agent():
+    """The root agent, building the agent tree on first call (blocking; the server does it in a thread)."""
+    global root_agent
+    with _agent_tree_lock:
+        if root_agent is None:
+            root_agent = _build_agent_tree()
+    return root_agent
+
+
+# --- FastAPI App Setup ---
+app = FastAPI()
+
+# Ensure only one mount for static files
+app.mount("/static", StaticFiles(directory="templates/static"), name="static")
+
+runner: Optional["Runner"] = None  # Created by the agent warm-up (see AGENT_WARMUP)
+
+# Using DEFAULT_USER_ID defined at the top for session management
+APP_NAME = "my_adk_fastapi_app"
+USER_ID_FOR_SESSIONS = DEFAULT_USER_ID # Default user ID when the client does not send X-User-ID
+
+# --- Per-client sessions ---
+# Each client gets its own ADK session, identified by the X-Session-ID header or the session cookie.
+SESSION_COOKIE_NAME = "chat_session_id"
+SESSION_HEADER_NAME = "X-Session-ID"
+USER_HEADER_NAME = "X-User-ID"
+# "sqlite" (persistent, default) or "memory" (InMemorySessionService, lost on restart)
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite").lower()
+SESSION_DATABASE_PATH = os.getenv("SESSION_DATABASE_PATH", "./sessions.db")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))  # idle sessions are evicted after this
+SESSION_MAX_EVENTS = int(os.getenv("SESSION_MAX_EVENTS", "200"))  # per-session history is truncated to this
+SESSION_EVICTION_INTERVAL_SECONDS = float(os.getenv("SESSION_EVICTION_INTERVAL_SECONDS", "600"))
+
+session_service = None  # Created by the agent warm-up according to SESSION_STORE
+session_eviction_task: asyncio.Task = None
+
+
+def _new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def resolve_client_session(headers, cookies, query_params=None):
+    """
+    Returns (user_id, session_id, is_new) for a request or WebSocket handshake.
+    The session ID comes from the X-Session-ID header, the session cookie or a
+    'session_id' query parameter; a fresh one is generated when none is present.
+    """
+    user_id = (headers.get(USER_HEADER_NAME) or "").strip() or USER_ID_FOR_SESSIONS
+    session_id = (
+        (headers.get(SESSION_HEADER_NAME) or "").strip()
+        or (cookies.get(SESSION_COOKIE_NAME) or "").strip()
+        or ((query_params or {}).get("session_id") or "").strip()
+    )
+    if session_id:
+        return user_id, session_id[:128], False
+    return user_id, _new_session_id(), True
+
+
+def _set_session_cookie(response, session_id: str) -> None:
+    response.set_cookie(SESSION_COOKIE_NAME, session_id, httponly=True, samesite="lax", max_age=int(SESSION_TTL_SECONDS) or None)
+
+
+async def ensure_session(user_id: str, session_id: str):
+    """Returns the client's ADK session, creating it if it does not exist (or has expired)."""
+    session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    if session is None:
+        session = await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+        logger.info("Created session", extra=fields(session_id=session_id, user_id=user_id))
+    return session
+
+
+async def _evict_expired_sessions_periodically():
+    while True:
+        await asyncio.sleep(SESSION_EVICTION_INTERVAL_SECONDS)
+        try:
+            evicted = await session_service.evict_expired()
+            if evicted:
+                logger.info("Evicted expired sessions", extra=fields(evicted=evicted))
+        except Exception:
+            logger.exception("Error evicting expired sessions")
+
+
+# --- Agent warm-up: the agent tree, the ADK session service and the Runner ---
+# "startup": built before the worker accepts requests (GET /ready is 200 from the start).
+# "background": the worker serves right away (orders, catalog, fast-path answers) and builds them in a background
+# task; GET /ready answers 503 until it is done, and chat turns that need the agent tree wait for it.
+# "lazy": built by the first chat turn that needs the agent tree.
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "startup").lower()
+agent_warmup_task: Optional[asyncio.Task] = None
+
+AGENT_WARMUP_SECONDS = metrics.gauge("ecommerce_agent_warmup_seconds", "Time spent importing the agent stack and building the agent tree and Runner.")
+
+
+def _load_agent_stack() -> None:
+    """Imports google.adk, google.genai, LiteLLM, httpx and the session store and builds the agent tree (blocking)."""
+    get_root_agent()
+    import google.adk.runners  # noqa: F401
+    from google.genai import types  # noqa: F401
+    import llm_http  # noqa: F401
+    if SESSION_STORE != "memory":
+        import session_store  # noqa: F401
+
+
+async def _open_session_service():
+    """The ADK session service for SESSION_STORE (sessions are created per client on first message)."""
+    if SESSION_STORE == "memory":
+        from google.adk.sessions import InMemorySessionService
+        logger.info("Using in-memory ADK session service.")
+        return InMemorySessionService()
+
+    from session_store import SQLiteSessionService
+    service = SQLiteSessionService(
+        SESSION_DATABASE_PATH,
+        ttl_seconds=SESSION_TTL_SECONDS,
+        max_events=SESSION_MAX_EVENTS,
+    )
+    await service.open()
+    evicted = await service.evict_expired()
+    logger.info(f"Using SQLite session store: {SESSION_DATABASE_PATH} (TTL {SESSION_TTL_SECONDS:.0f}s, "
+                f"max {SESSION_MAX_EVENTS} events/session, evicted {evicted} expired).")
+    return service
+
+
+async def _open_llm_http_pool() -> None:
+    """Installs the shared LLM client into LiteLLM and opens LLM_HTTP_WARMUP_CONNECTIONS connections to API_URL."""
+    global llm_http_pool
+    from llm_http import LLMHttpPool
+
+    llm_http_pool = LLMHttpPool(**LLM_HTTP_SETTINGS)
+    llm_http_pool.install()
+    logger.info(f"LLM HTTP pool installed: {LLM_HTTP_SETTINGS['max_connections']} connections "
+                f"({LLM_HTTP_SETTINGS['max_keepalive']} kept alive), {LLM_HTTP_SETTINGS['max_per_host']} per host, "
+                f"{'HTTP/2' if llm_http_pool.http2 else 'HTTP/1.1'}.")
+    await llm_http_pool.warm_up(API_URL, LLM_HTTP_WARMUP_CONNECTIONS, timeout=LLM_HTTP_SETTINGS["connect_timeout"])
+
+
+async def _warm_up_agents() -> None:
+    global runner, session_service, session_eviction_task
+    started = time.perf_counter()
+    try:
+        # The imports take seconds of CPU; in a thread they do not stall requests already being served
+        await asyncio.to_thread(_load_agent_stack)
+        from google.adk.runners import Runner
+
+        if LLM_HTTP_POOL_ENABLED and llm_http_pool is None:
+            await _open_llm_http_pool()
+
+        if session_service is None:
+            session_service = await _open_session_service()
+            if SESSION_STORE != "memory":
+                session_eviction_task = asyncio.create_task(_evict_expired_sessions_periodically())
+
+        runner = Runner(
+            agent=get_root_agent(),
+            app_name=APP_NAME,
+            # No need to pass API key here, SDK should pick it up from env
+            session_service=session_service
+        )
+    except Exception:
+        logger.exception("Agent warm-up failed")
+        raise
+    AGENT_WARMUP_SECONDS.set(value=time.perf_counter() - started)
+    logger.info(f"ADK Runner initialized with Root Agent (warm-up took {time.perf_counter() - started:.2f}s).")
+
+
+async def ensure_agent_runner():
+    """Returns the Runner, starting the agent warm-up (or waiting for the one in progress) if needed."""
+    global agent_warmup_task
+    if runner is None:
+        if agent_warmup_task is None or agent_warmup_task.done():
+            # First use, or an earlier attempt failed
+            agent_warmup_task = asyncio.create_task(_warm_up_agents())
+        # Shielded: a chat turn cancelled at its deadline must not cancel the warm-up other turns wait for
+        await asyncio.shield(agent_warmup_task)
+    return runner
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Opens the databases, loads static data and sets up the agent Runner (now or later, see AGENT_WARMUP)."""
+    global db_file_path, db_pool, catalog_watch_task, CATALOG_STORE
+    global shared_state_task, order_archive_task, agent_warmup_task
+
+    # --- Shared state between worker processes (cache invalidations, counters) ---
+    await shared_state.open()
+    if shared_state.backend != "memory":
+        shared_state_task = asyncio.create_task(_apply_shared_invalidations_periodically())
+        if SESSION_STORE == "memory":
+            logger.warning("SESSION_STORE=memory keeps sessions per worker; use SESSION_STORE=sqlite with several workers.")
+    logger.info(f"Worker {os.getpid()} using shared state backend: {shared_state.backend}")
+
+    # --- Database Setup (SQLite) ---
+    db_file_path = SQLITE_DATABASE_PATH
+    logger.info(f"Using SQLite database file: {db_file_path}")
+
+    # Open the long-lived connection pool (WAL mode, tuned pragmas)
+    db_pool = SQLitePool(
+        db_file_path,
+        readers=SQLITE_POOL_READERS,
+        mmap_size=SQLITE_MMAP_SIZE,
+        cache_size_kib=SQLITE_CACHE_SIZE_KIB,
+        attachments={order_archive.ARCHIVE_SCHEMA: ORDER_ARCHIVE_PATH} if ORDER_ARCHIVE_PATH else None,
+    )
+    await db_pool.open()
+    logger.info(f"SQLite connection pool opened: 1 writer + {db_pool.reader_count} readers (WAL mode).")
+
+    # Bring the schema up to date (versioned migrations, see migrations.py)
+    try:
+        async with db_pool.writer() as db:
+            previous_version = await get_schema_version(db)
+            schema_version = await run_migrations(db)
+            logger.info(f"SQLite schema at version {schema_version}.")
+            # An up-to-date schema costs one PRAGMA read; the plans only change when a migration ran
+            if SQLITE_CHECK_QUERY_PLANS == "always" or (SQLITE_CHECK_QUERY_PLANS == "on_migrate" and schema_version != previous_version):
+                for failure in await check_query_plans(db):
+                    logger.warning(f"Query plan for {failure['query']} is not using the expected index: {failure['actual']}")
+            if ORDER_ARCHIVE_AFTER_DAYS > 0:
+                await order_archive.ensure_archive_tables(db, ORDER_ARCHIVE_SCHEMA)
+    except Exception as e:
+        logger.exception("Error migrating SQLite schema")
+    if ORDER_ARCHIVE_AFTER_DAYS > 0:
+        order_archive_task = asyncio.create_task(_archive_old_orders_periodically())
+        logger.info(f"Archiving orders older than {ORDER_ARCHIVE_AFTER_DAYS:g} days to {ORDER_ARCHIVE_PATH or db_file_path}.")
+
+    # --- Load Static Data (products.json: imported into SQLite, memory-mapped or parsed, see CATALOG_STORE) ---
+    if _sql_catalog():
+        try:
+            async with db_pool.reader() as db:
+                fts_ready = await product_store.has_fts(db)
+        except Exception:
+            fts_ready = False
+        if not fts_ready:
+            logger.warning("SQLite products_fts table is not available; using the memory-mapped catalog instead.")
+            CATALOG_STORE = "mmap"
+    logger.info(f"Loading product data from {PRODUCTS_FILE} (catalog store: {CATALOG_STORE})...")
+    result = await reload_catalog()
+    if result["status"] != "success":
+        # Last resort: the plain JSON path
+        CATALOG_STORE = "json"
+        load_catalog(PRODUCTS_FILE)
+    if CATALOG_WATCH_INTERVAL_SECONDS > 0:
+        catalog_watch_task = asyncio.create_task(_watch_catalog_files())
+
+    # --- Agent tree, session service and Runner (see AGENT_WARMUP) ---
+    if AGENT_WARMUP == "startup":
+        await ensure_agent_runner()
+    elif AGENT_WARMUP == "background":
+        agent_warmup_task = asyncio.create_task(_warm_up_agents())
+        logger.info("Building the agent tree in the background; GET /ready reports when it is done.")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Shuts down the LLM HTTP pool and closes the database connection pool."""
+    if agent_warmup_task is not None:
+        agent_warmup_task.cancel()
+    if llm_http_pool is not None:
+        await llm_http_pool.aclose()
+        logger.info("LLM HTTP pool closed.")
+
+    if order_archive_task is not None:
+        order_archive_task.cancel()
+    if db_pool is not None:
+        await db_pool.close()
+        logger.info("SQLite connection pool closed.")
+
+    if session_eviction_task is not None:
+        session_eviction_task.cancel()
+    if catalog_watch_task is not None:
+        catalog_watch_task.cancel()
+    if shared_state_task is not None:
+        shared_state_task.cancel()
+    await shared_state.close()
+    if session_service is not None and SESSION_STORE != "memory":
+        await session_service.close()
+        logger.info("SQLite session store closed.")
+
+
+# --- FastAPI Endpoints ---
+@app.get("/", response_class=HTMLResponse)
+async def read_root(request: Request):
+    """Serves the index.html file and gives new clients their own chat session cookie."""
+    try:
+        response = FileResponse("templates/index.html")
+        _, session_id, is_new = resolve_client_session(request.headers, request.cookies)
+        if is_new:
+            _set_session_cookie(response, session_id)
+        return response
+    except FileNotFoundError:
+        return HTMLResponse("<html><body><h1>Error: index.html not found in the 'templates' directory.</h1></body></html>", status_code=404)
+
+
+# --- Fast-path router: answer unambiguous intents without the LLM agent tree ---
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() in ("1", "true", "yes")
+FAST_PATH_AGENT_NAME = "fast_path_router"
+
+# intent -> (tool name, tool function, fixed tool arguments)
+# Read-only tools only. A cancellation cannot be undone, so even a message matched by a rule
+# ("cancel order <id>") goes to order_cancellation_agent, which confirms before calling remove_order
+FAST_PATH_TOOLS = {
+    "order_status": ("check_order_status", check_order_status, {}),
+    "list_orders": ("list_all_orders", list_all_orders, {}),
+    "product_count": ("search_products", search_products, {"query": "total product count"}),
+    "list_categories": ("search_products", search_products, {"query": "what categories"}),
+}
+
+
+def _tool_result_text(result: Dict[str, Any]) -> str:
+    """Turns a tool result dict into the text shown to the user."""
+    if result.get("status") == "report":
+        parts = [result.get("intro_message"), result.get("report"), result.get("more_message")]
+        return "\n".join(part for part in parts if part)
+    return result.get("message") or result.get("report") or "Done."
+
+
+async def run_fast_path(user_message: str) -> Optional[Dict[str, Any]]:
+    """
+    Routes the message with intent_router and, when it is unambiguous, calls the
+    matching tool directly. Returns the /chat response body, or None to fall back
+    to the agent tree.
+    """
+    if not FAST_PATH_ENABLED:
+        return None
+    routed = route_intent(user_message)
+    if routed is None or routed["intent"] not in FAST_PATH_TOOLS:
+        return None
+
+    tool_name, tool, fixed_args = FAST_PATH_TOOLS[routed["intent"]]
+    tool_args = {**fixed_args, **routed["args"]}
+    logger.info("Fast path", extra=fields(intent=routed["intent"], matched_by=routed["matched_by"], confidence=routed["confidence"], tool=tool_name))
+
+    result = await tool(**tool_args)
+    text = _tool_result_text(result)
+    events = [
+        {"type": "fast_path", "intent": routed["intent"], "tool": tool_name, "matched_by": routed["matched_by"]},
+        {"type": "final_response", "text": text, "agent_name": FAST_PATH_AGENT_NAME},
+    ]
+    return {"response": text, "agent_name": FAST_PATH_AGENT_NAME, "events": events}
+
+
+# --- Semantic response cache: serve repeated, context-free questions without the agent tree ---
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+# 1.0 = exact (normalized) match only; below that, rephrasings with the same content words (see response_cache.py)
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "1.0"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+
+# Turns touching these agents or any tool outside the allowlist are never cached
+# (orders change state or show per-user, changing data)
+response_cache: Optional[SemanticResponseCache] = SemanticResponseCache(
+    similarity_threshold=RESPONSE_CACHE_SIMILARITY,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    uncacheable_agents=["order_status_agent", "ordering_agent",
+                        "order_cancellation_agent", "list_orders_agent", "sales_analytics_agent"],
+    cacheable_tools=["search_products", "transfer_to_agent"],
+) if RESPONSE_CACHE_ENABLED else None
+
+
+# --- Admission control: bound concurrent agent runs per worker, rate-limit clients (see admission.py) ---
+# Fast-path and response-cache answers skip the concurrency limit (no LLM call); the rate limit covers every message
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "32"))  # per worker; 0 = unlimited
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))  # turns waiting for a slot; more are rejected with 503
+CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "10"))
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "60"))  # whole turn, queueing included; 0 = none
+CHAT_RATE_LIMIT = int(os.getenv("CHAT_RATE_LIMIT", "30"))  # messages per client per window; 0 = unlimited
+CHAT_RATE_LIMIT_WINDOW_SECONDS = float(os.getenv("CHAT_RATE_LIMIT_WINDOW_SECONDS", "60"))
+
+chat_limiter = ConcurrencyLimiter(CHAT_MAX_IN_FLIGHT, CHAT_MAX_QUEUE, CHAT_QUEUE_TIMEOUT_SECONDS)
+# Counts live in shared_state, so with the sqlite backend the limit applies across all workers
+chat_rate_limiter = RateLimiter(shared_state, CHAT_RATE_LIMIT, CHAT_RATE_LIMIT_WINDOW_SECONDS)
+
+CHAT_IN_FLIGHT = metrics.gauge("ecommerce_chat_in_flight", "Agent runs currently executing in this worker.")
+CHAT_QUEUE_DEPTH = metrics.gauge("ecommerce_chat_queue_depth", "Chat turns waiting for an agent run slot.")
+CHAT_REJECTED = metrics.counter("ecommerce_chat_rejected_total", "Chat messages rejected by admission control, by reason.", ["reason"])
+CHAT_DEADLINE_EXCEEDED = metrics.counter("ecommerce_chat_deadline_exceeded_total", "Agent runs cancelled at the chat deadline.")
+
+
+def _rate_limit_key(client) -> str:
+    """
+    Clients are identified by their address, never by X-User-ID: a header the client
+    chooses would let it start a fresh budget on every request. Behind a reverse proxy,
+    run uvicorn with --proxy-headers (and --forwarded-allow-ips) so this is the real client.
+    """
+    return f"ip:{client.host if client else 'unknown'}"
+
+
+async def check_chat_rate_limit(client) -> None:
+    """Raises AdmissionRejected (429) when the client is over its budget. Fails open if shared state is unavailable."""
+    try:
+        await chat_rate_limiter.check(_rate_limit_key(client))
+    except AdmissionRejected as e:
+        CHAT_REJECTED.inc(e.reason)
+        raise
+    except Exception:
+        logger.exception("Error checking chat rate limit")
+
+
+def _rejection_event(e: AdmissionRejected) -> Dict[str, Any]:
+    return {"type": "error", "message": e.message, "status_code": e.status_code, "reason": e.reason, "retry_after": e.retry_after}
+
+
+def _rejection_response(e: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        content={"response": e.message, "events": [_rejection_event(e)]},
+        status_code=e.status_code,
+        headers=e.headers(),
+    )
+
+
+def _event_text(event) -> Optional[str]:
+    """Returns the text of the first content part of an ADK event, if any."""
+    content = getattr(event, 'content', None)
+    if content and getattr(content, 'parts', None):
+        return getattr(content.parts[0], 'text', None) or None
+    return None
+
+
+async def chat_events(user_message: str, user_id: str, session_id: str, streaming: bool = False):
+    """
+    Runs one chat turn and yields UI events as they happen:
+    fast_path, agent_transfer, tool_call, tool_result, partial_text (streaming only),
+    intermediate_message, final_response and error.
+    With streaming=True the model output is requested in SSE mode, so text arrives
+    as partial_text chunks before the final_response event.
+    Error events carry an HTTP-style status_code: 503 when admission control turns
+    the agent run away, 504 when it is cancelled at CHAT_DEADLINE_SECONDS.
+    On a cold worker, a turn that needs the agent tree first waits for the warm-up.
+    """
+    turn_started = time.perf_counter()
+    fast_path = await run_fast_path(user_message)
+    if fast_path is not None:
+        observe_span("chat", "fast_path", time.perf_counter() - turn_started)
+        for event in fast_path["events"]:
+            yield event
+        return
+
+    use_response_cache = response_cache is not None and is_cacheable_message(user_message)
+    if use_response_cache:
+        cached = response_cache.lookup(user_message)
+        if cached is not None:
+            logger.info("Response cache hit", extra=fields(matched=cached["matched"], similarity=cached["similarity"], agent_path=" > ".join(cached["agent_path"])))
+            observe_span("chat", "response_cache", time.perf_counter() - turn_started)
+            yield {"type": "response_cache", "matched": cached["matched"], "similarity": cached["similarity"], "agent_path": cached["agent_path"]}
+            yield {"type": "final_response", "text": cached["response"], "agent_name": cached["agent_name"]}
+            return
+
+    agent_name = "Shopping Assistant"
+    last_distinct_agent = None
+    agent_path = []  # Distinct agents in the order they ran, for the response cache
+    tool_names = []
+    final_text = None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + CHAT_DEADLINE_SECONDS if CHAT_DEADLINE_SECONDS > 0 else None
+
+    try:
+        if runner is None:
+            # Cold worker (AGENT_WARMUP=background|lazy): wait for the agent tree within the turn's deadline
+            warmup_started = time.perf_counter()
+            async with asyncio.timeout_at(deadline):
+                await ensure_agent_runner()
+            observe_span("chat", "warmup_wait", time.perf_counter() - warmup_started)
+        # Already loaded by the warm-up
+        from google.adk.agents.run_config import RunConfig, StreamingMode
+        from google.genai import types
+
+        user_content = types.Content(role='user', parts=[types.Part(text=user_message)])
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE) if streaming else RunConfig()
+
+        queued_at = time.perf_counter()
+        async with chat_limiter.slot(timeout=None if deadline is None else deadline - loop.time()):
+            observe_span("chat", "queue_wait", time.perf_counter() - queued_at)
+            session = await ensure_session(user_id, session_id)
+            # Only first turns are cached: later answers may depend on the conversation (names, follow-ups)
+            use_response_cache = use_response_cache and not session.events
+            agent_run = runner.run_async(user_id=user_id, session_id=session_id, new_message=user_content, run_config=run_config)
+            if deadline is not None:
+                agent_run = until_deadline(agent_run, deadline)
+            async for event in agent_run:
+                current_agent = getattr(event, 'author', None)
+                logger.debug("Runner event", extra=fields(author=current_agent, partial=bool(getattr(event, 'partial', False))))
+
+                if current_agent and last_distinct_agent and current_agent != last_distinct_agent:
+                    record_agent_transfer(last_distinct_agent, current_agent)
+                    yield {"type": "agent_transfer", "from": last_distinct_agent, "to": current_agent}
+
+                if current_agent:
+                    last_distinct_agent = current_agent
+                    if current_agent != "user" and current_agent not in agent_path:
+                        agent_path.append(current_agent)
+
+                for call in event.get_function_calls():
+                    tool_names.append(call.name)
+                    yield {"type": "tool_call", "author": current_agent, "name": call.name, "args": dict(call.args or {})}
+                for response in event.get_function_responses():
+                    tool_status = response.response.get("status") if isinstance(response.response, dict) else None
+                    yield {"type": "tool_result", "author": current_agent, "name": response.name, "status": tool_status}
+
+                text = _event_text(event)
+                if not text:
+                    continue
+                if getattr(event, 'partial', False):
+                    # Streaming chunk; the complete text follows in a non-partial event
+                    yield {"type": "partial_text", "author": current_agent or "System", "text": text}
+                elif event.is_final_response():
+                    agent_name = current_agent or "Shopping Assistant"
+                    final_text = text
+                    yield {"type": "final_response", "text": text, "agent_name": agent_name}
+                else:
+                    # Capture intermediate messages as well, with the author
+                    yield {"type": "intermediate_message", "author": current_agent or "System", "text": text}
+
+        if use_response_cache and final_text:
+            response_cache.store(user_message, final_text, agent_name, agent_path, tool_names)
+
+    except AdmissionRejected as e:
+        CHAT_REJECTED.inc(e.reason)
+        logger.warning("Chat turn rejected", extra=fields(reason=e.reason, in_flight=chat_limiter.in_flight, waiting=chat_limiter.waiting))
+        yield {**_rejection_event(e), "agent_name": agent_name}
+    except TimeoutError:
+        if deadline is None or loop.time() < deadline:
+            logger.exception("Error during runner execution")
+            yield {"type": "error", "message": "An internal server error occurred. Check server logs for details.", "status_code": 500, "agent_name": agent_name}
+        else:
+            # until_deadline has cancelled the pending LLM call / tool and closed the agent run
+            CHAT_DEADLINE_EXCEEDED.inc()
+            logger.warning("Chat turn exceeded its deadline", extra=fields(session_id=session_id, deadline_seconds=CHAT_DEADLINE_SECONDS, agent_path=" > ".join(agent_path)))
+            yield {"type": "error", "message": "Sorry, that took too long to answer. Please try again.", "status_code": 504, "agent_name": agent_name}
+    except Exception as e:
+        logger.exception("Error during runner execution")
+        error_message = f"An internal server error occurred: {e}. Check server logs for details."
+        if "Missing key inputs argument" in str(e) or "api_key" in str(e).lower():
+            error_message = "Error: The AI model could not be accessed. Please ensure your Google API key is correctly set in the environment variable GOOGLE_API_KEY."
+        yield {"type": "error", "message": error_message, "status_code": 500, "agent_name": agent_name}
+    finally:
+        observe_span("chat", "agent", time.perf_counter() - turn_started)
+
+
+def _validate_chat_message(message: Dict[str, str]):
+    """Returns (user message, None) or (None, error JSONResponse) for a chat request body."""
+    user_message = (message.get("message") or "").strip()
+    if not user_message:
+        events = [{"type": "error", "message": "Please provide a message.", "status_code": 400}]
+        return None, JSONResponse(content={"response": "Please provide a message.", "events": events}, status_code=400)
+
+    return user_message, None
+
+
+@app.post("/chat")
+async def chat_endpoint(message: Dict[str, str], request: Request):
+    """
+    Receives user message, runs through ADK agent (delegation) in the client's own session,
+    and returns the final text response.
+    """
+    user_message, error_response = _validate_chat_message(message)
+    if error_response:
+        return error_response
+    try:
+        await check_chat_rate_limit(request.client)
+    except AdmissionRejected as e:
+        return _rejection_response(e)
+
+    user_id, session_id, is_new_session = resolve_client_session(request.headers, request.cookies)
+    request_idempotency_key.set(_scoped_idempotency_key(user_id, request.headers.get(IDEMPOTENCY_HEADER_NAME)))
+    request_is_admin.set(_is_admin(request))
+    logger.info("Received message", extra=fields(transport="http", session_id=session_id, chars=len(user_message)))
+
+    final_response = None
+    agent_name = "Shopping Assistant"
+    events = []
+    error_event = None
+
+    async for event in chat_events(user_message, user_id, session_id):
+        events.append(event)
+        if event["type"] == "final_response":
+            final_response = event["text"]
+            agent_name = event["agent_name"]
+        elif event["type"] == "error":
+            error_event = event
+
+    # Construct and return the JSONResponse once the turn has finished
+    if final_response:
+        try:
+            parsed_json = json.loads(final_response)
+            response = JSONResponse(content={"response": parsed_json, "agent_name": agent_name, "session_id": session_id, "events": events})
+        except (json.JSONDecodeError, TypeError):
+            response = JSONResponse(content={"response": final_response, "agent_name": agent_name, "session_id": session_id, "events": events})
+    elif error_event is not None and error_event.get("status_code") in (503, 504):
+        # Overload / deadline: pass the status (and Retry-After) through so clients can back off
+        retry_after = error_event.get("retry_after")
+        response = JSONResponse(
+            content={"response": error_event["message"], "agent_name": agent_name, "session_id": session_id, "events": events},
+            status_code=error_event["status_code"],
+            headers={"Retry-After": str(max(1, int(retry_after)))} if retry_after else None,
+        )
+    else:
+        response = JSONResponse(content={"response": "No final response received.", "agent_name": agent_name, "session_id": session_id, "events": events}, status_code=500)
+    if is_new_session:
+        _set_session_cookie(response, session_id)
+    return response
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(message: Dict[str, str], request: Request):
+    """
+    Server-Sent Events variant of /chat: pushes each event (see chat_events) as soon as
+    it happens, then a final 'done' event.
+    """
+    user_message, error_response = _validate_chat_message(message)
+    if error_response:
+        return error_response
+    try:
+        await check_chat_rate_limit(request.client)
+    except AdmissionRejected as e:
+        return _rejection_response(e)
+
+    user_id, session_id, is_new_session = resolve_client_session(request.headers, request.cookies)
+    idempotency_key = _scoped_idempotency_key(user_id, request.headers.get(IDEMPOTENCY_HEADER_NAME))
+    is_admin = _is_admin(request)
+    logger.info("Received message", extra=fields(transport="sse", session_id=session_id, chars=len(user_message)))
+
+    async def sse_events():
+        request_idempotency_key.set(idempotency_key)
+        request_is_admin.set(is_admin)
+        async for event in chat_events(user_message, user_id, session_id, streaming=True):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    response = StreamingResponse(
+        sse_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    if is_new_session:
+        _set_session_cookie(response, session_id)
+    return response
+
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """
+    WebSocket chat: the client sends {"message": "..."} frames (optionally with an
+    "idempotency_key", like the Idempotency-Key header of /chat) and receives every event
+    of the turn as a JSON frame as it happens, followed by {"type": "done"}.
+    The session comes from the handshake (header, cookie or ?session_id=); without one,
+    the connection gets its own session, announced in an initial {"type": "session"} frame.
+    """
+    user_id, session_id, _ = resolve_client_session(websocket.headers, websocket.cookies, websocket.query_params)
+    # The admin token is checked once, on the handshake headers
+    request_is_admin.set(_is_admin(websocket))
+    await websocket.accept()
+    try:
+        await websocket.send_json({"type": "session", "session_id": session_id})
+        while True:
+            data = await websocket.receive_json()
+            user_message = (data.get("message") or "").strip() if isinstance(data, dict) else ""
+            if not user_message:
+                await websocket.send_json({"type": "error", "message": "Please provide a message.", "status_code": 400})
+                await websocket.send_json({"type": "done"})
+                continue
+
+            try:
+                await check_chat_rate_limit(websocket.client)
+            except AdmissionRejected as e:
+                await websocket.send_json(_rejection_event(e))
+                await websocket.send_json({"type": "done"})
+                continue
+
+            request_idempotency_key.set(_scoped_idempotency_key(user_id, data.get("idempotency_key")))
+            logger.info("Received message", extra=fields(transport="websocket", session_id=session_id, chars=len(user_message)))
+            async for event in chat_events(user_message, user_id, session_id, streaming=True):
+                await websocket.send_json(event)
+            await websocket.send_json({"type": "done"})
+    except WebSocketDisconnect:
+        logger.info("WebSocket client disconnected.")
+
+
+@app.get("/stats/prompt-size")
+async def prompt_size_stats():
+    """Prompt size per LLM call (estimated tokens, before and after history compaction)."""
+    return JSONResponse(content={
+        "keep_turns": HISTORY_KEEP_TURNS,
+        "token_budget": HISTORY_TOKEN_BUDGET,
+        **prompt_size_metrics.summary(),
+    })
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics: latency histograms per tool, SQL statement, agent, LLM call and chat path, plus admission control and LLM pool use."""
+    for name, stats in (("tool", tool_cache.stats()), ("response", response_cache.stats() if response_cache else None)):
+        if stats:
+            CACHE_LOOKUPS.set(name, "hit", value=stats["hits"])
+            CACHE_LOOKUPS.set(name, "miss", value=stats["misses"])
+            CACHE_ENTRIES.set(name, value=stats["entries"])
+    CHAT_IN_FLIGHT.set(value=chat_limiter.in_flight)
+    CHAT_QUEUE_DEPTH.set(value=chat_limiter.waiting)
+    if llm_http_pool is not None:
+        llm_http_pool.update_metrics()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def readiness():
+    """
+    Readiness probe: 200 once this worker can run chat turns, 503 while it is still
+    warming up (AGENT_WARMUP=background) or shutting down. With AGENT_WARMUP=lazy the
+    agent tree is built on demand, so the worker is ready as soon as startup finished.
+    """
+    if runner is not None:
+        agents = "ready"
+    elif agent_warmup_task is not None and not agent_warmup_task.done():
+        agents = "warming_up"
+    elif agent_warmup_task is not None:
+        agents = "failed"
+    else:
+        agents = "not_started"
+    database = db_pool is not None and db_pool.is_open
+    ready = database and (agents == "ready" or (AGENT_WARMUP == "lazy" and agents != "failed"))
+    return JSONResponse(
+        content={
+            "ready": ready,
+            "agent_warmup": AGENT_WARMUP,
+            "agents": agents,
+            "database": database,
+        },
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/stats/llm-http")
+async def llm_http_stats():
+    """Connections, in-flight and waiting requests of the shared LLM provider HTTP pool (LLM_HTTP_POOL)."""
+    if llm_http_pool is None:
+        return JSONResponse(content={"enabled": LLM_HTTP_POOL_ENABLED, "open": False})
+    return JSONResponse(content={"enabled": True, "open": True, **llm_http_pool.stats()})
+
+
+@app.get("/stats/response-cache")
+async def response_cache_stats():
+    """Hit/miss counters of the semantic /chat response cache (RESPONSE_CACHE_ENABLED)."""
+    if response_cache is None:
+        return JSONResponse(content={"enabled": False})
+    return JSONResponse(content={"enabled": True, **response_cache.stats()})
+
+
+@app.get("/stats/cache")
+async def tool_cache_stats():
+    """Hit/miss counters and size of the search_products / check_order_status result cache, plus order status batching."""
+    return JSONResponse(content={**tool_cache.stats(), "order_status_batches": order_status_loader.stats()})
+
+
+def _is_admin(request) -> bool:
+    """True when the request (or WebSocket handshake) carries ADMIN_TOKEN. Nobody is an admin while no token is configured."""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+
+
+def _admin_forbidden(request) -> Optional[JSONResponse]:
+    """The 403 response for a request that is not from an admin (see _is_admin), else None."""
+    if not ADMIN_TOKEN:
+        return JSONResponse(content={"status": "error", "message": "Admin access is disabled: ADMIN_TOKEN is not configured."}, status_code=403)
+    if not _is_admin(request):
+        return JSONResponse(content={"status": "error", "message": "Invalid admin token."}, status_code=403)
+    return None
+
+
+@app.get("/admin/catalog")
+async def catalog_info(request: Request):
+    """Generation and size of the live product catalog."""
+    forbidden = _admin_forbidden(request)
+    if forbidden:
+        return forbidden
+    if _sql_catalog():
+        return JSONResponse(content={"store": CATALOG_STORE, "source": SQLITE_DATABASE_PATH, **sql_catalog_state})
+    return JSONResponse(content={
+        "store": CATALOG_STORE,
+        "source": PRODUCTS_FILE if CATALOG_STORE == "json" else CATALOG_FILE,
+        "generation": catalog.generation,
+        "products": len(catalog),
+        "search_terms": len(catalog.search_index.postings),
+        "changed_products": None if catalog.changed_ids is None else len(catalog.changed_ids),
+    })
+
+
+@app.get("/admin/inventory")
+async def inventory_levels(request: Request, product_id: Optional[str] = None):
+    """Units in stock per tracked product (?product_id=a,b for specific products)."""
+    forbidden = _admin_forbidden(request)
+    if forbidden:
+        return forbidden
+    if db_pool is None or not db_pool.is_open:
+        return JSONResponse(content={"status": "error", "message": "Database is not configured."}, status_code=500)
+    product_ids = [p.strip() for p in product_id.split(",") if p.strip()] if product_id else None
+    async with db_pool.reader() as db:
+        levels = await order_store.stock_levels(db, product_ids)
+    return JSONResponse(content={"status": "success", "inventory": levels})
+
+
+@app.put("/admin/inventory")
+async def set_inventory_levels(payload: Dict[str, Any], request: Request):
+    """
+    Sets stock levels. Body: {"inventory": {"<product_id>": <units>, ...}}; units null stops
+    tracking the product (unlimited stock). Products without a level are never out of stock.
+    """
+    forbidden = _admin_forbidden(request)
+    if forbidden:
+        return forbidden
+    if db_pool is None or not db_pool.is_open:
+        return JSONResponse(content={"status": "error", "message": "Database is not configured."}, status_code=500)
+    levels = payload.get("inventory")
+    if not isinstance(levels, dict) or not levels:
+        return JSONResponse(content={"status": "error", "message": "Please provide a non-empty 'inventory' object."}, status_code=400)
+    try:
+        async with db_pool.writer() as db:
+            levels = await order_store.set_stock(db, levels)
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+    logger.info("Inventory updated", extra=fields(products=len(payload["inventory"])))
+    return JSONResponse(content={"status": "success", "inventory": levels})
+
+
+@app.post("/admin/catalog/reload")
+async def reload_catalog_endpoint(request: Request, compile: bool = False):
+    """Reloads the product catalog now (`?compile=true` recompiles products.json even if it looks unchanged)."""
+    forbidden = _admin_forbidden(request)
+    if forbidden:
+        return forbidden
+    result = await reload_catalog(compile_source=compile)
+    return JSONResponse(content=result, status_code=500 if result["status"] == "error" else 200)
+
+
+@app.post("/orders")
+async def place_order_endpoint(payload: Dict[str, Any], request: Request):
+    """
+    Places one order. Body: {"items": [{"product_id": ..., "quantity": ...}]}
+    Send an Idempotency-Key header to make retries safe: a repeat returns the original
+    order (Idempotent-Replayed: true) and the key cannot be reused for other items (409).
+    """
+    if db_pool is None or not db_pool.is_open:
+        return JSONResponse(content={"status": "error", "message": "Database is not configured."}, status_code=500)
+    items = payload.get("items")
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return JSONResponse(content={"status": "error", "message": "Please provide an 'items' list."}, status_code=400)
+
+    user_id = (request.headers.get(USER_HEADER_NAME) or "").strip() or USER_ID_FOR_SESSIONS
+    result = await _place_order(items, idempotency_key=_scoped_idempotency_key(user_id, request.headers.get(IDEMPOTENCY_HEADER_NAME)))
+    if result["status"] == "success":
+        replayed = result.get("idempotent_replay", False)
+        return JSONResponse(content=result, status_code=200 if replayed else 201, headers={"Idempotent-Replayed": str(replayed).lower()})
+    # Anything else is an invalid order (unknown product, bad quantity)
+    status_code = {"insufficient_stock": 409, "idempotency_key_reused": 409, "internal_error": 500}.get(result.get("error_code"), 400)
+    return JSONResponse(content=result, status_code=status_code)
+
+
+@app.post("/orders/import")
+async def import_orders_endpoint(payload: Dict[str, Any], request: Request):
+    """
+    Bulk order import (admin; refused while ADMIN_TOKEN is unset).
+    Body: {"orders": [{"items": [{"product_id": ..., "quantity": ...}], ...}, ...]}
+    """
+    forbidden = _admin_forbidden(request)
+    if forbidden:
+        return forbidden
+    orders = payload.get("orders")
+    if not isinstance(orders, list) or not orders:
+        return JSONResponse(content={"status": "error", "message": "Please provide a non-empty 'orders' list."}, status_code=400)
+
+    result = await import_orders(orders)
+    status_code = 500 if result["status"] == "error" else 200
+    return JSONResponse(content=result, status_code=status_code)
+
+
+@app.get("/analytics/sales")
+async def sales_analytics_endpoint(request: Request, days: int = SALES_SUMMARY_DAYS, top: int = 5):
+    """
+    Revenue / orders / units per day for the last `days` days, the `top` best sellers and
+    order counts by status, read from the sales rollup tables (cost independent of order volume).
+    """
+    forbidden = _admin_forbidden(request)
+    if forbidden:
+        return forbidden
+    if db_pool is None or not db_pool.is_open:
+        return JSONResponse(content={"status": "error", "message": "Database is not configured."}, status_code=500)
+    return JSONResponse(content={"status": "success", **await sales_summary(days, top)})
+
+
+@app.get("/orders/stream")
+async def stream_orders_endpoint(user_id: Optional[str] = None, page_size: int = MAX_ORDER_PAGE_SIZE):
+    """
+    Streams the full order history (most recent first, then the archived orders) as NDJSON,
+    one order per line. Rows are read page by page, so memory use stays constant regardless of history size.
+    """
+    if db_pool is None or not db_pool.is_open:
+        return JSONResponse(content={"status": "error", "message": "Database is not configured."}, status_code=500)
+
+    page_size = max(1, min(page_size, MAX_ORDER_PAGE_SIZE))
+
+    async def ndjson_lines():
+        async for row in iter_orders(user_id=user_id, page_size=page_size, include_archive=True):
+            yield json.dumps(row) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+# --- How to run ---
+# 1. Save the code as main.py
+# 2. Create the 'templates' folder with index.html, style.css, script.js
+# 3. Create products.json in the same directory as main.py
+# 4. Create/Update a .env file with your Google API key and SQLite database path:
+#    GOOGLE_API_KEY=YOUR_ACTUAL_GOOGLE_API_KEY
+#    SQLITE_DATABASE_PATH=./ecommerce.db
+#    Optional tuning: SQLITE_POOL_READERS=4, SQLITE_MMAP_SIZE=268435456, SQLITE_CACHE_SIZE_KIB=65536,
+#    SQLITE_CHECK_QUERY_PLANS=on_migrate|always|never (EXPLAIN the recorded query plans at startup)
+#    Sessions: SESSION_STORE=sqlite|memory, SESSION_DATABASE_PATH=./sessions.db, SESSION_TTL_SECONDS=86400, SESSION_MAX_EVENTS=200
+#    History compaction: HISTORY_KEEP_TURNS=3, HISTORY_TOKEN_BUDGET=4000, HISTORY_TOOL_SUMMARY_CHARS=300
+#    Tool result cache: TOOL_CACHE_MAX_ENTRIES=2048, TOOL_CACHE_TTL_SECONDS=600, ORDER_STATUS_CACHE_TTL_SECONDS=30
+#    Order status: concurrent lookups share one IN (...) query; check_order_statuses takes up to MAX_ORDER_STATUS_BATCH=20 IDs
+#    LLM endpoint: LLM_API_BASE=https://..., LLM_API_KEY=..., LLM_MODEL=gpt-4o-mini; all LLM calls share one pooled client
+#    (LLM_HTTP_POOL=true): LLM_HTTP_MAX_CONNECTIONS=100, LLM_HTTP_MAX_KEEPALIVE=20, LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS=60,
+#    LLM_HTTP_MAX_PER_HOST=32 (then requests wait for a slot), LLM_HTTP2=true (needs pip install h2 and an https endpoint),
+#    LLM_HTTP_CONNECT_TIMEOUT_SECONDS=5, LLM_HTTP_TIMEOUT_SECONDS=120, LLM_HTTP_VERIFY=true, LLM_HTTP_WARMUP_CONNECTIONS=2
+#    (opened with the agent warm-up); pool use at GET /stats/llm-http and GET /metrics;
+#    against a local fake LLM server: python benchmarks/load_chat.py --llm-server
+#    Logging: LOG_LEVEL=INFO|DEBUG (DEBUG logs every tool/SQL/LLM span), LOG_FORMAT=text|json; metrics at GET /metrics
+#    Chat response cache (off by default): RESPONSE_CACHE_ENABLED=true, RESPONSE_CACHE_SIMILARITY=1.0,
+#    RESPONSE_CACHE_TTL_SECONDS=3600, RESPONSE_CACHE_MAX_ENTRIES=512
+#    Admission control (per worker): CHAT_MAX_IN_FLIGHT=32 agent runs, CHAT_MAX_QUEUE=64 waiting (then 503),
+#    CHAT_QUEUE_TIMEOUT_SECONDS=10, CHAT_DEADLINE_SECONDS=60 (504, the agent run is cancelled);
+#    per client address (use --proxy-headers behind a proxy): CHAT_RATE_LIMIT=30 messages per CHAT_RATE_LIMIT_WINDOW_SECONDS=60 (then 429)
+#    Orders: POST /orders (or /chat) with an Idempotency-Key header is safe to retry, IDEMPOTENCY_KEY_TTL_SECONDS=86400;
+#    stock is tracked for products given a level with PUT /admin/inventory {"inventory": {"p-001": 25}} (GET to read; ADMIN_TOKEN);
+#    stress test: python benchmarks/stress_orders.py --workers 4 (single-process version: pytest tests/test_order_concurrency.py)
+#    remove_order cancels in place (status 'Cancelled'); orders older than ORDER_ARCHIVE_AFTER_DAYS=90 (0 = never) move to
+#    archive tables every ORDER_ARCHIVE_INTERVAL_SECONDS=3600 in batches of ORDER_ARCHIVE_BATCH_SIZE=1000, inside the orders
+#    database or in ORDER_ARCHIVE_PATH=./orders_archive.db; run once with: python order_archive.py --days 90
+#    Sales analytics: order writes keep rollup tables (revenue per day, units per product, orders per status) in the
+#    same transaction; read them with GET /analytics/sales?days=7&top=5 or the sales_analytics_agent (both need ADMIN_TOKEN);
+#    recompute them from the order history with: python sales_rollups.py [--archive orders_archive.db]
+#    Category / price queries: search_products(sort_by="price_asc"|"price_desc") and the category list use a NumPy
+#    columnar view of the catalog (pip install numpy), rebuilt on every catalog reload; PRICE_SORT_CANDIDATES=500
+#    Catalog: CATALOG_STORE=sqlite|mmap|json, CATALOG_FILE=./products.cat, CATALOG_WATCH_INTERVAL_SECONDS=5, ADMIN_TOKEN=...
+#    (edit products.json and the catalog is re-imported / recompiled and hot-reloaded; or POST /admin/catalog/reload,
+#    or compile ahead of time with: python catalog_store.py products.json products.cat)
+# 5. Install necessary libraries: pip install fastapi uvicorn google-adk google-generativeai python-dotenv httpx aiosqlite numpy
+# 6. Make sure your GOOGLE_API_KEY environment variable is correctly set via the .env file.
+#    When you run uvicorn, check the terminal output for the "DEBUG: GOOGLE_API_KEY loaded from environment:" line
+#    to confirm your key is being loaded.
+# 7. Run: uvicorn main:app --reload
+#    Cold start: AGENT_WARMUP=startup|background|lazy. google.adk and LiteLLM are imported (and the agent tree built)
+#    only then, so with background|lazy a worker serves orders, catalog and fast-path answers within about a second;
+#    GET /ready is 503 until it can run agent turns. Measure with: python benchmarks/bench_startup.py
+# 8. Multi-worker mode (one process per core): WEB_CONCURRENCY=4 uvicorn main:app --host 0.0.0.0 --port 8000
+#    WEB_CONCURRENCY > 1 selects SHARED_STATE_BACKEND=sqlite (SHARED_STATE_PATH=./shared_state.db,
+#    SHARED_STATE_POLL_INTERVAL_SECONDS=0.25); set it explicitly when starting workers another way (e.g. gunicorn -w 4
+#    -k uvicorn.workers.UvicornWorker main:app). Keep SESSION_STORE=sqlite and CATALOG_STORE=sqlite|mmap so every
+#    worker sees the same sessions, orders and catalog. Tool/response caches stay per worker: order writes are
+#    broadcast as invalidations (other workers apply them within the poll interval) and catalog reloads are
+#    picked up by each worker's watcher. /metrics and /stats/* report the worker that answered the request.
\ No newline at end of file
@@ -0,0 +1,476 @@
+"""
+Versioned schema migrations for the orders database.
+
+The applied version is stored in SQLite's `PRAGMA user_version`. On startup
+`run_migrations` applies every migration newer than that version, each in its
+own transaction, so an up-to-date database costs a single PRAGMA read.
+
+Each migration may also record the EXPLAIN QUERY PLAN output that its hot
+queries are expected to produce. `check_query_plans` verifies them against a
+database, so the order queries stay on index lookups as order volume grows:
+
+    python migrations.py --check [path/to/ecommerce.db]
+"""
+import asyncio
+import os
+import sys
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import aiosqlite
+
+from observability import configure_logging, get_logger
+
+logger = get_logger("migrations")
+
+
+async def _column_names(db: aiosqlite.Connection, table: str) -> List[str]:
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return [row[1] for row in rows]
+
+
+async def _m001_create_order_tables(db: aiosqlite.Connection) -> None:
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id VARCHAR(255) PRIMARY KEY,
+            user_id VARCHAR(255),
+            status VARCHAR(50),
+            created_at DATETIME,
+            details TEXT,
+            total_price REAL DEFAULT 0.0 -- Total price of the order
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS order_items (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id VARCHAR(255),
+            product_id VARCHAR(255),
+            quantity INTEGER,
+            price REAL, -- Stores unit price at time of order
+            FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE
+        )
+    """)
+
+
+async def _m002_add_price_columns(db: aiosqlite.Connection) -> None:
+    # Databases created from the original test.sql lack these columns (they were added with ALTER TABLE)
+    if "price" not in await _column_names(db, "order_items"):
+        await db.execute("ALTER TABLE order_items ADD COLUMN price REAL")
+    if "total_price" not in await _column_names(db, "orders"):
+        await db.execute("ALTER TABLE orders ADD COLUMN total_price REAL DEFAULT 0.0")
+
+
+async def _m003_add_order_indexes(db: aiosqlite.Connection) -> None:
+    # Covers the check_order_status JOIN and the order_items deletes in remove_order
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_order_items_order_id
+        ON order_items (order_id, product_id, quantity, price)
+    """)
+    # Covers list_all_orders (ORDER BY created_at DESC) without a sort or table lookups
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_orders_created_at
+        ON orders (created_at, order_id, status, total_price)
+    """)
+    # Per-user order history
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_orders_user_created_at
+        ON orders (user_id, created_at, order_id, status, total_price)
+    """)
+
+
+async def _m004_create_product_tables(db: aiosqlite.Connection) -> None:
+    # Catalog imported from products.json (see product_store.py); rowid order = catalog order
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            product_id VARCHAR(255) PRIMARY KEY,
+            name TEXT NOT NULL,
+            price REAL, -- NULL when the source price is missing or non-numeric
+            description TEXT NOT NULL DEFAULT '',
+            category TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+            checksum INTEGER NOT NULL -- content hash, lets re-imports skip unchanged rows
+        )
+    """)
+    # Category / price-range browsing
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_products_category_price ON products (category, price)")
+    # Bumped by every import that changed something, so all processes can tell the catalog moved
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL,
+            updated_at DATETIME
+        )
+    """)
+    await db.execute("INSERT OR IGNORE INTO catalog_meta (id, generation, updated_at) VALUES (1, 0, NULL)")
+    # Full-text index over the products table, kept in sync by triggers
+    try:
+        await db.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                name, description, category,
+                content='products', content_rowid='rowid', tokenize='porter unicode61'
+            )
+        """)
+    except aiosqlite.OperationalError as e:
+        # SQLite built without FTS5: the server keeps searching the in-memory catalog
+        logger.warning(f"FTS5 is not available ({e}); products_fts was not created.")
+        return
+    # ORDER BY rank = BM25 with name and category weighted like the in-memory index (3x / 2x)
+    await db.execute("INSERT INTO products_fts (products_fts, rank) VALUES ('rank', 'bm25(3.0, 1.0, 2.0)')")
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name, description, category)
+            VALUES (new.rowid, new.name, new.description, new.category);
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description, category)
+            VALUES ('delete', old.rowid, old.name, old.description, old.category);
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description, category)
+            VALUES ('delete', old.rowid, old.name, old.description, old.category);
+            INSERT INTO products_fts (rowid, name, description, category)
+            VALUES (new.rowid, new.name, new.description, new.category);
+        END
+    """)
+
+
+
+async def _m005_create_inventory_tables(db: aiosqlite.Connection) -> None:
+    # Stock per product (see order_store.py); products without a row are not stock-tracked
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS inventory (
+            product_id VARCHAR(255) PRIMARY KEY,
+            quantity INTEGER NOT NULL CHECK (quantity >= 0),
+            updated_at DATETIME
+        )
+    """)
+    # Units each order took from inventory, so remove_order gives back exactly those
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS inventory_reservations (
+            order_id VARCHAR(255) NOT NULL,
+            product_id VARCHAR(255) NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (order_id, product_id)
+        ) WITHOUT ROWID
+    """)
+    # Idempotency-Key -> the order it created and the response returned for it
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            idempotency_key TEXT PRIMARY KEY,
+            request_hash TEXT NOT NULL,
+            order_id VARCHAR(255) NOT NULL,
+            response TEXT NOT NULL,
+            created_at DATETIME NOT NULL
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys (created_at)")
+
+
+async def _m006_add_cancelled_at(db: aiosqlite.Connection) -> None:
+    # remove_order cancels in place (status 'Cancelled') instead of deleting the order
+    if "cancelled_at" not in await _column_names(db, "orders"):
+        await db.execute("ALTER TABLE orders ADD COLUMN cancelled_at DATETIME")
+
+
+async def _m007_create_sales_rollups(db: aiosqlite.Connection) -> None:
+    # Summary tables maintained by the order writes (see sales_rollups.py)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day TEXT PRIMARY KEY, -- YYYY-MM-DD of the orders' created_at
+            orders INTEGER NOT NULL DEFAULT 0,
+            units INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0.0,
+            cancelled_orders INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS sales_by_product (
+            product_id VARCHAR(255) PRIMARY KEY,
+            orders INTEGER NOT NULL DEFAULT 0,
+            units INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0.0
+        ) WITHOUT ROWID
+    """)
+    # Best sellers: reads the first rows of the index instead of sorting every product
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sales_by_product_units
+        ON sales_by_product (units DESC, product_id, orders, revenue)
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS order_status_counts (
+            status VARCHAR(50) PRIMARY KEY,
+            orders INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    # Backfill from the existing order history (hot tables and any archive tier already attached)
+    from sales_rollups import rebuild
+    await rebuild(db)
+
+
+# (version, description, apply). Append new migrations; never edit or reorder applied ones.
+MIGRATIONS: List[Tuple[int, str, Callable[[aiosqlite.Connection], Awaitable[None]]]] = [
+    (1, "create orders and order_items tables", _m001_create_order_tables),
+    (2, "add order_items.price and orders.total_price", _m002_add_price_columns),
+    (3, "add covering indexes for order lookups and listing", _m003_add_order_indexes),
+    (4, "create products, catalog_meta and products_fts tables", _m004_create_product_tables),
+    (5, "create inventory, inventory_reservations and idempotency_keys tables", _m005_create_inventory_tables),
+    (6, "add orders.cancelled_at", _m006_add_cancelled_at),
+    (7, "create sales_daily, sales_by_product and order_status_counts rollup tables", _m007_create_sales_rollups),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Expected EXPLAIN QUERY PLAN output per migration: (version, query name, sql, plan fragments).
+# Every expected fragment must appear in some plan line; a full-table SCAN or a temp B-tree sort fails the check.
+QUERY_PLANS: List[Tuple[int, str, str, List[str]]] = [
+    (
+        3,
+        "check_order_status",
+        """
+        SELECT o.order_id, o.status, o.created_at, o.details, o.total_price,
+               oi.product_id, oi.quantity, oi.price
+        FROM orders o
+        LEFT JOIN order_items oi ON o.order_id = oi.order_id
+        WHERE o.order_id = ?
+        """,
+        [
+            "SEARCH o USING INDEX sqlite_autoindex_orders_1 (order_id=?)",
+            "SEARCH oi USING COVERING INDEX idx_order_items_order_id (order_id=?) LEFT-JOIN",
+        ],
+    ),
+    (
+        3,
+        "remove_order items",
+        "DELETE FROM order_items WHERE order_id = ?",
+        # Reported as COVERING INDEX when foreign_keys is ON
+        ["SEARCH order_items USING", "INDEX idx_order_items_order_id (order_id=?)"],
+    ),
+    (
+        3,
+        "list_all_orders",
+        "SELECT order_id, status, created_at, total_price FROM orders ORDER BY created_at DESC",
+        ["SCAN orders USING COVERING INDEX idx_orders_created_at"],
+    ),
+    (
+        3,
+        "list_all_orders next page",
+        """
+        SELECT order_id, status, created_at, total_price FROM orders
+        WHERE (created_at, order_id) < (?, ?)
+        ORDER BY created_at DESC, order_id DESC LIMIT ?
+        """,
+        ["SEARCH orders USING COVERING INDEX idx_orders_created_at ((created_at,order_id)<(?,?))"],
+    ),
+    (
+        3,
+        "list_all_orders next page by user",
+        """
+        SELECT order_id, status, created_at, total_price FROM orders
+        WHERE user_id = ? AND (created_at, order_id) < (?, ?)
+        ORDER BY created_at DESC, order_id DESC LIMIT ?
+        """,
+        ["SEARCH orders USING COVERING INDEX idx_orders_user_created_at (user_id=? AND (created_at,order_id)<(?,?))"],
+    ),
+    (
+        3,
+        "list_all_orders by user",
+        "SELECT order_id, status, created_at, total_price FROM orders WHERE user_id = ? ORDER BY created_at DESC",
+        ["SEARCH orders USING COVERING INDEX idx_orders_user_created_at (user_id=?)"],
+    ),
+    (
+        4,
+        "check_order_status with product names",
+        """
+        SELECT o.order_id, o.status, o.created_at, o.details, o.total_price,
+               oi.product_id, oi.quantity, oi.price, p.name AS product_name
+        FROM orders o
+        LEFT JOIN order_items oi ON o.order_id = oi.order_id
+        LEFT JOIN products p ON p.product_id = oi.product_id
+        WHERE o.order_id = ?
+        """,
+        [
+            "SEARCH o USING INDEX sqlite_autoindex_orders_1 (order_id=?)",
+            "SEARCH oi USING COVERING INDEX idx_order_items_order_id (order_id=?) LEFT-JOIN",
+            "SEARCH p USING INDEX sqlite_autoindex_products_1 (product_id=?) LEFT-JOIN",
+        ],
+    ),
+    (
+        4,
+        "check_order_status batched lookup",
+        """
+        SELECT o.order_id, o.status, o.created_at, o.details, o.total_price,
+               oi.product_id, oi.quantity, oi.price, p.name AS product_name
+        FROM orders o
+        LEFT JOIN order_items oi ON o.order_id = oi.order_id
+        LEFT JOIN products p ON p.product_id = oi.product_id
+        WHERE o.order_id IN (?, ?, ?)
+        """,
+        [
+            "SEARCH o USING INDEX sqlite_autoindex_orders_1 (order_id=?)",
+            "SEARCH oi USING COVERING INDEX idx_order_items_order_id (order_id=?) LEFT-JOIN",
+            "SEARCH p USING INDEX sqlite_autoindex_products_1 (product_id=?) LEFT-JOIN",
+        ],
+    ),
+    (
+        4,
+        "place_order product lookup",
+        "SELECT product_id, name, price, description, category FROM products WHERE product_id IN (?, ?, ?)",
+        ["SEARCH products USING INDEX sqlite_autoindex_products_1 (product_id=?)"],
+    ),
+    (
+        5,
+        "place_order idempotency key lookup",
+        "SELECT request_hash, order_id, response, created_at FROM idempotency_keys WHERE idempotency_key = ?",
+        ["SEARCH idempotency_keys USING INDEX sqlite_autoindex_idempotency_keys_1 (idempotency_key=?)"],
+    ),
+    (
+        5,
+        "place_order stock reservation",
+        "UPDATE inventory SET quantity = quantity - ?, updated_at = ? WHERE product_id = ? AND quantity >= ?",
+        ["SEARCH inventory USING INDEX sqlite_autoindex_inventory_1 (product_id=?)"],
+    ),
+    (
+        5,
+        "remove_order reservations",
+        "SELECT product_id, quantity FROM inventory_reservations WHERE order_id = ?",
+        ["SEARCH inventory_reservations USING PRIMARY KEY (order_id=?)"],
+    ),
+    (
+        5,
+        "idempotency key expiry",
+        "DELETE FROM idempotency_keys WHERE created_at < ?",
+        ["SEARCH idempotency_keys USING INDEX idx_idempotency_keys_created_at (created_at<?)"],
+    ),
+    (
+        6,
+        "remove_order soft cancel",
+        "UPDATE orders SET status = 'Cancelled', cancelled_at = ? WHERE order_id = ? AND status != 'Cancelled'",
+        ["SEARCH orders USING INDEX sqlite_autoindex_orders_1 (order_id=?)"],
+    ),
+    (
+        6,
+        "order archival batch",
+        "SELECT order_id FROM orders WHERE created_at < ? ORDER BY created_at LIMIT ?",
+        ["SEARCH orders USING COVERING INDEX idx_orders_created_at (created_at<?)"],
+    ),
+    (
+        7,
+        "remove_order previous status",
+        "SELECT status, created_at, total_price FROM orders WHERE order_id = ?",
+        ["SEARCH orders USING INDEX sqlite_autoindex_orders_1 (order_id=?)"],
+    ),
+    (
+        7,
+        "remove_order rollup item totals",
+        """
+        SELECT product_id, SUM(quantity), SUM(quantity * COALESCE(price, 0.0))
+        FROM order_items WHERE order_id = ? GROUP BY product_id
+        """,
+        ["SEARCH order_items USING COVERING INDEX idx_order_items_order_id (order_id=?)"],
+    ),
+    (
+        7,
+        "sales analytics daily revenue",
+        "SELECT day, orders, units, revenue, cancelled_orders FROM sales_daily WHERE day >= ? ORDER BY day DESC",
+        ["SEARCH sales_daily USING PRIMARY KEY (day>?)"],
+    ),
+    (
+        7,
+        "sales analytics top products",
+        """
+        SELECT product_id, orders, units, revenue FROM sales_by_product
+        WHERE units > 0 ORDER BY units DESC, product_id LIMIT ?
+        """,
+        ["SEARCH sales_by_product USING COVERING INDEX idx_sales_by_product_units (units>?)"],
+    ),
+]
+
+
+async def get_schema_version(db: aiosqlite.Connection) -> int:
+    cursor = await db.execute("PRAGMA user_version")
+    row = await cursor.fetchone()
+    await cursor.close()
+    return row[0]
+
+
+async def run_migrations(db: aiosqlite.Connection) -> int:
+    """
+    Applies all pending migrations and returns the resulting schema version.
+    Each migration runs in its own transaction together with its user_version bump.
+    """
+    current = await get_schema_version(db)
+    if current >= LATEST_VERSION:
+        return current
+
+    for version, description, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process (e.g. a second uvicorn worker) may have applied it while we waited for the lock
+            current = await get_schema_version(db)
+            if version <= current:
+                await db.rollback()
+                continue
+            logger.info(f"Applying database migration {version}: {description}")
+            await apply(db)
+            await db.execute(f"PRAGMA user_version = {int(version)}")
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+        current = version
+    return current
+
+
+async def explain(db: aiosqlite.Connection, sql: str) -> List[str]:
+    """Returns the EXPLAIN QUERY PLAN detail lines for `sql` (parameters bound to NULL)."""
+    params = [None] * sql.count("?")
+    cursor = await db.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return [row[3] for row in rows]
+
+
+async def check_query_plans(db: aiosqlite.Connection) -> List[Dict[str, Any]]:
+    """
+    Compares the current query plans with the ones recorded in QUERY_PLANS for
+    every applied migration. Returns a list of mismatches (empty when all pass).
+    """
+    version = await get_schema_version(db)
+    failures = []
+    for plan_version, name, sql, expected in QUERY_PLANS:
+        if plan_version > version:
+            continue
+        actual = await explain(db, sql)
+        missing = [fragment for fragment in expected if not any(fragment in line for line in actual)]
+        regressions = [line for line in actual if line.startswith("SCAN") and "USING COVERING INDEX" not in line]
+        regressions += [line for line in actual if "TEMP B-TREE" in line]
+        if missing or regressions:
+            failures.append({"query": name, "expected": expected, "actual": actual})
+    return failures
+
+
+async def _main(path: str) -> int:
+    async with aiosqlite.connect(path) as db:
+        version = await run_migrations(db)
+        print(f"Schema version: {version}")
+        failures = await check_query_plans(db)
+    for failure in failures:
+        print(f"Query plan mismatch for {failure['query']}:")
+        print(f"  expected: {failure['expected']}")
+        print(f"  actual:   {failure['actual']}")
+    if not failures:
+        print(f"All {len(QUERY_PLANS)} recorded query plans match.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    configure_logging()
+    args = [a for a in sys.argv[1:] if a != "--check"]
+    db_path = args[0] if args else os.getenv("SQLITE_DATABASE_PATH", "./ecommerce.db")
+    sys.exit(asyncio.run(_main(db_path)))
@@ -0,0 +1,305 @@
+"""
+Structured logging, tracing spans and Prometheus metrics.
+
+Replaces the print() debugging on the hot paths:
+
+* `get_logger(name)` returns a logger under the "ecommerce" namespace, gated by
+  LOG_LEVEL (default INFO) and formatted as text or one JSON object per line
+  (LOG_FORMAT=json). Structured fields are passed with `extra=fields(...)`.
+* `span(kind, name, **attributes)` times a block (tool, sql, llm, agent, chat),
+  records it in the matching latency histogram, logs it at DEBUG and, when
+  OpenTelemetry is installed, opens a span so traces nest under the ADK's own.
+* `traced_tool` wraps an agent tool function in a "tool" span and counts
+  calls per result status; `AgentCallTracer` provides the before/after agent
+  and model callbacks that time every agent run and LLM call.
+* `metrics.render()` serves everything in the Prometheus text format (/metrics).
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # Tracing is optional; metrics and logs work without it
+    otel_trace = None
+
+LOGGER_NAMESPACE = "ecommerce"
+
+
+# --- Logging ---
+
+def fields(**values: Any) -> Dict[str, Any]:
+    """`extra=` payload for structured log fields: logger.info("Order placed", extra=fields(order_id=...))."""
+    return {"fields": values}
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            line += f" {key}={value}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **(getattr(record, "fields", None) or {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """Configures the "ecommerce" logger tree from LOG_LEVEL / LOG_FORMAT (idempotent)."""
+    root = logging.getLogger(LOGGER_NAMESPACE)
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if (fmt or os.getenv("LOG_FORMAT", "text")).lower() == "json" else TextFormatter())
+    root.handlers[:] = [handler]
+    root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{LOGGER_NAMESPACE}.{name}")
+
+
+# --- Metrics ---
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: Any, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, *labelvalues: Any, value: float) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [bucket counts..., sum, count]
+        self._series: Dict[Tuple[Any, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: Any) -> None:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {count:g}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {series[-1]:g}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {series[-1]:g}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# Span kind -> (latency histogram, label name)
+SPAN_HISTOGRAMS: Dict[str, Tuple[Histogram, str]] = {
+    "tool": (metrics.histogram("ecommerce_tool_latency_seconds", "Agent tool call latency.", ["tool"]), "tool"),
+    "sql": (metrics.histogram("ecommerce_sql_latency_seconds", "SQL statement latency.", ["statement"]), "statement"),
+    "llm": (metrics.histogram("ecommerce_llm_call_latency_seconds", "LLM call latency per agent.", ["agent"]), "agent"),
+    "agent": (metrics.histogram("ecommerce_agent_latency_seconds", "Agent run latency (including sub-calls).", ["agent"]), "agent"),
+    "chat": (metrics.histogram("ecommerce_chat_latency_seconds", "Chat turn latency by path.", ["path"]), "path"),
+}
+SPAN_ERRORS = metrics.counter("ecommerce_span_errors_total", "Spans that ended with an exception.", ["kind", "name"])
+TOOL_CALLS = metrics.counter("ecommerce_tool_calls_total", "Agent tool calls by result status.", ["tool", "status"])
+AGENT_TRANSFERS = metrics.counter("ecommerce_agent_transfers_total", "Agent-to-agent transfers.", ["from_agent", "to_agent"])
+
+_span_logger = get_logger("trace")
+_tracer = otel_trace.get_tracer(LOGGER_NAMESPACE) if otel_trace is not None else None
+
+
+@contextmanager
+def span(kind: str, name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Times the block as a `kind` span (tool, sql, llm, agent, chat) named `name`.
+    Yields a dict the block may add attributes to (e.g. the result status).
+    """
+    attributes = dict(attributes)
+    otel_context = _tracer.start_as_current_span(f"{kind} {name}") if _tracer is not None else None
+    otel_span = otel_context.__enter__() if otel_context is not None else None
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        histogram = SPAN_HISTOGRAMS.get(kind)
+        if histogram is not None:
+            histogram[0].observe(duration, name)
+        if error is not None:
+            SPAN_ERRORS.inc(kind, name)
+        if otel_span is not None:
+            for key, value in attributes.items():
+                if isinstance(value, (str, bool, int, float)):
+                    otel_span.set_attribute(f"ecommerce.{key}", value)
+            otel_context.__exit__(type(error) if error else None, error, error.__traceback__ if error else None)
+        if _span_logger.isEnabledFor(logging.DEBUG):
+            _span_logger.debug(
+                f"{kind} {name}",
+                extra=fields(kind=kind, span=name, duration_ms=round(duration * 1000, 3),
+                             error=repr(error) if error else None, **attributes),
+            )
+
+
+def traced_tool(func):
+    """Wraps an async tool function in a "tool" span and counts calls per result status."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with span("tool", func.__name__) as attributes:
+            result = await func(*args, **kwargs)
+            status = result.get("status", "unknown") if isinstance(result, dict) else "unknown"
+            attributes["status"] = status
+        TOOL_CALLS.inc(func.__name__, status)
+        return result
+    return wrapper
+
+
+class AgentCallTracer:
+    """
+    before/after agent and model callbacks that time every agent run ("agent"
+    spans) and LLM call ("llm" spans). Open timers live in a context variable,
+    so concurrent chats never see each other's.
+    """
+
+    def __init__(self):
+        self._open: contextvars.ContextVar = contextvars.ContextVar("ecommerce_open_spans", default=())
+
+    def _start(self, kind: str, name: str) -> None:
+        self._open.set(self._open.get() + ((kind, name, time.perf_counter()),))
+
+    def _finish(self, kind: str, name: str, error: bool = False) -> None:
+        frames = self._open.get()
+        for i in range(len(frames) - 1, -1, -1):
+            if frames[i][0] == kind and frames[i][1] == name:
+                duration = time.perf_counter() - frames[i][2]
+                self._open.set(frames[:i] + frames[i + 1:])
+                SPAN_HISTOGRAMS[kind][0].observe(duration, name)
+                if error:
+                    SPAN_ERRORS.inc(kind, name)
+                if _span_logger.isEnabledFor(logging.DEBUG):
+                    _span_logger.debug(f"{kind} {name}", extra=fields(kind=kind, span=name, duration_ms=round(duration * 1000, 3)))
+                return
+
+    def before_agent(self, callback_context) -> None:
+        self._start("agent", callback_context.agent_name)
+        return None
+
+    def after_agent(self, callback_context) -> None:
+        self._finish("agent", callback_context.agent_name)
+        return None
+
+    def before_model(self, callback_context, llm_request) -> None:
+        self._start("llm", callback_context.agent_name)
+        return None
+
+    def after_model(self, callback_context, llm_response) -> None:
+        # Streaming calls yield partial responses first; the call ends with the complete one
+        if not getattr(llm_response, "partial", False):
+            self._finish("llm", callback_context.agent_name, error=bool(getattr(llm_response, "error_code", None)))
+        return None
+
+
+def record_agent_transfer(from_agent: str, to_agent: str) -> None:
+    AGENT_TRANSFERS.inc(from_agent, to_agent)
+    _span_logger.debug("agent transfer", extra=fields(from_agent=from_agent, to_agent=to_agent))
+
+
+def observe_span(kind: str, name: str, duration: float) -> None:
+    """Records an already-measured duration (e.g. a streamed chat turn) in the `kind` histogram."""
+    SPAN_HISTOGRAMS[kind][0].observe(duration, name)
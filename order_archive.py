@@ -0,0 +1,175 @@
+"""
+Archive tier for old orders.
+
+Orders created more than ORDER_ARCHIVE_AFTER_DAYS ago are moved, in batches,
+from the hot `orders` / `order_items` tables into `orders_archive` /
+`order_items_archive`, so the tables and indexes behind check_order_status
+and list_all_orders only hold recent orders. The archive tables live either
+in the orders database itself (schema "main") or in a separate SQLite file
+ATTACHed to every pool connection as "archive" (ORDER_ARCHIVE_PATH), which
+also keeps the hot database file and its backups small.
+
+Moving a batch copies it with INSERT OR IGNORE and then deletes it from the
+hot tables. In the same file both happen in one transaction. Across attached
+WAL databases SQLite commits each file atomically but not both together, so
+the copy commits first and the delete follows in its own transaction: a crash
+in between leaves the batch in both tiers, and the next run skips the copies
+and finishes the delete. Nothing is ever deleted before it is in the archive.
+
+To archive once from the command line (the server also runs it periodically):
+    python order_archive.py [--days 90] [--archive orders_archive.db] [path/to/ecommerce.db]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+from typing import Optional
+
+import aiosqlite
+
+from migrations import run_migrations
+from observability import configure_logging
+
+ARCHIVE_SCHEMA = "archive"
+ORDER_COLUMNS = "order_id, user_id, status, created_at, details, total_price, cancelled_at"
+ORDER_ITEM_COLUMNS = "item_id, order_id, product_id, quantity, price"
+
+
+def archive_schema(archive_path: Optional[str]) -> str:
+    """Schema holding the archive tables: the attached archive file, or the orders database itself."""
+    return ARCHIVE_SCHEMA if archive_path else "main"
+
+
+def cutoff_for(days: float) -> str:
+    """created_at bound (same isoformat as the orders table) for orders older than `days`."""
+    return (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+
+
+ARCHIVE_OBJECTS = (
+    "orders_archive", "order_items_archive",
+    "idx_order_items_archive_order_id", "idx_orders_archive_created_at", "idx_orders_archive_user_created_at",
+)
+
+
+async def ensure_archive_tables(db: aiosqlite.Connection, schema: str) -> None:
+    """Creates the archive tables (shaped like the hot ones, with the same covering indexes) if missing."""
+    placeholders = ", ".join("?" for _ in ARCHIVE_OBJECTS)
+    cursor = await db.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master WHERE name IN ({placeholders})", ARCHIVE_OBJECTS)
+    existing = (await cursor.fetchone())[0]
+    await cursor.close()
+    if existing == len(ARCHIVE_OBJECTS):
+        # Already in place: avoid taking the write lock at every worker start
+        return
+
+    await db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.orders_archive (
+            order_id VARCHAR(255) PRIMARY KEY,
+            user_id VARCHAR(255),
+            status VARCHAR(50),
+            created_at DATETIME,
+            details TEXT,
+            total_price REAL DEFAULT 0.0,
+            cancelled_at DATETIME,
+            archived_at DATETIME NOT NULL
+        )
+    """)
+    await db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.order_items_archive (
+            item_id INTEGER PRIMARY KEY,
+            order_id VARCHAR(255),
+            product_id VARCHAR(255),
+            quantity INTEGER,
+            price REAL
+        )
+    """)
+    await db.execute(f"""
+        CREATE INDEX IF NOT EXISTS {schema}.idx_order_items_archive_order_id
+        ON order_items_archive (order_id, product_id, quantity, price)
+    """)
+    await db.execute(f"""
+        CREATE INDEX IF NOT EXISTS {schema}.idx_orders_archive_created_at
+        ON orders_archive (created_at, order_id, status, total_price)
+    """)
+    await db.execute(f"""
+        CREATE INDEX IF NOT EXISTS {schema}.idx_orders_archive_user_created_at
+        ON orders_archive (user_id, created_at, order_id, status, total_price)
+    """)
+    await db.commit()
+
+
+async def _in_transaction(db: aiosqlite.Connection, statements) -> None:
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        for sql, params in statements:
+            await db.execute(sql, params)
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+
+async def archive_batch(db: aiosqlite.Connection, schema: str, cutoff: str, batch_size: int) -> int:
+    """
+    Moves up to `batch_size` of the oldest orders created before `cutoff` (and their
+    items) into the archive tables. Returns how many orders were moved.
+    """
+    cursor = await db.execute(
+        "SELECT order_id FROM orders WHERE created_at < ? ORDER BY created_at LIMIT ?", (cutoff, batch_size)
+    )
+    order_ids = [row[0] for row in await cursor.fetchall()]
+    await cursor.close()
+    if not order_ids:
+        return 0
+
+    placeholders = ", ".join("?" for _ in order_ids)
+    archived_at = datetime.datetime.now().isoformat()
+    copy = [
+        (f"""INSERT OR IGNORE INTO {schema}.orders_archive ({ORDER_COLUMNS}, archived_at)
+             SELECT {ORDER_COLUMNS}, ? FROM orders WHERE order_id IN ({placeholders})""", [archived_at, *order_ids]),
+        (f"""INSERT OR IGNORE INTO {schema}.order_items_archive ({ORDER_ITEM_COLUMNS})
+             SELECT {ORDER_ITEM_COLUMNS} FROM order_items WHERE order_id IN ({placeholders})""", order_ids),
+    ]
+    # Only rows that made it into the archive are deleted
+    delete = [
+        (f"""DELETE FROM order_items WHERE order_id IN ({placeholders})
+             AND order_id IN (SELECT order_id FROM {schema}.orders_archive WHERE order_id IN ({placeholders}))""", order_ids * 2),
+        (f"""DELETE FROM inventory_reservations WHERE order_id IN ({placeholders})
+             AND order_id IN (SELECT order_id FROM {schema}.orders_archive WHERE order_id IN ({placeholders}))""", order_ids * 2),
+        (f"""DELETE FROM orders WHERE order_id IN ({placeholders})
+             AND order_id IN (SELECT order_id FROM {schema}.orders_archive WHERE order_id IN ({placeholders}))""", order_ids * 2),
+    ]
+    if schema == "main":
+        await _in_transaction(db, copy + delete)
+    else:
+        await _in_transaction(db, copy)
+        await _in_transaction(db, delete)
+    return len(order_ids)
+
+
+async def _main(args) -> None:
+    schema = archive_schema(args.archive)
+    async with aiosqlite.connect(args.db) as db:
+        await db.execute("PRAGMA foreign_keys = ON;")
+        await run_migrations(db)
+        if args.archive:
+            await db.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (args.archive,))
+            await db.execute(f"PRAGMA {ARCHIVE_SCHEMA}.journal_mode = WAL;")
+        await ensure_archive_tables(db, schema)
+        cutoff = cutoff_for(args.days)
+        moved = 0
+        while True:
+            batch = await archive_batch(db, schema, cutoff, args.batch_size)
+            moved += batch
+            if batch < args.batch_size:
+                break
+    print(f"{args.db}: archived {moved} orders created before {cutoff} into {args.archive or args.db}")
+
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Move old orders into the archive tables.")
+    parser.add_argument("db", nargs="?", default=os.getenv("SQLITE_DATABASE_PATH", "./ecommerce.db"))
+    parser.add_argument("--days", type=float, default=float(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "90")))
+    parser.add_argument("--archive", default=os.getenv("ORDER_ARCHIVE_PATH") or None, help="separate archive database file")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", "1000")))
+    asyncio.run(_main(parser.parse_args()))
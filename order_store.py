@@ -0,0 +1,186 @@
+"""
+Order writes that must stay correct when many orders race for the same stock:
+idempotency keys and inventory reservations (tables from migration 5).
+
+Every function except `set_stock` runs inside the caller's BEGIN IMMEDIATE
+transaction on the writer connection. SQLite admits one writer at a time
+(across worker processes too), so each read-check-write sequence below is
+atomic, and a rollback undoes the reservation together with the order.
+
+  * Inventory: products with a row in `inventory` are stock-tracked, all
+    others are unlimited. `reserve_stock` takes the units for an order (all
+    items or none) and records them in `inventory_reservations`;
+    `release_stock` gives exactly those units back when the order is removed.
+  * Idempotency keys: the first order placed with a key stores its order ID
+    and response; a retry with the same key gets that response back instead
+    of creating a second order.
+"""
+import datetime
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import aiosqlite
+
+LOOKUP_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    """Raised by reserve_stock; `shortages` lists {product_id, requested, available} per short item."""
+
+    def __init__(self, shortages: List[Dict[str, Any]]):
+        super().__init__(", ".join(f"{s['product_id']}: {s['requested']} requested, {s['available']} available" for s in shortages))
+        self.shortages = shortages
+
+
+def _quantities(items: Iterable[Mapping[str, Any]]) -> Dict[str, int]:
+    """product_id -> total quantity (an order may list the same product twice)."""
+    totals: Dict[str, int] = {}
+    for item in items:
+        totals[item["product_id"]] = totals.get(item["product_id"], 0) + int(item["quantity"])
+    return totals
+
+
+def request_fingerprint(items: Iterable[Mapping[str, Any]]) -> str:
+    """Hash of an order's content (products and total quantities, order-insensitive)."""
+    canonical = json.dumps(sorted(_quantities(items).items()), separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat()
+
+
+# --- Idempotency keys ---
+
+async def find_idempotent_response(db: aiosqlite.Connection, key: str, ttl_seconds: float) -> Optional[Dict[str, Any]]:
+    """
+    The order recorded for `key` as {"request_hash", "order_id", "response"},
+    or None if the key is unknown or older than `ttl_seconds` (then it is dropped).
+    """
+    cursor = await db.execute(
+        "SELECT request_hash, order_id, response, created_at FROM idempotency_keys WHERE idempotency_key = ?", (key,)
+    )
+    row = await cursor.fetchone()
+    await cursor.close()
+    if row is None:
+        return None
+    expires = datetime.datetime.fromisoformat(row[3]) + datetime.timedelta(seconds=ttl_seconds)
+    if expires <= datetime.datetime.now():
+        await db.execute("DELETE FROM idempotency_keys WHERE idempotency_key = ?", (key,))
+        return None
+    return {"request_hash": row[0], "order_id": row[1], "response": json.loads(row[2])}
+
+
+async def record_idempotent_response(db: aiosqlite.Connection, key: str, request_hash: str, order_id: str, response: Dict[str, Any]) -> None:
+    await db.execute(
+        "INSERT INTO idempotency_keys (idempotency_key, request_hash, order_id, response, created_at) VALUES (?, ?, ?, ?, ?)",
+        (key, request_hash, order_id, json.dumps(response), _now()),
+    )
+
+
+async def prune_idempotency_keys(db: aiosqlite.Connection, ttl_seconds: float) -> int:
+    """Deletes keys older than `ttl_seconds`; returns how many."""
+    cutoff = (datetime.datetime.now() - datetime.timedelta(seconds=ttl_seconds)).isoformat()
+    cursor = await db.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (cutoff,))
+    deleted = cursor.rowcount
+    await cursor.close()
+    return deleted
+
+
+# --- Inventory ---
+
+async def stock_levels(db: aiosqlite.Connection, product_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """product_id -> units in stock, for the tracked products among `product_ids` (default: all tracked)."""
+    if product_ids is None:
+        cursor = await db.execute("SELECT product_id, quantity FROM inventory ORDER BY product_id")
+        levels = {row[0]: row[1] for row in await cursor.fetchall()}
+        await cursor.close()
+        return levels
+
+    ids = list(dict.fromkeys(product_ids))
+    levels = {}
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" for _ in batch)
+        cursor = await db.execute(f"SELECT product_id, quantity FROM inventory WHERE product_id IN ({placeholders})", batch)
+        levels.update({row[0]: row[1] for row in await cursor.fetchall()})
+        await cursor.close()
+    return levels
+
+
+async def reserve_stock(db: aiosqlite.Connection, order_id: str, items: Iterable[Mapping[str, Any]]) -> Dict[str, int]:
+    """
+    Takes the stock for every tracked product in `items` and records the reservation
+    under `order_id`. Raises InsufficientStock (and changes nothing) if any tracked
+    product has fewer units than requested. Returns product_id -> units reserved.
+    """
+    wanted = _quantities(items)
+    available = await stock_levels(db, wanted)
+    shortages = [
+        {"product_id": product_id, "requested": wanted[product_id], "available": units}
+        for product_id, units in available.items() if units < wanted[product_id]
+    ]
+    if shortages:
+        raise InsufficientStock(shortages)
+    if not available:
+        return {}
+
+    reserved = {product_id: wanted[product_id] for product_id in available}
+    now = _now()
+    # The quantity guard cannot fail under the transaction's write lock; it (and the CHECK constraint) only back it up
+    await db.executemany(
+        "UPDATE inventory SET quantity = quantity - ?, updated_at = ? WHERE product_id = ? AND quantity >= ?",
+        [(units, now, product_id, units) for product_id, units in reserved.items()],
+    )
+    await db.executemany(
+        "INSERT INTO inventory_reservations (order_id, product_id, quantity) VALUES (?, ?, ?)",
+        [(order_id, product_id, units) for product_id, units in reserved.items()],
+    )
+    return reserved
+
+
+async def release_stock(db: aiosqlite.Connection, order_id: str) -> Dict[str, int]:
+    """Returns the units reserved by `order_id` to inventory and drops the reservation."""
+    cursor = await db.execute("SELECT product_id, quantity FROM inventory_reservations WHERE order_id = ?", (order_id,))
+    reserved = {row[0]: row[1] for row in await cursor.fetchall()}
+    await cursor.close()
+    if not reserved:
+        return {}
+    now = _now()
+    # Products whose tracking was removed since (no inventory row) are simply not restocked
+    await db.executemany(
+        "UPDATE inventory SET quantity = quantity + ?, updated_at = ? WHERE product_id = ?",
+        [(units, now, product_id) for product_id, units in reserved.items()],
+    )
+    await db.execute("DELETE FROM inventory_reservations WHERE order_id = ?", (order_id,))
+    return reserved
+
+
+async def set_stock(db: aiosqlite.Connection, levels: Mapping[str, Optional[int]]) -> Dict[str, int]:
+    """
+    Sets absolute stock levels in one BEGIN IMMEDIATE transaction; None stops tracking
+    a product. Returns the resulting levels of the products in `levels`.
+    """
+    for product_id, units in levels.items():
+        if units is not None and (not isinstance(units, int) or isinstance(units, bool) or units < 0):
+            raise ValueError(f"Invalid stock level for '{product_id}': {units!r}")
+    now = _now()
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        await db.executemany(
+            """
+            INSERT INTO inventory (product_id, quantity, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT (product_id) DO UPDATE SET quantity = excluded.quantity, updated_at = excluded.updated_at
+            """,
+            [(product_id, units, now) for product_id, units in levels.items() if units is not None],
+        )
+        await db.executemany(
+            "DELETE FROM inventory WHERE product_id = ?",
+            [(product_id,) for product_id, units in levels.items() if units is None],
+        )
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    return await stock_levels(db, levels)
@@ -0,0 +1,264 @@
+"""
+Product catalog stored in SQLite (the `products` table and its FTS5 index, see migration 4).
+
+`import_products` loads products.json into the table. Rows are diffed by
+content checksum, so a re-import only writes the products that were added,
+changed or removed, and the `catalog_meta` generation is bumped only when
+something changed. Searches run against `products_fts` ranked with BM25
+(name and category weighted like the in-memory index), and order pricing and
+reports use primary-key lookups and JOINs instead of the in-process catalog.
+
+The server imports products.json at startup and whenever it changes; to load
+a catalog into a database ahead of time:
+    python product_store.py [products.json] [path/to/ecommerce.db]
+"""
+import asyncio
+import datetime
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aiosqlite
+
+from catalog import Product, parse_products
+from migrations import run_migrations
+from observability import configure_logging
+from search_index import unstemmed_terms
+
+PRODUCT_COLUMNS = "p.product_id, p.name, p.price, p.description, p.category"
+
+# Upsert keeps the rowid of updated rows (and with it their FTS entry and catalog order)
+UPSERT_SQL = """
+    INSERT INTO products (product_id, name, price, description, category, checksum)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (product_id) DO UPDATE SET
+        name = excluded.name, price = excluded.price, description = excluded.description,
+        category = excluded.category, checksum = excluded.checksum
+    """
+
+# Keeps IN (...) lists well under SQLite's bound-parameter limit
+LOOKUP_BATCH_SIZE = 500
+
+
+def _signed(checksum: int) -> int:
+    """SQLite integers are signed 64-bit; store the unsigned checksum's bit pattern."""
+    return checksum - (1 << 64) if checksum >= (1 << 63) else checksum
+
+
+def product_row(product: Product) -> Tuple:
+    """Parameters for UPSERT_SQL."""
+    return (product.id, product.name, product.price, product.description, product.category, _signed(product.checksum()))
+
+
+def _product(row) -> Product:
+    return Product(id=row[0], name=row[1], price=row[2], description=row[3], category=row[4])
+
+
+def fts_query(query: str) -> Optional[str]:
+    """FTS5 MATCH expression: any of the query's terms (stop words dropped), or None if there are none."""
+    terms = dict.fromkeys(unstemmed_terms(query))
+    return " OR ".join(f'"{term}"' for term in terms) or None
+
+
+async def has_fts(db: aiosqlite.Connection) -> bool:
+    cursor = await db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+    row = await cursor.fetchone()
+    await cursor.close()
+    return row is not None
+
+
+async def catalog_generation(db: aiosqlite.Connection) -> int:
+    cursor = await db.execute("SELECT generation FROM catalog_meta WHERE id = 1")
+    row = await cursor.fetchone()
+    await cursor.close()
+    return row[0] if row else 0
+
+
+async def catalog_state(db: aiosqlite.Connection) -> Dict[str, Any]:
+    """Current catalog generation and product count."""
+    cursor = await db.execute("SELECT generation, updated_at FROM catalog_meta WHERE id = 1")
+    meta = await cursor.fetchone()
+    await cursor.close()
+    cursor = await db.execute("SELECT COUNT(*) FROM products")
+    count = (await cursor.fetchone())[0]
+    await cursor.close()
+    return {
+        "generation": meta[0] if meta else 0,
+        "updated_at": meta[1] if meta else None,
+        "products": count,
+    }
+
+
+async def import_products(db: aiosqlite.Connection, products: Sequence[Product]) -> Dict[str, Any]:
+    """
+    Makes the products table match `products` in one BEGIN IMMEDIATE transaction.
+    Returns counts of inserted / updated / deleted rows and the resulting generation.
+    """
+    wanted = {p.id: p for p in products}
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = await db.execute("SELECT product_id, checksum FROM products")
+        existing = {row[0]: row[1] for row in await cursor.fetchall()}
+        await cursor.close()
+
+        rows, inserted, updated = [], 0, 0
+        for product in products:
+            row = product_row(product)
+            previous = existing.get(product.id)
+            if previous == row[-1]:
+                continue
+            if previous is None:
+                inserted += 1
+            else:
+                updated += 1
+            rows.append(row)
+        deleted = [(product_id,) for product_id in existing if product_id not in wanted]
+
+        if rows:
+            await db.executemany(UPSERT_SQL, rows)
+        if deleted:
+            await db.executemany("DELETE FROM products WHERE product_id = ?", deleted)
+        if rows or deleted:
+            await db.execute(
+                "UPDATE catalog_meta SET generation = generation + 1, updated_at = ? WHERE id = 1",
+                (datetime.datetime.now().isoformat(),),
+            )
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+    state = await catalog_state(db)
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": len(deleted),
+        "changed_ids": [row[0] for row in rows] + [row[0] for row in deleted],
+        **state,
+    }
+
+
+async def get_products(db: aiosqlite.Connection, product_ids: Iterable[str]) -> Dict[str, Product]:
+    """product ID -> Product for the IDs that exist (primary-key lookups, batched)."""
+    ids = list(dict.fromkeys(product_ids))
+    found: Dict[str, Product] = {}
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" for _ in batch)
+        cursor = await db.execute(f"SELECT {PRODUCT_COLUMNS} FROM products p WHERE p.product_id IN ({placeholders})", batch)
+        for row in await cursor.fetchall():
+            found[row[0]] = _product(row)
+        await cursor.close()
+    return found
+
+
+async def get_products_by_rowid(db: aiosqlite.Connection, rowids: Iterable[int]) -> List[Product]:
+    """Products for `rowids`, in the given order (rowids that no longer exist are skipped)."""
+    rowids = [int(rowid) for rowid in rowids]
+    found: Dict[int, Product] = {}
+    for start in range(0, len(rowids), LOOKUP_BATCH_SIZE):
+        batch = rowids[start:start + LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" for _ in batch)
+        cursor = await db.execute(f"SELECT p.rowid, {PRODUCT_COLUMNS} FROM products p WHERE p.rowid IN ({placeholders})", batch)
+        for row in await cursor.fetchall():
+            found[row[0]] = _product(row[1:])
+        await cursor.close()
+    return [found[rowid] for rowid in rowids if rowid in found]
+
+
+async def price_category_rows(db: aiosqlite.Connection) -> List[Tuple[int, Optional[float], str]]:
+    """(rowid, price, category) of every product in catalog order, for the columnar view (catalog_columns.py)."""
+    cursor = await db.execute("SELECT rowid, price, category FROM products ORDER BY rowid")
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return rows
+
+
+async def categories(db: aiosqlite.Connection) -> List[str]:
+    """Distinct category names, in first-seen catalog order."""
+    cursor = await db.execute(
+        "SELECT category FROM products WHERE category != '' GROUP BY category ORDER BY MIN(rowid)"
+    )
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return [row[0] for row in rows]
+
+
+async def search(
+    db: aiosqlite.Connection,
+    query: str,
+    limit: int = 20,
+    categories: Optional[Iterable[str]] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> Tuple[List[Product], int]:
+    """
+    Same contract as ProductSearchIndex.search: (top `limit` products by BM25, total matches).
+    Missing prices count as 0.0 for the price filters.
+    """
+    match = fts_query(query)
+    categories = list(categories or ())
+    if match is None and not categories:
+        return [], 0
+
+    where, params = [], []
+    if match is not None:
+        where.append("products_fts MATCH ?")
+        params.append(match)
+    if categories:
+        where.append(f"p.category IN ({', '.join('?' for _ in categories)})")
+        params.extend(categories)
+    if min_price is not None:
+        where.append("COALESCE(p.price, 0.0) >= ?")
+        params.append(float(min_price))
+    if max_price is not None:
+        where.append("COALESCE(p.price, 0.0) <= ?")
+        params.append(float(max_price))
+
+    if match is not None:
+        # CROSS JOIN keeps the FTS index as the outer loop; otherwise the planner may walk
+        # idx_products_category_price and evaluate MATCH once per product in the category
+        source = "products_fts CROSS JOIN products p ON p.rowid = products_fts.rowid"
+        # rank = bm25 with the column weights configured in migration 4
+        order_by = "products_fts.rank, p.rowid"
+    else:
+        # Category-only browse: no ranking signal, keep catalog order
+        source = "products p"
+        order_by = "p.rowid"
+    where_sql = " AND ".join(where)
+
+    cursor = await db.execute(
+        f"SELECT {PRODUCT_COLUMNS} FROM {source} WHERE {where_sql} ORDER BY {order_by} LIMIT ?",
+        params + [max(limit, 0)],
+    )
+    found = [_product(row) for row in await cursor.fetchall()]
+    await cursor.close()
+
+    if len(found) < limit:
+        total = len(found)
+    else:
+        if match is not None and len(where) == 1:
+            # Unfiltered: counting the full-text matches alone avoids the JOIN
+            source, where_sql = "products_fts", "products_fts MATCH ?"
+        cursor = await db.execute(f"SELECT COUNT(*) FROM {source} WHERE {where_sql}", params)
+        total = (await cursor.fetchone())[0]
+        await cursor.close()
+    return found, total
+
+
+async def _main(json_path: str, db_path: str) -> None:
+    with open(json_path, "r") as f:
+        products = parse_products(json.load(f))
+    async with aiosqlite.connect(db_path) as db:
+        await run_migrations(db)
+        stats = await import_products(db, products)
+    stats.pop("changed_ids")
+    print(f"{db_path}: {stats}")
+
+
+if __name__ == "__main__":
+    configure_logging()
+    source = sys.argv[1] if len(sys.argv) > 1 else "products.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else os.getenv("SQLITE_DATABASE_PATH", "./ecommerce.db")
+    asyncio.run(_main(source, target))
@@ -0,0 +1,216 @@
+"""
+Semantic response cache for /chat.
+
+Much of the chat traffic is near-identical ("hi", "what can you do?", "list
+categories"), yet every message costs root_agent -> sub-agent LLM round trips.
+This cache stores final responses keyed on the normalized message text and
+serves them for later messages that are the same or similar enough.
+
+By default only the same normalized message matches. With a
+`similarity_threshold` below 1.0, similarity uses a local hashed n-gram
+embedding: character trigrams and words of the normalized text are hashed into
+a sparse vector, and two messages match when their cosine similarity reaches
+the threshold and they have the same content words (`content_terms`: the
+words left after dropping filler like "do you", "show me", "please"). Scores
+alone are not enough: "running shoes for men" / "... for women" or "yoga mat" /
+"yoga ball" score above 0.82 but ask for different products, so only
+rephrasings of the same request ("show me running shoes" / "show me the
+running shoes please") can share an answer; a message without content words
+only matches itself. Entries expire after `ttl_seconds` and the least recently
+used entry is evicted beyond `max_entries`.
+
+What may be cached is decided by `is_cacheable_message` (no ordering,
+cancellation, order IDs or follow-ups like "yes" / "that one") and
+`is_cacheable_turn` (no state-changing agents or tools were involved).
+"""
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+_PUNCT_RE = re.compile(r"[^\w\s'$.]|\.(?!\d)")
+_SPACE_RE = re.compile(r"\s+")
+# Filler words that do not change what a message asks for (see content_terms)
+_STOP_WORDS = frozenset(
+    "a an the and or of to in on at for from with by about is are am be was were do does did can could would "
+    "will i me my we our us you your please hi hello hey show tell give list find get see what which whats "
+    "there here have has sell carry any some all just also want need like looking know let".split()
+)
+
+# Messages that ask to change state; they always go through the agent tree
+_STATE_CHANGING_RE = re.compile(
+    r"\b(buy|purchase|order|orders|ordered|checkout|check out|cart|cancel|remove|delete|return|refund|"
+    r"reorder|place|change|update|modify)\b",
+    re.IGNORECASE,
+)
+# Messages whose meaning depends on the previous turns
+_FOLLOW_UP_RE = re.compile(
+    r"^(yes|yeah|yep|no|nope|ok|okay|sure|please do|go ahead|do it|and)\b"
+    r"|\b(it|that|this|these|those|them|one|ones|more|another|again|instead|same|above|previous|first|second|last)\b",
+    re.IGNORECASE,
+)
+_IDENTIFIER_RE = re.compile(r"\b(?:p-\d+|[A-Za-z]{0,5}-?\d{3,}[A-Za-z0-9-]*)\b|\b[0-9a-f]{8}-[0-9a-f]{4}-", re.IGNORECASE)
+
+
+def normalize_message(message: str) -> str:
+    """Lowercases, drops punctuation and collapses whitespace ("What can you do?" -> "what can you do")."""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", message.lower())).strip()
+
+
+def embed(text: str, dims: int = 1024, ngram: int = 3) -> Dict[int, float]:
+    """
+    Hashed n-gram embedding of normalized text: character n-grams (with word
+    boundaries) plus whole words, hashed into `dims` buckets and L2-normalized.
+    Returned as a sparse {bucket: weight} dict.
+    """
+    vector: Dict[int, float] = {}
+    padded = f" {text} "
+    features = [padded[i:i + ngram] for i in range(max(len(padded) - ngram + 1, 1))]
+    features += [f"w:{word}" for word in text.split()]
+    for feature in features:
+        bucket = zlib.crc32(feature.encode("utf-8")) % dims
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    norm = sum(v * v for v in vector.values()) ** 0.5 or 1.0
+    return {bucket: v / norm for bucket, v in vector.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(bucket, 0.0) for bucket, weight in a.items())
+
+
+def content_terms(text: str) -> frozenset:
+    """The words of normalized text that carry its meaning (numbers included), without the stop words."""
+    return frozenset(word for word in text.split() if word not in _STOP_WORDS)
+
+
+def is_cacheable_message(message: str) -> bool:
+    """False for messages that ask to change state, reference an order/product ID, or follow up on earlier turns."""
+    text = normalize_message(message)
+    if not text:
+        return False
+    return not (_STATE_CHANGING_RE.search(text) or _FOLLOW_UP_RE.search(text) or _IDENTIFIER_RE.search(message))
+
+
+class SemanticResponseCache:
+    """
+    LRU + TTL cache of chat responses with similarity lookup.
+
+    `uncacheable_agents` / `cacheable_tools` decide which completed turns may be
+    stored: a turn is stored only if none of its agents is in
+    `uncacheable_agents` and every tool it called is in `cacheable_tools`.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 1.0,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 512,
+        uncacheable_agents: Iterable[str] = (),
+        cacheable_tools: Iterable[str] = (),
+        dims: int = 1024,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.uncacheable_agents = frozenset(uncacheable_agents)
+        self.cacheable_tools = frozenset(cacheable_tools)
+        self.dims = dims
+        # normalized message -> entry dict (message, vector, terms, response, agent_name, agent_path, expires_at)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, entry in self._entries.items() if entry["expires_at"] < now]:
+            del self._entries[key]
+
+    def lookup(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"response", "agent_name", "agent_path", "matched", "similarity"} for
+        the best cached match at or above the similarity threshold, else None.
+        """
+        key = normalize_message(message)
+        self._expire()
+        entry = self._entries.get(key)
+        similarity = 1.0
+        if entry is None and self.similarity_threshold < 1.0:
+            vector = embed(key, self.dims)
+            terms = content_terms(key)
+            # Messages made only of filler ("what can you do", "hi there") have nothing to compare: exact match only
+            candidates = [(k, cosine(vector, e["vector"])) for k, e in self._entries.items() if terms and e["terms"] == terms]
+            if candidates:
+                best_key, similarity = max(candidates, key=lambda item: item[1])
+                if similarity >= self.similarity_threshold:
+                    key, entry = best_key, self._entries[best_key]
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if similarity >= 1.0:
+            self.exact_hits += 1
+        return {
+            "response": entry["response"],
+            "agent_name": entry["agent_name"],
+            "agent_path": list(entry["agent_path"]),
+            "matched": entry["message"],
+            "similarity": round(similarity, 4),
+        }
+
+    def is_cacheable_turn(self, agent_path: List[str], tool_names: Iterable[str]) -> bool:
+        if self.uncacheable_agents.intersection(agent_path):
+            return False
+        return all(name in self.cacheable_tools for name in tool_names)
+
+    def store(self, message: str, response: str, agent_name: str, agent_path: List[str], tool_names: Iterable[str] = ()) -> bool:
+        """Caches a completed turn if it is cacheable. Returns whether it was stored."""
+        if not response or not self.is_cacheable_turn(agent_path, tool_names):
+            self.rejected += 1
+            return False
+        key = normalize_message(message)
+        self._entries.pop(key, None)
+        self._entries[key] = {
+            "message": message,
+            "vector": embed(key, self.dims),
+            "terms": content_terms(key),
+            "response": response,
+            "agent_name": agent_name,
+            "agent_path": tuple(agent_path),
+            "expires_at": time.monotonic() + self.ttl_seconds,
+        }
+        self.stores += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+        }
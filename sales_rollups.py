@@ -0,0 +1,255 @@
+"""
+Sales rollups: summary tables maintained by the order writes themselves
+(tables from migration 7).
+
+Revenue per day, best-selling products and order counts by status would
+otherwise take full scans of `orders` / `order_items`, which grow with the
+order history and compete with live place_order writes. Instead every write
+path updates three small tables inside its own BEGIN IMMEDIATE transaction,
+so a rollup commits or rolls back together with the order it counts:
+
+    sales_daily          day -> orders, units, revenue, cancelled_orders
+    sales_by_product     product_id -> orders, units, revenue
+    order_status_counts  status -> orders
+
+Days are order creation days (the date part of created_at). orders / units /
+revenue count the orders that are not cancelled: `record_cancellation`
+subtracts a cancelled order from the day it was placed on and from its
+products, and adds it to that day's cancelled_orders. Archiving moves orders
+out of the hot tables but leaves the rollups alone, so they keep covering the
+whole history.
+
+`rebuild` recomputes all three tables from the hot and archive tables, for a
+backfill or after orders were edited outside this app:
+    python sales_rollups.py [--archive orders_archive.db] [path/to/ecommerce.db]
+"""
+import argparse
+import asyncio
+import os
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import aiosqlite
+
+from observability import configure_logging
+
+CANCELLED = "Cancelled"
+
+DAILY_UPSERT_SQL = """
+    INSERT INTO sales_daily (day, orders, units, revenue, cancelled_orders) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (day) DO UPDATE SET
+        orders = orders + excluded.orders,
+        units = units + excluded.units,
+        revenue = revenue + excluded.revenue,
+        cancelled_orders = cancelled_orders + excluded.cancelled_orders
+"""
+PRODUCT_UPSERT_SQL = """
+    INSERT INTO sales_by_product (product_id, orders, units, revenue) VALUES (?, ?, ?, ?)
+    ON CONFLICT (product_id) DO UPDATE SET
+        orders = orders + excluded.orders,
+        units = units + excluded.units,
+        revenue = revenue + excluded.revenue
+"""
+STATUS_UPSERT_SQL = """
+    INSERT INTO order_status_counts (status, orders) VALUES (?, ?)
+    ON CONFLICT (status) DO UPDATE SET orders = orders + excluded.orders
+"""
+ORDER_PRODUCT_TOTALS_SQL = """
+    SELECT product_id, SUM(quantity), SUM(quantity * COALESCE(price, 0.0))
+    FROM order_items WHERE order_id = ? GROUP BY product_id
+"""
+DAILY_SALES_SQL = """
+    SELECT day, orders, units, revenue, cancelled_orders FROM sales_daily
+    WHERE day >= ? ORDER BY day DESC
+"""
+TOP_PRODUCTS_SQL = """
+    SELECT product_id, orders, units, revenue FROM sales_by_product
+    WHERE units > 0 ORDER BY units DESC, product_id LIMIT ?
+"""
+
+
+def day_of(created_at: Optional[str]) -> str:
+    """Rollup day (YYYY-MM-DD) of an order's created_at."""
+    return (created_at or "")[:10]
+
+
+def _status_key(status: Optional[str]) -> str:
+    return status or "Unknown"
+
+
+# --- Write path (inside the caller's transaction) ---
+
+async def record_orders(db: aiosqlite.Connection, orders: Iterable[Mapping[str, Any]]) -> None:
+    """
+    Adds newly inserted orders to the rollups. Each order holds the `orders` columns
+    plus its priced 'items' (as passed to main._insert_orders).
+    """
+    daily: Dict[str, List[float]] = {}
+    products: Dict[str, List[float]] = {}
+    statuses: Dict[str, int] = {}
+    for order in orders:
+        status = _status_key(order["status"])
+        statuses[status] = statuses.get(status, 0) + 1
+        day = daily.setdefault(day_of(order["created_at"]), [0, 0, 0.0, 0])
+        if status == CANCELLED:
+            day[3] += 1
+            continue
+        day[0] += 1
+        day[2] += order["total_price"] or 0.0
+        counted = set()
+        for item in order["items"]:
+            day[1] += item["quantity"]
+            totals = products.setdefault(item["product_id"], [0, 0, 0.0])
+            if item["product_id"] not in counted:
+                counted.add(item["product_id"])
+                totals[0] += 1
+            totals[1] += item["quantity"]
+            totals[2] += item["quantity"] * (item["price"] or 0.0)
+
+    await db.executemany(DAILY_UPSERT_SQL, [(day, *totals) for day, totals in daily.items()])
+    await db.executemany(PRODUCT_UPSERT_SQL, [(product_id, *totals) for product_id, totals in products.items()])
+    await db.executemany(STATUS_UPSERT_SQL, list(statuses.items()))
+
+
+async def record_cancellation(
+    db: aiosqlite.Connection, order_id: str, previous_status: Optional[str], created_at: Optional[str], total_price: Optional[float]
+) -> None:
+    """Moves a just-cancelled order (still in the hot tables) from its previous status to 'Cancelled'."""
+    previous_status = _status_key(previous_status)
+    if previous_status == CANCELLED:
+        return
+    await db.executemany(STATUS_UPSERT_SQL, [(previous_status, -1), (CANCELLED, 1)])
+
+    cursor = await db.execute(ORDER_PRODUCT_TOTALS_SQL, (order_id,))
+    rows = await cursor.fetchall()
+    await cursor.close()
+    units = sum(row[1] or 0 for row in rows)
+    await db.execute(DAILY_UPSERT_SQL, (day_of(created_at), -1, -units, -(total_price or 0.0), 1))
+    await db.executemany(PRODUCT_UPSERT_SQL, [(row[0], -1, -(row[1] or 0), -(row[2] or 0.0)) for row in rows])
+
+
+# --- Read path: each query reads a bounded number of rows, whatever the order volume ---
+
+async def daily_sales(db: aiosqlite.Connection, since_day: str) -> List[Dict[str, Any]]:
+    """Rollup rows for the days from `since_day` (YYYY-MM-DD) on, most recent first."""
+    cursor = await db.execute(DAILY_SALES_SQL, (since_day,))
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return [
+        {"day": row[0], "orders": row[1], "units": row[2], "revenue": round(row[3], 2), "cancelled_orders": row[4]}
+        for row in rows
+    ]
+
+
+async def top_products(db: aiosqlite.Connection, limit: int) -> List[Dict[str, Any]]:
+    """The `limit` products with the most units sold (cancelled orders excluded)."""
+    cursor = await db.execute(TOP_PRODUCTS_SQL, (limit,))
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return [{"product_id": row[0], "orders": row[1], "units": row[2], "revenue": round(row[3], 2)} for row in rows]
+
+
+async def status_counts(db: aiosqlite.Connection) -> Dict[str, int]:
+    """Orders per status (one row per distinct status)."""
+    cursor = await db.execute("SELECT status, orders FROM order_status_counts WHERE orders != 0 ORDER BY status")
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return {row[0]: row[1] for row in rows}
+
+
+# --- Backfill ---
+
+async def archive_schemas(db: aiosqlite.Connection) -> List[str]:
+    """Schemas (main and attached databases) that hold the order archive tables."""
+    cursor = await db.execute("PRAGMA database_list")
+    schemas = [row[1] for row in await cursor.fetchall()]
+    await cursor.close()
+    found = []
+    for schema in schemas:
+        if schema == "temp":
+            continue
+        cursor = await db.execute(
+            f"SELECT COUNT(*) FROM {schema}.sqlite_master WHERE type = 'table' AND name IN ('orders_archive', 'order_items_archive')"
+        )
+        if (await cursor.fetchone())[0] == 2:
+            found.append(schema)
+        await cursor.close()
+    return found
+
+
+async def rebuild(db: aiosqlite.Connection) -> Dict[str, int]:
+    """
+    Recomputes the rollups from `orders` / `order_items` and every archive tier
+    (see archive_schemas), inside the caller's transaction. An order that is in
+    both tiers (an interrupted archive batch) is counted once. Returns the
+    number of rows written per table.
+    """
+    orders_sql = ["SELECT order_id, status, created_at, total_price FROM main.orders"]
+    items_sql = ["SELECT order_id, product_id, quantity, price FROM main.order_items"]
+    for schema in await archive_schemas(db):
+        not_hot = "WHERE order_id NOT IN (SELECT order_id FROM main.orders)"
+        orders_sql.append(f"SELECT order_id, status, created_at, total_price FROM {schema}.orders_archive {not_hot}")
+        items_sql.append(f"SELECT order_id, product_id, quantity, price FROM {schema}.order_items_archive {not_hot}")
+    sources = f"""
+        WITH all_orders AS ({" UNION ALL ".join(orders_sql)}),
+             all_items AS ({" UNION ALL ".join(items_sql)}),
+             order_units AS (SELECT order_id, SUM(quantity) AS units FROM all_items GROUP BY order_id)
+    """
+    not_cancelled = f"COALESCE(o.status, '') != '{CANCELLED}'"
+
+    inserts = {
+        "sales_daily": f"""
+            INSERT INTO sales_daily (day, orders, units, revenue, cancelled_orders)
+            SELECT substr(COALESCE(o.created_at, ''), 1, 10),
+                   SUM({not_cancelled}),
+                   SUM(CASE WHEN {not_cancelled} THEN COALESCE(u.units, 0) ELSE 0 END),
+                   SUM(CASE WHEN {not_cancelled} THEN COALESCE(o.total_price, 0.0) ELSE 0.0 END),
+                   SUM(NOT {not_cancelled})
+            FROM all_orders o LEFT JOIN order_units u ON u.order_id = o.order_id
+            GROUP BY 1
+        """,
+        "sales_by_product": f"""
+            INSERT INTO sales_by_product (product_id, orders, units, revenue)
+            SELECT i.product_id, COUNT(DISTINCT i.order_id), SUM(i.quantity), SUM(i.quantity * COALESCE(i.price, 0.0))
+            FROM all_items i JOIN all_orders o ON o.order_id = i.order_id
+            WHERE {not_cancelled}
+            GROUP BY i.product_id
+        """,
+        "order_status_counts": """
+            INSERT INTO order_status_counts (status, orders)
+            SELECT COALESCE(status, 'Unknown'), COUNT(*) FROM all_orders GROUP BY 1
+        """,
+    }
+    written = {}
+    for table, insert in inserts.items():
+        await db.execute(f"DELETE FROM {table}")
+        await db.execute(sources + insert)
+        cursor = await db.execute(f"SELECT COUNT(*) FROM {table}")
+        written[table] = (await cursor.fetchone())[0]
+        await cursor.close()
+    return written
+
+
+async def _main(args) -> None:
+    from migrations import run_migrations
+
+    async with aiosqlite.connect(args.db) as db:
+        await db.execute("PRAGMA foreign_keys = ON;")
+        if args.archive:
+            await db.execute("ATTACH DATABASE ? AS archive", (args.archive,))
+        await run_migrations(db)
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            written = await rebuild(db)
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+    print(f"{args.db}: rebuilt sales rollups ({', '.join(f'{table}: {rows} rows' for table, rows in written.items())})")
+
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Recompute the sales rollup tables from the order history.")
+    parser.add_argument("db", nargs="?", default=os.getenv("SQLITE_DATABASE_PATH", "./ecommerce.db"))
+    parser.add_argument("--archive", default=os.getenv("ORDER_ARCHIVE_PATH") or None, help="separate archive database file")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,218 @@
+import heapq
+import math
+import re
+from array import array
+from bisect import insort
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from catalog import Product
+
+# --- Tokenization ---
+# Lowercase alphanumeric runs, e.g. "Wi-Fi Smart Plug (2-Pack)" -> ["wi", "fi", "smart", "plug", "2", "pack"]
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry no search signal and would otherwise match almost every product
+STOP_WORDS = frozenset({
+    "a", "an", "and", "any", "are", "do", "does", "for", "from", "have", "i", "in",
+    "is", "it", "me", "my", "of", "on", "or", "show", "some", "the", "to", "want",
+    "what", "with", "you", "your", "find", "search", "looking", "need", "please",
+})
+
+
+def _stem(token: str) -> str:
+    """Very light plural folding so 'shoes' matches 'shoe' and 'accessories' matches 'accessory'."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("ches", "shes", "sses", "xes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def unstemmed_terms(text: str) -> List[str]:
+    """Lowercase search terms with stop words removed but not stemmed (for engines that stem on their own)."""
+    if not text:
+        return []
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into normalized search terms (stop words removed)."""
+    if not text:
+        return []
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+class ProductSearchIndex:
+    """
+    Inverted index over the product catalog, built once when the catalog is loaded.
+    Queries only touch the postings of their own terms, so cost grows with the number
+    of matching products rather than the size of the catalog. Results are ranked with BM25.
+
+    An index is never mutated once built; `updated()` derives the index for a
+    reloaded catalog by re-indexing only the products that changed.
+    """
+
+    # BM25 parameters (standard defaults)
+    K1 = 1.2
+    B = 0.75
+    # Name terms count more than description terms when scoring
+    NAME_BOOST = 3
+    CATEGORY_BOOST = 2
+
+    def __init__(self, products: Iterable["Product"]):
+        # A sequence (e.g. the memory-mapped catalog) is referenced, not copied
+        self.products: Sequence["Product"] = products if isinstance(products, Sequence) else list(products)
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # term -> {doc index: term frequency}
+        self.doc_lengths: List[int] = []
+        self.category_docs: Dict[str, List[int]] = defaultdict(list)  # lowercase category -> doc indexes
+        self.prices = array("d")
+
+        for doc_id, product in enumerate(self.products):
+            self._add(doc_id, product)
+        self._finish()
+
+    @classmethod
+    def _doc_terms(cls, product: "Product") -> List[str]:
+        return (
+            tokenize(product.name) * cls.NAME_BOOST
+            + tokenize(product.description)
+            + tokenize(product.category) * cls.CATEGORY_BOOST
+        )
+
+    def _add(self, doc_id: int, product: "Product") -> None:
+        terms = self._doc_terms(product)
+        for term in terms:
+            tf = self.postings[term]
+            tf[doc_id] = tf.get(doc_id, 0) + 1
+        self.doc_lengths.append(len(terms))
+
+        self.category_docs[product.category.lower()].append(doc_id)
+
+        self.prices.append(product.price if product.price is not None else 0.0)
+
+    def _finish(self) -> None:
+        self.doc_count = len(self.products)
+        self.avg_doc_length = (sum(self.doc_lengths) / self.doc_count) if self.doc_count else 0.0
+        # Precompute IDF per term; the index is immutable after construction
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def updated(self, products: Sequence["Product"], changed_doc_ids: Iterable[int]) -> "ProductSearchIndex":
+        """
+        Index for `products`, a new version of this index's catalog with the same
+        product IDs in the same order where only `changed_doc_ids` differ.
+        Unchanged postings are shared with this index (copy-on-write), so the
+        cost is proportional to the changes, not to the catalog size.
+        """
+        index = ProductSearchIndex.__new__(ProductSearchIndex)
+        index.products = products
+        index.postings = defaultdict(dict, self.postings)
+        index.doc_lengths = list(self.doc_lengths)
+        index.category_docs = defaultdict(list, self.category_docs)
+        index.prices = array("d", self.prices)
+
+        copied_terms, copied_categories = set(), set()
+
+        def own_postings(term):
+            if term not in copied_terms:
+                copied_terms.add(term)
+                index.postings[term] = dict(index.postings.get(term, ()))
+            return index.postings[term]
+
+        def own_category(category):
+            if category not in copied_categories:
+                copied_categories.add(category)
+                index.category_docs[category] = list(index.category_docs.get(category, ()))
+            return index.category_docs[category]
+
+        for doc_id in changed_doc_ids:
+            old, new = self.products[doc_id], products[doc_id]
+            for term in set(self._doc_terms(old)):
+                postings = own_postings(term)
+                postings.pop(doc_id, None)
+                if not postings:
+                    del index.postings[term]
+            terms = self._doc_terms(new)
+            for term in terms:
+                postings = own_postings(term)
+                postings[doc_id] = postings.get(doc_id, 0) + 1
+            index.doc_lengths[doc_id] = len(terms)
+
+            if old.category.lower() != new.category.lower():
+                docs = own_category(old.category.lower())
+                docs.remove(doc_id)
+                if not docs:
+                    del index.category_docs[old.category.lower()]
+                insort(own_category(new.category.lower()), doc_id)
+
+            index.prices[doc_id] = new.price if new.price is not None else 0.0
+
+        index._finish()
+        return index
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def categories(self) -> List[str]:
+        """Distinct category names, in first-seen catalog order."""
+        seen = []
+        for doc_ids in self.category_docs.values():
+            category = self.products[doc_ids[0]].category
+            if category:
+                seen.append(category)
+        return seen
+
+    def _passes_filters(self, doc_id: int, min_price: Optional[float], max_price: Optional[float]) -> bool:
+        price = self.prices[doc_id]
+        if min_price is not None and price < min_price:
+            return False
+        if max_price is not None and price > max_price:
+            return False
+        return True
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        categories: Optional[Iterable[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> Tuple[List["Product"], int]:
+        """
+        Returns (top `limit` products by BM25 score, total number of matches).
+        `categories` restricts matches to those categories (case-insensitive).
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        terms = [t for t in query_terms if t in self.postings]
+        allowed = None
+        if categories:
+            allowed = set()
+            for category in categories:
+                allowed.update(self.category_docs.get(category.lower(), ()))
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in terms:
+            idf = self.idf[term]
+            for doc_id, tf in self.postings[term].items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[doc_id] / self.avg_doc_length)
+                scores[doc_id] += idf * tf * (self.K1 + 1) / (tf + norm)
+
+        if not query_terms and allowed is not None:
+            # Category-only browse: no ranking signal, keep catalog order
+            scores = {doc_id: 0.0 for doc_id in sorted(allowed)}
+
+        matches = [
+            (score, doc_id) for doc_id, score in scores.items()
+            if self._passes_filters(doc_id, min_price, max_price)
+        ]
+        # Highest score first; ties broken by catalog order
+        top = heapq.nsmallest(max(limit, 0), matches, key=lambda m: (-m[0], m[1]))
+        return [self.products[doc_id] for _, doc_id in top], len(matches)
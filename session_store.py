@@ -0,0 +1,258 @@
+"""
+SQLite-backed ADK session store (SESSION_STORE=sqlite).
+
+Chat sessions live in their own SQLite file (SESSION_DATABASE_PATH), separate
+from the orders database: `adk_sessions` holds each session's state and last
+update time, `adk_session_events` its events in order. Sessions are read
+per turn, capped at a number of events and evicted once idle for longer
+than their TTL, so memory stays flat and any worker process can serve the
+next message of a conversation.
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import aiosqlite
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+
+# Stored in the file's PRAGMA user_version once the tables below exist
+SCHEMA_VERSION = 1
+
+
+class SQLiteSessionService(BaseSessionService):
+    """
+    ADK session service persisted in SQLite, so conversations survive restarts
+    and every client can have its own session.
+
+    Memory stays bounded: sessions are loaded per turn rather than kept in RAM,
+    each session keeps at most `max_events` events (older ones are truncated as
+    new ones arrive), and sessions idle for longer than `ttl_seconds` are
+    evicted by `evict_expired` (run periodically from the app). Because every
+    turn reads the session from the file, any worker process can serve the next
+    message of a conversation.
+
+    The whole session state is stored per session; app:/user: scoped state keys
+    are not shared across sessions.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 24 * 3600, max_events: int = 200):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_events = max_events
+        self._db: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        if self._db is not None:
+            return
+        self._db = await aiosqlite.connect(self.path)
+        # Several worker processes may write to the same file
+        await self._db.execute("PRAGMA busy_timeout = 5000;")
+        await self._db.execute("PRAGMA journal_mode = WAL;")
+        await self._db.execute("PRAGMA synchronous = NORMAL;")
+        await self._db.execute("PRAGMA foreign_keys = ON;")
+        # The CREATE statements take the write lock; skip them once this file's schema is in place
+        cursor = await self._db.execute("PRAGMA user_version")
+        version = (await cursor.fetchone())[0]
+        await cursor.close()
+        if version < SCHEMA_VERSION:
+            await self._db.execute("""
+                CREATE TABLE IF NOT EXISTS adk_sessions (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT '{}',
+                    last_update_time REAL NOT NULL,
+                    PRIMARY KEY (app_name, user_id, session_id)
+                )
+            """)
+            await self._db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_adk_sessions_last_update
+                ON adk_sessions (last_update_time)
+            """)
+            await self._db.execute("""
+                CREATE TABLE IF NOT EXISTS adk_session_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    FOREIGN KEY (app_name, user_id, session_id)
+                        REFERENCES adk_sessions (app_name, user_id, session_id) ON DELETE CASCADE
+                )
+            """)
+            await self._db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_adk_session_events_session
+                ON adk_session_events (app_name, user_id, session_id, seq)
+            """)
+            await self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            await self._db.commit()
+
+    async def close(self) -> None:
+        if self._db is not None:
+            async with self._write_lock:
+                await self._db.close()
+                self._db = None
+
+    def _is_expired(self, last_update_time: float) -> bool:
+        return bool(self.ttl_seconds) and last_update_time < time.time() - self.ttl_seconds
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = (session_id or "").strip() or str(uuid.uuid4())
+        now = time.time()
+        async with self._write_lock:
+            # Replaces an expired session that has not been evicted yet
+            await self._db.execute(
+                "DELETE FROM adk_sessions WHERE app_name = ? AND user_id = ? AND session_id = ? AND last_update_time < ?",
+                (app_name, user_id, session_id, now - self.ttl_seconds if self.ttl_seconds else float("-inf")),
+            )
+            # Another worker process may have created the same session first; keep its row (and events)
+            cursor = await self._db.execute(
+                "INSERT OR IGNORE INTO adk_sessions (app_name, user_id, session_id, state, last_update_time) VALUES (?, ?, ?, ?, ?)",
+                (app_name, user_id, session_id, json.dumps(state or {}), now),
+            )
+            created = cursor.rowcount == 1
+            await cursor.close()
+            await self._db.commit()
+        if not created:
+            existing = await self.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+            if existing is not None:
+                return existing
+        return Session(
+            id=session_id, app_name=app_name, user_id=user_id, state=dict(state or {}), last_update_time=now
+        )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        cursor = await self._db.execute(
+            "SELECT state, last_update_time FROM adk_sessions WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            (app_name, user_id, session_id),
+        )
+        row = await cursor.fetchone()
+        await cursor.close()
+        if row is None:
+            return None
+        state, last_update_time = row
+        if self._is_expired(last_update_time):
+            await self.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+            return None
+
+        limit = self.max_events
+        if config and config.num_recent_events:
+            limit = min(limit, config.num_recent_events)
+        cursor = await self._db.execute(
+            """
+            SELECT event FROM (
+                SELECT seq, event FROM adk_session_events
+                WHERE app_name = ? AND user_id = ? AND session_id = ?
+                ORDER BY seq DESC LIMIT ?
+            ) ORDER BY seq
+            """,
+            (app_name, user_id, session_id, limit),
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        events = [Event.model_validate_json(event_json) for (event_json,) in rows]
+        if config and config.after_timestamp:
+            events = [e for e in events if e.timestamp >= config.after_timestamp]
+
+        return Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=json.loads(state),
+            events=events,
+            last_update_time=last_update_time,
+        )
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        cursor = await self._db.execute(
+            "SELECT session_id, state, last_update_time FROM adk_sessions WHERE app_name = ? AND user_id = ?",
+            (app_name, user_id),
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        sessions = [
+            Session(id=session_id, app_name=app_name, user_id=user_id, state=json.loads(state), last_update_time=ts)
+            for session_id, state, ts in rows
+            if not self._is_expired(ts)
+        ]
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        async with self._write_lock:
+            await self._db.execute(
+                "DELETE FROM adk_sessions WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (app_name, user_id, session_id),
+            )
+            await self._db.commit()
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp or time.time()
+
+        # Keep only the most recent events, in memory and on disk
+        if self.max_events and len(session.events) > self.max_events:
+            del session.events[:-self.max_events]
+
+        key = (session.app_name, session.user_id, session.id)
+        async with self._write_lock:
+            await self._db.execute(
+                "INSERT INTO adk_session_events (app_name, user_id, session_id, event) VALUES (?, ?, ?, ?)",
+                (*key, event.model_dump_json(exclude_none=True)),
+            )
+            await self._db.execute(
+                "UPDATE adk_sessions SET state = ?, last_update_time = ? WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (json.dumps(session.state, default=str), session.last_update_time, *key),
+            )
+            if self.max_events:
+                await self._db.execute(
+                    """
+                    DELETE FROM adk_session_events
+                    WHERE app_name = ? AND user_id = ? AND session_id = ? AND seq <= (
+                        SELECT seq FROM adk_session_events
+                        WHERE app_name = ? AND user_id = ? AND session_id = ?
+                        ORDER BY seq DESC LIMIT 1 OFFSET ?
+                    )
+                    """,
+                    (*key, *key, self.max_events),
+                )
+            await self._db.commit()
+        return event
+
+    async def evict_expired(self) -> int:
+        """Deletes sessions idle for longer than the TTL (their events cascade). Returns the count."""
+        if not self.ttl_seconds:
+            return 0
+        async with self._write_lock:
+            cursor = await self._db.execute(
+                "DELETE FROM adk_sessions WHERE last_update_time < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+            evicted = cursor.rowcount
+            await cursor.close()
+            await self._db.commit()
+        return evicted
@@ -0,0 +1,243 @@
+"""
+State shared between the worker processes of one deployment (`uvicorn main:app --workers N`).
+
+Sessions, orders and the SQLite catalog already live in SQLite files that
+every worker opens. What remains per process are the tool / response caches
+and anything counted in memory. A SharedState backend connects those:
+
+  * `publish(tags)` / `poll()`: cache invalidations (e.g. "order:<id>" after
+    place_order) are broadcast, and every worker drops the matching entries
+    from its own caches when it next polls;
+  * `incr` / `get` / `set`: small expiring counters and values (rate limits,
+    flags) visible to every worker.
+
+Backends:
+  * "memory": single process; nothing to share, so publish/poll are no-ops.
+  * "sqlite": a WAL-mode SQLite file that all workers on the host open.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+from observability import get_logger
+
+logger = get_logger("shared_state")
+
+SCHEMA_VERSION = 1  # PRAGMA user_version of a SQLite shared state file whose tables exist
+
+
+class MemorySharedState:
+    """
+    In-process backend for a single worker. Expired values are dropped when read and,
+    every `sweep_interval_seconds`, all at once on a write: keys that are never read
+    again (e.g. one rate limit counter per client and window) do not accumulate.
+    """
+
+    backend = "memory"
+
+    def __init__(self, sweep_interval_seconds: float = 60.0):
+        self._values: Dict[str, Tuple[Any, Optional[float]]] = {}  # key -> (value, expires_at)
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._last_sweep = time.time()
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def publish(self, tags: Iterable[str]) -> None:
+        """Broadcasts cache invalidation tags to the other workers (none here)."""
+
+    async def poll(self) -> List[str]:
+        """Tags published by other workers since the last poll."""
+        return []
+
+    def _live(self, key: str, now: float) -> Optional[Tuple[Any, Optional[float]]]:
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._values[key]
+            return None
+        return entry
+
+    def _sweep(self, now: float) -> None:
+        if now - self._last_sweep < self.sweep_interval_seconds:
+            return
+        self._last_sweep = now
+        for key in [k for k, (_, expires_at) in self._values.items() if expires_at is not None and expires_at <= now]:
+            del self._values[key]
+
+    async def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        """Adds `amount` to a counter and returns the new value. `ttl` applies when the counter is created."""
+        now = time.time()
+        self._sweep(now)
+        entry = self._live(key, now)
+        if entry is None:
+            entry = (0, now + ttl if ttl else None)
+        value = entry[0] + amount
+        self._values[key] = (value, entry[1])
+        return value
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        entry = self._live(key, time.time())
+        return default if entry is None else entry[0]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        self._sweep(now)
+        self._values[key] = (value, now + ttl if ttl else None)
+
+    async def delete(self, key: str) -> None:
+        self._values.pop(key, None)
+
+
+class SQLiteSharedState:
+    """
+    Backend in a WAL-mode SQLite file shared by all worker processes on the host.
+    Published tags are rows of an append-only table; each worker remembers the
+    last row it has seen. Rows older than `retention_seconds` are pruned.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, retention_seconds: float = 600.0, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.busy_timeout_ms = busy_timeout_ms
+        # Identifies this process's own publications, which it has already applied locally
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._db: Optional[aiosqlite.Connection] = None
+        self._lock = asyncio.Lock()
+        self._last_seq = 0
+        self._last_prune = 0.0
+
+    async def open(self) -> None:
+        if self._db is not None:
+            return
+        self._db = await aiosqlite.connect(self.path)
+        await self._db.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)};")
+        await self._db.execute("PRAGMA journal_mode = WAL;")
+        await self._db.execute("PRAGMA synchronous = NORMAL;")
+        # Every worker opens this file at startup; only the first one needs the (write-locking) CREATEs
+        cursor = await self._db.execute("PRAGMA user_version")
+        version = (await cursor.fetchone())[0]
+        await cursor.close()
+        if version < SCHEMA_VERSION:
+            await self._db.execute("""
+                CREATE TABLE IF NOT EXISTS shared_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    origin TEXT NOT NULL,
+                    tags TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            await self._db.execute("""
+                CREATE TABLE IF NOT EXISTS shared_kv (
+                    key TEXT PRIMARY KEY,
+                    value,
+                    expires_at REAL
+                )
+            """)
+            await self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            await self._db.commit()
+        # Only invalidations published after this worker started matter (its caches are empty)
+        cursor = await self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM shared_events")
+        self._last_seq = (await cursor.fetchone())[0]
+        await cursor.close()
+
+    async def close(self) -> None:
+        if self._db is not None:
+            async with self._lock:
+                await self._db.close()
+                self._db = None
+
+    async def publish(self, tags: Iterable[str]) -> None:
+        tags = list(tags)
+        if not tags:
+            return
+        async with self._lock:
+            await self._db.execute(
+                "INSERT INTO shared_events (origin, tags, created_at) VALUES (?, ?, ?)",
+                (self.origin, json.dumps(tags), time.time()),
+            )
+            await self._db.commit()
+
+    async def poll(self) -> List[str]:
+        async with self._lock:
+            cursor = await self._db.execute(
+                "SELECT seq, origin, tags FROM shared_events WHERE seq > ? ORDER BY seq", (self._last_seq,)
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+            tags: List[str] = []
+            for seq, origin, encoded in rows:
+                self._last_seq = seq
+                if origin != self.origin:
+                    tags.extend(json.loads(encoded))
+
+            now = time.time()
+            if now - self._last_prune > self.retention_seconds / 10:
+                self._last_prune = now
+                await self._db.execute("DELETE FROM shared_events WHERE created_at < ?", (now - self.retention_seconds,))
+                await self._db.execute("DELETE FROM shared_kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+                await self._db.commit()
+        return tags
+
+    async def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        async with self._lock:
+            # An expired counter restarts from `amount` with a fresh expiry
+            cursor = await self._db.execute(
+                """
+                INSERT INTO shared_kv (key, value, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = CASE WHEN shared_kv.expires_at <= ? THEN excluded.value ELSE shared_kv.value + excluded.value END,
+                    expires_at = CASE WHEN shared_kv.expires_at <= ? THEN excluded.expires_at ELSE shared_kv.expires_at END
+                RETURNING value
+                """,
+                (key, amount, expires_at, now, now),
+            )
+            value = (await cursor.fetchone())[0]
+            await cursor.close()
+            await self._db.commit()
+        return value
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        async with self._lock:
+            cursor = await self._db.execute(
+                "SELECT value FROM shared_kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
+        if row is None:
+            return default
+        return json.loads(row[0]) if isinstance(row[0], str) else row[0]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        stored = value if isinstance(value, (int, float)) and not isinstance(value, bool) else json.dumps(value)
+        async with self._lock:
+            await self._db.execute(
+                "INSERT OR REPLACE INTO shared_kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, stored, time.time() + ttl if ttl else None),
+            )
+            await self._db.commit()
+
+    async def delete(self, key: str) -> None:
+        async with self._lock:
+            await self._db.execute("DELETE FROM shared_kv WHERE key = ?", (key,))
+            await self._db.commit()
+
+
+def create_shared_state(backend: str, path: str):
+    """SharedState backend by name ("memory" or "sqlite")."""
+    if backend == "sqlite":
+        return SQLiteSharedState(path)
+    if backend != "memory":
+        logger.warning(f"Unknown shared state backend '{backend}', using 'memory'.")
+    return MemorySharedState()
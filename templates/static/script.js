@@ -44,64 +44,63 @@ document.addEventListener('DOMContentLoaded', () => {
                 eventLogContent.scrollTop = eventLogContent.scrollHeight;
             }
 
-            async function sendMessage() {
-            const message = userInput.value.trim();
-            if (!message) return;
+            // --- Streaming chat over WebSocket (falls back to POST /chat) ---
+            let chatSocket = null;
+            let socketReady = null;
+            let currentTurn = null;
 
-            addMessage(message, 'user');
-            addEventLogItem('user', 'Aryan', `--- Received message: ${message} ---`);
-            userInput.value = '';
-            sendButton.disabled = true;
+            function newTurn() {
+                return { streamDiv: null, streamText: '' };
+            }
 
-    const typingDiv = document.createElement('div');
-    typingDiv.classList.add('message', 'agent');
-    typingDiv.id = 'typing-indicator';
-    typingDiv.textContent = '🤖 typing...';
-    chatBox.appendChild(typingDiv);
-    chatBox.scrollTop = chatBox.scrollHeight;
+            function removeTypingIndicator() {
+                const currentTypingIndicator = document.getElementById('typing-indicator');
+                if (currentTypingIndicator) {
+                    currentTypingIndicator.remove();
+                }
+            }
 
-    try {
-        const response = await fetch('/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ message: message })
-        });
-
-        const currentTypingIndicator = document.getElementById('typing-indicator');
-        if (currentTypingIndicator) {
-            currentTypingIndicator.remove();
-        }
+            function finishTurn() {
+                removeTypingIndicator();
+                sendButton.disabled = false;
+                currentTurn = null;
+            }
 
-        if (!response.ok) {
-            let errorDetail = `HTTP error! status: ${response.status}`;
-            try {
-                const errorBody = await response.json();
-                if (errorBody && errorBody.response) {
-                    errorDetail = `Error from server: ${errorBody.response}`;
-                } else if (errorBody && errorBody.detail) {
-                    errorDetail = `Server validation error: ${errorBody.detail}`;
-                } else {
-                    errorDetail = `HTTP error! status: ${response.status} - ${response.statusText}`;
+            function appendPartialText(turn, text) {
+                removeTypingIndicator();
+                if (!turn.streamDiv) {
+                    turn.streamDiv = document.createElement('div');
+                    turn.streamDiv.classList.add('message', 'agent');
+                    chatBox.appendChild(turn.streamDiv);
                 }
-            } catch (jsonError) {
-                errorDetail = `HTTP error! status: ${response.status} - ${response.statusText}`;
+                turn.streamText += text;
+                turn.streamDiv.textContent = `🤖 ${turn.streamText}`;
+                chatBox.scrollTop = chatBox.scrollHeight;
             }
-            addMessage(`Error processing your request: ${errorDetail}`, 'agent');
-            addEventLogItem('agent', 'Shopping Assistant', `---> Captured final response text event from  Shopping Assistant: Error processing your request: ${errorDetail}`);
-
-        } else {
-            const data = await response.json();
-            const events = data.events || [];
 
-            events.forEach(event => {
-                if (event.type === 'final_response') {
+            function handleChatEvent(event, turn) {
+                if (event.type === 'partial_text') {
+                    appendPartialText(turn, event.text);
+                } else if (event.type === 'final_response') {
+                    removeTypingIndicator();
+                    if (turn.streamDiv) {
+                        // Replace the streamed chunks with the complete text
+                        turn.streamDiv.remove();
+                    }
+                    turn.streamDiv = null;
+                    turn.streamText = '';
                     addMessage(event.text, 'agent');
                     addEventLogItem('agent', event.agent_name || 'Shopping Assistant', `---> Captured final response text event from ${event.agent_name || 'Shopping Assistant'}: ${event.text} ---`);
+                } else if (event.type === 'fast_path') {
+                    addEventLogItem('system', 'System', `Fast path: ${event.intent} handled directly by ${event.tool}`);
                 } else if (event.type === 'agent_transfer') {
                     addEventLogItem('system', 'System', `Transferring from ${event.from} to ${event.to}`);
+                } else if (event.type === 'tool_call') {
+                    addEventLogItem('system', event.author || 'System', `Calling tool ${event.name}(${JSON.stringify(event.args || {})})`);
+                } else if (event.type === 'tool_result') {
+                    addEventLogItem('system', event.author || 'System', `Tool ${event.name} returned status: ${event.status || 'unknown'}`);
                 } else if (event.type === 'error') {
+                    removeTypingIndicator();
                     addMessage(`Error: ${event.message}`, 'agent');
                     addEventLogItem('system', 'Error', event.message);
                 } else if (event.type === 'intermediate_message') {
@@ -109,22 +108,112 @@ document.addEventListener('DOMContentLoaded', () => {
                     console.log(`Intermediate message from ${event.author}: ${event.text}`);
                     addEventLogItem('agent', event.author, event.text); // Log intermediate messages
                 }
-            });
-        }
+            }
 
-    } catch (error) {
-        console.error('Fetch or unexpected error:', error);
-        const currentTypingIndicator = document.getElementById('typing-indicator');
-        if (currentTypingIndicator) {
-            currentTypingIndicator.remove();
-        }
-        addMessage(`An unexpected error occurred: ${error.message}`, 'agent');
-        addEventLogItem('agent', 'Shopping Assistant', `---> Captured final response text event from Shopping Assistant: An unexpected error occurred: ${error.message} ---`);
-    } finally {
-        sendButton.disabled = false;
-        const finalTypingIndicator = document.getElementById('typing-indicator');
-        if (finalTypingIndicator) {
-            finalTypingIndicator.remove();
+            function connectChatSocket() {
+                if (socketReady) {
+                    return socketReady;
+                }
+                if (!('WebSocket' in window)) {
+                    return Promise.reject(new Error('WebSocket not supported'));
+                }
+                socketReady = new Promise((resolve, reject) => {
+                    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+                    const socket = new WebSocket(`${protocol}//${window.location.host}/ws/chat`);
+                    socket.onopen = () => {
+                        chatSocket = socket;
+                        resolve(socket);
+                    };
+                    socket.onmessage = (message) => {
+                        const event = JSON.parse(message.data);
+                        if (!currentTurn) {
+                            return;
+                        }
+                        if (event.type === 'done') {
+                            finishTurn();
+                        } else {
+                            handleChatEvent(event, currentTurn);
+                        }
+                    };
+                    socket.onerror = () => reject(new Error('WebSocket connection failed'));
+                    socket.onclose = () => {
+                        chatSocket = null;
+                        socketReady = null;
+                        if (currentTurn) {
+                            addMessage('Connection lost while waiting for a response.', 'agent');
+                            finishTurn();
+                        }
+                    };
+                });
+                return socketReady;
+            }
+
+            async function sendViaHttp(message, turn) {
+                const response = await fetch('/chat', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({ message: message })
+                });
+
+                removeTypingIndicator();
+
+                if (!response.ok) {
+                    let errorDetail = `HTTP error! status: ${response.status}`;
+                    try {
+                        const errorBody = await response.json();
+                        if (errorBody && errorBody.response) {
+                            errorDetail = `Error from server: ${errorBody.response}`;
+                        } else if (errorBody && errorBody.detail) {
+                            errorDetail = `Server validation error: ${errorBody.detail}`;
+                        } else {
+                            errorDetail = `HTTP error! status: ${response.status} - ${response.statusText}`;
+                        }
+                    } catch (jsonError) {
+                        errorDetail = `HTTP error! status: ${response.status} - ${response.statusText}`;
+                    }
+                    addMessage(`Error processing your request: ${errorDetail}`, 'agent');
+                    addEventLogItem('agent', 'Shopping Assistant', `---> Captured final response text event from  Shopping Assistant: Error processing your request: ${errorDetail}`);
+                } else {
+                    const data = await response.json();
+                    const events = data.events || [];
+                    events.forEach(event => handleChatEvent(event, turn));
+                }
+            }
+
+            async function sendMessage() {
+            const message = userInput.value.trim();
+            if (!message || currentTurn) return;
+
+            addMessage(message, 'user');
+            addEventLogItem('user', 'Aryan', `--- Received message: ${message} ---`);
+            userInput.value = '';
+            sendButton.disabled = true;
+
+    const typingDiv = document.createElement('div');
+    typingDiv.classList.add('message', 'agent');
+    typingDiv.id = 'typing-indicator';
+    typingDiv.textContent = '🤖 typing...';
+    chatBox.appendChild(typingDiv);
+    chatBox.scrollTop = chatBox.scrollHeight;
+
+    currentTurn = newTurn();
+    try {
+        const socket = await connectChatSocket();
+        // Events for this turn are rendered by the socket's onmessage handler until 'done'
+        socket.send(JSON.stringify({ message: message }));
+    } catch (socketError) {
+        console.warn('Streaming unavailable, falling back to POST /chat:', socketError);
+        try {
+            await sendViaHttp(message, currentTurn);
+        } catch (error) {
+            console.error('Fetch or unexpected error:', error);
+            removeTypingIndicator();
+            addMessage(`An unexpected error occurred: ${error.message}`, 'agent');
+            addEventLogItem('agent', 'Shopping Assistant', `---> Captured final response text event from Shopping Assistant: An unexpected error occurred: ${error.message} ---`);
+        } finally {
+            finishTurn();
         }
     }
 }
@@ -1,27 +1,128 @@
--- Active: 1746695805491@@127.0.0.1@3306
--- You can run these queries using a simple Python script or an SQLite client (like DB Browser for SQLite)
-
--- Enable foreign key constraints (run this after connecting)
-PRAGMA foreign_keys = ON;
-
--- Create the orders table (SQLite syntax)
-CREATE TABLE IF NOT EXISTS orders (
-    order_id VARCHAR(255) PRIMARY KEY, -- Unique ID for the order
-    user_id VARCHAR(255),           -- ID of the user who placed the order
-    status VARCHAR(50),             -- Current status (e.g., 'Processing', 'Shipped')
-    created_at DATETIME,            -- Timestamp when the order was created (SQLite DATETIME)
-    details TEXT                    -- Additional details
-);
-
--- Create the order_items table (SQLite syntax)
-CREATE TABLE IF NOT EXISTS order_items (
-    item_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Auto-incrementing integer primary key in SQLite
-    order_id VARCHAR(255),                  -- The ID of the order this item belongs to
-    product_id VARCHAR(255),                -- The ID of the product ordered
-    quantity INTEGER,                       -- The quantity (SQLite INTEGER)
-    -- Define the foreign key constraint
-    FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE
-);
-ALTER TABLE order_items ADD COLUMN price REAL;
-
-ALTER TABLE orders ADD COLUMN total_price REAL DEFAULT 0.0;
\ No newline at end of file
+-- Reference schema for the SQLite orders database.
+-- The application creates and upgrades this schema itself through the versioned
+-- migrations in migrations.py (tracked in PRAGMA user_version); this file mirrors
+-- the result of the latest migration for use with an SQLite client (like DB Browser for SQLite);
+-- tests/test_migrations.py checks that the two stay in sync.
+-- To upgrade an existing database and verify the recorded query plans, run:
+--     python migrations.py --check ./ecommerce.db
+
+-- Enable foreign key constraints (run this after connecting)
+PRAGMA foreign_keys = ON;
+
+-- Migration 1 + 2: orders table (SQLite syntax)
+CREATE TABLE IF NOT EXISTS orders (
+    order_id VARCHAR(255) PRIMARY KEY, -- Unique ID for the order
+    user_id VARCHAR(255),           -- ID of the user who placed the order
+    status VARCHAR(50),             -- Current status (e.g., 'Processing', 'Shipped')
+    created_at DATETIME,            -- Timestamp when the order was created (SQLite DATETIME)
+    details TEXT,                   -- Additional details
+    total_price REAL DEFAULT 0.0    -- Total price of the order
+);
+
+-- Migration 1 + 2: order_items table (SQLite syntax)
+CREATE TABLE IF NOT EXISTS order_items (
+    item_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Auto-incrementing integer primary key in SQLite
+    order_id VARCHAR(255),                  -- The ID of the order this item belongs to
+    product_id VARCHAR(255),                -- The ID of the product ordered
+    quantity INTEGER,                       -- The quantity (SQLite INTEGER)
+    price REAL,                             -- Unit price at time of order
+    -- Define the foreign key constraint
+    FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE
+);
+
+-- Migration 3: covering indexes
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id, product_id, quantity, price);
+CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders (created_at, order_id, status, total_price);
+CREATE INDEX IF NOT EXISTS idx_orders_user_created_at ON orders (user_id, created_at, order_id, status, total_price);
+
+-- Migration 4: product catalog imported from products.json (rowid order = catalog order)
+CREATE TABLE IF NOT EXISTS products (
+    product_id VARCHAR(255) PRIMARY KEY,
+    name TEXT NOT NULL,
+    price REAL,                             -- NULL when the source price is missing or non-numeric
+    description TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    checksum INTEGER NOT NULL               -- Content hash, lets re-imports skip unchanged rows
+);
+CREATE INDEX IF NOT EXISTS idx_products_category_price ON products (category, price);
+
+-- Migration 4: catalog generation, bumped by every import that changed something
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    generation INTEGER NOT NULL,
+    updated_at DATETIME
+);
+INSERT OR IGNORE INTO catalog_meta (id, generation, updated_at) VALUES (1, 0, NULL);
+
+-- Migration 4: full-text index over products (needs FTS5), kept in sync by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, description, category,
+    content='products', content_rowid='rowid', tokenize='porter unicode61'
+);
+INSERT INTO products_fts (products_fts, rank) VALUES ('rank', 'bm25(3.0, 1.0, 2.0)');
+CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, description, category)
+    VALUES (new.rowid, new.name, new.description, new.category);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, category)
+    VALUES ('delete', old.rowid, old.name, old.description, old.category);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, category)
+    VALUES ('delete', old.rowid, old.name, old.description, old.category);
+    INSERT INTO products_fts (rowid, name, description, category)
+    VALUES (new.rowid, new.name, new.description, new.category);
+END;
+
+-- Migration 5: stock per product (products without a row are not stock-tracked)
+CREATE TABLE IF NOT EXISTS inventory (
+    product_id VARCHAR(255) PRIMARY KEY,
+    quantity INTEGER NOT NULL CHECK (quantity >= 0),
+    updated_at DATETIME
+);
+
+-- Migration 5: units each order took from inventory
+CREATE TABLE IF NOT EXISTS inventory_reservations (
+    order_id VARCHAR(255) NOT NULL,
+    product_id VARCHAR(255) NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (order_id, product_id)
+) WITHOUT ROWID;
+
+-- Migration 5: Idempotency-Key -> the order it created and the response returned for it
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idempotency_key TEXT PRIMARY KEY,
+    request_hash TEXT NOT NULL,
+    order_id VARCHAR(255) NOT NULL,
+    response TEXT NOT NULL,
+    created_at DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys (created_at);
+
+-- Migration 6: remove_order cancels in place
+ALTER TABLE orders ADD COLUMN cancelled_at DATETIME;
+
+-- Migration 7: sales rollups, maintained by the order writes (see sales_rollups.py)
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day TEXT PRIMARY KEY,                   -- YYYY-MM-DD of the orders' created_at
+    orders INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0.0,
+    cancelled_orders INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sales_by_product (
+    product_id VARCHAR(255) PRIMARY KEY,
+    orders INTEGER NOT NULL DEFAULT 0,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0.0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sales_by_product_units ON sales_by_product (units DESC, product_id, orders, revenue);
+CREATE TABLE IF NOT EXISTS order_status_counts (
+    status VARCHAR(50) PRIMARY KEY,
+    orders INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- The archive tables (orders_archive, order_items_archive) are created by order_archive.py, not by a migration.
+
+PRAGMA user_version = 7;
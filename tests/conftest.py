@@ -0,0 +1,39 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules live at the repository root
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """main, imported with its files in a scratch directory and the agent tree built on first use."""
+    workdir = tmp_path_factory.mktemp("app")
+    os.environ.update({
+        "SQLITE_DATABASE_PATH": str(workdir / "ecommerce.db"),
+        "SESSION_DATABASE_PATH": str(workdir / "sessions.db"),
+        "SHARED_STATE_PATH": str(workdir / "shared_state.db"),
+        "CATALOG_FILE": str(workdir / "products.cat"),
+        "CATALOG_WATCH_INTERVAL_SECONDS": "0",
+        "AGENT_WARMUP": "lazy",
+        "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "ERROR"),
+    })
+    os.environ.pop("ADMIN_TOKEN", None)
+    # main mounts templates/static and reads products.json relative to the working directory
+    os.chdir(ROOT)
+    return importlib.import_module("main")
+
+
+@pytest.fixture
+def main(main_module, tmp_path, monkeypatch):
+    """main with a fresh orders database for this test (started with main.startup_event())."""
+    monkeypatch.setattr(main_module, "SQLITE_DATABASE_PATH", str(tmp_path / "ecommerce.db"))
+    monkeypatch.setattr(main_module, "CATALOG_FILE", str(tmp_path / "products.cat"))
+    monkeypatch.setattr(main_module, "ADMIN_TOKEN", None)
+    return main_module
@@ -0,0 +1,95 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+
+class _Request:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def _agent_names(root):
+    return [agent.name for agent in root.sub_agents]
+
+
+def test_no_one_is_admin_without_a_configured_token(main):
+    assert not main._is_admin(_Request({}))
+    assert not main._is_admin(_Request({"X-Admin-Token": ""}))
+    assert not main._is_admin(_Request({"X-Admin-Token": "anything"}))
+
+
+def test_admin_needs_the_configured_token(main, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    assert main._is_admin(_Request({"X-Admin-Token": "s3cret"}))
+    assert not main._is_admin(_Request({"X-Admin-Token": "wrong"}))
+    assert not main._is_admin(_Request({}))
+
+
+def test_sales_endpoint_is_closed_without_a_configured_token(main):
+    client = TestClient(main.app)
+    response = client.get("/analytics/sales", headers={"X-Admin-Token": "guess"})
+    assert response.status_code == 403
+    assert "ADMIN_TOKEN is not configured" in response.json()["message"]
+
+
+def test_sales_agent_is_left_out_without_a_configured_token(main, monkeypatch):
+    pytest.importorskip("google.adk")
+    assert "sales_analytics_agent" not in _agent_names(main._build_agent_tree())
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    assert "sales_analytics_agent" in _agent_names(main._build_agent_tree())
+
+
+def test_chat_without_the_token_gets_no_sales_figures(main, monkeypatch):
+    pytest.importorskip("google.adk")
+    from fake_llm import install_fake_llm
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(main, "root_agent", None)
+    monkeypatch.setattr(main, "runner", None)
+    monkeypatch.setattr(main, "response_cache", None)
+    with TestClient(main.app) as client:
+        client.portal.call(main.ensure_agent_runner)
+        install_fake_llm(main.get_root_agent())
+        message = {"message": "What was our revenue this week?"}
+
+        customer = client.post("/chat", json=message, headers={"X-Admin-Token": "wrong"}).json()
+        assert customer["agent_name"] == "sales_analytics_agent"
+        assert "only available to store operators" in customer["response"]
+        assert "revenue" not in customer["response"].lower()
+
+        operator = client.post("/chat", json=message, headers={"X-Admin-Token": "s3cret"}).json()
+        assert operator["agent_name"] == "sales_analytics_agent"
+        assert "revenue" in operator["response"].lower()
+
+
+def test_admin_endpoints_are_closed_without_a_configured_token(main):
+    with TestClient(main.app) as client:
+        for method, path, body in [
+            ("GET", "/admin/catalog", None),
+            ("GET", "/admin/inventory", None),
+            ("PUT", "/admin/inventory", {"inventory": {"p-001": 0}}),
+            ("POST", "/admin/catalog/reload", None),
+        ]:
+            response = client.request(method, path, json=body, headers={"X-Admin-Token": ""})
+            assert response.status_code == 403, path
+        assert client.portal.call(_stock, main) == {}
+
+
+def test_inventory_needs_the_admin_token(main, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    body = {"inventory": {"p-001": 5}}
+    with TestClient(main.app) as client:
+        assert client.put("/admin/inventory", json=body, headers={"X-Admin-Token": "wrong"}).status_code == 403
+        assert client.portal.call(_stock, main) == {}
+        response = client.put("/admin/inventory", json=body, headers={"X-Admin-Token": "s3cret"})
+        assert response.status_code == 200
+        assert client.portal.call(_stock, main) == {"p-001": 5}
+
+
+async def _stock(main):
+    async with main.db_pool.reader() as db:
+        return await main.order_store.stock_levels(db)
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionRejected, ConcurrencyLimiter, RateLimiter, until_deadline
+from shared_state import MemorySharedState
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("time.time", lambda: now[0])
+    return now
+
+
+def test_rate_limit_rejects_with_429_until_the_next_window(clock):
+    async def run():
+        limiter = RateLimiter(MemorySharedState(), limit=2, window_seconds=60)
+        await limiter.check("10.0.0.1")
+        await limiter.check("10.0.0.1")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limiter.check("10.0.0.1")
+        # Other clients have their own budget
+        await limiter.check("10.0.0.2")
+        clock[0] += 60
+        await limiter.check("10.0.0.1")
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.status_code == 429
+    assert rejected.reason == "rate_limited"
+    assert 0 < rejected.retry_after <= 60
+    assert rejected.headers() == {"Retry-After": str(int(rejected.retry_after))}
+
+
+def test_expired_rate_limit_windows_are_swept(clock):
+    async def run():
+        state = MemorySharedState(sweep_interval_seconds=60)
+        limiter = RateLimiter(state, limit=5, window_seconds=10)
+        for _ in range(100):
+            for client in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+                await limiter.check(client)
+            clock[0] += 10
+        return state
+
+    state = asyncio.run(run())
+    # At most the windows of the last sweep interval survive, not one per window ever seen
+    assert len(state._values) <= 3 * 7
+
+
+def test_queue_full_is_rejected_with_503():
+    async def run():
+        limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert (limiter.in_flight, limiter.waiting) == (1, 1)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(holder, queued)
+        assert (limiter.in_flight, limiter.waiting) == (0, 0)
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert (rejected.status_code, rejected.reason) == (503, "queue_full")
+
+
+def test_queue_wait_times_out_with_503():
+    async def run():
+        limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=4, queue_timeout=5)
+        async with limiter.slot():
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with limiter.slot(timeout=0.01):
+                    pass
+            assert limiter.waiting == 0
+        async with limiter.slot():
+            pass
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert (rejected.status_code, rejected.reason) == (503, "queue_timeout")
+
+
+def test_deadline_cancels_the_step_in_progress():
+    async def run():
+        seen = []
+
+        async def agent_run():
+            try:
+                yield "first"
+                seen.append("waiting")
+                await asyncio.sleep(10)
+                yield "never"
+            except asyncio.CancelledError:
+                seen.append("cancelled")
+                raise
+            finally:
+                seen.append("closed")
+
+        loop = asyncio.get_running_loop()
+        received = []
+        with pytest.raises(TimeoutError):
+            async for event in until_deadline(agent_run(), loop.time() + 0.05):
+                received.append(event)
+        return received, seen
+
+    received, seen = asyncio.run(run())
+    assert received == ["first"]
+    assert seen == ["waiting", "cancelled", "closed"]
+
+
+def test_run_that_finishes_before_the_deadline_is_untouched():
+    async def run():
+        async def agent_run():
+            for event in ("a", "b"):
+                await asyncio.sleep(0)
+                yield event
+
+        loop = asyncio.get_running_loop()
+        return [event async for event in until_deadline(agent_run(), loop.time() + 5)]
+
+    assert asyncio.run(run()) == ["a", "b"]
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from batch_loader import BatchLoader
+
+
+def _recording_loader(**kwargs):
+    calls = []
+
+    async def load_many(keys):
+        calls.append(list(keys))
+        await asyncio.sleep(0)
+        return {key: f"row {key}" for key in keys if not key.startswith("missing")}
+
+    return BatchLoader(load_many, **kwargs), calls
+
+
+def test_concurrent_loads_share_one_batch():
+    async def run():
+        loader, calls = _recording_loader()
+        results = await asyncio.gather(*(loader.load(key) for key in ["a", "b", "a", "missing", "c"]))
+        # A later event-loop turn starts a new batch
+        later = await loader.load("d")
+        return results, later, calls, loader.stats()
+
+    results, later, calls, stats = asyncio.run(run())
+    assert results == ["row a", "row b", "row a", None, "row c"]
+    assert later == "row d"
+    assert calls == [["a", "b", "missing", "c"], ["d"]]
+    assert stats == {"batches": 2, "keys": 5, "keys_per_batch": 2.5}
+
+
+def test_batches_are_split_at_max_batch_size():
+    async def run():
+        loader, calls = _recording_loader(max_batch_size=2)
+        results = await asyncio.gather(*(loader.load(key) for key in "abcde"))
+        return results, calls
+
+    results, calls = asyncio.run(run())
+    assert results == [f"row {key}" for key in "abcde"]
+    assert calls == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_errors_reach_every_caller_of_the_batch():
+    async def run():
+        async def load_many(keys):
+            raise RuntimeError("database is locked")
+
+        loader = BatchLoader(load_many)
+        results = await asyncio.gather(loader.load("a"), loader.load("b"), return_exceptions=True)
+        return results
+
+    results = asyncio.run(run())
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    assert all(str(r) == "database is locked" for r in results)
+
+
+def test_a_cancelled_caller_does_not_fail_the_batch():
+    async def run():
+        release = asyncio.Event()
+
+        async def load_many(keys):
+            await release.wait()
+            return {key: key.upper() for key in keys}
+
+        loader = BatchLoader(load_many)
+        impatient = asyncio.create_task(loader.load("a"))
+        patient = asyncio.create_task(loader.load("a"))
+        other = asyncio.create_task(loader.load("b"))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient, await other
+
+    assert asyncio.run(run()) == ("A", "B")
+
+
+def test_order_statuses_are_read_in_one_batch(main):
+    async def run():
+        await main.startup_event()
+        try:
+            placed = [await main._place_order([{"product_id": "p-001", "quantity": n}]) for n in (1, 2, 3)]
+            order_ids = [order["order_id"] for order in placed]
+            before = main.order_status_loader.stats()["batches"]
+            result = await main.check_order_statuses(order_ids + ["missing-123"])
+            return order_ids, result, main.order_status_loader.stats()["batches"] - before
+        finally:
+            await main.shutdown_event()
+
+    order_ids, result, batches = asyncio.run(run())
+    assert batches == 1
+    assert result["status"] == "report"
+    assert [order["order_id"] for order in result["orders"]] == order_ids + ["missing-123"]
+    assert result["not_found"] == ["missing-123"]
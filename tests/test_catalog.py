@@ -0,0 +1,58 @@
+from catalog import Product, ProductCatalog, parse_products
+
+PRODUCTS = [
+    {"id": "p-1", "name": "Denim Jeans", "price": 45.99, "description": "Classic fit.", "category": "Clothing"},
+    {"id": "p-2", "name": "Cotton T-Shirt", "price": 18.5, "description": "Organic cotton.", "category": "Clothing"},
+    {"id": "p-3", "name": "Running Shoes", "price": 89, "description": "Lightweight.", "category": "Footwear"},
+]
+
+
+def test_lookup_by_id():
+    catalog = ProductCatalog(PRODUCTS)
+    assert len(catalog) == 3
+    assert catalog.get("p-2").name == "Cotton T-Shirt"
+    assert catalog.get("p-3").price == 89.0
+    assert catalog.get("p-9") is None
+    assert "p-1" in catalog and "p-9" not in catalog
+    assert catalog.name_for("p-9") == "Unknown Product (p-9)"
+    assert [p.id for p in catalog] == ["p-1", "p-2", "p-3"]
+
+
+def test_invalid_and_duplicate_products_are_skipped():
+    records = parse_products([
+        {"id": "p-1", "name": "First", "price": 1},
+        {"id": "p-1", "name": "Duplicate", "price": 2},
+        {"name": "No ID"},
+        "not a product",
+        {"id": "p-2", "name": "Bad price", "price": "free"},
+        {"id": "p-3", "price": True},
+    ])
+    assert [(p.id, p.name, p.price) for p in records] == [
+        ("p-1", "First", 1.0), ("p-2", "Bad price", None), ("p-3", "Unknown Product", None),
+    ]
+
+
+def test_checksum_changes_with_the_record():
+    product = Product.from_dict(PRODUCTS[0])
+    assert product.checksum() == Product.from_dict(dict(PRODUCTS[0])).checksum()
+    assert product.checksum() != Product.from_dict({**PRODUCTS[0], "price": 39.99}).checksum()
+    assert Product.from_dict(product.to_dict()).checksum() == product.checksum()
+
+
+def test_reload_updates_only_the_changed_products():
+    first = ProductCatalog(PRODUCTS, generation=1)
+    assert first.changed_ids is None
+
+    edited = [dict(p) for p in PRODUCTS]
+    edited[1]["name"] = "Linen T-Shirt"
+    second = ProductCatalog(edited, generation=2, previous=first)
+    assert second.changed_ids == ["p-2"]
+    assert second.get("p-2").name == "Linen T-Shirt"
+    assert first.get("p-2").name == "Cotton T-Shirt"
+    assert [p.id for p in second.search_index.search("linen")[0]] == ["p-2"]
+    assert first.search_index.search("linen") == ([], 0)
+
+    # IDs added (or removed / reordered): the search index is rebuilt
+    added = ProductCatalog(edited + [{"id": "p-4", "name": "Wool Socks", "price": 7}], previous=second)
+    assert added.changed_ids is None
+    assert [p.id for p in added.search_index.search("socks")[0]] == ["p-4"]
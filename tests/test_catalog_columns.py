@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from catalog import Product, parse_products  # noqa: E402
+from catalog_columns import ColumnarCatalog  # noqa: E402
+
+PRODUCTS = [
+    Product("p-1", "Desk Lamp", 30.0, "", "Home & Office"),
+    Product("p-2", "Headphones", 80.0, "", "Electronics"),
+    Product("p-3", "Mouse", 20.0, "", "Electronics"),
+    Product("p-4", "Cable", None, "", "Electronics"),
+    Product("p-5", "Keyboard", 20.0, "", "Electronics"),
+    Product("p-6", "Mystery Box", 5.0, "", ""),
+    Product("p-7", "Notebook", None, "", "Stationery"),
+]
+
+
+def _columns():
+    return ColumnarCatalog.from_products(PRODUCTS, generation=3)
+
+
+def _ids(keys):
+    return [PRODUCTS[key].id for key in keys.tolist()]
+
+
+def test_facets_count_products_and_price_ranges_per_category():
+    columns = _columns()
+    assert columns.generation == 3 and len(columns) == 7
+    assert columns.category_names() == ["Home & Office", "Electronics", "Stationery"]
+    assert columns.facets() == [
+        {"category": "Home & Office", "products": 1, "min_price": 30.0, "max_price": 30.0},
+        {"category": "Electronics", "products": 4, "min_price": 20.0, "max_price": 80.0},
+        # No product has a price
+        {"category": "Stationery", "products": 1, "min_price": None, "max_price": None},
+    ]
+
+
+def test_select_filters_by_category_and_price():
+    columns = _columns()
+    assert columns.select().tolist() == list(range(7))
+    assert columns.select(categories=["  electronics "]).tolist() == [1, 2, 3, 4]
+    assert columns.select(categories=["Garden"]).tolist() == []
+    assert columns.select(categories=["Electronics"], min_price=20, max_price=50).tolist() == [2, 4]
+    # A missing price counts as 0.0, as in the search filters
+    assert columns.select(max_price=10).tolist() == [3, 5, 6]
+
+
+def test_top_k_by_price_keeps_catalog_order_for_ties_and_unpriced_last():
+    columns = _columns()
+    keys, total = columns.top_k_by_price(2, categories=["Electronics"])
+    assert (_ids(keys), total) == (["p-3", "p-5"], 4)
+    keys, total = columns.top_k_by_price(10, categories=["Electronics"])
+    assert _ids(keys) == ["p-3", "p-5", "p-2", "p-4"]
+    keys, _ = columns.top_k_by_price(10, descending=True, categories=["Electronics"])
+    assert _ids(keys) == ["p-2", "p-3", "p-5", "p-4"]
+    keys, total = columns.top_k_by_price(0)
+    assert (len(keys), total) == (0, 7)
+
+
+def test_top_k_matches_a_full_sort():
+    rng = np.random.default_rng(7)
+    prices = rng.integers(1, 50, size=500).astype(float)
+    prices[rng.choice(500, size=40, replace=False)] = np.nan
+    categories = [f"c{n}" for n in rng.integers(0, 5, size=500)]
+    rows = [(1000 + i, None if np.isnan(price) else float(price), category) for i, (price, category) in enumerate(zip(prices, categories))]
+    columns = ColumnarCatalog.from_rows(rows, generation=1)
+
+    for descending in (False, True):
+        matching = [row for row in rows if row[2] == "c2" and (row[1] or 0.0) >= 10]
+        expected = sorted(matching, key=lambda row: (row[1] is None, -(row[1] or 0.0) if descending else (row[1] or 0.0), row[0]))
+        keys, total = columns.top_k_by_price(25, descending, categories=["c2"], min_price=10)
+        # Keys are the table's rowids
+        assert keys.tolist() == [row[0] for row in expected[:25]]
+        assert total == len(matching)
+
+
+@pytest.mark.parametrize("store", ["sqlite", "memory"])
+def test_search_products_sorts_a_category_by_price(main, monkeypatch, store):
+    monkeypatch.setattr(main, "CATALOG_STORE", store)
+    # A view left by another test can carry the same generation number
+    monkeypatch.setattr(main, "catalog_columns", None)
+
+    async def run():
+        await main.startup_event()
+        try:
+            columns = main.current_catalog_columns()
+            result = await main.search_products("", limit=3, category="Electronics", sort_by="price_desc")
+            return columns, result
+        finally:
+            await main.shutdown_event()
+
+    columns, result = asyncio.run(run())
+    assert columns is not None
+    with open(main.PRODUCTS_FILE) as f:
+        products = parse_products(json.load(f))
+    electronics = [p for p in products if p.category == "Electronics"]
+    expensive = sorted(electronics, key=lambda p: -(p.price or 0.0))[:3]
+    assert result["status"] == "report"
+    assert result["report"].startswith(f"I found {len(electronics)} product(s)")
+    assert "most expensive first" in result["report"]
+    positions = [result["report"].index(f"(ID: {p.id},") for p in expensive]
+    assert positions == sorted(positions)
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from db_pool import SQLitePool
+
+
+async def _open(tmp_path, **kwargs):
+    pool = SQLitePool(str(tmp_path / "pool.db"), **kwargs)
+    await pool.open()
+    async with pool.writer() as db:
+        await db.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+        await db.executemany("INSERT INTO items (id) VALUES (?)", [(1,), (2,), (3,)])
+        await db.commit()
+    return pool
+
+
+async def _count(db):
+    return (await db.execute_fetchall("SELECT COUNT(*) FROM items"))[0][0]
+
+
+async def _is_closed(db):
+    try:
+        await _count(db)
+    except ValueError:  # aiosqlite: no active connection
+        return True
+    return False
+
+
+def test_close_waits_for_checked_out_readers(tmp_path):
+    async def run():
+        pool = await _open(tmp_path, readers=2)
+        borrowed = asyncio.Event()
+        finish = asyncio.Event()
+        counts = []
+
+        async def slow_read():
+            async with pool.reader() as db:
+                borrowed.set()
+                await finish.wait()
+                # The pool is closing, but this reader stays usable until it is returned
+                counts.append(await _count(db))
+                return db
+
+        reading = asyncio.create_task(slow_read())
+        await borrowed.wait()
+        closing = asyncio.create_task(pool.close())
+        await asyncio.sleep(0.05)
+        assert not closing.done()
+        assert not pool.is_open
+        with pytest.raises(RuntimeError):
+            async with pool.reader():
+                pass
+
+        finish.set()
+        db = await reading
+        await asyncio.wait_for(closing, 1)
+        return counts, await _is_closed(db)
+
+    counts, closed = asyncio.run(run())
+    assert counts == [3]
+    assert closed
+
+
+def test_readers_still_out_after_the_timeout_are_closed_on_return(tmp_path):
+    async def run():
+        pool = await _open(tmp_path, readers=1, close_timeout=0.05)
+        async with pool.reader() as db:
+            await pool.close()
+            count = await _count(db)
+        return count, await _is_closed(db)
+
+    assert asyncio.run(run()) == (3, True)
+
+
+def test_waiting_borrowers_fail_when_the_pool_closes(tmp_path):
+    async def run():
+        pool = await _open(tmp_path, readers=1)
+        async with pool.reader():
+            waiters = [asyncio.create_task(_borrow(pool)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            closing = asyncio.create_task(pool.close())
+            results = await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(closing, 1)
+        # The pool can be opened again with fresh readers
+        await pool.open()
+        try:
+            async with pool.reader() as db:
+                return results, await _count(db)
+        finally:
+            await pool.close()
+
+    async def _borrow(pool):
+        async with pool.reader():
+            pass
+
+    results, count = asyncio.run(run())
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    assert count == 3
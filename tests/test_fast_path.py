@@ -0,0 +1,31 @@
+import asyncio
+import sqlite3
+
+from intent_router import route
+
+
+async def _fast_path(main, messages):
+    await main.startup_event()
+    try:
+        placed = await main._place_order([{"product_id": "p-001", "quantity": 1}])
+        order_id = placed["order_id"]
+        answers = [await main.run_fast_path(message.format(order_id=order_id)) for message in messages]
+        return answers, order_id
+    finally:
+        await main.shutdown_event()
+
+
+def test_cancellations_are_left_to_the_agent(main):
+    assert route("cancel order ORD1001")["intent"] == "cancel_order"
+    (cancel, remove, status_answer), order_id = asyncio.run(_fast_path(main, [
+        "cancel order {order_id}",
+        "please remove my order {order_id}",
+        "status of order {order_id}",
+    ]))
+
+    assert cancel is None and remove is None
+    with sqlite3.connect(main.SQLITE_DATABASE_PATH) as db:
+        assert db.execute("SELECT status FROM orders WHERE order_id = ?", (order_id,)).fetchone()[0] == "Processing"
+    # Read-only intents still take the fast path
+    assert status_answer["agent_name"] == main.FAST_PATH_AGENT_NAME
+    assert status_answer["events"][0]["tool"] == "check_order_status"
@@ -0,0 +1,87 @@
+import pytest
+
+types = pytest.importorskip("google.genai.types")
+
+from history_compaction import HistoryCompactor, estimate_tokens  # noqa: E402
+
+ORDERS_TABLE = "<table><tr><th>Order ID</th></tr>" + "".join(f"<tr><td>ORD{i:04d}</td></tr>" for i in range(200)) + "</table>"
+
+
+def _turn(i, table=ORDERS_TABLE):
+    """One user turn: question, tool call, tool output, answer."""
+    return [
+        types.Content(role="user", parts=[types.Part(text=f"question {i}: list my orders")]),
+        types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(id=f"call-{i}", name="list_all_orders", args={}))]),
+        types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+            id=f"call-{i}", name="list_all_orders", response={"status": "report", "report": table}))]),
+        types.Content(role="model", parts=[types.Part(text=f"answer {i}")]),
+    ]
+
+
+def _history(turns):
+    return [content for i in range(turns) for content in _turn(i)]
+
+
+def _texts(contents):
+    return [part.text for content in contents for part in content.parts if part.text]
+
+
+def _responses(contents):
+    return [part.function_response for content in contents for part in content.parts if part.function_response]
+
+
+def test_old_tool_outputs_are_digested_and_recent_turns_kept():
+    history = _history(5)
+    compacted = HistoryCompactor(keep_turns=2, token_budget=100_000, tool_summary_chars=200).compact(history)
+
+    assert len(compacted) == len(history)
+    responses = _responses(compacted)
+    for response in responses[:3]:
+        assert response.response["status"] == "report"
+        assert response.response["summary"].startswith("[table with 200 row(s)]")
+        assert len(response.response["summary"]) < 300
+    # The last two turns are untouched
+    assert compacted[-8:] == history[-8:]
+
+
+def test_history_is_trimmed_to_the_budget_by_whole_turns():
+    history = _history(8)
+    budget = 2_700
+    assert estimate_tokens(history) > 3 * budget
+    compacted = HistoryCompactor(keep_turns=2, token_budget=budget, tool_summary_chars=100).compact(history)
+
+    assert estimate_tokens(compacted) <= budget
+    questions = [text for text in _texts(compacted) if text.startswith("question")]
+    assert 2 < len(questions) < 8
+    assert questions[-2:] == ["question 6: list my orders", "question 7: list my orders"]
+    assert questions == [f"question {i}: list my orders" for i in range(8 - len(questions), 8)]
+    # Every call kept its response (turns are dropped whole)
+    calls = [part.function_call.id for content in compacted for part in content.parts if part.function_call]
+    assert calls == [response.id for response in _responses(compacted)]
+
+
+def test_kept_turns_are_clipped_except_the_latest_tool_output():
+    history = _history(3)
+    compacted = HistoryCompactor(keep_turns=3, token_budget=2_000, tool_summary_chars=100).compact(history)
+
+    responses = _responses(compacted)
+    assert len(responses) == 3
+    assert all("summary" in response.response for response in responses[:2])
+    assert responses[-1].response["report"] == ORDERS_TABLE
+
+
+def test_callback_rewrites_the_request_and_records_sizes():
+    class Request:
+        contents = _history(6)
+
+    class Context:
+        agent_name = "list_orders_agent"
+
+    compactor = HistoryCompactor(keep_turns=1, token_budget=3_000)
+    before = estimate_tokens(Request.contents)
+    assert compactor(Context(), Request) is None
+    summary = compactor.metrics.summary()
+    assert summary["calls"] == 1
+    assert summary["last"]["tokens_before"] == before
+    assert summary["last"]["tokens_after"] == estimate_tokens(Request.contents) < before
+    assert summary["per_agent"]["list_orders_agent"]["calls"] == 1
@@ -0,0 +1,42 @@
+import pytest
+
+from intent_router import route
+
+
+@pytest.mark.parametrize("message", [
+    "should I cancel order ORD1001?",
+    "what happens if I cancel order ORD1001?",
+    "is it too late to cancel order 12345?",
+    "how do I cancel order 12345",
+    "cancel order ORD1001 if it is still processing",
+    "cancel order ORD1001 unless it has shipped",
+    "can I cancel order ORD1001",
+])
+def test_questions_and_conditions_never_cancel(message):
+    routed = route(message)
+    assert routed is None or routed["intent"] != "cancel_order"
+
+
+@pytest.mark.parametrize("message", [
+    "cancel order ORD1001",
+    "please cancel my order #ABC-678",
+    "can you delete order number 11223",
+])
+def test_plain_cancel_requests_use_the_rule(message):
+    routed = route(message)
+    assert routed["intent"] == "cancel_order"
+    assert routed["matched_by"] == "rule"
+
+
+def test_classifier_never_picks_cancel_order():
+    # Scores as cancel_order but does not match the whole-message rule
+    assert route("order ORD1001 cancellation please") is None
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("what is the status of order ORD1001?", "order_status"),
+    ("how many products do you have?", "product_count"),
+    ("what categories do you have?", "list_categories"),
+])
+def test_read_only_questions_still_take_the_fast_path(message, intent):
+    assert route(message)["intent"] == intent
@@ -0,0 +1,110 @@
+import asyncio
+
+import httpx
+import pytest
+
+from llm_http import HostLimitedTransport, LLMHttpPool
+
+
+class _Body(httpx.AsyncByteStream):
+    """A streamed response body, like a completion read chunk by chunk."""
+
+    async def __aiter__(self):
+        for _ in range(3):
+            yield b"chunk"
+
+
+def _streamed(request):
+    return httpx.Response(200, stream=_Body())
+
+
+def _client(max_per_host, handler=_streamed):
+    transport = HostLimitedTransport(httpx.MockTransport(handler), max_per_host)
+    return httpx.AsyncClient(transport=transport), transport
+
+
+def test_slot_is_held_until_the_stream_is_closed():
+    async def run():
+        client, transport = _client(max_per_host=1)
+        async with client:
+            first = await client.send(client.build_request("POST", "http://llm.test/v1/chat"), stream=True)
+            assert transport.in_flight == {"llm.test": 1}
+
+            second = asyncio.create_task(client.post("http://llm.test/v1/chat"))
+            await asyncio.sleep(0.01)
+            # Headers have arrived, but the body is still open: the next request waits
+            assert not second.done()
+            assert transport.waiting == {"llm.test": 1}
+
+            await first.aread()
+            await first.aclose()
+            response = await asyncio.wait_for(second, 1)
+            assert response.status_code == 200
+            assert transport.in_flight == {"llm.test": 0}
+            assert transport.waiting == {"llm.test": 0}
+
+    asyncio.run(run())
+
+
+def test_hosts_have_separate_slots():
+    async def run():
+        client, transport = _client(max_per_host=1)
+        async with client:
+            held = await client.send(client.build_request("GET", "http://a.test/"), stream=True)
+            other = await asyncio.wait_for(client.get("http://b.test/"), 1)
+            assert other.status_code == 200
+            await held.aclose()
+            assert transport.in_flight == {"a.test": 0, "b.test": 0}
+
+    asyncio.run(run())
+
+
+def test_bodies_read_by_the_transport_release_their_slot():
+    async def run():
+        client, transport = _client(max_per_host=1, handler=lambda request: httpx.Response(200, text="done"))
+        async with client:
+            for _ in range(3):
+                response = await asyncio.wait_for(client.send(client.build_request("GET", "http://llm.test/"), stream=True), 1)
+                assert response.text == "done"
+            assert transport.in_flight == {"llm.test": 0}
+
+    asyncio.run(run())
+
+
+def test_failed_requests_release_their_slot():
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    async def run():
+        client, transport = _client(max_per_host=1, handler=handler)
+        async with client:
+            for _ in range(3):
+                with pytest.raises(httpx.ConnectError):
+                    await asyncio.wait_for(client.get("http://llm.test/"), 1)
+            assert transport.in_flight == {"llm.test": 0}
+
+    asyncio.run(run())
+
+
+def test_pool_warm_up_install_and_close(monkeypatch):
+    # No network fetch of the model cost map while litellm is imported (as in bench_startup.py)
+    monkeypatch.setenv("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    litellm = pytest.importorskip("litellm")
+
+    async def run():
+        pool = LLMHttpPool(max_connections=8, max_keepalive=4, max_per_host=2, http2=False)
+        requests = []
+        pool.transport._transport = httpx.MockTransport(lambda request: requests.append(request.method) or httpx.Response(405))
+        assert await pool.warm_up("not a url", 3) == 0
+        assert await pool.warm_up("https://llm.test/v1", 3) == 3
+        assert requests == ["HEAD"] * 3
+
+        pool.install()
+        assert litellm.aclient_session is pool.client
+        stats = pool.stats()
+        assert (stats["max_connections"], stats["max_keepalive"], stats["max_per_host"]) == (8, 4, 2)
+        assert stats["in_flight"] == {} and stats["waiting"] == {}
+        await pool.aclose()
+        assert litellm.aclient_session is None
+
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sqlite3
+
+import aiosqlite
+
+import migrations
+
+TEST_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test.sql")
+
+
+def _migrate(path):
+    async def run():
+        async with aiosqlite.connect(path) as db:
+            version = await migrations.run_migrations(db)
+            return version, await migrations.check_query_plans(db)
+    return asyncio.run(run())
+
+
+def _schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        objects = {
+            (row[0], row[1])
+            for row in conn.execute("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")
+        }
+        columns = {
+            name: [col[1:] for col in conn.execute(f"PRAGMA table_info({name})")]
+            for kind, name in objects if kind == "table"
+        }
+        return objects, columns, conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_recorded_query_plans_match_on_a_fresh_database(tmp_path):
+    version, failures = _migrate(str(tmp_path / "fresh.db"))
+    assert version == migrations.LATEST_VERSION
+    assert failures == []
+
+
+def test_migrations_are_idempotent(tmp_path):
+    path = str(tmp_path / "twice.db")
+    _migrate(path)
+    version, failures = _migrate(path)
+    assert version == migrations.LATEST_VERSION
+    assert failures == []
+
+
+def test_reference_schema_matches_the_migrations(tmp_path):
+    migrated = str(tmp_path / "migrated.db")
+    _migrate(migrated)
+    reference = str(tmp_path / "reference.db")
+    conn = sqlite3.connect(reference)
+    try:
+        with open(TEST_SQL) as f:
+            conn.executescript(f.read())
+    finally:
+        conn.close()
+    assert _schema(reference) == _schema(migrated)
@@ -0,0 +1,72 @@
+import asyncio
+import random
+import sqlite3
+from collections import defaultdict
+
+import order_store
+
+HOT_SKU = "p-003"
+STOCK = 150
+ORDERS = 300
+RETRIES = 100
+
+
+async def _place_and_cancel(main):
+    await main.startup_event()
+    try:
+        async with main.db_pool.writer() as db:
+            await order_store.set_stock(db, {HOT_SKU: STOCK})
+
+        rng = random.Random(7)
+        submissions = [(f"stress-{i}", rng.randint(1, 3)) for i in range(ORDERS)]
+        # Retries reuse a key with the same items; all of them race the first submission
+        submissions += rng.sample(submissions, RETRIES)
+        rng.shuffle(submissions)
+        results = await asyncio.gather(*(
+            main._place_order([{"product_id": HOT_SKU, "quantity": quantity}], idempotency_key=key)
+            for key, quantity in submissions
+        ))
+
+        async with main.db_pool.reader() as db:
+            left_after_orders = (await order_store.stock_levels(db, [HOT_SKU]))[HOT_SKU]
+
+        placed = {result["order_id"] for result in results if result["status"] == "success"}
+        # Every order cancelled twice at once: only one cancellation may restock
+        removals = await asyncio.gather(*(main.remove_order(order_id) for order_id in placed for _ in range(2)))
+        return submissions, results, left_after_orders, removals
+    finally:
+        await main.shutdown_event()
+
+
+def test_concurrent_orders_on_a_hot_sku(main):
+    submissions, results, left_after_orders, removals = asyncio.run(_place_and_cancel(main))
+
+    by_key = defaultdict(list)
+    for (key, quantity), result in zip(submissions, results):
+        assert result["status"] == "success" or result.get("error_code") == "insufficient_stock", result
+        by_key[key].append((quantity, result))
+
+    sold = 0
+    for key, copies in by_key.items():
+        order_ids = {result.get("order_id") for _, result in copies if result["status"] == "success"}
+        assert len(order_ids) <= 1, f"{key} produced orders {order_ids}"
+        created = [result for _, result in copies if result["status"] == "success" and not result.get("idempotent_replay")]
+        assert len(created) <= 1, f"{key} created {len(created)} orders"
+        if created:
+            sold += copies[0][0]
+
+    assert 0 <= left_after_orders
+    assert sold + left_after_orders == STOCK
+    assert sold > 0 and left_after_orders < 3, "the SKU should sell out"
+
+    assert all(r["status"] == "success" for r in removals)
+    assert sum(1 for r in removals if r.get("already_cancelled")) == len(removals) // 2
+
+    with sqlite3.connect(main.SQLITE_DATABASE_PATH) as db:
+        keys = db.execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()[0]
+        orders = db.execute("SELECT COUNT(*), SUM(status = 'Cancelled') FROM orders").fetchone()
+        stock = db.execute("SELECT quantity FROM inventory WHERE product_id = ?", (HOT_SKU,)).fetchone()[0]
+        reserved = db.execute("SELECT COUNT(*) FROM inventory_reservations").fetchone()[0]
+    assert keys == orders[0] == orders[1] == len(removals) // 2
+    assert stock == STOCK
+    assert reserved == 0
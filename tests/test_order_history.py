@@ -0,0 +1,51 @@
+import asyncio
+import re
+import sqlite3
+
+ITEMS = [{"product_id": "p-001", "quantity": 1}]
+
+
+def _order(order_id, user_id, created_at):
+    return {"order_id": order_id, "user_id": user_id, "created_at": created_at, "items": ITEMS}
+
+
+async def _history(main, user_id, page_size):
+    """Every page of list_all_orders for `user_id`: (order IDs per page, last response)."""
+    pages, cursor = [], None
+    while True:
+        result = await main.list_all_orders(page_size=page_size, cursor=cursor, user_id=user_id)
+        if result["status"] != "report":
+            return pages, result
+        pages.append(re.findall(r"<tr><td>([^<]+)</td>", result["report"]))
+        cursor = result.get("next_cursor")
+        if cursor is None:
+            return pages, result
+
+
+async def _archive_and_list(main):
+    await main.startup_event()
+    try:
+        await main.import_orders([
+            _order("recent-2", "alice", "2099-01-02T10:00:00"),
+            _order("recent-1", "alice", "2099-01-01T10:00:00"),
+            _order("old-3", "alice", "2020-03-01T10:00:00"),
+            _order("old-2", "alice", "2020-02-01T10:00:00"),
+            _order("old-1", "alice", "2020-01-01T10:00:00"),
+            _order("old-bob", "bob", "2020-01-15T10:00:00"),
+        ])
+        await main.archive_old_orders()
+        return await _history(main, "alice", 3), await _history(main, "bob", 20)
+    finally:
+        await main.shutdown_event()
+
+
+def test_order_history_continues_into_the_archive(main):
+    (alice_pages, _), (bob_pages, bob_last) = asyncio.run(_archive_and_list(main))
+
+    with sqlite3.connect(main.SQLITE_DATABASE_PATH) as db:
+        assert db.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 2
+        assert db.execute("SELECT COUNT(*) FROM orders_archive").fetchone()[0] == 4
+    # The first page straddles the two tiers, the next one comes from the archive only
+    assert alice_pages == [["recent-2", "recent-1", "old-3"], ["old-2", "old-1"]]
+    assert bob_pages == [["old-bob"]]
+    assert "next_cursor" not in bob_last
@@ -0,0 +1,35 @@
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+ORDERS = {"orders": [
+    {"order_id": "import-1", "items": [{"product_id": "p-001", "quantity": 2}], "status": "Shipped"},
+    {"order_id": "import-2", "items": [{"product_id": "p-002", "quantity": 1}], "status": "Refunded"},
+]}
+
+
+def _order_ids(main):
+    with sqlite3.connect(main.SQLITE_DATABASE_PATH) as db:
+        return [row[0] for row in db.execute("SELECT order_id FROM orders ORDER BY order_id")]
+
+
+def test_import_is_refused_without_a_configured_token(main):
+    with TestClient(main.app) as client:
+        response = client.post("/orders/import", json=ORDERS, headers={"X-Admin-Token": ""})
+        assert response.status_code == 403
+        assert "ADMIN_TOKEN is not configured" in response.json()["message"]
+    assert _order_ids(main) == []
+
+
+def test_import_needs_the_admin_token(main, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    with TestClient(main.app) as client:
+        assert client.post("/orders/import", json=ORDERS).status_code == 403
+        assert client.post("/orders/import", json=ORDERS, headers={"X-Admin-Token": "wrong"}).status_code == 403
+        assert _order_ids(main) == []
+
+        result = client.post("/orders/import", json=ORDERS, headers={"X-Admin-Token": "s3cret"}).json()
+    assert result["imported"] == 1
+    assert [r["index"] for r in result["rejected"]] == [1]
+    assert "Unknown status 'Refunded'" in result["rejected"][0]["message"]
+    assert _order_ids(main) == ["import-1"]
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import re
+
+from fastapi.testclient import TestClient
+
+ITEMS = [{"product_id": "p-001", "quantity": 1}]
+# Five orders sharing one timestamp: the keyset must break ties on order_id
+ORDERS = [
+    {"order_id": f"order-{i:02d}", "user_id": "alice" if i % 2 else "bob", "items": ITEMS,
+     "created_at": "2099-01-01T10:00:00" if i < 5 else f"2099-01-{i:02d}T10:00:00"}
+    for i in range(12)
+]
+NEWEST_FIRST = sorted(ORDERS, key=lambda o: (o["created_at"], o["order_id"]), reverse=True)
+
+
+def test_cursor_round_trip(main):
+    cursor = main._encode_order_cursor("2099-01-01T10:00:00", "order-03")
+    assert re.fullmatch(r"[A-Za-z0-9_=-]+", cursor)
+    assert main._decode_order_cursor(cursor) == ("2099-01-01T10:00:00", "order-03")
+
+
+async def _pages(main, page_size, user_id=None):
+    pages, cursor = [], None
+    while True:
+        result = await main.list_all_orders(page_size=page_size, cursor=cursor, user_id=user_id)
+        pages.append(re.findall(r"<tr><td>([^<]+)</td>", result["report"]))
+        cursor = result.get("next_cursor")
+        if cursor is None:
+            return pages
+
+
+async def _paginate(main):
+    await main.startup_event()
+    try:
+        await main.import_orders(ORDERS)
+        everyone = await _pages(main, 5)
+        alice = await _pages(main, 4, user_id="alice")
+        streamed = [row["order_id"] async for row in main.iter_orders(page_size=3)]
+        invalid = await main.list_all_orders(cursor="not a cursor")
+        after_end = await main.list_all_orders(cursor=main._encode_order_cursor("2000-01-01", "x"))
+        return everyone, alice, streamed, invalid, after_end
+    finally:
+        await main.shutdown_event()
+
+
+def test_keyset_pages_cover_every_order_once(main):
+    everyone, alice, streamed, invalid, after_end = asyncio.run(_paginate(main))
+
+    newest_first = [o["order_id"] for o in NEWEST_FIRST]
+    assert [len(page) for page in everyone] == [5, 5, 2]
+    assert sum(everyone, []) == newest_first
+    assert sum(alice, []) == [o["order_id"] for o in NEWEST_FIRST if o["user_id"] == "alice"]
+    assert streamed == newest_first
+    assert invalid["status"] == "error" and "Invalid page cursor" in invalid["message"]
+    assert after_end == {"status": "not_found", "message": "There are no more orders."}
+
+
+def test_orders_stream_is_ndjson(main):
+    with TestClient(main.app) as client:
+        client.portal.call(main.import_orders, ORDERS)
+        response = client.get("/orders/stream", params={"user_id": "bob", "page_size": 2})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["order_id"] for row in rows] == [o["order_id"] for o in NEWEST_FIRST if o["user_id"] == "bob"]
+    assert set(rows[0]) == {"order_id", "status", "created_at", "total_price"}
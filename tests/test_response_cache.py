@@ -0,0 +1,85 @@
+import pytest
+
+from response_cache import SemanticResponseCache, content_terms, is_cacheable_message, normalize_message
+
+# Similar wording, different products (or price): the first three score 0.83-0.91 with this embedding
+NEAR_MISSES = [
+    ("show me running shoes for men", "show me running shoes for women"),
+    ("do you sell wireless headphones", "do you sell wired headphones"),
+    ("do you have a yoga mat", "do you have a yoga ball"),
+    ("backpacks under $20", "backpacks under $25"),
+]
+
+
+def _cache(**kwargs):
+    return SemanticResponseCache(uncacheable_agents=["ordering_agent"], cacheable_tools=["search_products"], **kwargs)
+
+
+def _store(cache, message):
+    assert cache.store(message, f"answer to {message}", "product_search_agent", ["product_search_agent"], ["search_products"])
+
+
+def test_default_is_an_exact_normalized_match():
+    cache = _cache()
+    _store(cache, "Show me running shoes!")
+    hit = cache.lookup("show me   running shoes")
+    assert hit["response"] == "answer to Show me running shoes!"
+    assert hit["similarity"] == 1.0
+    assert cache.lookup("show me the running shoes please") is None
+
+
+@pytest.mark.parametrize("stored, asked", NEAR_MISSES)
+def test_near_misses_are_not_served(stored, asked):
+    assert is_cacheable_message(stored) and is_cacheable_message(asked)
+    cache = _cache(similarity_threshold=0.82)
+    _store(cache, stored)
+    assert cache.lookup(asked) is None
+    assert cache.lookup(stored)["response"] == f"answer to {stored}"
+
+
+def test_rephrasings_with_the_same_content_words_match():
+    cache = _cache(similarity_threshold=0.82)
+    _store(cache, "show me running shoes")
+    hit = cache.lookup("show me the running shoes please")
+    assert hit["matched"] == "show me running shoes"
+    assert 0.82 <= hit["similarity"] < 1.0
+
+
+def test_messages_without_content_words_only_match_themselves():
+    assert content_terms(normalize_message("What can you do?")) == frozenset()
+    cache = _cache(similarity_threshold=0.5)
+    _store(cache, "what can you do")
+    assert cache.lookup("what can you do for me") is None
+    assert cache.lookup("What can you do?") is not None
+
+
+def test_state_changing_and_follow_up_messages_are_not_cacheable():
+    assert not is_cacheable_message("buy p-001")
+    assert not is_cacheable_message("cancel my order")
+    assert not is_cacheable_message("yes please")
+    assert not is_cacheable_message("show me more of those")
+    assert is_cacheable_message("what product categories do you have?")
+
+
+def test_turns_through_uncacheable_agents_or_tools_are_not_stored():
+    cache = _cache()
+    assert not cache.store("hi", "hello", "ordering_agent", ["shopping_orchestrator_agent", "ordering_agent"])
+    assert not cache.store("hi", "hello", "product_search_agent", ["product_search_agent"], ["place_order"])
+    assert cache.lookup("hi") is None
+    assert cache.stats()["rejected"] == 2
+
+
+def test_entries_expire_and_are_evicted_least_recently_used(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("response_cache.time.monotonic", lambda: now[0])
+    cache = _cache(ttl_seconds=10, max_entries=2)
+    _store(cache, "hats")
+    _store(cache, "scarves")
+    assert cache.lookup("hats") is not None
+    _store(cache, "gloves")
+    assert cache.lookup("scarves") is None
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 11
+    assert cache.lookup("hats") is None
+    assert len(cache) == 0
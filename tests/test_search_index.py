@@ -0,0 +1,74 @@
+from catalog import Product
+from search_index import ProductSearchIndex, tokenize
+
+
+def _product(id, name, category="Footwear", price=50.0, description=""):
+    return Product(id, name, price, description, category)
+
+
+PRODUCTS = [
+    _product("p-1", "Trail Running Shoes", description="Grippy shoes for muddy trails."),
+    _product("p-2", "Leather Dress Shoes", description="Formal shoes.", price=120.0),
+    _product("p-3", "Running Socks", category="Clothing", description="Thin socks for running.", price=9.0),
+    _product("p-4", "Yoga Mat", category="Fitness", description="Non-slip mat.", price=25.0),
+]
+
+
+def _ids(result):
+    products, _ = result
+    return [p.id for p in products]
+
+
+def test_tokenize_drops_stop_words_and_folds_plurals():
+    assert tokenize("Show me the Wi-Fi accessories for kitchens") == ["wi", "fi", "accessory", "kitchen"]
+
+
+def test_bm25_ranks_name_matches_first_and_counts_every_match():
+    index = ProductSearchIndex(PRODUCTS)
+    products, total = index.search("running shoes")
+    # Both terms in the name beats one term in the name (p-2, p-3)
+    assert [p.id for p in products][0] == "p-1"
+    assert total == 3
+    assert _ids(index.search("running shoes", limit=1)) == ["p-1"]
+    assert index.search("tent") == ([], 0)
+
+
+def test_category_and_price_filters():
+    index = ProductSearchIndex(PRODUCTS)
+    assert _ids(index.search("running", categories=["clothing"])) == ["p-3"]
+    assert _ids(index.search("shoes", max_price=100)) == ["p-1"]
+    assert _ids(index.search("shoes", min_price=100)) == ["p-2"]
+    # A category without query terms lists it in catalog order
+    assert _ids(index.search("", categories=["Footwear"])) == ["p-1", "p-2"]
+    assert index.categories() == ["Footwear", "Clothing", "Fitness"]
+
+
+def test_updated_reindexes_changed_products_without_touching_the_original():
+    index = ProductSearchIndex(PRODUCTS)
+    reloaded = list(PRODUCTS)
+    reloaded[3] = _product("p-4", "Yoga Ball", category="Clothing", description="Anti-burst ball.", price=30.0)
+
+    updated = index.updated(reloaded, [3])
+
+    assert _ids(updated.search("ball")) == ["p-4"]
+    assert _ids(updated.search("mat")) == []
+    assert _ids(updated.search("", categories=["clothing"])) == ["p-3", "p-4"]
+    assert "Fitness" not in updated.categories()
+    assert _ids(updated.search("ball", min_price=28)) == ["p-4"]
+    # Copy-on-write: the original index still answers for the old catalog
+    assert _ids(index.search("mat")) == ["p-4"]
+    assert _ids(index.search("ball")) == []
+    assert _ids(index.search("", categories=["clothing"])) == ["p-3"]
+    # Postings of terms the change did not touch are shared, not copied
+    assert updated.postings["running"] is index.postings["running"]
+
+
+def test_updated_matches_a_full_rebuild():
+    reloaded = list(PRODUCTS)
+    reloaded[0] = _product("p-1", "Trail Running Shoes V2", description="Lighter and grippier.", price=80.0)
+    updated = ProductSearchIndex(PRODUCTS).updated(reloaded, [0])
+    rebuilt = ProductSearchIndex(reloaded)
+    for query in ("running shoes", "trail", "grippier", "socks", "v2"):
+        assert updated.search(query) == rebuilt.search(query)
+    assert dict(updated.postings) == dict(rebuilt.postings)
+    assert updated.idf == rebuilt.idf
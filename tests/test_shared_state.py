@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from shared_state import MemorySharedState, SQLiteSharedState, create_shared_state
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("time.time", lambda: now[0])
+    return now
+
+
+async def _open(path):
+    state = SQLiteSharedState(path)
+    await state.open()
+    return state
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_counters_and_values_expire(backend, tmp_path, clock):
+    async def run():
+        state = create_shared_state(backend, str(tmp_path / "shared.db"))
+        await state.open()
+        try:
+            assert await state.incr("hits", 1, ttl=10) == 1
+            assert await state.incr("hits", 2, ttl=10) == 3
+            await state.set("flag", {"paused": True}, ttl=5)
+            await state.set("forever", "yes")
+            assert await state.get("flag") == {"paused": True}
+
+            clock[0] += 6
+            assert await state.get("flag", "gone") == "gone"
+            assert await state.get("hits") == 3
+            clock[0] += 5
+            # An expired counter starts over with a fresh expiry
+            assert await state.incr("hits", 1, ttl=10) == 1
+            assert await state.get("forever") == "yes"
+            await state.delete("forever")
+            assert await state.get("forever") is None
+        finally:
+            await state.close()
+
+    asyncio.run(run())
+
+
+def test_invalidations_reach_the_other_workers_only(tmp_path):
+    async def run():
+        path = str(tmp_path / "shared.db")
+        first, second = await _open(path), await _open(path)
+        try:
+            await first.publish(["order:1", "catalog"])
+            await second.publish(["order:2"])
+            await first.publish([])
+            seen_by_first, seen_by_second = await first.poll(), await second.poll()
+            # Each tag is delivered once
+            again = await first.poll(), await second.poll()
+            late = await _open(path)
+            try:
+                return seen_by_first, seen_by_second, again, await late.poll()
+            finally:
+                await late.close()
+        finally:
+            await first.close()
+            await second.close()
+
+    seen_by_first, seen_by_second, again, late = asyncio.run(run())
+    assert seen_by_first == ["order:2"]
+    assert seen_by_second == ["order:1", "catalog"]
+    assert again == ([], [])
+    # A worker that starts later has empty caches: older invalidations do not apply to it
+    assert late == []
+
+
+def test_counters_are_shared_between_workers(tmp_path):
+    async def run():
+        path = str(tmp_path / "shared.db")
+        workers = [await _open(path) for _ in range(3)]
+        try:
+            counts = await asyncio.gather(*(w.incr("ratelimit:10.0.0.1:1", 1, ttl=60) for w in workers for _ in range(5)))
+            return sorted(counts), await workers[0].get("ratelimit:10.0.0.1:1")
+        finally:
+            for w in workers:
+                await w.close()
+
+    counts, total = asyncio.run(run())
+    assert counts == list(range(1, 16))
+    assert total == 15
+
+
+def test_poll_prunes_old_events_and_expired_values(tmp_path, clock):
+    async def run():
+        state = SQLiteSharedState(str(tmp_path / "shared.db"), retention_seconds=100)
+        await state.open()
+        try:
+            await state.publish(["old"])
+            await state.set("short", 1, ttl=5)
+            clock[0] += 101
+            await state.poll()
+            db = state._db
+            events = (await (await db.execute("SELECT COUNT(*) FROM shared_events")).fetchone())[0]
+            values = (await (await db.execute("SELECT COUNT(*) FROM shared_kv")).fetchone())[0]
+            return events, values
+        finally:
+            await state.close()
+
+    assert asyncio.run(run()) == (0, 0)
+
+
+def test_unknown_backend_falls_back_to_memory(tmp_path):
+    assert isinstance(create_shared_state("redis", str(tmp_path / "x.db")), MemorySharedState)
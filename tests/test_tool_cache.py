@@ -0,0 +1,47 @@
+import asyncio
+
+from tool_cache import ToolResultCache
+
+
+def test_waiters_recompute_when_the_first_caller_is_cancelled():
+    async def run():
+        cache = ToolResultCache()
+        calls = 0
+        release = asyncio.Event()
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await release.wait()
+            return {"status": "report", "call": calls}
+
+        owner = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        owner.cancel()
+        result = await waiter
+        assert owner.cancelled()
+        assert result == {"status": "report", "call": 2}
+        assert cache.get("key") == result
+
+    asyncio.run(run())
+
+
+def test_errors_are_shared_with_waiters():
+    async def run():
+        cache = ToolResultCache()
+        gate = asyncio.Event()
+
+        async def compute():
+            await gate.wait()
+            raise ValueError("boom")
+
+        tasks = [asyncio.create_task(cache.get_or_compute("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(run())
@@ -0,0 +1,166 @@
+"""
+In-process result cache for the read-only agent tools.
+
+search_products and check_order_status are called repeatedly with the same
+arguments (users re-ask, agents retry, the fast path and the agent tree answer
+the same question). Their results are cached here keyed on normalized
+arguments, with a TTL and an LRU size bound. Every entry carries tags
+("catalog", "order:<id>") so writes invalidate exactly what they affect:
+place_order/remove_order/import drop the order's entries, and a catalog
+reload clears everything.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+
+class _ComputationAbandoned(Exception):
+    """Set on a shared computation whose owner was cancelled: its waiters compute the value themselves."""
+
+
+class ToolResultCache:
+    """
+    Async-safe LRU + TTL cache for tool results.
+
+    Concurrent misses for the same key share one computation (single flight),
+    so a burst of identical queries runs the tool once. Only results whose
+    'status' is in `cacheable_statuses` are stored; errors are never cached.
+    A computation whose tags are invalidated while it runs is returned to its
+    callers but not stored. If the caller running a shared computation is
+    cancelled (e.g. at its request deadline), the callers waiting on it are
+    not: the next one starts the computation again.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0,
+                 cacheable_statuses: Iterable[str] = ("report", "not_found")):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cacheable_statuses = frozenset(cacheable_statuses)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any], Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._in_flight: Dict[Hashable, Tuple["asyncio.Future[Dict[str, Any]]", Tuple[str, ...]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return dict(value)
+
+    def set(self, key: Hashable, value: Dict[str, Any], tags: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        if value.get("status") not in self.cacheable_statuses:
+            return
+        if key in self._entries:
+            self._remove(key)
+        tags = tuple(tags)
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl is None else ttl)
+        self._entries[key] = (expires_at, dict(value), tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        tags: Iterable[str] = (),
+        ttl: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Returns the cached result for `key`, or awaits `compute()` (once per key) and caches it."""
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            try:
+                value = await asyncio.shield(pending[0])
+            except _ComputationAbandoned:
+                continue
+            self.hits += 1
+            return dict(value)
+
+        self.misses += 1
+        tags = tuple(tags)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (future, tags)
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            # This caller's cancellation is not the waiters' failure: let them retry
+            future.set_exception(_ComputationAbandoned())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved; waiters (if any) get the exception themselves
+            raise
+        else:
+            future.set_result(value)
+            # Skip storing if the key was invalidated or the cache cleared while computing
+            if self._in_flight.get(key, (None,))[0] is future:
+                self.set(key, value, tags=tags, ttl=ttl)
+            return dict(value)
+        finally:
+            if self._in_flight.get(key, (None,))[0] is future:
+                del self._in_flight[key]
+
+    def invalidate(self, *tags: str) -> int:
+        """Drops every entry (and in-flight computation) carrying any of the tags. Returns the entry count."""
+        wanted = set(tags)
+        removed = 0
+        for tag in wanted:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                removed += 1
+        for key, (_, key_tags) in list(self._in_flight.items()):
+            if wanted.intersection(key_tags):
+                del self._in_flight[key]
+        self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        """Drops everything, e.g. after a catalog reload."""
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._tags.clear()
+        self._in_flight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }